@@ -0,0 +1,2 @@
+# Optunaスイーパー（hydra-optuna-sweeper）に試行の枝刈りを追加したHydraスイーパープラグイン
+# `hydra_plugins`名前空間パッケージとして、プロジェクトのルートがPYTHONPATHにあるときにHydraに検出されます
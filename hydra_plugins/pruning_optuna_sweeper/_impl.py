@@ -0,0 +1,434 @@
+import csv
+import functools
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import optuna
+from hydra.core.utils import JobReturn, JobStatus
+from hydra_plugins.hydra_optuna_sweeper._impl import (
+    OptunaSweeperImpl,
+    create_params_from_overrides,
+)
+from omegaconf import DictConfig, ListConfig, OmegaConf
+from optuna.distributions import BaseDistribution
+from optuna.trial import FrozenTrial, Trial, TrialState
+
+from src.utils.optuna_utils import register_trial, unregister_trial
+
+log = logging.getLogger(__name__)
+
+
+def is_pruned(ret: JobReturn) -> bool:
+    """ジョブが`optuna.TrialPruned`によって終了したかどうかを返します。
+
+    :param ret: ジョブの結果。
+    :return: ジョブが枝刈りされた場合は`True`。
+    """
+    return ret.status == JobStatus.FAILED and isinstance(ret._return_value, optuna.TrialPruned)
+
+
+def format_pareto_table(
+    trials: Sequence[FrozenTrial], metric_names: Sequence[str], directions: Sequence[str]
+) -> List[List[str]]:
+    """パレート解の試行を、試行番号・各目的の値・パラメータを列とする表にします。
+
+    :param trials: パレート解の試行のシーケンス。
+    :param metric_names: 各目的のメトリック名。
+    :param directions: 各目的の最適化の方向。
+    :return: ヘッダー行を先頭に含む行のリスト。
+    """
+    param_names = sorted({name for trial in trials for name in trial.params})
+    header = ["trial"]
+    header += [f"{name} ({direction})" for name, direction in zip(metric_names, directions)]
+    header += param_names
+    rows = [header]
+    # 最初の目的の良い順に並べます
+    reverse = directions[0] == "maximize"
+    for trial in sorted(trials, key=lambda t: t.values[0], reverse=reverse):
+        row = [str(trial.number)]
+        row += [f"{value:.6g}" for value in trial.values]
+        row += [str(trial.params.get(name, "")) for name in param_names]
+        rows.append(row)
+    return rows
+
+
+class PruningOptunaSweeperImpl(OptunaSweeperImpl):
+    """`OptunaSweeperImpl`に試行の枝刈りを追加した実装。
+
+    各ジョブの起動前に、ジョブ番号と試行の対応を`src.utils.optuna_utils`に登録することで、
+    ジョブ内のコールバック（`src.callbacks.OptunaPruning`）が中間値を報告できるようにします。
+    `optuna.TrialPruned`で終了したジョブは失敗ではなく枝刈り済み（`TrialState.PRUNED`）として記録されます。
+
+    `optimized_metric`がメトリック名のリストの場合（`direction`もリスト）は多目的最適化となり、
+    結果はパレート解の表（`pareto_front.csv`）として保存されます。
+
+    `successive_halving`が設定されている場合は、すべての試行を最小の予算で実行し、上位`1/reduction_factor`の
+    試行だけを次の段階（より大きな予算）に昇格させる逐次半減法でスイープします。昇格した試行は
+    前の段階のチェックポイントからトレーニングを再開します。
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        pruner: Optional[Any] = None,
+        successive_halving: Optional[DictConfig] = None,
+    ) -> None:
+        """`PruningOptunaSweeperImpl`を初期化します。
+
+        :param args: `OptunaSweeperImpl`の引数。
+        :param pruner: 試行の枝刈りアルゴリズム。`None`の場合は枝刈りしません。
+        :param successive_halving: 逐次半減法の設定。`None`の場合は通常のスイープを行います。
+        """
+        super().__init__(*args)
+        self.pruner = pruner
+        self.successive_halving = successive_halving
+
+    def _create_study(
+        self, arguments: List[str]
+    ) -> Tuple[optuna.Study, Dict[str, BaseDistribution], Dict[str, Any], List[str], bool]:
+        """探索空間を構築し、スタディを作成（またはストレージから読み込み）します。
+
+        :param arguments: コマンドラインから与えられたオーバーライドのリスト。
+        :return: スタディ、探索空間の分布、固定パラメータ、最適化の方向、グリッドサンプラーかどうかのタプル。
+        """
+        self._process_searchspace_config()
+        params_conf = self._parse_sweeper_params_config()
+        params_conf.extend(arguments)
+
+        is_grid_sampler = (
+            isinstance(self.sampler, functools.partial)
+            and self.sampler.func == optuna.samplers.GridSampler
+        )
+
+        override_search_space_distributions, fixed_params = create_params_from_overrides(
+            params_conf
+        )
+
+        search_space_distributions = dict()
+        if self.search_space_distributions:
+            search_space_distributions = self.search_space_distributions.copy()
+        search_space_distributions.update(override_search_space_distributions)
+
+        if is_grid_sampler:
+            search_space_for_grid_sampler = {
+                name: self._to_grid_sampler_choices(distribution)
+                for name, distribution in search_space_distributions.items()
+            }
+            self.sampler = self.sampler(search_space_for_grid_sampler)
+            n_trial = 1
+            for v in search_space_for_grid_sampler.values():
+                n_trial *= len(v)
+            self.n_trials = min(self.n_trials, n_trial)
+            log.info(f"Updating num of trials to {self.n_trials} due to using GridSampler.")
+
+        # 固定パラメータを探索空間から取り除きます
+        for param_name in fixed_params:
+            if param_name in search_space_distributions:
+                del search_space_distributions[param_name]
+
+        directions = self._get_directions()
+
+        # `optuna.create_study`は`None`を`MedianPruner`として扱うため、枝刈りしない場合は明示的に指定します
+        pruner = self.pruner if self.pruner is not None else optuna.pruners.NopPruner()
+        study = optuna.create_study(
+            study_name=self.study_name,
+            storage=self.storage,
+            sampler=self.sampler,
+            pruner=pruner,
+            directions=directions,
+            load_if_exists=True,
+        )
+        if len(directions) > 1:
+            study.set_metric_names(self._metric_names(len(directions)))
+        log.info(f"Study name: {study.study_name}")
+        log.info(f"Storage: {self.storage}")
+        log.info(f"Sampler: {type(self.sampler).__name__}")
+        log.info(f"Pruner: {type(study.pruner).__name__}")
+        log.info(f"Directions: {directions}")
+
+        return study, search_space_distributions, fixed_params, directions, is_grid_sampler
+
+    def _metric_names(self, num_objectives: int) -> List[str]:
+        """各目的のメトリック名を返します。
+
+        :param num_objectives: 目的の数。
+        :return: `optimized_metric`がその数のメトリック名のリストの場合はそれらの名前、
+            そうでない場合は`value_{i}`のリスト。
+        """
+        names = OmegaConf.select(self.config, "optimized_metric", default=None)
+        if isinstance(names, (list, ListConfig)) and len(names) == num_objectives:
+            return [str(name) for name in names]
+        return [f"value_{i}" for i in range(num_objectives)]
+
+    def _launch(
+        self, trials: Sequence[Trial], overrides: Sequence[Sequence[str]]
+    ) -> Sequence[JobReturn]:
+        """試行をジョブ番号に登録してからジョブを起動します。
+
+        :param trials: ジョブが評価する試行のシーケンス。
+        :param overrides: 各ジョブのオーバーライドのシーケンス。
+        :return: 各ジョブの結果のシーケンス。
+        """
+        job_nums = [self.job_idx + i for i in range(len(trials))]
+        for job_num, trial in zip(job_nums, trials):
+            register_trial(job_num, trial)
+        try:
+            returns = self.launcher.launch(overrides, initial_job_idx=self.job_idx)
+        finally:
+            for job_num in job_nums:
+                unregister_trial(job_num)
+        self.job_idx += len(returns)
+        return returns
+
+    def _tell(
+        self,
+        study: optuna.Study,
+        trials: Sequence[Trial],
+        returns: Sequence[JobReturn],
+        directions: List[str],
+        is_grid_sampler: bool,
+    ) -> List[Exception]:
+        """各ジョブの結果をスタディに記録します。
+
+        :param study: 結果を記録するスタディ。
+        :param trials: ジョブが評価した試行のシーケンス。
+        :param returns: 各ジョブの結果のシーケンス。
+        :param directions: 最適化の方向のリスト。
+        :param is_grid_sampler: グリッドサンプラーを使用しているかどうか。
+        :return: 失敗したジョブの例外のリスト。
+        """
+        failures = []
+        for trial, ret in zip(trials, returns):
+            if is_pruned(ret):
+                study.tell(trial=trial, state=TrialState.PRUNED)
+                log.info(f"Pruned trial {trial.number}: {ret._return_value}")
+                continue
+
+            values: Optional[List[float]] = None
+            try:
+                if len(directions) == 1:
+                    try:
+                        values = [float(ret.return_value)]
+                    except (ValueError, TypeError) as e:
+                        raise ValueError(
+                            f"Return value must be float-castable. Got '{ret.return_value}'."
+                        ) from e
+                else:
+                    try:
+                        values = [float(v) for v in ret.return_value]
+                    except (ValueError, TypeError) as e:
+                        raise ValueError(
+                            "Return value must be a list or tuple of float-castable values."
+                            f" Got '{ret.return_value}'."
+                        ) from e
+                    if len(values) != len(directions):
+                        raise ValueError(
+                            "The number of the values and the number of the objectives are"
+                            f" mismatched. Expect {len(directions)}, but actually {len(values)}."
+                        )
+
+                try:
+                    study.tell(trial=trial, state=TrialState.COMPLETE, values=values)
+                except RuntimeError as e:
+                    if not (is_grid_sampler and "`Study.stop` is supposed to be invoked" in str(e)):
+                        raise e
+
+            except Exception as e:
+                study.tell(trial=trial, state=TrialState.FAIL, values=values)
+                log.warning(f"Failed experiment: {e}")
+                failures.append(e)
+
+        # 失敗が多すぎる場合は例外を送出します
+        if len(failures) / len(returns) > self.max_failure_rate:
+            log.error(
+                f"Failed {failures} times out of {len(returns)} "
+                f"with max_failure_rate={self.max_failure_rate}."
+            )
+            for ret in returns:
+                if not is_pruned(ret):
+                    ret.return_value  # 実際のトレースバックを含む例外の送出をJobReturnに任せます
+
+        return failures
+
+    def _save_results(self, study: optuna.Study, directions: List[str]) -> None:
+        """最適化の結果をログに出力し、`optimization_results.yaml`に保存します。
+
+        :param study: 結果を取得するスタディ。
+        :param directions: 最適化の方向のリスト。
+        """
+        results_to_serialize: Dict[str, Any]
+        num_pruned = len(study.get_trials(deepcopy=False, states=(TrialState.PRUNED,)))
+        log.info(f"Number of pruned trials: {num_pruned}")
+        if len(directions) < 2:
+            best_trial = study.best_trial
+            results_to_serialize = {
+                "name": "optuna",
+                "best_params": best_trial.params,
+                "best_value": best_trial.value,
+            }
+            log.info(f"Best parameters: {best_trial.params}")
+            log.info(f"Best value: {best_trial.value}")
+        else:
+            best_trials = study.best_trials
+            metric_names = self._metric_names(len(directions))
+            pareto_front = [
+                {"number": t.number, "params": t.params, "values": t.values} for t in best_trials
+            ]
+            results_to_serialize = {
+                "name": "optuna",
+                "metric_names": metric_names,
+                "directions": directions,
+                "solutions": pareto_front,
+            }
+
+            rows = format_pareto_table(best_trials, metric_names, directions)
+            with open(f"{self.config.hydra.sweep.dir}/pareto_front.csv", "w", newline="") as f:
+                csv.writer(f).writerows(rows)
+            widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+            table = "\n".join(
+                "  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows
+            )
+            log.info(f"Number of Pareto solutions: {len(best_trials)}\n{table}")
+        OmegaConf.save(
+            OmegaConf.create(results_to_serialize),
+            f"{self.config.hydra.sweep.dir}/optimization_results.yaml",
+        )
+
+    def sweep(self, arguments: List[str]) -> None:
+        """スイープを実行します。
+
+        :param arguments: コマンドラインから与えられたオーバーライドのリスト。
+        """
+        assert self.config is not None
+        assert self.launcher is not None
+        assert self.hydra_context is not None
+        assert self.job_idx is not None
+
+        study, search_space_distributions, fixed_params, directions, is_grid_sampler = (
+            self._create_study(arguments)
+        )
+
+        if self.successive_halving:
+            self._sweep_successive_halving(
+                study, search_space_distributions, fixed_params, directions
+            )
+            self._save_results(study, directions)
+            return
+
+        batch_size = self.n_jobs
+        n_trials_to_go = self.n_trials
+
+        while n_trials_to_go > 0:
+            batch_size = min(n_trials_to_go, batch_size)
+
+            trials = [study.ask() for _ in range(batch_size)]
+            overrides = self._configure_trials(trials, search_space_distributions, fixed_params)
+            returns = self._launch(trials, overrides)
+            self._tell(study, trials, returns, directions, is_grid_sampler)
+
+            n_trials_to_go -= batch_size
+
+        self._save_results(study, directions)
+
+    def _sweep_successive_halving(
+        self,
+        study: optuna.Study,
+        search_space_distributions: Dict[str, BaseDistribution],
+        fixed_params: Dict[str, Any],
+        directions: List[str],
+    ) -> None:
+        """逐次半減法でスイープを実行します。
+
+        段階`r`では`successive_halving.rungs[r]`のオーバーライド（`trainer.max_epochs`や
+        `trainer.limit_train_batches`など）を予算として各試行を実行し、結果の上位`1/reduction_factor`を
+        次の段階に昇格させます。昇格しなかった試行は枝刈り済み、最後の段階まで残った試行は完了として記録されます。
+
+        :param study: 結果を記録するスタディ。
+        :param search_space_distributions: 探索空間の分布。
+        :param fixed_params: 固定パラメータ。
+        :param directions: 最適化の方向のリスト。
+        """
+        if len(directions) != 1:
+            raise ValueError("逐次半減法は単一目的の最適化にのみ対応しています！")
+
+        rungs = [list(rung) for rung in self.successive_halving.rungs]
+        reduction_factor = self.successive_halving.get("reduction_factor", 3)
+        checkpoint = self.successive_halving.get("checkpoint", "checkpoints/last.ckpt")
+        maximize = directions[0] == "maximize"
+
+        trials = [study.ask() for _ in range(self.n_trials)]
+        trial_overrides = self._configure_trials(trials, search_space_distributions, fixed_params)
+        # (試行, 試行のオーバーライド, 再開するチェックポイントのパス)
+        candidates: List[Tuple[Trial, Sequence[str], Optional[str]]] = [
+            (trial, overrides, None) for trial, overrides in zip(trials, trial_overrides)
+        ]
+        # 試行番号ごとに中間値を報告したステップ
+        reported_steps: Dict[int, Set[int]] = {}
+
+        for rung_idx, rung in enumerate(rungs):
+            is_last_rung = rung_idx == len(rungs) - 1
+            log.info(
+                f"Successive halving rung {rung_idx}: {len(candidates)} trials with budget {rung}"
+            )
+
+            results: List[Tuple[float, Trial, Sequence[str], Optional[str]]] = []
+            failures = []
+            for start in range(0, len(candidates), self.n_jobs):
+                batch = candidates[start : start + self.n_jobs]
+                job_overrides = [
+                    tuple(overrides) + tuple(rung) + ((f"ckpt_path='{ckpt}'",) if ckpt else ())
+                    for _, overrides, ckpt in batch
+                ]
+                returns = self._launch([trial for trial, _, _ in batch], job_overrides)
+
+                for (trial, overrides, _), ret in zip(batch, returns):
+                    if is_pruned(ret):
+                        study.tell(trial=trial, state=TrialState.PRUNED)
+                        log.info(f"Pruned trial {trial.number}: {ret._return_value}")
+                        continue
+                    try:
+                        value = float(ret.return_value)
+                    except Exception as e:
+                        study.tell(trial=trial, state=TrialState.FAIL)
+                        log.warning(f"Failed experiment: {e}")
+                        failures.append(ret)
+                        continue
+
+                    # 予算（エポック数）をステップとして、最適化するメトリックを中間値として報告します
+                    max_epochs = OmegaConf.select(ret.cfg, "trainer.max_epochs", default=None)
+                    step = max_epochs - 1 if max_epochs is not None else rung_idx
+                    if step not in reported_steps.setdefault(trial.number, set()):
+                        trial.report(value, step=step)
+                        reported_steps[trial.number].add(step)
+
+                    ckpt = os.path.join(ret.hydra_cfg.hydra.runtime.output_dir, checkpoint)
+                    if not os.path.exists(ckpt):
+                        log.warning(f"Checkpoint not found, trial {trial.number} will restart: {ckpt}")
+                        ckpt = None
+                    results.append((value, trial, overrides, ckpt))
+
+                if len(failures) / len(returns) > self.max_failure_rate:
+                    log.error(
+                        f"Failed {len(failures)} times out of {len(returns)} "
+                        f"with max_failure_rate={self.max_failure_rate}."
+                    )
+                    for ret in failures:
+                        ret.return_value  # 実際のトレースバックを含む例外の送出をJobReturnに任せます
+
+            results.sort(key=lambda result: result[0], reverse=maximize)
+            if is_last_rung:
+                for value, trial, _, _ in results:
+                    study.tell(trial=trial, state=TrialState.COMPLETE, values=[value])
+                break
+
+            num_promoted = max(1, len(results) // reduction_factor) if results else 0
+            for _, trial, _, _ in results[num_promoted:]:
+                study.tell(trial=trial, state=TrialState.PRUNED)
+            candidates = [(trial, overrides, ckpt) for _, trial, overrides, ckpt in results[:num_promoted]]
+            log.info(
+                f"Promoted {num_promoted} of {len(results)} trials: "
+                f"{[trial.number for trial, _, _ in candidates]}"
+            )
+            if not candidates:
+                break
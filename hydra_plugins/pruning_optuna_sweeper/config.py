@@ -0,0 +1,28 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from hydra.core.config_store import ConfigStore
+from hydra_plugins.hydra_optuna_sweeper.config import OptunaSweeperConf
+
+
+@dataclass
+class PruningOptunaSweeperConf(OptunaSweeperConf):
+    _target_: str = (
+        "hydra_plugins.pruning_optuna_sweeper.pruning_optuna_sweeper.PruningOptunaSweeper"
+    )
+
+    # 試行の枝刈りアルゴリズム（`optuna.pruners.MedianPruner`など）、nullの場合は枝刈りしません
+    # https://optuna.readthedocs.io/en/stable/reference/pruners.html
+    pruner: Optional[Any] = None
+
+    # 逐次半減法（successive halving）の設定、nullの場合は通常のスイープを行います
+    # `rungs`（各段階の予算を指定するオーバーライドのリスト）、`reduction_factor`、`checkpoint`を含みます
+    successive_halving: Optional[Any] = None
+
+
+ConfigStore.instance().store(
+    group="hydra/sweeper",
+    name="optuna_pruning",
+    node=PruningOptunaSweeperConf,
+    provider="pruning_optuna_sweeper",
+)
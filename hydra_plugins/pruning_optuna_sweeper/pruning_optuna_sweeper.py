@@ -0,0 +1,66 @@
+from typing import Any, List, Optional
+
+from hydra.plugins.sweeper import Sweeper
+from hydra.types import HydraContext, TaskFunction
+from hydra_plugins.hydra_optuna_sweeper.config import SamplerConfig
+from omegaconf import DictConfig
+
+
+class PruningOptunaSweeper(Sweeper):
+    """試行の枝刈りと逐次半減法による多忠実度（multi-fidelity）スイープに対応したOptunaスイーパー。"""
+
+    def __init__(
+        self,
+        sampler: SamplerConfig,
+        direction: Any,
+        storage: Optional[Any],
+        study_name: Optional[str],
+        n_trials: int,
+        n_jobs: int,
+        max_failure_rate: float,
+        search_space: Optional[DictConfig],
+        custom_search_space: Optional[str],
+        params: Optional[DictConfig],
+        pruner: Optional[Any] = None,
+        successive_halving: Optional[DictConfig] = None,
+    ) -> None:
+        """`PruningOptunaSweeper`を初期化します。
+
+        `pruner`以外の引数は`hydra_plugins.hydra_optuna_sweeper.optuna_sweeper.OptunaSweeper`と同じです。
+
+        :param pruner: 試行の枝刈りアルゴリズム。`None`の場合は枝刈りしません。
+        :param successive_halving: 逐次半減法の設定。`None`の場合は通常のスイープを行います。
+        """
+        from ._impl import PruningOptunaSweeperImpl
+
+        self.sweeper = PruningOptunaSweeperImpl(
+            sampler,
+            direction,
+            storage,
+            study_name,
+            n_trials,
+            n_jobs,
+            max_failure_rate,
+            search_space,
+            custom_search_space,
+            params,
+            pruner=pruner,
+            successive_halving=successive_halving,
+        )
+
+    def setup(
+        self,
+        *,
+        hydra_context: HydraContext,
+        task_function: TaskFunction,
+        config: DictConfig,
+    ) -> None:
+        """スイーパーをセットアップします。"""
+        self.sweeper.setup(hydra_context=hydra_context, task_function=task_function, config=config)
+
+    def sweep(self, arguments: List[str]) -> None:
+        """スイープを実行します。
+
+        :param arguments: コマンドラインから与えられたオーバーライドのリスト。
+        """
+        return self.sweeper.sweep(arguments)
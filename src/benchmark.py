@@ -0,0 +1,726 @@
+import os
+import socket
+import subprocess
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import hydra
+import rootutils
+from omegaconf import DictConfig, OmegaConf
+
+if TYPE_CHECKING:
+    # lightningは型注釈にのみ使用し、実際のインポートはインスタンス化するまで遅らせます
+    import torch
+    from lightning import LightningDataModule, LightningModule
+
+root = rootutils.setup_root(__file__, indicator=".project-root", pythonpath=True)
+# ------------------------------------------------------------------------------------ #
+# setup_rootの上記は以下と同等です:
+# - プロジェクトのルートディレクトリをPYTHONPATHに追加する
+#       (ユーザーにプロジェクトをパッケージとしてインストールさせる必要がない)
+#       (ローカルモジュールをインポートする前に必要 例: `from src import utils`)
+# - PROJECT_ROOT環境変数を設定する
+#       ("configs/paths/default.yaml"内のパスのベースとして使用される)
+#       (これによりコードを実行する場所に関係なく、すべてのファイルパスが同じになる)
+# - ルートディレクトリの".env"から環境変数を読み込む
+#
+# 以下の場合は削除できます:
+# 1. プロジェクトをパッケージとしてインストールするか、エントリーファイルをプロジェクトのルートディレクトリに移動する
+# 2. "configs/paths/default.yaml"内の`root_dir`を"."に設定する
+#
+# 詳細情報: https://github.com/ashleve/rootutils
+# ------------------------------------------------------------------------------------ #
+
+# このプロジェクトからのインポートは、必ずrootutils.setup_rootの実行後に行う必要がある
+from src.utils import (
+    RankedLogger,
+    compare_to_baseline,
+    extras,
+    hardware_info,
+    load_results,
+    save_results,
+    task_wrapper,
+    time_repeated,
+)
+
+log = RankedLogger(__name__, rank_zero_only=True)
+
+# `precision`の設定値とautocastのデータ型の名前の対応（`None`はautocastを使用しない）
+_AUTOCAST_DTYPES = {"32": None, "32-true": None, "16-mixed": "float16", "bf16-mixed": "bfloat16"}
+
+
+def _resolve_device(device: str) -> "torch.device":
+    """計測に使用するデバイスを決定します。
+
+    :param device: `"auto"`、`"cpu"`、`"cuda"`のいずれか。`"auto"`の場合はGPUが使用可能であればGPUを使用します。
+    :return: 計測に使用するデバイス。
+    """
+    import torch
+
+    if device == "auto":
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    return torch.device(device)
+
+
+def _synchronizer(device: "torch.device") -> Optional[Any]:
+    """デバイスの非同期な処理を待機する関数を返します。
+
+    :param device: 計測に使用するデバイス。
+    :return: GPUの場合は`torch.cuda.synchronize`を呼び出す関数、CPUの場合は`None`。
+    """
+    import torch
+
+    if device.type == "cuda":
+        return lambda: torch.cuda.synchronize(device)
+    return None
+
+
+def bench_dataloader(
+    datamodule: "LightningDataModule", num_warmup: int = 3, num_batches: int = 50
+) -> Dict[str, float]:
+    """トレーニングデータローダーのスループットを計測します。
+
+    :param datamodule: セットアップ済みのデータモジュール。
+    :param num_warmup: 計測から除外する最初のバッチの数（ワーカーの起動を含む）。デフォルトは`3`。
+    :param num_batches: 計測するバッチの数。デフォルトは`50`。
+    :return: `dataloader/first_batch_sec`（最初のバッチまでの時間）と
+        `dataloader/samples_per_sec`（ウォームアップ後のスループット）を含む辞書。
+    """
+    start = time.perf_counter()
+    iterator = iter(datamodule.train_dataloader())
+    next(iterator)
+    first_batch_sec = time.perf_counter() - start
+
+    for _ in range(num_warmup):
+        next(iterator, None)
+
+    num_samples = 0
+    start = time.perf_counter()
+    for _, batch in zip(range(num_batches), iterator):
+        num_samples += len(batch[0])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "dataloader/first_batch_sec": first_batch_sec,
+        "dataloader/samples_per_sec": num_samples / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def bench_step(
+    cfg: DictConfig,
+    device: "torch.device",
+    batch_sizes: Sequence[int],
+    precisions: Sequence[str],
+    input_shape: Sequence[int],
+    num_classes: int,
+    num_warmup: int = 3,
+    num_repeats: int = 20,
+) -> Dict[str, float]:
+    """バッチサイズと精度の組み合わせごとに、モデルの順伝播と学習ステップの時間を計測します。
+
+    データの読み込みの影響を除くため、デバイス上に固定したランダムな入力を使用します。
+    学習ステップは`model_step`による損失の計算、逆伝播、オプティマイザの更新を含みます。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param device: 計測に使用するデバイス。
+    :param batch_sizes: 計測するバッチサイズのリスト。
+    :param precisions: 計測する精度のリスト（`"32"`、`"16-mixed"`、`"bf16-mixed"`）。
+    :param input_shape: 1サンプルの入力の形状（バッチ次元を除く）。
+    :param num_classes: クラスの数。
+    :param num_warmup: 計測前のウォームアップ回数。デフォルトは`3`。
+    :param num_repeats: 計測回数。デフォルトは`20`。
+    :return: `step/bs{バッチサイズ}/{精度}/forward_ms`、`.../step_ms`、`.../samples_per_sec`を含む辞書。
+    """
+    import torch
+
+    synchronize = _synchronizer(device)
+    results: Dict[str, float] = {}
+    for precision in precisions:
+        if precision not in _AUTOCAST_DTYPES:
+            raise ValueError(f"サポートされていない精度です！ <precision={precision}>")
+        dtype_name = _AUTOCAST_DTYPES[precision]
+        dtype = getattr(torch, dtype_name) if dtype_name else None
+
+        for batch_size in batch_sizes:
+            model: LightningModule = hydra.utils.instantiate(cfg.model).to(device)
+            optimizer = model.hparams.optimizer(params=model.parameters())
+            x = torch.randn(batch_size, *input_shape, device=device)
+            y = torch.randint(0, num_classes, (batch_size,), device=device)
+
+            def forward() -> None:
+                with torch.no_grad():
+                    with torch.autocast(device.type, dtype=dtype, enabled=dtype is not None):
+                        model(x)
+
+            def step() -> None:
+                optimizer.zero_grad(set_to_none=True)
+                with torch.autocast(device.type, dtype=dtype, enabled=dtype is not None):
+                    loss, _, _ = model.model_step((x, y))
+                loss.backward()
+                optimizer.step()
+
+            prefix = f"step/bs{batch_size}/{precision}"
+            try:
+                forward_stats = time_repeated(forward, num_warmup, num_repeats, synchronize)
+                step_stats = time_repeated(step, num_warmup, num_repeats, synchronize)
+            except RuntimeError as exception:
+                log.warning(f"計測できませんでした！スキップします... <{prefix}> <{exception}>")
+                continue
+
+            results[f"{prefix}/forward_ms"] = forward_stats["median_ms"]
+            results[f"{prefix}/step_ms"] = step_stats["median_ms"]
+            results[f"{prefix}/samples_per_sec"] = batch_size / step_stats["median_ms"] * 1000
+    return results
+
+
+def bench_epoch(
+    cfg: DictConfig, datamodule: "LightningDataModule", limit_train_batches: Any = 1.0
+) -> Dict[str, float]:
+    """検証を除いた1エポックのトレーニングの時間を、データの読み込みを含めてエンドツーエンドで計測します。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param datamodule: トレーニングに使用するデータモジュール。
+    :param limit_train_batches: 1エポックのバッチの数または割合。デフォルトは`1.0`（すべて）。
+    :return: `epoch/epoch_sec`（`trainer.fit`の時間）と`epoch/samples_per_sec`（定常状態のスループット）を含む辞書。
+    """
+    from src.callbacks.throughput_meter import ThroughputMeter
+
+    # 検証を行わないため、検証メトリクスを監視する学習率スケジューラは無効にします
+    overrides = {"scheduler": None} if "scheduler" in cfg.model else {}
+    model: LightningModule = hydra.utils.instantiate(cfg.model, **overrides)
+    meter = ThroughputMeter(num_warmup=1)
+    trainer = hydra.utils.instantiate(
+        cfg.trainer,
+        callbacks=[meter],
+        logger=False,
+        min_epochs=None,
+        max_epochs=1,
+        limit_train_batches=limit_train_batches,
+        limit_val_batches=0,
+        num_sanity_val_steps=0,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+    )
+
+    start = time.perf_counter()
+    trainer.fit(model=model, datamodule=datamodule)
+    epoch_sec = time.perf_counter() - start
+
+    results = {"epoch/epoch_sec": epoch_sec}
+    if meter.samples_per_sec is not None:
+        results["epoch/samples_per_sec"] = meter.samples_per_sec
+    return results
+
+
+def bench_eval(
+    cfg: DictConfig,
+    datamodule: "LightningDataModule",
+    device: "torch.device",
+    num_warmup: int = 3,
+    num_batches: int = 50,
+) -> Dict[str, float]:
+    """検証データローダーを使用して、データの読み込みを含む推論のスループットを計測します。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param datamodule: セットアップ済みのデータモジュール。
+    :param device: 計測に使用するデバイス。
+    :param num_warmup: 計測から除外する最初のバッチの数。デフォルトは`3`。
+    :param num_batches: 計測するバッチの数。デフォルトは`50`。
+    :return: `eval/samples_per_sec`を含む辞書。
+    """
+    import torch
+
+    model: LightningModule = hydra.utils.instantiate(cfg.model).to(device).eval()
+    synchronize = _synchronizer(device)
+    iterator = iter(datamodule.val_dataloader())
+
+    num_samples = 0
+    start = None
+    with torch.inference_mode():
+        for i, (x, _) in enumerate(iterator):
+            if i == num_warmup:
+                if synchronize is not None:
+                    synchronize()
+                start = time.perf_counter()
+            elif i >= num_warmup + num_batches:
+                break
+            model(x.to(device, non_blocking=True))
+            if start is not None:
+                num_samples += len(x)
+        if synchronize is not None:
+            synchronize()
+
+    if start is None:
+        log.warning(f"計測するバッチがありませんでした！ <num_warmup={num_warmup}>")
+        return {}
+    elapsed = time.perf_counter() - start
+    return {"eval/samples_per_sec": num_samples / elapsed if elapsed > 0 else 0.0}
+
+
+def _ddp_comm_worker(
+    rank: int,
+    world_size: int,
+    port: int,
+    net_cfg: DictConfig,
+    hooks: Sequence[str],
+    powersgd: Dict[str, Any],
+    batch_size: int,
+    input_shape: Sequence[int],
+    num_classes: int,
+    num_warmup: int,
+    num_repeats: int,
+    results_queue: Any,
+) -> None:
+    """`bench_ddp_comm`が起動する各ランクのプロセスで、通信フックごとに学習ステップを計測します。
+
+    :param rank: ランク。
+    :param world_size: プロセスの数。
+    :param port: プロセスグループの通信に使用するポート。
+    :param net_cfg: ネットワーク（`model.net`）の設定。
+    :param hooks: 計測する通信フックの名前のリスト。
+    :param powersgd: `PowerSGDState`の引数。
+    :param batch_size: 各ランクのバッチサイズ。
+    :param input_shape: 1サンプルの入力の形状（バッチ次元を除く）。
+    :param num_classes: クラスの数。
+    :param num_warmup: 計測前のウォームアップ回数。
+    :param num_repeats: 計測回数。
+    :param results_queue: ランク0が結果を送るキュー。
+    """
+    import torch
+    import torch.distributed as dist
+    import torch.nn.functional as F
+    from torch.nn.parallel import DistributedDataParallel
+
+    from src.utils.ddp_utils import comm_hook_and_state, count_allreduce_bytes
+
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    try:
+        torch.manual_seed(rank)
+        x = torch.randn(batch_size, *input_shape)
+        y = torch.randint(0, num_classes, (batch_size,))
+        for name in hooks:
+            torch.manual_seed(0)
+            model = DistributedDataParallel(hydra.utils.instantiate(net_cfg))
+            hook, state, wrapper = comm_hook_and_state(name, powersgd=powersgd)
+            if hook is not None:
+                model.register_comm_hook(state, wrapper(hook) if wrapper is not None else hook)
+            optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+
+            def step() -> None:
+                optimizer.zero_grad(set_to_none=True)
+                F.cross_entropy(model(x), y).backward()
+                optimizer.step()
+
+            # PowerSGDは`start_powerSGD_iter`までは通常のall-reduceのため、それ以降のステップを計測します
+            warmup = max(num_warmup, powersgd.get("start_powerSGD_iter", 0) + 1)
+            stats = time_repeated(step, warmup, num_repeats)
+            if hook is None:
+                # 組み込みのall-reduceはPythonから見えないため、fp32の勾配のサイズを通信量とします
+                comm_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+            else:
+                with count_allreduce_bytes() as counter:
+                    step()
+                comm_bytes = counter["bytes"]
+            if rank == 0:
+                results_queue.put((name, stats["median_ms"], comm_bytes))
+    finally:
+        dist.destroy_process_group()
+
+
+def bench_ddp_comm(
+    cfg: DictConfig,
+    hooks: Sequence[str],
+    world_size: int = 2,
+    batch_size: int = 128,
+    powersgd: Optional[Dict[str, Any]] = None,
+    input_shape: Sequence[int] = (1, 28, 28),
+    num_classes: int = 10,
+    num_warmup: int = 3,
+    num_repeats: int = 20,
+) -> Dict[str, float]:
+    """CPUのglooバックエンドで`world_size`個のプロセスを起動し、DDPの通信フックごとに
+    1ステップあたりの通信量と学習ステップの時間を計測します。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param hooks: 計測する通信フックの名前のリスト（`src.utils.ddp_utils.COMM_HOOKS`）。
+    :param world_size: プロセスの数。デフォルトは`2`。
+    :param batch_size: 各ランクのバッチサイズ。デフォルトは`128`。
+    :param powersgd: `PowerSGDState`の引数。デフォルトは`None`。
+    :param input_shape: 1サンプルの入力の形状（バッチ次元を除く）。
+    :param num_classes: クラスの数。
+    :param num_warmup: 計測前のウォームアップ回数。デフォルトは`3`。
+    :param num_repeats: 計測回数。デフォルトは`20`。
+    :return: `ddp/{フック}/step_ms`と`ddp/{フック}/comm_mb_per_step`（各ランクが送る勾配のサイズ）を含む辞書。
+    """
+    import torch.multiprocessing as mp
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    results_queue = mp.get_context("spawn").SimpleQueue()
+    mp.spawn(
+        _ddp_comm_worker,
+        args=(
+            world_size,
+            port,
+            cfg.model.net,
+            list(hooks),
+            dict(powersgd or {}),
+            batch_size,
+            list(input_shape),
+            num_classes,
+            num_warmup,
+            num_repeats,
+            results_queue,
+        ),
+        nprocs=world_size,
+        join=True,
+    )
+
+    results: Dict[str, float] = {}
+    while not results_queue.empty():
+        name, step_ms, comm_bytes = results_queue.get()
+        results[f"ddp/{name}/step_ms"] = step_ms
+        results[f"ddp/{name}/comm_mb_per_step"] = comm_bytes / 2**20
+    return results
+
+
+def bench_cpu_placement(
+    cfg: DictConfig,
+    datamodule: "LightningDataModule",
+    num_warmup: int = 3,
+    num_batches: int = 50,
+    loader_cores: Optional[int] = None,
+    use_smt: bool = False,
+) -> Dict[str, float]:
+    """CPUで、データの読み込みを含む学習ステップのスループットを、コアの割り当てなしとありで計測します。
+
+    割り当てありでは`plan_cpu_placement`の1ランクの割り当てを適用し、メインプロセスの計算スレッドと
+    データローダーのワーカーを互いに素なコアに固定します。計測後は元の割り当てに戻します。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param datamodule: セットアップ済みのデータモジュール。
+    :param num_warmup: 計測から除外する最初のバッチの数（ワーカーの起動を含む）。デフォルトは`3`。
+    :param num_batches: 計測するバッチの数。デフォルトは`50`。
+    :param loader_cores: ワーカーに割り当てるコアの数。`None`の場合はワーカー数。
+    :param use_smt: ハイパースレッドごとに計算スレッドを使用するかどうか。デフォルトは`False`。
+    :return: `cpu_placement/{off,on}/samples_per_sec`と`cpu_placement/on/num_threads`を含む辞書
+        （計測するバッチがなかったモードのスループットは含みません）。
+    """
+    import torch
+    from torch.utils.data import DataLoader
+
+    from src.utils import (
+        apply_cpu_placement,
+        loader_worker_init_fn,
+        plan_cpu_placement,
+        restore_cpu_placement,
+    )
+
+    num_workers = datamodule.hparams.num_workers
+    results: Dict[str, float] = {}
+    for mode in ("off", "on"):
+        previous = None
+        if mode == "on":
+            placement = plan_cpu_placement(1, num_workers, loader_cores=loader_cores, use_smt=use_smt)[0]
+            previous = apply_cpu_placement(placement)
+            results["cpu_placement/on/num_threads"] = float(placement["num_threads"])
+        try:
+            torch.manual_seed(0)
+            model: LightningModule = hydra.utils.instantiate(cfg.model)
+            optimizer = model.hparams.optimizer(params=model.parameters())
+            dataloader = DataLoader(
+                datamodule.data_train,
+                batch_size=datamodule.batch_size_per_device,
+                shuffle=True,
+                num_workers=num_workers,
+                worker_init_fn=loader_worker_init_fn(),
+            )
+            num_samples = 0
+            start = None
+            for i, batch in enumerate(dataloader):
+                if i == num_warmup:
+                    start = time.perf_counter()
+                elif i >= num_warmup + num_batches:
+                    break
+                optimizer.zero_grad(set_to_none=True)
+                loss, _, _ = model.model_step(batch)
+                loss.backward()
+                optimizer.step()
+                if start is not None:
+                    num_samples += len(batch[0])
+            if start is None:
+                log.warning(f"計測するバッチがありませんでした！ <mode={mode}, num_warmup={num_warmup}>")
+                continue
+            elapsed = time.perf_counter() - start
+            results[f"cpu_placement/{mode}/samples_per_sec"] = num_samples / elapsed if elapsed > 0 else 0.0
+        finally:
+            if previous is not None:
+                restore_cpu_placement(previous)
+    return results
+
+
+def bench_trainer_overhead(
+    cfg: DictConfig,
+    datamodule: "LightningDataModule",
+    limit_train_batches: Any = 1.0,
+    num_repeats: int = 3,
+    fused_optimizer: bool = False,
+) -> Dict[str, float]:
+    """同じモデルとデータで、Lightningの`Trainer`と`FastTrainer`の1エポックの時間を比較します。
+
+    どちらも検証、チェックポイント、ロガー、プログレスバーを無効にし、同じバッチ数をトレーニングします。
+    エポックの時間（`fit`の時間）は`num_repeats`回の最小値で、それぞれのステップ数で割ったステップあたりの
+    時間の差をトレーナーのオーバーヘッドとして報告します（ステップ数が異なる場合は警告します）。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param datamodule: トレーニングに使用するデータモジュール。
+    :param limit_train_batches: 1エポックのバッチの数または割合。デフォルトは`1.0`（すべて）。
+    :param num_repeats: 各トレーナーの計測回数。デフォルトは`3`。
+    :param fused_optimizer: `FastTrainer`でオプティマイザに`fused=True`を渡すかどうか。デフォルトは`False`。
+    :return: `trainer_overhead/{lightning,fast}/{epoch_sec,samples_per_sec}`と
+        `trainer_overhead/lightning/overhead_ms_per_step`を含む辞書。
+    """
+    import torch
+
+    from src.trainers import FastTrainer
+
+    # 検証を行わないため、検証メトリクスを監視する学習率スケジューラは無効にします
+    overrides = {"scheduler": None} if "scheduler" in cfg.model else {}
+    common = {
+        "accelerator": cfg.trainer.get("accelerator", "cpu"),
+        "precision": cfg.trainer.get("precision", "32"),
+        "max_epochs": 1,
+        "limit_train_batches": limit_train_batches,
+        "limit_val_batches": 0,
+        "enable_checkpointing": False,
+        "logger": False,
+    }
+
+    def run(engine: str) -> Tuple[float, int]:
+        torch.manual_seed(0)
+        model: LightningModule = hydra.utils.instantiate(cfg.model, **overrides)
+        if engine == "lightning":
+            from lightning import Trainer
+
+            trainer = Trainer(
+                **common,
+                devices=1,
+                min_epochs=None,
+                num_sanity_val_steps=0,
+                enable_progress_bar=False,
+                enable_model_summary=False,
+            )
+        else:
+            trainer = FastTrainer(**common, devices=1, fused_optimizer=fused_optimizer)
+        start = time.perf_counter()
+        trainer.fit(model=model, datamodule=datamodule)
+        return time.perf_counter() - start, trainer.global_step
+
+    results: Dict[str, float] = {}
+    step_ms: Dict[str, float] = {}
+    num_steps: Dict[str, int] = {}
+    for engine in ("lightning", "fast"):
+        epoch_sec, num_steps[engine] = min(run(engine) for _ in range(num_repeats))
+        num_samples = num_steps[engine] * datamodule.batch_size_per_device
+        results[f"trainer_overhead/{engine}/epoch_sec"] = epoch_sec
+        results[f"trainer_overhead/{engine}/samples_per_sec"] = (
+            num_samples / epoch_sec if epoch_sec > 0 else 0.0
+        )
+        if num_steps[engine] > 0:
+            step_ms[engine] = epoch_sec / num_steps[engine] * 1000
+
+    if num_steps["lightning"] != num_steps["fast"]:
+        log.warning(
+            f"トレーナーごとのステップ数が異なります！ステップあたりの時間で比較します <{num_steps}>"
+        )
+    # ステップ数が異なっても比較できるように、それぞれのステップあたりの時間の差をオーバーヘッドとします
+    if len(step_ms) == 2:
+        results["trainer_overhead/lightning/overhead_ms_per_step"] = step_ms["lightning"] - step_ms["fast"]
+    return results
+
+
+def bench_startup(module: str = "src.train") -> Dict[str, float]:
+    """新しいプロセスでエントリーポイントをインポートし、起動時間を計測します。
+
+    :param module: インポートするモジュール名。デフォルトは`"src.train"`。
+    :return: `startup/total_sec`（インタプリタの起動を含む）と`startup/import_sec`を含む辞書。
+    """
+    from src.utils.startup import import_time_breakdown
+
+    breakdown = import_time_breakdown(module)
+    return {"startup/total_sec": breakdown["total_sec"], "startup/import_sec": breakdown["import_sec"]}
+
+
+def _git_commit() -> Optional[str]:
+    """現在のgitのコミットハッシュを返します。
+
+    :return: コミットハッシュ。gitリポジトリでない場合は`None`。
+    """
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+@task_wrapper
+def benchmark(cfg: DictConfig) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """データ読み込み・学習ステップ・エポック・推論・起動の性能を個別に計測し、ベースラインと比較します。
+
+    結果はハードウェアのメタデータとともに`benchmark.output_path`にJSONとして保存されます。
+    `benchmark.baseline_path`にベースラインがある場合は比較し、許容範囲（`benchmark.tolerance`、
+    メトリクスごとの`benchmark.tolerances`）を超えて悪化したメトリクスを報告します。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: メトリクスとすべてのインスタンス化されたオブジェクトを含む辞書のタプル。
+    """
+    bench_cfg = cfg.benchmark
+
+    if cfg.get("seed"):
+        import lightning as L
+
+        L.seed_everything(cfg.seed, workers=True)
+
+    device = _resolve_device(bench_cfg.device)
+    log.info(f"ベンチマークを開始します！ <device={device}>")
+
+    log.info(f"データモジュールをインスタンス化しています <{cfg.data._target_}>")
+    datamodule: LightningDataModule = hydra.utils.instantiate(cfg.data)
+    datamodule.prepare_data()
+    datamodule.setup(stage="fit")
+
+    metric_dict: Dict[str, float] = {}
+    if bench_cfg.dataloader.get("enabled"):
+        log.info("データローダーのスループットを計測しています...")
+        metric_dict.update(
+            bench_dataloader(datamodule, bench_cfg.num_warmup, bench_cfg.dataloader.num_batches)
+        )
+    if bench_cfg.step.get("enabled"):
+        log.info("学習ステップの時間を計測しています...")
+        metric_dict.update(
+            bench_step(
+                cfg,
+                device,
+                batch_sizes=bench_cfg.step.batch_sizes,
+                precisions=bench_cfg.step.precisions,
+                input_shape=bench_cfg.input_shape,
+                num_classes=bench_cfg.num_classes,
+                num_warmup=bench_cfg.num_warmup,
+                num_repeats=bench_cfg.num_repeats,
+            )
+        )
+    if bench_cfg.epoch.get("enabled"):
+        log.info("エポックの時間を計測しています...")
+        metric_dict.update(bench_epoch(cfg, datamodule, bench_cfg.epoch.limit_train_batches))
+    if bench_cfg.eval.get("enabled"):
+        log.info("推論のスループットを計測しています...")
+        metric_dict.update(
+            bench_eval(cfg, datamodule, device, bench_cfg.num_warmup, bench_cfg.eval.num_batches)
+        )
+    if bench_cfg.ddp_comm.get("enabled"):
+        log.info("DDPの通信フックごとの通信量とステップ時間を計測しています...")
+        metric_dict.update(
+            bench_ddp_comm(
+                cfg,
+                hooks=bench_cfg.ddp_comm.hooks,
+                world_size=bench_cfg.ddp_comm.world_size,
+                batch_size=bench_cfg.ddp_comm.batch_size,
+                powersgd=OmegaConf.to_container(bench_cfg.ddp_comm.powersgd),
+                input_shape=bench_cfg.input_shape,
+                num_classes=bench_cfg.num_classes,
+                num_warmup=bench_cfg.num_warmup,
+                num_repeats=bench_cfg.num_repeats,
+            )
+        )
+    if bench_cfg.get("cpu_placement") and bench_cfg.cpu_placement.get("enabled"):
+        log.info("CPUコアの割り当てなし・ありの学習ステップのスループットを計測しています...")
+        metric_dict.update(
+            bench_cpu_placement(
+                cfg,
+                datamodule,
+                num_warmup=bench_cfg.num_warmup,
+                num_batches=bench_cfg.cpu_placement.num_batches,
+                loader_cores=bench_cfg.cpu_placement.get("loader_cores"),
+                use_smt=bench_cfg.cpu_placement.get("use_smt", False),
+            )
+        )
+    if bench_cfg.get("trainer_overhead") and bench_cfg.trainer_overhead.get("enabled"):
+        log.info("LightningのTrainerとFastTrainerのエポックの時間を比較しています...")
+        metric_dict.update(
+            bench_trainer_overhead(
+                cfg,
+                datamodule,
+                limit_train_batches=bench_cfg.trainer_overhead.limit_train_batches,
+                num_repeats=bench_cfg.trainer_overhead.num_repeats,
+                fused_optimizer=bench_cfg.trainer_overhead.get("fused_optimizer", False),
+            )
+        )
+    if bench_cfg.startup.get("enabled"):
+        log.info("起動時間を計測しています...")
+        metric_dict.update(bench_startup(bench_cfg.startup.module))
+
+    metadata = {
+        "hardware": hardware_info(device.type),
+        "git_commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "benchmark": OmegaConf.to_container(bench_cfg, resolve=True),
+    }
+
+    regressions: List[Dict[str, Any]] = []
+    baseline = load_results(bench_cfg.baseline_path)
+    if bench_cfg.get("update_baseline"):
+        save_results(bench_cfg.baseline_path, metric_dict, metadata)
+        log.info(f"ベースラインを更新しました！ <{bench_cfg.baseline_path}>")
+    elif baseline is not None:
+        if baseline["metadata"].get("hardware") != metadata["hardware"]:
+            log.warning("ベースラインとハードウェアが異なります！比較結果は参考値です...")
+        regressions = compare_to_baseline(
+            metric_dict,
+            baseline["results"],
+            tolerance=bench_cfg.tolerance,
+            tolerances=bench_cfg.get("tolerances"),
+        )
+    else:
+        log.warning(f"ベースラインが見つかりません！比較をスキップします... <{bench_cfg.baseline_path}>")
+
+    metadata["regressions"] = regressions
+    save_results(bench_cfg.output_path, metric_dict, metadata)
+    for name, value in sorted(metric_dict.items()):
+        log.info(f"{name}: {value:.4g}")
+    log.info(f"ベンチマークの結果を保存しました！ <{bench_cfg.output_path}>")
+
+    for regression in regressions:
+        log.warning(
+            f"性能が悪化しました！ <{regression['name']}: {regression['baseline']:.4g} -> "
+            f"{regression['value']:.4g} ({regression['change']:+.1%}), "
+            f"tolerance={regression['tolerance']:.0%}>"
+        )
+    if regressions and bench_cfg.get("fail_on_regression"):
+        raise RuntimeError(f"{len(regressions)}個のメトリクスがベースラインから悪化しました！")
+
+    object_dict = {"cfg": cfg, "datamodule": datamodule, "regressions": regressions}
+    return metric_dict, object_dict
+
+
+@hydra.main(version_base="1.3", config_path="../configs", config_name="benchmark.yaml")
+def main(cfg: DictConfig) -> None:
+    """ベンチマークのメインエントリーポイント。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    """
+    # 追加ユーティリティを適用します
+    # (例：cfgにタグが提供されていない場合はタグを要求する、cfg構造を表示するなど)
+    extras(cfg)
+
+    benchmark(cfg)
+
+
+if __name__ == "__main__":
+    main()
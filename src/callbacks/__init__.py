@@ -0,0 +1,44 @@
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from src.callbacks.cpu_placement import CpuPlacement
+    from src.callbacks.frozen_feature_cache import FrozenFeatureCache
+    from src.callbacks.member_checkpoint import MemberCheckpoint
+    from src.callbacks.memory_monitor import MemoryMonitor
+    from src.callbacks.optuna_pruning import OptunaPruning
+    from src.callbacks.sharded_prediction_writer import ShardedPredictionWriter
+    from src.callbacks.startup_timer import StartupTimer
+    from src.callbacks.step_profiler import StepProfiler
+    from src.callbacks.straggler_detector import StragglerDetector
+    from src.callbacks.throughput_meter import ThroughputMeter
+
+# Hydraは`_target_`のモジュールを直接インポートするため、使用しないコールバックの依存関係を
+# 読み込まないよう、ここでの再エクスポートは遅延インポートにします
+_LAZY_ATTRS = {
+    "CpuPlacement": "src.callbacks.cpu_placement",
+    "FrozenFeatureCache": "src.callbacks.frozen_feature_cache",
+    "MemberCheckpoint": "src.callbacks.member_checkpoint",
+    "MemoryMonitor": "src.callbacks.memory_monitor",
+    "OptunaPruning": "src.callbacks.optuna_pruning",
+    "ShardedPredictionWriter": "src.callbacks.sharded_prediction_writer",
+    "StartupTimer": "src.callbacks.startup_timer",
+    "StepProfiler": "src.callbacks.step_profiler",
+    "StragglerDetector": "src.callbacks.straggler_detector",
+    "ThroughputMeter": "src.callbacks.throughput_meter",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name: str) -> Any:
+    """コールバックを遅延インポートします（PEP 562）。
+
+    :param name: 属性の名前。
+    :return: 対応するモジュールからインポートされた属性。
+    """
+    if name in _LAZY_ATTRS:
+        value = getattr(import_module(_LAZY_ATTRS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,69 @@
+from typing import Any, Dict, Optional
+
+from lightning import Callback, LightningModule, Trainer
+
+from src.utils import pylogger
+from src.utils.cpu_utils import apply_cpu_placement, plan_cpu_placement, restore_cpu_placement
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+class CpuPlacement(Callback):
+    """CPUのトポロジーに従って、各ランクの計算スレッドとデータローダーのワーカーを互いに素なコアに固定するコールバック。
+
+    各ランクのプロセスで（`ddp_spawn`で起動したプロセスを含む）、データローダーが作成される前の
+    `setup`で`plan_cpu_placement`の割り当てを適用します。ランクはNUMAノードごとのコアのグループに、
+    メインプロセスの演算子内のスレッドはグループの計算用のコアに、データローダーのワーカーは
+    `worker_init_fn`でグループのワーカー用のコアに固定されるため、計算とデータの読み込みが同じコアを
+    奪い合ったり、NUMAノードをまたいだりしません。`teardown`で元の割り当てに戻します。
+
+    データモジュールは`src.utils.cpu_utils.loader_worker_init_fn()`をデータローダーに渡す必要があります。
+    """
+
+    def __init__(
+        self, num_workers: Optional[int] = None, loader_cores: Optional[int] = None, use_smt: bool = False
+    ) -> None:
+        """`CpuPlacement`を初期化します。
+
+        :param num_workers: ランクごとのデータローダーのワーカー数。`None`の場合はデータモジュールの
+            `num_workers`のハイパーパラメータ。
+        :param loader_cores: ランクごとにワーカーに割り当てるコアの数。`None`の場合はワーカー数
+            （ランクのコアの半分まで）。
+        :param use_smt: ハイパースレッドごとに計算スレッドを使用するかどうか。デフォルトは`False`。
+        """
+        super().__init__()
+        self.num_workers = num_workers
+        self.loader_cores = loader_cores
+        self.use_smt = use_smt
+        self.placement: Optional[Dict[str, Any]] = None
+        self._previous: Optional[Dict[str, Any]] = None
+
+    def setup(self, trainer: Trainer, pl_module: LightningModule, stage: str) -> None:
+        """fit、validate、test、predictの開始時に呼び出されるLightningフック。"""
+        if self._previous is not None:
+            return
+        num_workers = self.num_workers
+        if num_workers is None:
+            hparams = getattr(trainer.datamodule, "hparams", {})
+            num_workers = hparams.get("num_workers", 0)
+
+        placements = plan_cpu_placement(
+            world_size=trainer.num_devices,
+            num_workers=num_workers,
+            loader_cores=self.loader_cores,
+            use_smt=self.use_smt,
+        )
+        for rank, placement in enumerate(placements):
+            log.info(
+                f"CPUコアを割り当てます！ <local_rank={rank}, nodes={placement['nodes']}, "
+                f"compute={placement['compute']}, num_threads={placement['num_threads']}, "
+                f"loader={placement['loader']}>"
+            )
+        self.placement = placements[trainer.local_rank]
+        self._previous = apply_cpu_placement(self.placement)
+
+    def teardown(self, trainer: Trainer, pl_module: LightningModule, stage: str) -> None:
+        """fit、validate、test、predictの終了時に呼び出されるLightningフック。"""
+        if self._previous is not None:
+            restore_cpu_placement(self._previous)
+            self._previous = None
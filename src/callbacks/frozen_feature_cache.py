@@ -0,0 +1,120 @@
+import os
+import time
+from typing import Dict
+
+import torch
+from lightning import Callback, LightningModule, Trainer
+from torch.utils.data import Dataset
+
+from src.data.components.feature_cache import (
+    CachedFeatureDataset,
+    dataset_fingerprint,
+    module_hash,
+    write_features,
+)
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+# データローダーの設定など、サンプルの内容に影響しないデータモジュールのハイパーパラメータ
+_LOADER_HPARAMS = ("batch_size", "num_workers", "pin_memory", "persistent_workers")
+
+
+class FrozenFeatureCache(Callback):
+    """固定した前半の層の出力を一度だけ計算してメモリマップにキャッシュし、後半の層だけをトレーニングするコールバック。
+
+    モデルの`frozen_layers`で前半の層を固定しても、毎エポックすべてのデータで前半の層を順伝播し直す
+    必要があります。このコールバックは`fit`の開始時（チェックポイントの重みを読み込んだ後）に、
+    トレーニングと検証のデータセットを前半の層に通した出力を`cache_dir/{前半の層の重みのハッシュ}/`に
+    書き込み、データモジュールのデータセットをキャッシュを読み込むデータセットに置き換えます。
+    モジュールは`cached_features=True`の間、バッチの入力に後半の層だけを適用します。
+
+    キャッシュは前半の層の重み（BatchNormの移動平均を含む）とデータセットのサンプルをキーとするため、
+    重みやデータの分割が変わると自動的に計算し直されます。固定した層は推論モードで実行されるため、
+    データ拡張などのランダムな変換を含むデータセットには使用できません。
+
+    `fit`の終了時に元のデータセットに戻すため、テストと予測は通常どおり画像から全体を順伝播します。
+
+    モジュールは`frozen_prefix`（固定した前半の層、固定しない場合は`None`）と`cached_features`属性を、
+    データモジュールは`reset_dataloaders`メソッドを持つ必要があります。
+    """
+
+    def __init__(self, cache_dir: str, batch_size: int = 1024, dtype: str = "float32") -> None:
+        """`FrozenFeatureCache`を初期化します。
+
+        :param cache_dir: 特徴量のキャッシュを保存するディレクトリ。
+        :param batch_size: 特徴量を計算するバッチサイズ。デフォルトは`1024`。
+        :param dtype: 特徴量を保存するデータ型の名前（`"float16"`の場合はディスクとページキャッシュが半分）。
+            デフォルトは`"float32"`。
+        """
+        super().__init__()
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.dtype = dtype
+        self.cache_paths: Dict[str, str] = {}
+        self._originals: Dict[str, Dataset] = {}
+
+    def on_fit_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """fitの開始時に呼び出されるLightningフック。"""
+        prefix = getattr(pl_module, "frozen_prefix", None)
+        datamodule = trainer.datamodule
+        if prefix is None:
+            log.warning("モジュールに固定した層がないため、特徴量をキャッシュしません！ <frozen_layers=0>")
+            return
+        if datamodule is None:
+            log.warning("データモジュールがないため、特徴量をキャッシュしません！")
+            return
+
+        weights_key = module_hash(prefix)[:16]
+        hparams = {k: v for k, v in datamodule.hparams.items() if k not in _LOADER_HPARAMS}
+        for split in ("train", "val"):
+            dataset = getattr(datamodule, f"data_{split}", None)
+            if dataset is None:
+                continue
+            data_key = dataset_fingerprint(
+                dataset, datamodule=type(datamodule).__qualname__, hparams=hparams, dtype=self.dtype
+            )[:16]
+            path = os.path.join(self.cache_dir, weights_key, f"{split}_{data_key}")
+            self._build(trainer, prefix, dataset, path, datamodule.hparams.get("num_workers", 0))
+
+            self._originals[split] = dataset
+            self.cache_paths[split] = path
+            setattr(datamodule, f"data_{split}", CachedFeatureDataset(path))
+
+        if self._originals:
+            datamodule.reset_dataloaders()
+            pl_module.cached_features = True
+
+    def _build(
+        self, trainer: Trainer, prefix: torch.nn.Module, dataset: Dataset, path: str, num_workers: int
+    ) -> None:
+        """キャッシュがなければ、ノードごとに1つのランクで特徴量を計算して書き込みます。
+
+        :param trainer: Lightningのトレーナー。
+        :param prefix: 固定した前半の層。
+        :param dataset: 元のデータセット。
+        :param path: キャッシュのファイルのパスの接頭辞。
+        :param num_workers: 特徴量を計算するデータローダーのワーカー数。
+        """
+        if trainer.local_rank == 0 and not CachedFeatureDataset.exists(path):
+            log.info(f"固定した層の特徴量を計算しています... <path={path}, num_samples={len(dataset)}>")
+            start = time.perf_counter()
+            write_features(
+                prefix, dataset, path, batch_size=self.batch_size, num_workers=num_workers, dtype=self.dtype
+            )
+            log.info(f"特徴量をキャッシュしました！ <{time.perf_counter() - start:.2f}秒>")
+        elif trainer.local_rank == 0:
+            log.info(f"キャッシュされた特徴量を使用します <path={path}>")
+        # 他のランクは書き込みが完了してから読み込みます
+        trainer.strategy.barrier("frozen_feature_cache")
+
+    def teardown(self, trainer: Trainer, pl_module: LightningModule, stage: str) -> None:
+        """fit、validate、test、predictの終了時に呼び出されるLightningフック。"""
+        if stage != "fit" or not self._originals:
+            return
+        datamodule = trainer.datamodule
+        for split, dataset in self._originals.items():
+            setattr(datamodule, f"data_{split}", dataset)
+        self._originals = {}
+        datamodule.reset_dataloaders()
+        pl_module.cached_features = False
@@ -0,0 +1,75 @@
+import os
+from typing import Any, Dict, List
+
+import torch
+from lightning import Callback, LightningModule, Trainer
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+class MemberCheckpoint(Callback):
+    """`PopulationLitModule`の各メンバーについて、検証精度が最も良かった時点の重みを保存するコールバック。
+
+    メンバー`k`の重みは`{dirpath}/member_{k:03d}.ckpt`に、`state_dict`（`MNISTLitModule`に読み込める形式）、
+    `hparams`（学習率・重み減衰・シード）、`epoch`、監視するメトリクスの値を含む辞書として保存されます。
+    """
+
+    def __init__(self, dirpath: str, monitor: str = "val/acc") -> None:
+        """`MemberCheckpoint`を初期化します。
+
+        :param dirpath: チェックポイントを保存するディレクトリ。
+        :param monitor: 監視するメトリクスの名前。メンバー`k`の値は`{monitor}/member_{k}`から取得します。
+            値が大きいほど良いものとします。デフォルトは`"val/acc"`。
+        """
+        super().__init__()
+        self.dirpath = dirpath
+        self.monitor = monitor
+        self.best_scores: List[float] = []
+
+    def on_validation_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """検証ループが終了したときに呼び出されるLightningフック。"""
+        if trainer.sanity_checking:
+            return
+
+        num_members = pl_module.net.population_size
+        if len(self.best_scores) != num_members:
+            self.best_scores = [float("-inf")] * num_members
+
+        for k in range(num_members):
+            score = trainer.callback_metrics.get(f"{self.monitor}/member_{k}")
+            if score is None or float(score) <= self.best_scores[k]:
+                continue
+            self.best_scores[k] = float(score)
+            if trainer.is_global_zero:
+                os.makedirs(self.dirpath, exist_ok=True)
+                torch.save(
+                    {
+                        "state_dict": pl_module.member_state_dict(k),
+                        "hparams": pl_module.member_hparams(k),
+                        "epoch": trainer.current_epoch,
+                        self.monitor: float(score),
+                    },
+                    os.path.join(self.dirpath, f"member_{k:03d}.ckpt"),
+                )
+
+        best = max(range(num_members), key=lambda k: self.best_scores[k])
+        log.info(
+            f"最良のメンバー: {best} <{self.monitor}={self.best_scores[best]:.4f}, "
+            f"{pl_module.member_hparams(best)}>"
+        )
+
+    def state_dict(self) -> Dict[str, Any]:
+        """チェックポイントに保存するコールバックの状態を返します。
+
+        :return: メンバーごとの最高スコアを含む辞書。
+        """
+        return {"best_scores": self.best_scores}
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        """チェックポイントからコールバックの状態を読み込みます。
+
+        :param state_dict: `self.state_dict()`によって返された状態。
+        """
+        self.best_scores = list(state_dict["best_scores"])
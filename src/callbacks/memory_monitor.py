@@ -0,0 +1,378 @@
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+from lightning import Callback, LightningModule, Trainer
+
+from src.utils import pylogger
+from src.utils.ddp_utils import optimizer_state_mb
+from src.utils.inference_utils import model_size_mb
+from src.utils.memory_utils import child_pids, children_rss_mb, process_rss_mb
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+class MemoryMonitor(Callback):
+    """トレーニングの段階（ステージ）ごとにメモリ使用量を計測し、メトリクスとレポートに出力するコールバック。
+
+    Lightningのフックでステージを切り替え、バックグラウンドのスレッドが`interval_sec`ごとに
+    メインプロセスとその子孫プロセス（データローダーのワーカー）のRSSをサンプリングします。
+    GPUの場合は、ステージごとに`torch.cuda`のアロケータの最大確保量も記録します。
+
+    ステージ：
+        - `setup`: コールバックの初期化からトレーニング（またはサニティチェック）の開始まで（データの準備を含む）
+        - `dataloader`: トレーニングバッチの間（次のバッチの読み込みの待機）
+        - `forward`: トレーニングバッチの開始から逆伝播の直前まで（順伝播と損失の計算）
+        - `backward`: 逆伝播
+        - `optimizer`: 逆伝播の後からバッチの終了まで（オプティマイザのステップ）
+        - `validation`: 検証ループ
+        - `checkpoint`: チェックポイントの保存
+        - `other`: 上記以外
+
+    さらに、`module`の末端のモジュールに順伝播のフックを登録し、最初の`activation_steps`バッチで
+    モジュールごとの出力（アクティベーション）のサイズを記録します。
+
+    出力（`dirpath`）：
+        - `memory_rank{ランク}.json`/`.txt`: ステージごとの最大値、ワーカー、アクティベーションのレポート
+
+    注意：GPUのステージごとの最大確保量を求めるため`torch.cuda.reset_peak_memory_stats`を呼び出すので、
+    `ThroughputMeter`の`peak_memory_mb`とは併用できません。
+    """
+
+    def __init__(
+        self,
+        dirpath: str,
+        interval_sec: float = 0.1,
+        module: Optional[str] = "net",
+        activation_steps: int = 1,
+        log_metrics: bool = True,
+    ) -> None:
+        """`MemoryMonitor`を初期化します。
+
+        :param dirpath: レポートを保存するディレクトリ。
+        :param interval_sec: RSSをサンプリングする間隔（秒）。デフォルトは`0.1`。
+        :param module: アクティベーションを記録するLightningモジュールの属性名。`None`の場合は
+            Lightningモジュール全体。デフォルトは`"net"`。
+        :param activation_steps: アクティベーションを記録するトレーニングバッチの数。`0`の場合は記録しません。
+            デフォルトは`1`。
+        :param log_metrics: 各エポックの終了時にステージごとの最大値をロガーに記録するかどうか。
+            デフォルトは`True`。
+        """
+        super().__init__()
+        self.dirpath = dirpath
+        self.interval_sec = interval_sec
+        self.module = module
+        self.activation_steps = activation_steps
+        self.log_metrics = log_metrics
+
+        # `setup`ステージにデータの準備を含めるため、基準のRSSはトレーナーの作成前に記録します
+        self.baseline_rss_mb = process_rss_mb() or 0.0
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.activations: Dict[str, Dict[str, Any]] = {}
+        self.max_num_workers = 0
+
+        self._stage = "other"
+        self._stage_rss_mb = self.baseline_rss_mb
+        self._stage_allocated_mb = 0.0
+        self._device: Optional[torch.device] = None
+        self._rank = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._hooks: List[Any] = []
+        self._record_activations = False
+        self._activation_batches = 0
+        self._original_save_checkpoint: Optional[Callable] = None
+
+    def setup(self, trainer: Trainer, pl_module: LightningModule, stage: str) -> None:
+        """fit、validate、test、predictの開始時に呼び出されるLightningフック。"""
+        if stage != "fit":
+            return
+        self._rank = trainer.global_rank
+        self._stage = "setup"
+        self._stage_rss_mb = self.baseline_rss_mb
+
+        if self.activation_steps > 0:
+            self._register_activation_hooks(pl_module)
+
+        # チェックポイントの保存を`checkpoint`ステージとして計測します
+        save_checkpoint = trainer.save_checkpoint
+
+        @functools.wraps(save_checkpoint)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            previous = self._stage
+            self._enter("checkpoint")
+            try:
+                return save_checkpoint(*args, **kwargs)
+            finally:
+                self._enter(previous)
+
+        self._original_save_checkpoint = save_checkpoint
+        trainer.save_checkpoint = wrapper
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sampling_loop, name="memory-monitor", daemon=True)
+        self._thread.start()
+
+    def teardown(self, trainer: Trainer, pl_module: LightningModule, stage: str) -> None:
+        """fit、validate、test、predictの終了時に呼び出されるLightningフック。"""
+        if stage != "fit":
+            return
+        self._enter("other")
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self._remove_activation_hooks()
+        if self._original_save_checkpoint is not None:
+            # インスタンスに設定したラッパーを削除し、クラスのメソッドに戻します
+            if "save_checkpoint" in vars(trainer):
+                del trainer.save_checkpoint
+            self._original_save_checkpoint = None
+        self._write_report(pl_module)
+
+    def on_fit_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """fitが開始されるときに呼び出されるLightningフック。"""
+        if pl_module.device.type == "cuda":
+            self._device = pl_module.device
+            self._stage_allocated_mb = torch.cuda.memory_allocated(self._device) / 2**20
+            torch.cuda.reset_peak_memory_stats(self._device)
+
+    def on_validation_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """検証ループが開始されるときに呼び出されるLightningフック（サニティチェックを含む）。"""
+        self._enter("validation")
+
+    def on_validation_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """検証ループが終了するときに呼び出されるLightningフック（サニティチェックを含む）。"""
+        self._enter("other")
+
+    def on_train_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングが開始されるときに呼び出されるLightningフック。"""
+        self._enter("other")
+
+    def on_train_epoch_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングエポックが開始されるときに呼び出されるLightningフック。"""
+        self._enter("dataloader")
+
+    def on_train_batch_start(
+        self, trainer: Trainer, pl_module: LightningModule, batch: Any, batch_idx: int
+    ) -> None:
+        """トレーニングバッチが開始されるときに呼び出されるLightningフック。"""
+        self._enter("forward")
+        self._record_activations = bool(self._hooks)
+
+    def on_before_backward(
+        self, trainer: Trainer, pl_module: LightningModule, loss: torch.Tensor
+    ) -> None:
+        """逆伝播の直前に呼び出されるLightningフック。"""
+        self._enter("backward")
+        if self._record_activations:
+            self._record_activations = False
+            self._activation_batches += 1
+            if self._activation_batches >= self.activation_steps:
+                self._remove_activation_hooks()
+
+    def on_after_backward(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """逆伝播の後に呼び出されるLightningフック。"""
+        self._enter("optimizer")
+
+    def on_train_batch_end(
+        self,
+        trainer: Trainer,
+        pl_module: LightningModule,
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        """トレーニングバッチが終了するときに呼び出されるLightningフック。"""
+        self._enter("dataloader")
+
+    def on_train_epoch_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングエポックが終了するときに呼び出されるLightningフック。"""
+        self._enter("other")
+        if not self.log_metrics:
+            return
+        metrics = {}
+        with self._lock:
+            for stage, stats in self.stats.items():
+                for key, value in stats.items():
+                    if key != "visits":
+                        metrics[f"memory/{stage}/{key}"] = float(value)
+        metrics["memory/workers/num_workers"] = float(self.max_num_workers)
+        if self.activations:
+            metrics["memory/activations/total_mb"] = self._activations_total_mb()
+        pl_module.log_dict(metrics, on_step=False, on_epoch=True)
+
+    def _enter(self, stage: str) -> None:
+        """現在のステージを終了して、新しいステージを開始します。
+
+        短いステージでも値が記録されるよう、切り替えのたびにメインプロセスのRSSを同期的にサンプリングします。
+
+        :param stage: 新しいステージの名前。
+        """
+        if stage == self._stage:
+            return
+        rss_mb = process_rss_mb() or 0.0
+        with self._lock:
+            stats = self._update(self._stage, rss_mb)
+            stats["visits"] += 1
+            stats["rss_delta_max_mb"] = max(stats["rss_delta_max_mb"], rss_mb - self._stage_rss_mb)
+
+            if self._device is not None:
+                allocated_mb = torch.cuda.memory_allocated(self._device) / 2**20
+                for key, value in (
+                    ("cuda_allocated_peak_mb", torch.cuda.max_memory_allocated(self._device)),
+                    ("cuda_reserved_peak_mb", torch.cuda.max_memory_reserved(self._device)),
+                ):
+                    stats[key] = max(stats.get(key, 0.0), value / 2**20)
+                stats["cuda_allocated_delta_max_mb"] = max(
+                    stats.get("cuda_allocated_delta_max_mb", 0.0),
+                    allocated_mb - self._stage_allocated_mb,
+                )
+                torch.cuda.reset_peak_memory_stats(self._device)
+                self._stage_allocated_mb = allocated_mb
+
+            self._stage = stage
+            self._stage_rss_mb = rss_mb
+            self._update(stage, rss_mb)
+
+    def _update(
+        self, stage: str, rss_mb: float, workers_rss_mb: Optional[float] = None
+    ) -> Dict[str, float]:
+        """ステージの最大値を更新します。呼び出し元で`self._lock`を取得する必要があります。
+
+        :param stage: ステージの名前。
+        :param rss_mb: メインプロセスのRSS（MB）。
+        :param workers_rss_mb: 子孫プロセスのRSSの合計（MB）。`None`の場合はワーカーの値を更新しません。
+        :return: 更新したステージの統計。
+        """
+        stats = self.stats.setdefault(
+            stage,
+            {
+                "visits": 0,
+                "rss_peak_mb": 0.0,
+                "rss_delta_max_mb": 0.0,
+                "workers_rss_peak_mb": 0.0,
+                "total_rss_peak_mb": 0.0,
+            },
+        )
+        stats["rss_peak_mb"] = max(stats["rss_peak_mb"], rss_mb)
+        if workers_rss_mb is not None:
+            stats["workers_rss_peak_mb"] = max(stats["workers_rss_peak_mb"], workers_rss_mb)
+            stats["total_rss_peak_mb"] = max(stats["total_rss_peak_mb"], rss_mb + workers_rss_mb)
+        else:
+            stats["total_rss_peak_mb"] = max(stats["total_rss_peak_mb"], rss_mb)
+        return stats
+
+    def _sampling_loop(self) -> None:
+        """`interval_sec`ごとにメインプロセスとワーカーのRSSをサンプリングします。"""
+        while not self._stop_event.is_set():
+            rss_mb = process_rss_mb() or 0.0
+            num_workers = len(child_pids())
+            workers_rss_mb = children_rss_mb() if num_workers else 0.0
+            with self._lock:
+                self.max_num_workers = max(self.max_num_workers, num_workers)
+                self._update(self._stage, rss_mb, workers_rss_mb)
+            self._stop_event.wait(self.interval_sec)
+
+    def _register_activation_hooks(self, pl_module: LightningModule) -> None:
+        """`module`の末端のモジュールに、出力のサイズを記録する順伝播のフックを登録します。
+
+        :param pl_module: Lightningモジュール。
+        """
+        root = pl_module if self.module is None else getattr(pl_module, self.module, None)
+        if not isinstance(root, torch.nn.Module):
+            log.warning(f"モジュールが見つかりません！アクティベーションの記録をスキップします... <{self.module}>")
+            return
+
+        for name, submodule in root.named_modules():
+            if next(submodule.children(), None) is not None:
+                continue
+            label = f"{name} ({type(submodule).__name__})" if name else type(submodule).__name__
+
+            def hook(_module: torch.nn.Module, _inputs: Any, output: Any, _label: str = label) -> None:
+                if not self._record_activations:
+                    return
+                tensors = output if isinstance(output, (tuple, list)) else (output,)
+                tensors = [tensor for tensor in tensors if isinstance(tensor, torch.Tensor)]
+                size_mb = sum(tensor.numel() * tensor.element_size() for tensor in tensors) / 2**20
+                record = self.activations.setdefault(_label, {"size_mb": 0.0, "shape": None})
+                if size_mb >= record["size_mb"]:
+                    record["size_mb"] = size_mb
+                    record["shape"] = [list(tensor.shape) for tensor in tensors]
+
+            self._hooks.append(submodule.register_forward_hook(hook))
+
+    def _remove_activation_hooks(self) -> None:
+        """登録した順伝播のフックを削除します。"""
+        for handle in self._hooks:
+            handle.remove()
+        self._hooks.clear()
+
+    def _activations_total_mb(self) -> float:
+        """記録したアクティベーションのサイズの合計を返します。
+
+        :return: 1バッチあたりのアクティベーションのサイズの合計（MB）。
+        """
+        return sum(record["size_mb"] for record in self.activations.values())
+
+    def _write_report(self, pl_module: LightningModule) -> None:
+        """ステージごとの最大値、ワーカー、アクティベーションのレポートを出力します。
+
+        :param pl_module: Lightningモジュール。
+        """
+        # `ru_maxrss`の単位はLinuxではKB、macOSではバイトです
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        lifetime_peak_mb = max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
+
+        report = {
+            "baseline_rss_mb": self.baseline_rss_mb,
+            "lifetime_peak_rss_mb": lifetime_peak_mb,
+            "model_size_mb": model_size_mb(pl_module),
+            "optimizer_state_mb": sum(map(optimizer_state_mb, pl_module.trainer.optimizers)),
+            "num_workers": self.max_num_workers,
+            "stages": self.stats,
+            "activations_total_mb": self._activations_total_mb(),
+            "activations": [
+                {"module": name, **record}
+                for name, record in sorted(
+                    self.activations.items(), key=lambda item: item[1]["size_mb"], reverse=True
+                )
+            ],
+        }
+
+        os.makedirs(self.dirpath, exist_ok=True)
+        prefix = os.path.join(self.dirpath, f"memory_rank{self._rank}")
+        with open(f"{prefix}.json", "w") as file:
+            json.dump(report, file, indent=2)
+
+        lines = [
+            f"基準のRSS: {report['baseline_rss_mb']:.1f} MB",
+            f"最大のRSS（プロセス全体）: {report['lifetime_peak_rss_mb']:.1f} MB",
+            f"モデルのサイズ: {report['model_size_mb']:.3f} MB",
+            f"オプティマイザの状態（このランク）: {report['optimizer_state_mb']:.3f} MB",
+            f"データローダーのワーカー数: {report['num_workers']}",
+            "",
+            "== ステージごとの最大値（MB） ==",
+            f"{'stage':<12} {'rss':>10} {'rss_delta':>10} {'workers':>10} {'total':>10} "
+            f"{'cuda_alloc':>10} {'cuda_rsrv':>10} {'visits':>8}",
+        ]
+        for stage, stats in self.stats.items():
+            lines.append(
+                f"{stage:<12} {stats['rss_peak_mb']:>10.1f} {stats['rss_delta_max_mb']:>10.1f} "
+                f"{stats['workers_rss_peak_mb']:>10.1f} {stats['total_rss_peak_mb']:>10.1f} "
+                f"{stats.get('cuda_allocated_peak_mb', 0.0):>10.1f} "
+                f"{stats.get('cuda_reserved_peak_mb', 0.0):>10.1f} {stats['visits']:>8}"
+            )
+        lines.append("")
+        lines.append(f"== アクティベーション（1バッチ、合計 {report['activations_total_mb']:.3f} MB） ==")
+        for row in report["activations"]:
+            lines.append(f"{row['size_mb']:>10.3f} MB  {row['module']}  {row['shape']}")
+        with open(f"{prefix}.txt", "w") as file:
+            file.write("\n".join(lines) + "\n")
+        log.info(f"メモリのレポートを出力しました！ <{prefix}.txt>")
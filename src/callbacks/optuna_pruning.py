@@ -0,0 +1,56 @@
+from typing import Optional
+
+import optuna
+from lightning import Callback, LightningModule, Trainer
+
+from src.utils import pylogger
+from src.utils.optuna_utils import get_current_trial
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+class OptunaPruning(Callback):
+    """検証エポックごとに監視するメトリクスをOptunaの試行に報告し、枝刈りすべき試行を停止するコールバック。
+
+    枝刈りの判断はスタディの`pruner`（`hydra.sweeper.pruner`）が行います。枝刈りされた試行は
+    `optuna.TrialPruned`を送出して終了し、スイーパーによって失敗ではなく枝刈り済みとして記録されます。
+    スイーパーと同じプロセスで実行されていない場合（単一の実行など）は何もしません。
+    """
+
+    def __init__(self, monitor: str = "val/acc") -> None:
+        """`OptunaPruning`を初期化します。
+
+        :param monitor: Optunaの試行に報告するメトリクスの名前。デフォルトは`"val/acc"`。
+        """
+        super().__init__()
+        self.monitor = monitor
+        self.trial: Optional[optuna.trial.Trial] = None
+
+    def setup(self, trainer: Trainer, pl_module: LightningModule, stage: str) -> None:
+        """`fit`、`validate`、`test`、`predict`の開始時に呼び出されるLightningフック。"""
+        self.trial = get_current_trial()
+        if self.trial is not None and len(self.trial.study.directions) > 1:
+            # Optunaは多目的最適化の試行の枝刈りに対応していません
+            log.warning("多目的最適化の試行は枝刈りできません！報告をスキップします...")
+            self.trial = None
+
+    def on_validation_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """検証ループが終了したときに呼び出されるLightningフック。"""
+        if trainer.sanity_checking:
+            return
+
+        should_prune = False
+        if self.trial is not None:
+            value = trainer.callback_metrics.get(self.monitor)
+            if value is None:
+                log.warning(f"メトリクスが見つかりません！報告をスキップします... <monitor={self.monitor}>")
+            else:
+                self.trial.report(float(value), step=trainer.current_epoch)
+                should_prune = self.trial.should_prune()
+
+        # 試行はランク0のプロセスにのみ登録されているため、判断を全ランクに共有して同時に停止させます
+        should_prune = trainer.strategy.broadcast(should_prune)
+        if should_prune:
+            message = f"エポック{trainer.current_epoch}で試行が枝刈りされました"
+            log.info(message)
+            raise optuna.TrialPruned(message)
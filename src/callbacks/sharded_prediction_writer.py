@@ -0,0 +1,146 @@
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+from lightning import LightningModule, Trainer
+from lightning.pytorch.callbacks import BasePredictionWriter
+
+from src.data.components.shard_sampler import shard_bounds
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__)
+
+
+def shard_path(output_dir: str, shard_id: int, key: str) -> Path:
+    """シャードの出力ファイルのパスを返します。
+
+    :param output_dir: 出力ディレクトリ。
+    :param shard_id: シャードのインデックス。
+    :param key: 出力の種類（例：`"logits"`、`"preds"`）。
+    :return: `.npy`ファイルのパス。
+    """
+    return Path(output_dir, f"shard_{shard_id:06d}.{key}.npy")
+
+
+def completed_shards(output_dir: str, num_shards: int, keys: Sequence[str]) -> List[int]:
+    """すべての出力ファイルが書き込み済みのシャードのインデックスを返します。
+
+    シャードは一時ファイルに書き込んだ後にアトミックにリネームされるため、ファイルが存在すれば完全です。
+
+    :param output_dir: 出力ディレクトリ。
+    :param num_shards: シャードの総数。
+    :param keys: シャードごとに書き込まれる出力の種類。
+    :return: 完了済みのシャードのインデックスのリスト。
+    """
+    return [
+        k
+        for k in range(num_shards)
+        if all(shard_path(output_dir, k, key).exists() for key in keys)
+    ]
+
+
+class ShardedPredictionWriter(BasePredictionWriter):
+    """予測結果をシャード単位の`.npy`ファイルへストリーミングで書き込むコールバック。
+
+    シャードが揃うまでの予測のみをCPUメモリに保持するため、メモリ使用量は`shard_size`で上限が決まります。
+    `ShardedBatchSampler`と組み合わせて使用し、バッチがシャードの境界をまたがないことを前提とします。
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        num_rows: int,
+        shard_size: int,
+        keys: Sequence[str] = ("logits", "preds"),
+    ) -> None:
+        """`ShardedPredictionWriter`を初期化します。
+
+        :param output_dir: シャードの出力ディレクトリ。
+        :param num_rows: 入力データ全体の行数。
+        :param shard_size: 1シャードあたりの最大行数。
+        :param keys: `predict_step`が返す辞書のうち書き込むキー。デフォルトは`("logits", "preds")`。
+        """
+        super().__init__(write_interval="batch")
+        self.output_dir = output_dir
+        self.num_rows = num_rows
+        self.shard_size = shard_size
+        self.keys = list(keys)
+
+        self._buffers: Dict[int, Dict[str, List[np.ndarray]]] = {}
+        self._buffered_rows: Dict[int, int] = {}
+        self._rows_written = 0
+        self._start_time: Optional[float] = None
+
+    def on_predict_epoch_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """予測エポックが開始されるときに呼び出されるLightningフック。"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._rows_written = 0
+        self._start_time = time.perf_counter()
+
+    def write_on_batch_end(
+        self,
+        trainer: Trainer,
+        pl_module: LightningModule,
+        prediction: Dict[str, torch.Tensor],
+        batch_indices: Optional[Sequence[int]],
+        batch: Any,
+        batch_idx: int,
+        dataloader_idx: int,
+    ) -> None:
+        """バッチの予測をバッファに追加し、シャードが揃ったらファイルに書き込みます。
+
+        :param trainer: Lightningトレーナー。
+        :param pl_module: Lightningモジュール。
+        :param prediction: `predict_step`が返した予測の辞書。
+        :param batch_indices: バッチに含まれる行のインデックス。
+        :param batch: データのバッチ。
+        :param batch_idx: 現在のバッチのインデックス。
+        :param dataloader_idx: データローダーのインデックス。
+        """
+        if not batch_indices:
+            raise RuntimeError(
+                "バッチのインデックスが取得できません！`ShardedBatchSampler`を使用するDataLoaderを渡してください。"
+            )
+
+        shard_id = batch_indices[0] // self.shard_size
+        buffer = self._buffers.setdefault(shard_id, {key: [] for key in self.keys})
+        for key in self.keys:
+            buffer[key].append(prediction[key].detach().cpu().numpy())
+        self._buffered_rows[shard_id] = self._buffered_rows.get(shard_id, 0) + len(batch_indices)
+
+        start, end = shard_bounds(shard_id, self.shard_size, self.num_rows)
+        if self._buffered_rows[shard_id] == end - start:
+            self._write_shard(shard_id)
+
+    def _write_shard(self, shard_id: int) -> None:
+        """バッファされたシャードを書き込み、バッファを解放します。
+
+        :param shard_id: シャードのインデックス。
+        """
+        buffer = self._buffers.pop(shard_id)
+        num_rows = self._buffered_rows.pop(shard_id)
+
+        for key in self.keys:
+            path = shard_path(self.output_dir, shard_id, key)
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "wb") as file:
+                np.save(file, np.concatenate(buffer[key], axis=0))
+            os.replace(tmp_path, path)
+
+        self._rows_written += num_rows
+
+    def on_predict_epoch_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """予測エポックが終了するときに呼び出されるLightningフック。"""
+        if self._buffers:
+            log.warning(f"未完成のシャードが破棄されました！ <shards={sorted(self._buffers)}>")
+            self._buffers.clear()
+            self._buffered_rows.clear()
+
+        elapsed = time.perf_counter() - self._start_time
+        rows_per_sec = self._rows_written / elapsed if elapsed > 0 else 0.0
+        log.info(
+            f"予測を書き込みました！ <rows={self._rows_written}, rows/sec={rows_per_sec:.1f}>"
+        )
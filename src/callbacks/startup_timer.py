@@ -0,0 +1,43 @@
+from typing import Any, Optional
+
+from lightning import Callback, LightningModule, Trainer
+
+from src.utils import pylogger
+from src.utils.startup import process_uptime
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+class StartupTimer(Callback):
+    """プロセスの開始から最初のトレーニングステップまでの時間（time-to-first-step）を記録するコールバック。
+
+    インポート、設定の構成、インスタンス化、データの準備を含む起動のオーバーヘッド全体を
+    `startup/time_to_first_step`として一度だけログに記録します。
+    """
+
+    def __init__(self) -> None:
+        """`StartupTimer`を初期化します。"""
+        super().__init__()
+        self.time_to_first_step: Optional[float] = None
+
+    def on_train_batch_start(
+        self, trainer: Trainer, pl_module: LightningModule, batch: Any, batch_idx: int
+    ) -> None:
+        """トレーニングバッチが開始されるときに呼び出されるLightningフック。"""
+        if self.time_to_first_step is not None:
+            return
+
+        self.time_to_first_step = process_uptime()
+        if self.time_to_first_step is None:
+            log.warning("プロセスの開始時刻を取得できません！time-to-first-stepの記録をスキップします...")
+            self.time_to_first_step = float("nan")
+            return
+
+        log.info(f"最初のトレーニングステップまでの時間: {self.time_to_first_step:.2f}秒")
+        pl_module.log(
+            "startup/time_to_first_step",
+            self.time_to_first_step,
+            on_step=True,
+            on_epoch=False,
+            batch_size=1,
+        )
@@ -0,0 +1,273 @@
+import functools
+import json
+import os
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import torch
+from lightning import Callback, LightningModule, Trainer
+from lightning.pytorch.profilers import PassThroughProfiler, Profiler
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+class _RecordFunctionProfiler(Profiler):
+    """Lightningが計測するフックの区間を、`torch.profiler`の`record_function`として記録するプロファイラ。
+
+    Lightningはすべてのフックの呼び出しを`trainer.profiler.profile("[Callback]...")`などで囲むため、
+    これをトレーナーに設定すると、`torch.profiler`のトレースとサマリーにフックごとの時間が現れます。
+    `torch.profiler`が動作していない間の`record_function`のオーバーヘッドはごくわずかです。
+    """
+
+    def __init__(self) -> None:
+        """`_RecordFunctionProfiler`を初期化します。"""
+        super().__init__()
+        self._ranges: Dict[str, List[Any]] = defaultdict(list)
+
+    def start(self, action_name: str) -> None:
+        """区間の記録を開始します。
+
+        :param action_name: 区間の名前。
+        """
+        record = torch.profiler.record_function(action_name)
+        record.__enter__()
+        self._ranges[action_name].append(record)
+
+    def stop(self, action_name: str) -> None:
+        """区間の記録を終了します。このプロファイラの設定前に開始された区間は無視します。
+
+        :param action_name: 区間の名前。
+        """
+        ranges = self._ranges.get(action_name)
+        if ranges:
+            ranges.pop().__exit__(None, None, None)
+
+    def summary(self) -> str:
+        """サマリーを返します。集計は`StepProfiler`が行うため空です。
+
+        :return: 空の文字列。
+        """
+        return ""
+
+
+class StepProfiler(Callback):
+    """設定したステップの区間だけ`torch.profiler`を有効にし、トレースとホットスポットのレポートを出力するコールバック。
+
+    `torch.profiler.schedule`と同じく、最初の`skip_first`ステップを飛ばした後、`wait`ステップ待機、
+    `warmup`ステップのウォームアップ、`active`ステップの記録を1サイクルとして`repeat`回繰り返します
+    （`repeat=0`の場合はトレーニングの終了まで）。記録しないステップではプロファイラのオーバーヘッドがないため、
+    通常のトレーニングの定常状態を計測できます。
+
+    出力（`dirpath`）：
+        - `trace_rank{ランク}_cycle{サイクル}.json`: Chrome（`chrome://tracing`）やPerfettoで開けるトレース
+        - `summary_rank{ランク}.txt`/`.json`: すべてのサイクルを合計した、Lightningのフック、
+          モデルのメソッド（`methods`）、演算子ごとの自己時間のランキング
+    """
+
+    def __init__(
+        self,
+        dirpath: str,
+        wait: int = 5,
+        warmup: int = 1,
+        active: int = 3,
+        repeat: int = 1,
+        skip_first: int = 10,
+        methods: Sequence[str] = ("model_step", "forward"),
+        record_shapes: bool = False,
+        profile_memory: bool = False,
+        with_stack: bool = False,
+        export_trace: bool = True,
+        top_k: int = 20,
+    ) -> None:
+        """`StepProfiler`を初期化します。
+
+        :param dirpath: トレースとレポートを保存するディレクトリ。
+        :param wait: 各サイクルで記録せずに待機するステップの数。デフォルトは`5`。
+        :param warmup: 各サイクルで記録の前にプロファイラをウォームアップするステップの数。デフォルトは`1`。
+        :param active: 各サイクルで記録するステップの数。デフォルトは`3`。
+        :param repeat: サイクルの回数。`0`の場合はトレーニングの終了まで繰り返します。デフォルトは`1`。
+        :param skip_first: 最初に飛ばすステップの数（データローダーの起動などを除くため）。デフォルトは`10`。
+        :param methods: 区間として記録するLightningモジュールのメソッド名。デフォルトは`("model_step", "forward")`。
+        :param record_shapes: 演算子の入力の形状を記録するかどうか。デフォルトは`False`。
+        :param profile_memory: テンソルのメモリの確保と解放を記録するかどうか。デフォルトは`False`。
+        :param with_stack: 演算子のPythonのスタックを記録するかどうか。デフォルトは`False`。
+        :param export_trace: サイクルごとにトレースを出力するかどうか。デフォルトは`True`。
+        :param top_k: レポートに含める、種類ごとの上位の件数。デフォルトは`20`。
+        """
+        super().__init__()
+        self.dirpath = dirpath
+        self.wait = wait
+        self.warmup = warmup
+        self.active = active
+        self.repeat = repeat
+        self.skip_first = skip_first
+        self.methods = list(methods)
+        self.record_shapes = record_shapes
+        self.profile_memory = profile_memory
+        self.with_stack = with_stack
+        self.export_trace = export_trace
+        self.top_k = top_k
+
+        self._profiler: Optional[torch.profiler.profile] = None
+        self._original_profiler: Optional[Profiler] = None
+        self._wrapped_methods: Dict[str, Callable] = {}
+        self._cycle = 0
+        self._rank = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def setup(self, trainer: Trainer, pl_module: LightningModule, stage: str) -> None:
+        """fit、validate、test、predictの開始時に呼び出されるLightningフック。"""
+        if stage != "fit":
+            return
+        self._rank = trainer.global_rank
+
+        # フックの区間を記録するため、プロファイラが設定されていなければ置き換えます
+        if isinstance(trainer.profiler, PassThroughProfiler):
+            self._original_profiler = trainer.profiler
+            trainer.profiler = _RecordFunctionProfiler()
+
+        # モデルのメソッドを区間として記録します
+        for name in self.methods:
+            method = getattr(pl_module, name, None)
+            if method is None:
+                log.warning(f"メソッドが見つかりません！スキップします... <{name}>")
+                continue
+            label = f"[Method]{type(pl_module).__name__}.{name}"
+
+            @functools.wraps(method)
+            def wrapper(*args: Any, _method: Callable = method, _label: str = label, **kwargs: Any) -> Any:
+                with torch.profiler.record_function(_label):
+                    return _method(*args, **kwargs)
+
+            self._wrapped_methods[name] = method
+            setattr(pl_module, name, wrapper)
+
+    def teardown(self, trainer: Trainer, pl_module: LightningModule, stage: str) -> None:
+        """fit、validate、test、predictの終了時に呼び出されるLightningフック。"""
+        if stage != "fit":
+            return
+        self._stop_profiler()
+        if self._original_profiler is not None:
+            trainer.profiler = self._original_profiler
+            self._original_profiler = None
+        for name in self._wrapped_methods:
+            # インスタンスに設定したラッパーを削除し、クラスのメソッドに戻します
+            if name in vars(pl_module):
+                delattr(pl_module, name)
+        self._wrapped_methods.clear()
+
+    def on_train_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングが開始されるときに呼び出されるLightningフック。"""
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if pl_module.device.type == "cuda":
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+        os.makedirs(self.dirpath, exist_ok=True)
+        self._profiler = torch.profiler.profile(
+            activities=activities,
+            schedule=torch.profiler.schedule(
+                wait=self.wait,
+                warmup=self.warmup,
+                active=self.active,
+                repeat=self.repeat,
+                skip_first=self.skip_first,
+            ),
+            on_trace_ready=self._on_trace_ready,
+            record_shapes=self.record_shapes,
+            profile_memory=self.profile_memory,
+            with_stack=self.with_stack,
+        )
+        self._profiler.start()
+
+    def on_train_batch_end(
+        self,
+        trainer: Trainer,
+        pl_module: LightningModule,
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        """トレーニングバッチが終了するときに呼び出されるLightningフック。"""
+        if self._profiler is not None:
+            self._profiler.step()
+
+    def on_train_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングが終了するときに呼び出されるLightningフック。"""
+        self._stop_profiler()
+        self._write_report()
+
+    def _stop_profiler(self) -> None:
+        """プロファイラを停止します（記録中のサイクルがあればトレースを出力します）。"""
+        if self._profiler is not None:
+            self._profiler.stop()
+            self._profiler = None
+
+    def _on_trace_ready(self, profiler: torch.profiler.profile) -> None:
+        """記録するサイクルが終了したときに呼び出され、トレースを出力して時間を集計します。
+
+        :param profiler: 記録を終えたプロファイラ。
+        """
+        if self.export_trace:
+            path = os.path.join(self.dirpath, f"trace_rank{self._rank}_cycle{self._cycle}.json")
+            profiler.export_chrome_trace(path)
+            log.info(f"プロファイラのトレースを出力しました！ <{path}>")
+        self._cycle += 1
+
+        for event in profiler.key_averages():
+            stats = self._stats.setdefault(
+                event.key,
+                {"calls": 0, "self_cpu_ms": 0.0, "cpu_total_ms": 0.0, "self_device_ms": 0.0},
+            )
+            stats["calls"] += event.count
+            stats["self_cpu_ms"] += event.self_cpu_time_total / 1000
+            stats["cpu_total_ms"] += event.cpu_time_total / 1000
+            self_device_us = getattr(event, "self_device_time_total", None)
+            if self_device_us is None:
+                self_device_us = getattr(event, "self_cuda_time_total", 0.0)
+            stats["self_device_ms"] += self_device_us / 1000
+
+    @staticmethod
+    def _category(name: str) -> str:
+        """区間の名前から種類を判定します。
+
+        :param name: 区間または演算子の名前。
+        :return: `"methods"`（モデルのメソッド）、`"hooks"`（Lightningのフック）、`"operators"`のいずれか。
+        """
+        if name.startswith("[Method]"):
+            return "methods"
+        if name.startswith("["):
+            return "hooks"
+        return "operators"
+
+    def _write_report(self) -> None:
+        """集計した時間を種類ごとに自己時間の降順で並べたレポートを出力します。"""
+        if not self._stats:
+            log.warning("記録されたステップがありません！レポートの出力をスキップします...")
+            return
+
+        report: Dict[str, List[Dict[str, Any]]] = {"hooks": [], "methods": [], "operators": []}
+        for name, stats in self._stats.items():
+            report[self._category(name)].append({"name": name, **stats})
+        for category, rows in report.items():
+            rows.sort(key=lambda row: row["self_cpu_ms"] + row["self_device_ms"], reverse=True)
+            report[category] = rows[: self.top_k]
+
+        prefix = os.path.join(self.dirpath, f"summary_rank{self._rank}")
+        with open(f"{prefix}.json", "w") as file:
+            json.dump({"cycles": self._cycle, "active_steps": self.active, **report}, file, indent=2)
+
+        lines = [f"記録したサイクル: {self._cycle}（各{self.active}ステップ）"]
+        for category, rows in report.items():
+            lines.append("")
+            lines.append(f"== {category}（自己時間の降順） ==")
+            lines.append(f"{'self_cpu_ms':>12} {'self_dev_ms':>12} {'total_ms':>12} {'calls':>8}  name")
+            for row in rows:
+                lines.append(
+                    f"{row['self_cpu_ms']:>12.3f} {row['self_device_ms']:>12.3f} "
+                    f"{row['cpu_total_ms']:>12.3f} {row['calls']:>8}  {row['name']}"
+                )
+        with open(f"{prefix}.txt", "w") as file:
+            file.write("\n".join(lines) + "\n")
+        log.info(f"プロファイラのレポートを出力しました！ <{prefix}.txt>")
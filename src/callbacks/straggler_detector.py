@@ -0,0 +1,248 @@
+import faulthandler
+import json
+import os
+import statistics
+import time
+from typing import IO, Any, Dict, List, Optional, Sequence
+
+import torch
+from lightning import Callback, LightningModule, Trainer
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+# ランクごとに集める値（区間の平均）
+_FIELDS = ("data_ms", "forward_ms", "step_ms", "host_load")
+
+
+def straggler_ratios(values: Sequence[float]) -> List[float]:
+    """各ランクの値の、全ランクの中央値に対する比を返します。
+
+    :param values: ランクごとの値。
+    :return: ランクごとの中央値に対する比。中央値が`0`の場合はすべて`1.0`。
+    """
+    median = statistics.median(values)
+    if median <= 0:
+        return [1.0] * len(values)
+    return [value / median for value in values]
+
+
+class StragglerDetector(Callback):
+    """ランクごとのステップ時間、データ待ち時間、ホストの負荷を定期的に集め、遅いランクを検出するコールバック。
+
+    DDPでは勾配のall-reduceで速いランクが遅いランクを待つため、ステップ全体の時間はどのランクでも
+    ほぼ同じになります。そのため、通信の待ちを含まない各ランクのローカルな時間、つまりデータ待ち
+    （前のバッチの終了から次のバッチの開始まで）と順伝播（バッチの開始から逆伝播の前まで）の合計を
+    `interval`バッチごとに全ランクから集め、中央値の`threshold`倍を超えた区間が`patience`回続いたランクを
+    遅いランクとして警告します。ランクごとの時間の表をログに出力し、ロガーに`straggler/max_ratio`と
+    `straggler/num_slow`を記録します。
+
+    `dump_stack=True`の場合、遅いランクでは次の区間の間、1つのバッチ（データ待ちを含む）が中央値の
+    `threshold`倍を超えると`faulthandler`がすべてのスレッドのスタックを`dirpath`に書き込むため、
+    遅いランクがどこで止まっているか（データローダー、ディスクの読み込みなど）を診断できます。
+
+    出力（`dirpath`）：
+        - `stragglers.json`: 区間ごとの全ランクの値と遅いランク（ランク0）
+        - `stacks_rank{ランク}.txt`: 遅いランクのスタック（`dump_stack=True`の場合）
+    """
+
+    def __init__(
+        self,
+        dirpath: Optional[str] = None,
+        interval: int = 50,
+        threshold: float = 1.25,
+        patience: int = 3,
+        dump_stack: bool = False,
+        log_metrics: bool = True,
+    ) -> None:
+        """`StragglerDetector`を初期化します。
+
+        :param dirpath: レポートとスタックを保存するディレクトリ。`None`の場合は保存しません。
+        :param interval: 全ランクから値を集める間隔（トレーニングバッチ数）。デフォルトは`50`。
+        :param threshold: 遅いと判定する、中央値に対するローカルな時間の比。デフォルトは`1.25`。
+        :param patience: 遅いランクとして警告するまでに連続して遅い区間の数。デフォルトは`3`。
+        :param dump_stack: 遅いランクのスタックを書き込むかどうか（`dirpath`が必要）。デフォルトは`False`。
+        :param log_metrics: 区間ごとに最大の比と遅いランクの数をロガーに記録するかどうか。デフォルトは`True`。
+        """
+        super().__init__()
+        if dump_stack and dirpath is None:
+            raise ValueError("`dump_stack=True`には`dirpath`が必要です！")
+        self.dirpath = dirpath
+        self.interval = interval
+        self.threshold = threshold
+        self.patience = patience
+        self.dump_stack = dump_stack
+        self.log_metrics = log_metrics
+
+        self.windows: List[Dict[str, Any]] = []
+        self.slow_ranks: List[int] = []
+        self._rank = 0
+        self._sums = dict.fromkeys(_FIELDS, 0.0)
+        self._num_batches = 0
+        self._slow_counts: List[int] = []
+        self._last_end: Optional[float] = None
+        self._start: Optional[float] = None
+        self._forward_end: Optional[float] = None
+        self._stack_file: Optional[IO[str]] = None
+        self._stack_timeout: Optional[float] = None
+        self._stack_batches = 0
+
+    @staticmethod
+    def _synchronize(pl_module: LightningModule) -> None:
+        """GPUの非同期な処理が完了するまで待機します。
+
+        :param pl_module: デバイスを参照するLightningモジュール。
+        """
+        if pl_module.device.type == "cuda":
+            torch.cuda.synchronize(pl_module.device)
+
+    def on_train_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングが開始されるときに呼び出されるLightningフック。"""
+        self._rank = trainer.global_rank
+        self._slow_counts = [0] * trainer.world_size
+        self._last_end = None
+
+    def on_train_batch_start(
+        self, trainer: Trainer, pl_module: LightningModule, batch: Any, batch_idx: int
+    ) -> None:
+        """トレーニングバッチが開始されるときに呼び出されるLightningフック。"""
+        self._start = time.perf_counter()
+        self._forward_end = None
+        if self._last_end is not None:
+            self._sums["data_ms"] += (self._start - self._last_end) * 1000
+
+    def on_before_backward(
+        self, trainer: Trainer, pl_module: LightningModule, loss: torch.Tensor
+    ) -> None:
+        """逆伝播の前に呼び出されるLightningフック。"""
+        self._synchronize(pl_module)
+        self._forward_end = time.perf_counter()
+
+    def on_train_batch_end(
+        self,
+        trainer: Trainer,
+        pl_module: LightningModule,
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        """トレーニングバッチが終了するときに呼び出されるLightningフック。"""
+        if self._start is None:
+            return
+        self._synchronize(pl_module)
+        end = time.perf_counter()
+        self._sums["step_ms"] += (end - self._start) * 1000
+        self._sums["forward_ms"] += ((self._forward_end or end) - self._start) * 1000
+        self._sums["host_load"] += os.getloadavg()[0] / (os.cpu_count() or 1)
+        self._num_batches += 1
+
+        if self._num_batches >= self.interval:
+            self._gather(trainer, pl_module)
+
+        self._rearm_stack_dump()
+        # 集計の時間はデータ待ちに含めません
+        self._last_end = time.perf_counter()
+
+    def on_train_epoch_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングエポックが終了するときに呼び出されるLightningフック。"""
+        # 検証ループの時間をデータ待ちに含めないように、エポックの境界で区切ります
+        self._last_end = None
+
+    def on_train_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングが終了するときに呼び出されるLightningフック。"""
+        self._close_stack_file()
+        if self.dirpath is not None and self._rank == 0 and self.windows:
+            os.makedirs(self.dirpath, exist_ok=True)
+            with open(os.path.join(self.dirpath, "stragglers.json"), "w") as file:
+                json.dump({"slow_ranks": self.slow_ranks, "windows": self.windows}, file, indent=2)
+
+    def on_exception(
+        self, trainer: Trainer, pl_module: LightningModule, exception: BaseException
+    ) -> None:
+        """例外が発生したときに呼び出されるLightningフック。"""
+        self._close_stack_file()
+
+    def _gather(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """この区間の平均値を全ランクから集め、遅いランクを判定します。
+
+        すべてのランクで同じバッチ数ごとに呼び出されるため、集団通信の呼び出しは揃います。
+
+        :param trainer: Lightningのトレーナー。
+        :param pl_module: Lightningモジュール。
+        """
+        local = torch.tensor(
+            [self._sums[field] / self._num_batches for field in _FIELDS],
+            dtype=torch.float32,
+            device=pl_module.device,
+        )
+        gathered = trainer.strategy.all_gather(local).reshape(-1, len(_FIELDS)).cpu().tolist()
+        self._sums = dict.fromkeys(_FIELDS, 0.0)
+        self._num_batches = 0
+
+        rows = [dict(zip(_FIELDS, values), rank=rank) for rank, values in enumerate(gathered)]
+        ratios = straggler_ratios([row["data_ms"] + row["forward_ms"] for row in rows])
+        slow = []
+        for row, ratio in zip(rows, ratios):
+            rank = row["rank"]
+            row["ratio"] = ratio
+            self._slow_counts[rank] = self._slow_counts[rank] + 1 if ratio > self.threshold else 0
+            if self._slow_counts[rank] >= self.patience:
+                slow.append(rank)
+        self.windows.append({"step": trainer.global_step, "ranks": rows, "slow": slow})
+
+        log.info(f"ランクごとの時間（直近{self.interval}バッチの平均）\n{self._format_table(rows, slow)}")
+        if slow:
+            log.warning(
+                f"中央値より遅いランクがあります！ <slow_ranks={slow}, step={trainer.global_step}, "
+                f"threshold={self.threshold}, patience={self.patience}>"
+            )
+        self.slow_ranks = sorted(set(self.slow_ranks) | set(slow))
+
+        if self.dump_stack and self._rank in slow:
+            median_ms = statistics.median(row["data_ms"] + row["step_ms"] for row in rows)
+            self._stack_timeout = max(median_ms * self.threshold / 1000, 1e-3)
+            self._stack_batches = self.interval
+        if self.log_metrics:
+            pl_module.log_dict(
+                {"straggler/max_ratio": max(ratios), "straggler/num_slow": float(len(slow))},
+                on_step=True,
+                on_epoch=False,
+            )
+
+    @staticmethod
+    def _format_table(rows: List[Dict[str, Any]], slow: Sequence[int]) -> str:
+        """ランクごとの時間の表を作成します。
+
+        :param rows: ランクごとの値の辞書のリスト。
+        :param slow: 遅いランクのリスト。
+        :return: 表の文字列。
+        """
+        lines = [f"{'rank':>4} {'data_ms':>10} {'forward_ms':>10} {'step_ms':>10} {'load':>6} {'ratio':>6}"]
+        for row in rows:
+            lines.append(
+                f"{row['rank']:>4} {row['data_ms']:>10.2f} {row['forward_ms']:>10.2f} "
+                f"{row['step_ms']:>10.2f} {row['host_load']:>6.2f} {row['ratio']:>6.2f}"
+                + ("  <- slow" if row["rank"] in slow else "")
+            )
+        return "\n".join(lines)
+
+    def _rearm_stack_dump(self) -> None:
+        """遅いランクで、次のバッチが時間を超えた場合にスタックを書き込むタイマーを設定し直します。"""
+        if self._stack_file is not None:
+            faulthandler.cancel_dump_traceback_later()
+        if self._stack_batches <= 0 or self._stack_timeout is None:
+            return
+        if self._stack_file is None:
+            os.makedirs(self.dirpath, exist_ok=True)
+            self._stack_file = open(os.path.join(self.dirpath, f"stacks_rank{self._rank}.txt"), "a")
+        self._stack_batches -= 1
+        faulthandler.dump_traceback_later(self._stack_timeout, repeat=False, file=self._stack_file)
+
+    def _close_stack_file(self) -> None:
+        """スタックを書き込むタイマーを解除してファイルを閉じます。"""
+        if self._stack_file is not None:
+            faulthandler.cancel_dump_traceback_later()
+            self._stack_file.close()
+            self._stack_file = None
+        self._stack_batches = 0
@@ -0,0 +1,78 @@
+import time
+from typing import Any, Optional
+
+import torch
+from lightning import Callback, LightningModule, Trainer
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+class ThroughputMeter(Callback):
+    """トレーニングのスループット（サンプル/秒）と最大メモリ使用量を計測するコールバック。
+
+    最初の`num_warmup`バッチを除いたトレーニングステップの時間から`samples_per_sec`を計算します。
+    GPUの場合はトレーニング中の最大メモリ使用量を`peak_memory_mb`に記録します。
+    """
+
+    def __init__(self, num_warmup: int = 3) -> None:
+        """`ThroughputMeter`を初期化します。
+
+        :param num_warmup: 計測から除外する最初のバッチの数。デフォルトは`3`。
+        """
+        super().__init__()
+        self.num_warmup = num_warmup
+        self.samples_per_sec: Optional[float] = None
+        self.peak_memory_mb: Optional[float] = None
+        self._num_samples = 0
+        self._start_time: Optional[float] = None
+        self._end_time: Optional[float] = None
+
+    @staticmethod
+    def _synchronize(pl_module: LightningModule) -> None:
+        """GPUの非同期な処理が完了するまで待機します。
+
+        :param pl_module: デバイスを参照するLightningモジュール。
+        """
+        if pl_module.device.type == "cuda":
+            torch.cuda.synchronize(pl_module.device)
+
+    def on_train_start(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングが開始されるときに呼び出されるLightningフック。"""
+        if pl_module.device.type == "cuda":
+            torch.cuda.reset_peak_memory_stats(pl_module.device)
+
+    def on_train_batch_start(
+        self, trainer: Trainer, pl_module: LightningModule, batch: Any, batch_idx: int
+    ) -> None:
+        """トレーニングバッチが開始されるときに呼び出されるLightningフック。"""
+        if self._start_time is None and trainer.global_step >= self.num_warmup:
+            self._synchronize(pl_module)
+            self._start_time = time.perf_counter()
+
+    def on_train_batch_end(
+        self,
+        trainer: Trainer,
+        pl_module: LightningModule,
+        outputs: Any,
+        batch: Any,
+        batch_idx: int,
+    ) -> None:
+        """トレーニングバッチが終了するときに呼び出されるLightningフック。"""
+        if self._start_time is None:
+            return
+        x = batch[0] if isinstance(batch, (tuple, list)) else batch
+        self._num_samples += len(x)
+        self._synchronize(pl_module)
+        self._end_time = time.perf_counter()
+
+    def on_train_end(self, trainer: Trainer, pl_module: LightningModule) -> None:
+        """トレーニングが終了するときに呼び出されるLightningフック。"""
+        if self._start_time is not None and self._end_time is not None:
+            elapsed = self._end_time - self._start_time
+            self.samples_per_sec = self._num_samples / elapsed if elapsed > 0 else None
+        if self.samples_per_sec is None:
+            log.warning(f"計測するバッチがありませんでした！ <num_warmup={self.num_warmup}>")
+        if pl_module.device.type == "cuda":
+            self.peak_memory_mb = torch.cuda.max_memory_allocated(pl_module.device) / 2**20
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import ConcatDataset, DataLoader, Dataset, Subset
+
+
+def module_hash(module: torch.nn.Module) -> str:
+    """モジュールのすべてのパラメータとバッファ（BatchNormの移動平均など）の値のハッシュを返します。
+
+    :param module: ハッシュを計算するモジュール。
+    :return: SHA-1ハッシュの16進数文字列。
+    """
+    digest = hashlib.sha1()
+    for name, tensor in sorted(module.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(str(tensor.dtype).encode())
+        digest.update(str(tuple(tensor.shape)).encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _describe_dataset(dataset: Dataset) -> Dict[str, Any]:
+    """データセットに含まれるサンプルを識別する情報を返します。
+
+    `Subset`はインデックスのハッシュ、`ConcatDataset`は構成するデータセットを再帰的に含むため、
+    同じ元のデータセットでも分割（`random_split`や交差検証の分割）が異なれば異なる値になります。
+
+    :param dataset: データセット。
+    :return: JSONに変換できる辞書。
+    """
+    if isinstance(dataset, Subset):
+        indices = np.asarray(dataset.indices, dtype=np.int64)
+        return {
+            "subset": hashlib.sha1(indices.tobytes()).hexdigest(),
+            "dataset": _describe_dataset(dataset.dataset),
+        }
+    if isinstance(dataset, ConcatDataset):
+        return {"concat": [_describe_dataset(d) for d in dataset.datasets]}
+    return {
+        "type": type(dataset).__qualname__,
+        "num_samples": len(dataset),
+        "offset": getattr(dataset, "offset", None),
+    }
+
+
+def dataset_fingerprint(dataset: Dataset, **extra: Any) -> str:
+    """データセットのサンプルを識別するフィンガープリントを返します。
+
+    :param dataset: データセット。
+    :param extra: フィンガープリントに含める追加の値（データモジュールの設定など）。
+    :return: SHA-1ハッシュの16進数文字列。
+    """
+    spec = {"dataset": _describe_dataset(dataset), **extra}
+    return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def write_features(
+    prefix: torch.nn.Module,
+    dataset: Dataset,
+    path: str,
+    batch_size: int = 1024,
+    num_workers: int = 0,
+    dtype: str = "float32",
+) -> None:
+    """データセットのすべてのサンプルを`prefix`に通した出力を、メモリマップで読み込める`.npy`ファイルに書き込みます。
+
+    書き込みは一時ファイルに行い、完了してから置き換えるため、中断しても不完全なファイルは残りません。
+
+    :param prefix: 特徴量を計算するモジュール（推論モードで実行します）。
+    :param dataset: `(入力, ラベル)`を返すデータセット。
+    :param path: 書き込むファイルのパスの接頭辞（`{path}_x.npy`と`{path}_y.npy`に書き込みます）。
+    :param batch_size: 特徴量を計算するバッチサイズ。デフォルトは`1024`。
+    :param num_workers: データローダーのワーカー数。デフォルトは`0`。
+    :param dtype: 特徴量を保存するデータ型の名前。デフォルトは`"float32"`。
+    """
+    num_samples = len(dataset)
+    if num_samples == 0:
+        raise ValueError("特徴量を計算するサンプルがありません！")
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_x, tmp_y = f"{path}_x.{os.getpid()}.tmp.npy", f"{path}_y.{os.getpid()}.tmp.npy"
+    device = next(prefix.parameters()).device
+    dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+
+    was_training = prefix.training
+    prefix.eval()
+    x_array: Optional[np.ndarray] = None
+    y_array = np.lib.format.open_memmap(tmp_y, mode="w+", dtype=np.int64, shape=(num_samples,))
+    start = 0
+    try:
+        with torch.inference_mode():
+            for x, y in dataloader:
+                features = prefix(x.to(device)).float().cpu().numpy()
+                if x_array is None:
+                    x_array = np.lib.format.open_memmap(
+                        tmp_x, mode="w+", dtype=np.dtype(dtype), shape=(num_samples, *features.shape[1:])
+                    )
+                x_array[start : start + len(features)] = features
+                y_array[start : start + len(features)] = np.asarray(y)
+                start += len(features)
+    finally:
+        prefix.train(was_training)
+    x_array.flush()
+    y_array.flush()
+    del x_array, y_array
+    os.replace(tmp_x, f"{path}_x.npy")
+    os.replace(tmp_y, f"{path}_y.npy")
+
+
+class CachedFeatureDataset(Dataset):
+    """`write_features`で書き込んだ特徴量とラベルをメモリマップで読み込むデータセット。"""
+
+    def __init__(self, path: str) -> None:
+        """`CachedFeatureDataset`を初期化します。
+
+        :param path: `write_features`で書き込んだファイルのパスの接頭辞。
+        """
+        super().__init__()
+        self.path = path
+        self.num_samples = len(np.load(f"{path}_y.npy", mmap_mode="r"))
+
+        # メモリマップはワーカーごとに最初のアクセスで開きます（ピクルでデータがコピーされないように）
+        self._arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """`path`に書き込み済みの特徴量があるかどうかを返します。
+
+        :param path: ファイルのパスの接頭辞。
+        :return: 特徴量とラベルの両方のファイルがある場合は`True`。
+        """
+        return Path(f"{path}_x.npy").exists() and Path(f"{path}_y.npy").exists()
+
+    def __len__(self) -> int:
+        """サンプル数を返します。
+
+        :return: サンプル数。
+        """
+        return self.num_samples
+
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, int]:
+        """サンプルの特徴量とラベルを返します。
+
+        :param index: サンプルのインデックス。
+        :return: 特徴量のテンソル（`float32`）とクラスラベルのタプル。
+        """
+        if self._arrays is None:
+            self._arrays = (
+                np.load(f"{self.path}_x.npy", mmap_mode="r"),
+                np.load(f"{self.path}_y.npy", mmap_mode="r"),
+            )
+        x, y = self._arrays
+        return torch.from_numpy(np.array(x[index], dtype=np.float32)), int(y[index])
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """ワーカープロセスに渡す状態を返します。開いているメモリマップは含めません。
+
+        :return: データセットの状態。
+        """
+        state = self.__dict__.copy()
+        state["_arrays"] = None
+        return state
@@ -0,0 +1,30 @@
+from typing import List, Tuple
+
+import torch
+
+
+def kfold_indices(num_samples: int, num_folds: int, fold: int, seed: int = 42) -> Tuple[List[int], List[int]]:
+    """サンプルを`num_folds`個の分割に分け、`fold`番目の分割を検証に、残りをトレーニングに使用するインデックスを返します。
+
+    順列は`seed`だけで決まるため、同じ`seed`であればどのプロセスでも同じ分割になり、
+    すべての分割の検証のインデックスを合わせると、すべてのサンプルをちょうど1回ずつ含みます。
+
+    :param num_samples: サンプル数。
+    :param num_folds: 分割の数（2以上）。
+    :param fold: 検証に使用する分割のインデックス（`0`から`num_folds - 1`）。
+    :param seed: 順列のシード。デフォルトは`42`。
+    :return: トレーニングと検証のインデックスのリストのタプル。
+    """
+    if num_folds < 2:
+        raise ValueError(f"分割の数は2以上でなければなりません！ <num_folds={num_folds}>")
+    if not 0 <= fold < num_folds:
+        raise ValueError(f"分割のインデックスが範囲外です！ <fold={fold}, num_folds={num_folds}>")
+    if num_samples < num_folds:
+        raise ValueError(f"サンプル数（{num_samples}）が分割の数（{num_folds}）より少ないです！")
+
+    permutation = torch.randperm(num_samples, generator=torch.Generator().manual_seed(seed)).tolist()
+    # 余りのサンプルは先頭の分割に1つずつ割り当てます
+    size, remainder = divmod(num_samples, num_folds)
+    start = fold * size + min(fold, remainder)
+    end = start + size + (1 if fold < remainder else 0)
+    return permutation[:start] + permutation[end:], permutation[start:end]
@@ -0,0 +1,63 @@
+import math
+from typing import Iterator, Optional, Sized
+
+import torch
+from torch.utils.data import DistributedSampler
+
+
+class ResumableDistributedSampler(DistributedSampler):
+    """エポックの途中から再開できる`DistributedSampler`。
+
+    `DistributedSampler`と同じく、エポックごとに`seed + epoch`で決まる順列を作り、ランク`r`は
+    `r::world_size`番目のインデックスを担当します。`resume(epoch, samples_seen)`を呼び出すと、
+    そのエポックの反復では全ランクで消費済みの先頭`samples_seen`サンプルを飛ばします。
+
+    全ランクが同じ数のサンプルを消費するため、先頭`samples_seen`サンプルは順列の先頭部分と一致し、
+    ランク数を変えて再開しても（エラスティックな再スケール）同じ位置から続けられます。
+
+    長さは飛ばす前のサンプル数のままです。Lightningはエポックの途中から再開すると、チェックポイントに
+    保存された消費済みのバッチ数から数え始めるため、残りのバッチを読み終えたときにエポックが終了します。
+
+    ランクとワールドサイズは`torch.distributed`から解決されるため、分散環境でなければ1プロセスとして動作します。
+    Lightningは`DistributedSampler`を差し替えないため、`use_distributed_sampler=True`のままで使用できます。
+    """
+
+    def __init__(self, dataset: Sized, shuffle: bool = True, seed: int = 0) -> None:
+        """`ResumableDistributedSampler`を初期化します。
+
+        :param dataset: サンプリングするデータセット。
+        :param shuffle: エポックごとにシャッフルするかどうか。デフォルトは`True`。
+        :param seed: シャッフルのシード（全ランクで同じ値にする必要があります）。デフォルトは`0`。
+        """
+        if torch.distributed.is_available() and torch.distributed.is_initialized():
+            num_replicas, rank = torch.distributed.get_world_size(), torch.distributed.get_rank()
+        else:
+            num_replicas, rank = 1, 0
+        super().__init__(dataset, num_replicas=num_replicas, rank=rank, shuffle=shuffle, seed=seed)
+        self._resume_epoch: Optional[int] = None
+        self._resume_samples = 0
+
+    def resume(self, epoch: int, samples_seen: int) -> None:
+        """次に`epoch`を反復するときに、全ランクで消費済みの先頭`samples_seen`サンプルを飛ばします。
+
+        :param epoch: 再開するエポック。
+        :param samples_seen: そのエポックで全ランクが消費したサンプル数の合計。
+        """
+        self._resume_epoch = epoch
+        self._resume_samples = samples_seen
+
+    def _start_index(self) -> int:
+        """このランクが現在のエポックで飛ばすサンプル数を返します。
+
+        :return: 飛ばすサンプル数。再開するエポックでない場合は`0`。
+        """
+        if self._resume_epoch != self.epoch:
+            return 0
+        return min(math.ceil(self._resume_samples / self.num_replicas), self.num_samples)
+
+    def __iter__(self) -> Iterator[int]:
+        start = self._start_index()
+        # 飛ばすのは再開した最初のエポックだけです
+        self._resume_epoch = None
+        indices = list(super().__iter__())
+        return iter(indices[start:])
@@ -0,0 +1,83 @@
+import math
+from typing import Iterator, List, Sequence, Tuple
+
+import torch
+from torch.utils.data import Sampler
+
+
+def shard_bounds(shard_id: int, shard_size: int, num_rows: int) -> Tuple[int, int]:
+    """シャードが担当する行の範囲を返します。
+
+    :param shard_id: シャードのインデックス。
+    :param shard_size: 1シャードあたりの最大行数。
+    :param num_rows: 入力データ全体の行数。
+    :return: シャードの開始行（含む）と終了行（含まない）のタプル。
+    """
+    start = shard_id * shard_size
+    return start, min(start + shard_size, num_rows)
+
+
+class ShardedBatchSampler(Sampler[List[int]]):
+    """シャード単位で連続したインデックスのバッチを生成するバッチサンプラー。
+
+    各シャードは`shard_size`行の連続した範囲で、バッチがシャードの境界をまたぐことはありません。
+    `shard_ids`の`i`番目のシャードはランク`i % world_size`に割り当てられるため、各ランクは自分のシャードのみを
+    読み書きし、ランク間の調整なしに再開できます。シャードのインデックスではなく`shard_ids`の中の位置で
+    割り当てるため、途中まで書き込まれた後の残りのシャードも全ランクに均等に分配されます（`shard_ids`は
+    全ランクで同じである必要があります）。ランクは`torch.distributed`から反復時に解決されるため、
+    `ddp_spawn`で子プロセスに渡された場合でも正しく動作します。
+
+    Lightningのサンプラー差し替えを避けるため、`Trainer(use_distributed_sampler=False)`と
+    組み合わせて使用してください。
+    """
+
+    def __init__(
+        self,
+        num_rows: int,
+        shard_size: int,
+        rows_per_batch: int,
+        shard_ids: Sequence[int],
+    ) -> None:
+        """`ShardedBatchSampler`を初期化します。
+
+        :param num_rows: 入力データ全体の行数。
+        :param shard_size: 1シャードあたりの最大行数。
+        :param rows_per_batch: 1バッチあたりの最大行数。
+        :param shard_ids: 処理対象のシャードのインデックス（全ランク分）。
+        """
+        super().__init__()
+        self.num_rows = num_rows
+        self.shard_size = shard_size
+        self.rows_per_batch = rows_per_batch
+        self.shard_ids = list(shard_ids)
+
+    @staticmethod
+    def _rank_and_world_size() -> Tuple[int, int]:
+        """現在のプロセスのランクとワールドサイズを返します。
+
+        :return: ランクとワールドサイズのタプル。分散環境でない場合は`(0, 1)`。
+        """
+        if torch.distributed.is_available() and torch.distributed.is_initialized():
+            return torch.distributed.get_rank(), torch.distributed.get_world_size()
+        return 0, 1
+
+    def local_shard_ids(self) -> List[int]:
+        """現在のランクに割り当てられたシャードのインデックスを返します。
+
+        :return: シャードのインデックスのリスト。
+        """
+        rank, world_size = self._rank_and_world_size()
+        return self.shard_ids[rank::world_size]
+
+    def __iter__(self) -> Iterator[List[int]]:
+        for shard_id in self.local_shard_ids():
+            start, end = shard_bounds(shard_id, self.shard_size, self.num_rows)
+            for batch_start in range(start, end, self.rows_per_batch):
+                yield list(range(batch_start, min(batch_start + self.rows_per_batch, end)))
+
+    def __len__(self) -> int:
+        num_batches = 0
+        for shard_id in self.local_shard_ids():
+            start, end = shard_bounds(shard_id, self.shard_size, self.num_rows)
+            num_batches += math.ceil((end - start) / self.rows_per_batch)
+        return num_batches
@@ -0,0 +1,129 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+class SyntheticDataset(Dataset):
+    """決定的に生成される合成の分類データセット。
+
+    各サンプルはクラスごとのプロトタイプにガウスノイズを加えたもので、インデックス`i`のサンプルは
+    `seed`と`i`だけから決まります。そのため、サンプル数に関係なくメモリを使わずにオンザフライで生成でき、
+    データローダーのワーカー数やシャッフルの順序が変わっても同じサンプルが得られます。
+    `path`を指定した場合は、`write_arrays`で書き込んだメモリマップファイルから読み込みます。
+    """
+
+    def __init__(
+        self,
+        num_samples: int,
+        input_shape: Sequence[int] = (1, 28, 28),
+        num_classes: int = 10,
+        noise: float = 8.0,
+        seed: int = 42,
+        offset: int = 0,
+        path: Optional[str] = None,
+    ) -> None:
+        """`SyntheticDataset`を初期化します。
+
+        :param num_samples: サンプル数。
+        :param input_shape: 1サンプルの入力の形状。デフォルトは`(1, 28, 28)`。
+        :param num_classes: クラスの数。デフォルトは`10`。
+        :param noise: プロトタイプに加えるガウスノイズの標準偏差。大きいほど分類が難しくなります。デフォルトは`8.0`。
+        :param seed: プロトタイプとサンプルを生成するシード。デフォルトは`42`。
+        :param offset: 最初のサンプルのインデックス。同じシードのデータを分割する場合に使用します。デフォルトは`0`。
+        :param path: `write_arrays`で書き込んだファイルのパスの接頭辞。`None`の場合はオンザフライで生成します。
+        """
+        super().__init__()
+        self.num_samples = num_samples
+        self.input_shape = tuple(input_shape)
+        self.num_classes = num_classes
+        self.noise = noise
+        self.seed = seed
+        self.offset = offset
+        self.path = path
+
+        generator = torch.Generator().manual_seed(seed)
+        self.prototypes = torch.randn((num_classes, *self.input_shape), generator=generator)
+
+        # メモリマップはワーカーごとに最初のアクセスで開きます（ピクルでデータがコピーされないように）
+        self._arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        """サンプル数を返します。
+
+        :return: サンプル数。
+        """
+        return self.num_samples
+
+    def __getitem__(self, index: int) -> Tuple[torch.Tensor, int]:
+        """サンプルを返します。
+
+        :param index: サンプルのインデックス。
+        :return: 入力のテンソルとクラスラベルのタプル。
+        """
+        if not 0 <= index < self.num_samples:
+            raise IndexError(f"インデックスが範囲外です！ <index={index}, num_samples={self.num_samples}>")
+        if self.path is None:
+            return self.generate(self.offset + index)
+
+        if self._arrays is None:
+            self._arrays = (
+                np.load(f"{self.path}_x.npy", mmap_mode="r"),
+                np.load(f"{self.path}_y.npy", mmap_mode="r"),
+            )
+        x, y = self._arrays
+        return torch.from_numpy(np.array(x[self.offset + index])), int(y[self.offset + index])
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """ワーカープロセスに渡す状態を返します。開いているメモリマップは含めません。
+
+        :return: データセットの状態。
+        """
+        state = self.__dict__.copy()
+        state["_arrays"] = None
+        return state
+
+    def generate(self, index: int) -> Tuple[torch.Tensor, int]:
+        """インデックスから決定的にサンプルを生成します。
+
+        :param index: データセット全体でのサンプルのインデックス（`offset`を含む）。
+        :return: 入力のテンソルとクラスラベルのタプル。
+        """
+        generator = torch.Generator().manual_seed(self.seed * 1_000_003 + index + 1)
+        y = int(torch.randint(self.num_classes, (1,), generator=generator))
+        x = self.prototypes[y] + self.noise * torch.randn(self.input_shape, generator=generator)
+        return x, y
+
+    def write_arrays(self, path: str, chunk_size: int = 65536) -> None:
+        """すべてのサンプルを生成し、メモリマップで読み込める`.npy`ファイルに書き込みます。
+
+        書き込みは一時ファイルに行い、完了してから置き換えるため、中断しても不完全なファイルは残りません。
+
+        :param path: 書き込むファイルのパスの接頭辞（`{path}_x.npy`と`{path}_y.npy`に書き込みます）。
+        :param chunk_size: 進捗を記録するサンプル数の間隔。デフォルトは`65536`。
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_x, tmp_y = f"{path}_x.{os.getpid()}.tmp.npy", f"{path}_y.{os.getpid()}.tmp.npy"
+        x_array = np.lib.format.open_memmap(
+            tmp_x, mode="w+", dtype=np.float32, shape=(self.num_samples, *self.input_shape)
+        )
+        y_array = np.lib.format.open_memmap(tmp_y, mode="w+", dtype=np.int64, shape=(self.num_samples,))
+        for start in range(0, self.num_samples, chunk_size):
+            for index in range(start, min(start + chunk_size, self.num_samples)):
+                x, y = self.generate(self.offset + index)
+                x_array[index] = x.numpy()
+                y_array[index] = y
+            done = min(start + chunk_size, self.num_samples)
+            log.info(f"合成データを書き込んでいます... <{done}/{self.num_samples}>")
+        x_array.flush()
+        y_array.flush()
+        del x_array, y_array
+        os.replace(tmp_x, f"{path}_x.npy")
+        os.replace(tmp_y, f"{path}_y.npy")
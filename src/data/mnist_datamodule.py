@@ -1,11 +1,16 @@
-from typing import Any, Dict, Optional, Tuple
+import os
+from typing import Any, Dict, List, Optional, Tuple
 
 import torch
 from lightning import LightningDataModule
-from torch.utils.data import ConcatDataset, DataLoader, Dataset, random_split
+from torch.utils.data import ConcatDataset, DataLoader, Dataset, Subset, random_split
 from torchvision.datasets import MNIST
 from torchvision.transforms import transforms
 
+from src.data.components.kfold import kfold_indices
+from src.data.components.resumable_sampler import ResumableDistributedSampler
+from src.utils.cpu_utils import loader_worker_init_fn
+
 
 class MNISTDataModule(LightningDataModule):
     """MNISTデータセット用の`LightningDataModule`。
@@ -59,6 +64,7 @@ class MNISTDataModule(LightningDataModule):
         batch_size: int = 64,
         num_workers: int = 0,
         pin_memory: bool = False,
+        persistent_workers: bool = False,
     ) -> None:
         """MNISTDataModuleを初期化します。
 
@@ -67,6 +73,8 @@ class MNISTDataModule(LightningDataModule):
         :param batch_size: バッチサイズ。デフォルトは`64`。
         :param num_workers: ワーカーの数。デフォルトは`0`。
         :param pin_memory: メモリをピンするかどうか。デフォルトは`False`。
+        :param persistent_workers: データローダーのワーカープロセスを維持し、データローダーを再利用するかどうか。
+            `num_workers > 0`の場合にのみ有効です。デフォルトは`False`。
         """
         super().__init__()
 
@@ -82,9 +90,22 @@ class MNISTDataModule(LightningDataModule):
         self.data_train: Optional[Dataset] = None
         self.data_val: Optional[Dataset] = None
         self.data_test: Optional[Dataset] = None
+        self.data_predict: Optional[Dataset] = None
 
         self.batch_size_per_device = batch_size
 
+        # 永続ワーカーを使用する場合に再利用するデータローダー
+        # （(分割名, デバイスごとのバッチサイズ, ワールドサイズ) -> ローダー）
+        self._dataloaders: Dict[Tuple[str, int, int], DataLoader[Any]] = {}
+
+        # エポックの途中から再開するための、現在のエポックで全ランクが消費したトレーニングサンプル数
+        self._epoch = 0
+        self._samples_seen = 0
+        self._resume: Optional[Tuple[int, int]] = None
+
+        # k分割交差検証で分割するデータセット（最初の`select_fold`でのトレーニングと検証のデータセット）
+        self._cv_pool: Optional[Dataset] = None
+
     @property
     def num_classes(self) -> int:
         """クラスの数を取得します。
@@ -103,8 +124,16 @@ class MNISTDataModule(LightningDataModule):
         MNIST(self.hparams.data_dir, train=True, download=True)
         MNIST(self.hparams.data_dir, train=False, download=True)
 
+    def data_artifacts(self) -> List[str]:
+        """このデータモジュールがディスクから読み込むデータのパスを返します（実行のメモ化のチェックサムに使用します）。
+
+        :return: ダウンロードしたMNISTのファイルのディレクトリのリスト。
+        """
+        return [os.path.join(self.hparams.data_dir, "MNIST", "raw")]
+
     def setup(self, stage: Optional[str] = None) -> None:
-        """データを読み込みます。変数を設定します：`self.data_train`、`self.data_val`、`self.data_test`。
+        """データを読み込みます。変数を設定します：`self.data_train`、`self.data_val`、`self.data_test`、
+        `self.data_predict`。
 
         このメソッドは、Lightningによって`trainer.fit()`、`trainer.validate()`、`trainer.test()`、
         `trainer.predict()`の前に呼び出されるため、ランダム分割などを2回実行しないように注意してください！
@@ -122,6 +151,11 @@ class MNISTDataModule(LightningDataModule):
                 )
             self.batch_size_per_device = self.hparams.batch_size // self.trainer.world_size
 
+        # 再利用されたデータモジュールでは、前の`fit`の読み込み位置を破棄します
+        # (チェックポイントから再開する場合は、Lightningがこの後に`load_state_dict`で設定します)
+        if stage == "fit":
+            self._epoch, self._samples_seen, self._resume = 0, 0, None
+
         # まだロードされていない場合にのみデータセットを読み込んで分割します
         if not self.data_train and not self.data_val and not self.data_test:
             trainset = MNIST(self.hparams.data_dir, train=True, transform=self.transforms)
@@ -133,44 +167,131 @@ class MNISTDataModule(LightningDataModule):
                 generator=torch.Generator().manual_seed(42),
             )
 
+        # 予測にはテストセットを使用します
+        if not self.data_predict:
+            self.data_predict = self.data_test
+
+    def select_fold(self, fold: int, num_folds: int, seed: int = 42) -> None:
+        """k分割交差検証の`fold`番目の分割を選択し、トレーニングと検証のデータセットを置き換えます。
+
+        最初に呼び出されたときのトレーニングと検証のデータセットを合わせたものを`num_folds`個に分割し、
+        `fold`番目を検証、残りをトレーニングに使用します。テストセットは変更しません。読み込み済みの
+        データセットをそのまま分割するため、同じインスタンスで分割を切り替えてもデータは再読み込みされません。
+
+        :param fold: 検証に使用する分割のインデックス。
+        :param num_folds: 分割の数。
+        :param seed: 分割の順列のシード。デフォルトは`42`。
+        """
+        if self.data_train is None:
+            self.setup("fit")
+        if self._cv_pool is None:
+            self._cv_pool = ConcatDataset(datasets=[self.data_train, self.data_val])
+        train_indices, val_indices = kfold_indices(len(self._cv_pool), num_folds, fold, seed=seed)
+        self.data_train = Subset(self._cv_pool, train_indices)
+        self.data_val = Subset(self._cv_pool, val_indices)
+
+        # 前の分割のデータローダーと読み込み位置は使用しません
+        self.reset_dataloaders()
+        self._epoch, self._samples_seen, self._resume = 0, 0, None
+
     def train_dataloader(self) -> DataLoader[Any]:
         """トレーニングデータローダーを作成して返します。
 
         :return: トレーニングデータローダー。
         """
-        return DataLoader(
-            dataset=self.data_train,
-            batch_size=self.batch_size_per_device,
-            num_workers=self.hparams.num_workers,
-            pin_memory=self.hparams.pin_memory,
-            shuffle=True,
-        )
+        return self._build_dataloader("train", self.data_train, shuffle=True)
 
     def val_dataloader(self) -> DataLoader[Any]:
         """検証データローダーを作成して返します。
 
         :return: 検証データローダー。
         """
-        return DataLoader(
-            dataset=self.data_val,
-            batch_size=self.batch_size_per_device,
-            num_workers=self.hparams.num_workers,
-            pin_memory=self.hparams.pin_memory,
-            shuffle=False,
-        )
+        return self._build_dataloader("val", self.data_val, shuffle=False)
 
     def test_dataloader(self) -> DataLoader[Any]:
         """テストデータローダーを作成して返します。
 
         :return: テストデータローダー。
         """
-        return DataLoader(
-            dataset=self.data_test,
+        return self._build_dataloader("test", self.data_test, shuffle=False)
+
+    def predict_dataloader(self) -> DataLoader[Any]:
+        """予測データローダーを作成して返します。
+
+        :return: 予測データローダー。
+        """
+        return self._build_dataloader("predict", self.data_predict, shuffle=False)
+
+    def reset_dataloaders(self) -> None:
+        """キャッシュされたデータローダー（永続ワーカーを含む）を破棄します。
+
+        `data_train`などのデータセットを置き換えた後に呼び出すと、次のデータローダーは新しいデータセットから作成されます。
+        """
+        self._dataloaders.clear()
+
+    def _build_dataloader(self, split: str, dataset: Dataset, shuffle: bool) -> DataLoader[Any]:
+        """データローダーを作成して返します。
+
+        永続ワーカーが有効な場合、データローダーは分割ごとにキャッシュされ、同じデータモジュールを使う後続の
+        `trainer.fit()`などの呼び出し（同一プロセス内のマルチランの試行を含む）でワーカープロセスが再利用されます。
+
+        :param split: 分割の名前。`"train"`、`"val"`、`"test"`、または`"predict"`のいずれか。
+        :param dataset: データローダーが読み込むデータセット。
+        :param shuffle: データをシャッフルするかどうか。
+        :return: データローダー。
+        """
+        persistent_workers = self.hparams.persistent_workers and self.hparams.num_workers > 0
+        # (シードはLightningが分散サンプラーに使用する`PL_GLOBAL_SEED`と同じです)
+        seed = int(os.environ.get("PL_GLOBAL_SEED", 0))
+        world_size = self.trainer.world_size if self.trainer is not None else 1
+        key = (split, self.batch_size_per_device, world_size)
+        if persistent_workers and key in self._dataloaders:
+            dataloader = self._dataloaders[key]
+            # 前の試行とシードが異なる場合も、この実行のシードでシャッフルします
+            # (サンプラーはメインプロセスで反復されるため、ワーカーを再起動せずに変更できます)
+            if isinstance(dataloader.sampler, ResumableDistributedSampler):
+                dataloader.sampler.seed = seed
+            return self._resume_sampler(dataloader)
+
+        # シャッフルする場合は、チェックポイントから同じ位置で再開できる決定的なサンプラーを使用します
+        sampler = ResumableDistributedSampler(dataset, seed=seed) if shuffle else None
+        dataloader = DataLoader(
+            dataset=dataset,
             batch_size=self.batch_size_per_device,
             num_workers=self.hparams.num_workers,
             pin_memory=self.hparams.pin_memory,
-            shuffle=False,
+            persistent_workers=persistent_workers,
+            sampler=sampler,
+            worker_init_fn=loader_worker_init_fn(),
         )
+        if persistent_workers:
+            self._dataloaders[key] = dataloader
+        return self._resume_sampler(dataloader)
+
+    def _resume_sampler(self, dataloader: DataLoader[Any]) -> DataLoader[Any]:
+        """チェックポイントから読み込んだ位置をデータローダーのサンプラーに設定します。
+
+        :param dataloader: データローダー。
+        :return: 同じデータローダー。
+        """
+        if self._resume is not None and isinstance(dataloader.sampler, ResumableDistributedSampler):
+            dataloader.sampler.resume(*self._resume)
+            self._resume = None
+        return dataloader
+
+    def on_after_batch_transfer(self, batch: Any, dataloader_idx: int) -> Any:
+        """バッチをデバイスに転送した後に呼び出されるLightningフック。消費したトレーニングサンプル数を数えます。
+
+        :param batch: データのバッチ。
+        :param dataloader_idx: データローダーのインデックス。
+        :return: 同じバッチ。
+        """
+        trainer = self.trainer
+        if trainer is not None and trainer.training:
+            if trainer.current_epoch != self._epoch:
+                self._epoch, self._samples_seen = trainer.current_epoch, 0
+            self._samples_seen += len(batch[0]) * trainer.world_size
+        return batch
 
     def teardown(self, stage: Optional[str] = None) -> None:
         """Lightningフックで、`trainer.fit()`、`trainer.validate()`、`trainer.test()`、
@@ -186,7 +307,7 @@ class MNISTDataModule(LightningDataModule):
 
         :return: 保存したいデータモジュールの状態を含む辞書。
         """
-        return {}
+        return {"epoch": self._epoch, "samples_seen": self._samples_seen}
 
     def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
         """チェックポイントを読み込むときに呼び出されます。データモジュールの`state_dict()`によって返された
@@ -194,7 +315,9 @@ class MNISTDataModule(LightningDataModule):
 
         :param state_dict: `self.state_dict()`によって返されたデータモジュールの状態。
         """
-        pass
+        if "epoch" in state_dict:
+            self._epoch, self._samples_seen = state_dict["epoch"], state_dict["samples_seen"]
+            self._resume = (self._epoch, self._samples_seen)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,326 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from lightning import LightningDataModule
+from torch.utils.data import ConcatDataset, DataLoader, Dataset, Subset
+
+from src.data.components.kfold import kfold_indices
+from src.data.components.resumable_sampler import ResumableDistributedSampler
+from src.data.components.synthetic_dataset import SyntheticDataset
+from src.utils.cpu_utils import loader_worker_init_fn
+
+
+class SyntheticDataModule(LightningDataModule):
+    """決定的な合成データの分類タスク用の`LightningDataModule`。
+
+    ダウンロードやネットワークを必要としないため、テストをオフラインで高速に実行したり、`scale`で
+    サンプル数を増やしてMNISTの10倍〜1000倍の規模でパイプラインの負荷試験を行ったりするのに使用します。
+    デフォルトの形状・クラス数・分割はMNISTと同じため、`data=synthetic`で`MNISTDataModule`と置き換えられます。
+
+    サンプルはデフォルトでオンザフライで生成され、メモリを使用しません。`memmap=True`の場合は、
+    `prepare_data`で`data_dir/synthetic/`にすべてのサンプルを一度だけ書き込み、以降はメモリマップで読み込みます
+    （生成のコストを除いて、実データに近いディスクからの読み込みを再現します）。
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data/",
+        train_val_test_split: Tuple[int, int, int] = (55_000, 5_000, 10_000),
+        scale: int = 1,
+        input_shape: Tuple[int, ...] = (1, 28, 28),
+        num_classes: int = 10,
+        noise: float = 8.0,
+        seed: int = 42,
+        memmap: bool = False,
+        batch_size: int = 64,
+        num_workers: int = 0,
+        pin_memory: bool = False,
+        persistent_workers: bool = False,
+    ) -> None:
+        """SyntheticDataModuleを初期化します。
+
+        :param data_dir: データディレクトリ。`memmap=True`の場合にのみ使用します。デフォルトは`"data/"`。
+        :param train_val_test_split: トレーニング、検証、テストのサンプル数。デフォルトは`(55_000, 5_000, 10_000)`。
+        :param scale: 各分割のサンプル数に掛ける倍率。デフォルトは`1`。
+        :param input_shape: 1サンプルの入力の形状。デフォルトは`(1, 28, 28)`。
+        :param num_classes: クラスの数。デフォルトは`10`。
+        :param noise: クラスのプロトタイプに加えるガウスノイズの標準偏差。デフォルトは`8.0`。
+        :param seed: データを生成するシード。デフォルトは`42`。
+        :param memmap: サンプルをファイルに書き込み、メモリマップで読み込むかどうか。デフォルトは`False`。
+        :param batch_size: バッチサイズ。デフォルトは`64`。
+        :param num_workers: ワーカーの数。デフォルトは`0`。
+        :param pin_memory: メモリをピンするかどうか。デフォルトは`False`。
+        :param persistent_workers: データローダーのワーカープロセスを維持し、データローダーを再利用するかどうか。
+            `num_workers > 0`の場合にのみ有効です。デフォルトは`False`。
+        """
+        super().__init__()
+
+        # この行により、'self.hparams'属性で初期化パラメータにアクセスできます
+        # また、初期化パラメータがckptに保存されることを保証します
+        self.save_hyperparameters(logger=False)
+
+        self.data_train: Optional[Dataset] = None
+        self.data_val: Optional[Dataset] = None
+        self.data_test: Optional[Dataset] = None
+        self.data_predict: Optional[Dataset] = None
+
+        self.batch_size_per_device = batch_size
+
+        # 永続ワーカーを使用する場合に再利用するデータローダー
+        # （(分割名, デバイスごとのバッチサイズ, ワールドサイズ) -> ローダー）
+        self._dataloaders: Dict[Tuple[str, int, int], DataLoader[Any]] = {}
+
+        # エポックの途中から再開するための、現在のエポックで全ランクが消費したトレーニングサンプル数
+        self._epoch = 0
+        self._samples_seen = 0
+        self._resume: Optional[Tuple[int, int]] = None
+
+        # k分割交差検証で分割するデータセット（最初の`select_fold`でのトレーニングと検証のデータセット）
+        self._cv_pool: Optional[Dataset] = None
+
+    @property
+    def num_classes(self) -> int:
+        """クラスの数を取得します。
+
+        :return: クラスの数。
+        """
+        return self.hparams.num_classes
+
+    @property
+    def split_sizes(self) -> Tuple[int, int, int]:
+        """`scale`を掛けたトレーニング、検証、テストのサンプル数を取得します。
+
+        :return: 各分割のサンプル数のタプル。
+        """
+        return tuple(int(n) * self.hparams.scale for n in self.hparams.train_val_test_split)
+
+    @property
+    def memmap_path(self) -> str:
+        """メモリマップファイルのパスの接頭辞を取得します。生成の設定ごとに異なるファイルになります。
+
+        :return: `{data_dir}/synthetic/{設定のハッシュ}`。
+        """
+        spec = {
+            "num_samples": sum(self.split_sizes),
+            "input_shape": list(self.hparams.input_shape),
+            "num_classes": self.hparams.num_classes,
+            "noise": self.hparams.noise,
+            "seed": self.hparams.seed,
+        }
+        key = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+        return str(Path(self.hparams.data_dir) / "synthetic" / key)
+
+    def _dataset(self, num_samples: int, offset: int = 0, path: Optional[str] = None) -> SyntheticDataset:
+        """設定に従って合成データセットを作成します。
+
+        :param num_samples: サンプル数。
+        :param offset: 最初のサンプルのインデックス。デフォルトは`0`。
+        :param path: メモリマップファイルのパスの接頭辞。`None`の場合はオンザフライで生成します。
+        :return: 合成データセット。
+        """
+        return SyntheticDataset(
+            num_samples=num_samples,
+            input_shape=self.hparams.input_shape,
+            num_classes=self.hparams.num_classes,
+            noise=self.hparams.noise,
+            seed=self.hparams.seed,
+            offset=offset,
+            path=path,
+        )
+
+    def prepare_data(self) -> None:
+        """`memmap=True`の場合、まだ書き込まれていなければすべてのサンプルをファイルに書き込みます。
+
+        状態を割り当てるために使用しないでください（self.x = y）。
+        """
+        if not self.hparams.memmap:
+            return
+        path = self.memmap_path
+        if Path(f"{path}_x.npy").exists() and Path(f"{path}_y.npy").exists():
+            return
+        self._dataset(sum(self.split_sizes)).write_arrays(path)
+
+    def data_artifacts(self) -> List[str]:
+        """このデータモジュールがディスクから読み込むデータのパスを返します（実行のメモ化のチェックサムに使用します）。
+
+        :return: `memmap=True`の場合はメモリマップファイルのパスのリスト、それ以外は空のリスト。
+        """
+        if not self.hparams.memmap:
+            return []
+        return [f"{self.memmap_path}_x.npy", f"{self.memmap_path}_y.npy"]
+
+    def setup(self, stage: Optional[str] = None) -> None:
+        """データセットを作成します。変数を設定します：`self.data_train`、`self.data_val`、`self.data_test`、
+        `self.data_predict`。
+
+        サンプルは互いに独立に生成されるため、分割はシャッフルせずに連続したインデックスの範囲で行います。
+
+        :param stage: セットアップするステージ。`"fit"`、`"validate"`、`"test"`、または`"predict"`のいずれか。
+            デフォルトは``None``。
+        """
+        # バッチサイズをデバイス数で割ります。
+        if self.trainer is not None:
+            if self.hparams.batch_size % self.trainer.world_size != 0:
+                raise RuntimeError(
+                    f"バッチサイズ（{self.hparams.batch_size}）がデバイス数（{self.trainer.world_size}）で割り切れません。"
+                )
+            self.batch_size_per_device = self.hparams.batch_size // self.trainer.world_size
+
+        # 再利用されたデータモジュールでは、前の`fit`の読み込み位置を破棄します
+        # (チェックポイントから再開する場合は、Lightningがこの後に`load_state_dict`で設定します)
+        if stage == "fit":
+            self._epoch, self._samples_seen, self._resume = 0, 0, None
+
+        # まだ作成されていない場合にのみデータセットを作成します
+        if not self.data_train and not self.data_val and not self.data_test:
+            path = self.memmap_path if self.hparams.memmap else None
+            num_train, num_val, num_test = self.split_sizes
+            self.data_train = self._dataset(num_train, offset=0, path=path)
+            self.data_val = self._dataset(num_val, offset=num_train, path=path)
+            self.data_test = self._dataset(num_test, offset=num_train + num_val, path=path)
+
+        # 予測にはテストセットを使用します
+        if not self.data_predict:
+            self.data_predict = self.data_test
+
+    def select_fold(self, fold: int, num_folds: int, seed: int = 42) -> None:
+        """k分割交差検証の`fold`番目の分割を選択し、トレーニングと検証のデータセットを置き換えます。
+
+        最初に呼び出されたときのトレーニングと検証のデータセットを合わせたものを`num_folds`個に分割し、
+        `fold`番目を検証、残りをトレーニングに使用します。テストセットは変更しません。読み込み済みの
+        データセットをそのまま分割するため、同じインスタンスで分割を切り替えてもデータは再読み込みされません。
+
+        :param fold: 検証に使用する分割のインデックス。
+        :param num_folds: 分割の数。
+        :param seed: 分割の順列のシード。デフォルトは`42`。
+        """
+        if self.data_train is None:
+            self.setup("fit")
+        if self._cv_pool is None:
+            self._cv_pool = ConcatDataset(datasets=[self.data_train, self.data_val])
+        train_indices, val_indices = kfold_indices(len(self._cv_pool), num_folds, fold, seed=seed)
+        self.data_train = Subset(self._cv_pool, train_indices)
+        self.data_val = Subset(self._cv_pool, val_indices)
+
+        # 前の分割のデータローダーと読み込み位置は使用しません
+        self.reset_dataloaders()
+        self._epoch, self._samples_seen, self._resume = 0, 0, None
+
+    def train_dataloader(self) -> DataLoader[Any]:
+        """トレーニングデータローダーを作成して返します。
+
+        :return: トレーニングデータローダー。
+        """
+        return self._build_dataloader("train", self.data_train, shuffle=True)
+
+    def val_dataloader(self) -> DataLoader[Any]:
+        """検証データローダーを作成して返します。
+
+        :return: 検証データローダー。
+        """
+        return self._build_dataloader("val", self.data_val, shuffle=False)
+
+    def test_dataloader(self) -> DataLoader[Any]:
+        """テストデータローダーを作成して返します。
+
+        :return: テストデータローダー。
+        """
+        return self._build_dataloader("test", self.data_test, shuffle=False)
+
+    def predict_dataloader(self) -> DataLoader[Any]:
+        """予測データローダーを作成して返します。
+
+        :return: 予測データローダー。
+        """
+        return self._build_dataloader("predict", self.data_predict, shuffle=False)
+
+    def reset_dataloaders(self) -> None:
+        """キャッシュされたデータローダー（永続ワーカーを含む）を破棄します。
+
+        `data_train`などのデータセットを置き換えた後に呼び出すと、次のデータローダーは新しいデータセットから作成されます。
+        """
+        self._dataloaders.clear()
+
+    def _build_dataloader(self, split: str, dataset: Dataset, shuffle: bool) -> DataLoader[Any]:
+        """データローダーを作成して返します。永続ワーカーが有効な場合、データローダーは分割ごとにキャッシュされます。
+
+        :param split: 分割の名前。`"train"`、`"val"`、`"test"`、または`"predict"`のいずれか。
+        :param dataset: データローダーが読み込むデータセット。
+        :param shuffle: データをシャッフルするかどうか。
+        :return: データローダー。
+        """
+        persistent_workers = self.hparams.persistent_workers and self.hparams.num_workers > 0
+        # (シードはLightningが分散サンプラーに使用する`PL_GLOBAL_SEED`と同じです)
+        seed = int(os.environ.get("PL_GLOBAL_SEED", 0))
+        world_size = self.trainer.world_size if self.trainer is not None else 1
+        key = (split, self.batch_size_per_device, world_size)
+        if persistent_workers and key in self._dataloaders:
+            dataloader = self._dataloaders[key]
+            # 前の試行とシードが異なる場合も、この実行のシードでシャッフルします
+            # (サンプラーはメインプロセスで反復されるため、ワーカーを再起動せずに変更できます)
+            if isinstance(dataloader.sampler, ResumableDistributedSampler):
+                dataloader.sampler.seed = seed
+            return self._resume_sampler(dataloader)
+
+        # シャッフルする場合は、チェックポイントから同じ位置で再開できる決定的なサンプラーを使用します
+        sampler = ResumableDistributedSampler(dataset, seed=seed) if shuffle else None
+        dataloader = DataLoader(
+            dataset=dataset,
+            batch_size=self.batch_size_per_device,
+            num_workers=self.hparams.num_workers,
+            pin_memory=self.hparams.pin_memory,
+            persistent_workers=persistent_workers,
+            sampler=sampler,
+            worker_init_fn=loader_worker_init_fn(),
+        )
+        if persistent_workers:
+            self._dataloaders[key] = dataloader
+        return self._resume_sampler(dataloader)
+
+    def _resume_sampler(self, dataloader: DataLoader[Any]) -> DataLoader[Any]:
+        """チェックポイントから読み込んだ位置をデータローダーのサンプラーに設定します。
+
+        :param dataloader: データローダー。
+        :return: 同じデータローダー。
+        """
+        if self._resume is not None and isinstance(dataloader.sampler, ResumableDistributedSampler):
+            dataloader.sampler.resume(*self._resume)
+            self._resume = None
+        return dataloader
+
+    def on_after_batch_transfer(self, batch: Any, dataloader_idx: int) -> Any:
+        """バッチをデバイスに転送した後に呼び出されるLightningフック。消費したトレーニングサンプル数を数えます。
+
+        :param batch: データのバッチ。
+        :param dataloader_idx: データローダーのインデックス。
+        :return: 同じバッチ。
+        """
+        trainer = self.trainer
+        if trainer is not None and trainer.training:
+            if trainer.current_epoch != self._epoch:
+                self._epoch, self._samples_seen = trainer.current_epoch, 0
+            self._samples_seen += len(batch[0]) * trainer.world_size
+        return batch
+
+    def state_dict(self) -> Dict[Any, Any]:
+        """チェックポイントを保存するときに呼び出されます。トレーニングデータの読み込み位置を保存します。
+
+        :return: 現在のエポックと、そのエポックで全ランクが消費したサンプル数を含む辞書。
+        """
+        return {"epoch": self._epoch, "samples_seen": self._samples_seen}
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        """チェックポイントを読み込むときに呼び出されます。トレーニングデータの読み込み位置を復元します。
+
+        :param state_dict: `self.state_dict()`によって返されたデータモジュールの状態。
+        """
+        if "epoch" in state_dict:
+            self._epoch, self._samples_seen = state_dict["epoch"], state_dict["samples_seen"]
+            self._resume = (self._epoch, self._samples_seen)
+
+
+if __name__ == "__main__":
+    _ = SyntheticDataModule()
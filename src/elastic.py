@@ -0,0 +1,160 @@
+import argparse
+import logging
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import rootutils
+
+root = rootutils.setup_root(__file__, indicator=".project-root", pythonpath=True)
+
+# このプロジェクトからのインポートは、必ずrootutils.setup_rootの実行後に行う必要がある
+from src.utils import RankedLogger
+
+log = RankedLogger(__name__, rank_zero_only=True)
+
+# 再開に必要な、Lightningのチェックポイントのキー
+CHECKPOINT_KEYS = ("state_dict", "loops", "global_step")
+
+
+def is_valid_checkpoint(path: Path) -> bool:
+    """チェックポイントが読み込めて、トレーニングの再開に必要なキーを含むかどうかを返します。
+
+    保存中にプロセスが強制終了された場合、ファイルが途中までしか書き込まれていないことがあります。
+
+    :param path: チェックポイントのパス。
+    :return: 再開に使用できる場合は`True`。
+    """
+    import torch
+
+    try:
+        checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    except Exception as e:
+        log.warning(f"チェックポイントを読み込めません！ <path={path}, error={e!r}>")
+        return False
+    return isinstance(checkpoint, dict) and all(key in checkpoint for key in CHECKPOINT_KEYS)
+
+
+def find_resume_checkpoint(dirpath: Path) -> Optional[Path]:
+    """ディレクトリ以下で、再開に使用できる最新のチェックポイントを探します。
+
+    :param dirpath: チェックポイントを探すディレクトリ。
+    :return: 更新時刻が最も新しい有効なチェックポイントのパス。見つからない場合は`None`。
+    """
+    if not dirpath.is_dir():
+        return None
+    candidates = sorted(dirpath.rglob("*.ckpt"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in candidates:
+        if is_valid_checkpoint(path):
+            return path
+    return None
+
+
+def next_devices(devices: int, min_devices: int) -> int:
+    """ワーカーの障害の後に再起動するときのデバイス数を返します。
+
+    :param devices: 現在のデバイス数。
+    :param min_devices: デバイス数の下限。`devices`と同じ場合は同じ数で再起動します。
+    :return: 1つ減らしたデバイス数（`min_devices`未満にはしません）。
+    """
+    return max(min_devices, devices - 1)
+
+
+def build_command(
+    run_dir: Path, devices: int, ckpt_path: Optional[Path], overrides: Optional[List[str]] = None
+) -> List[str]:
+    """1回の試行で実行する`src/train.py`のコマンドを作成します。
+
+    :param run_dir: すべての試行で共有する出力先ディレクトリ。
+    :param devices: 使用するデバイス（プロセス）の数。
+    :param ckpt_path: 再開するチェックポイント。`None`の場合は最初からトレーニングします。
+    :param overrides: 追加のHydraオーバーライドのリスト（`ckpt_path`と`trainer.devices`は置き換えます）。
+    :return: コマンドの引数のリスト。
+    """
+    overrides = [
+        o for o in overrides or [] if not o.startswith(("ckpt_path=", "trainer.devices="))
+    ]
+    command = [
+        sys.executable,
+        str(root / "src" / "train.py"),
+        f"hydra.run.dir={run_dir}",
+        *overrides,
+        f"trainer.devices={devices}",
+    ]
+    if ckpt_path is not None:
+        command.append(f"ckpt_path='{ckpt_path}'")
+    return command
+
+
+def main() -> None:
+    """ワーカーの障害を検出し、最新の有効なチェックポイントから自動的に再開しながらトレーニングを実行します。
+
+    `src/train.py`を子プロセスとして実行し、いずれかのランクが異常終了してプロセスグループ全体が
+    失敗した場合は、同じ（または`--min-devices`まで1つ減らした）デバイス数で再起動し、
+    チェックポイントに保存されたモデル、オプティマイザ、ループ、データモジュールの読み込み位置から再開します。
+
+    例：`python src/elastic.py --devices 2 trainer=ddp_sim "callbacks=[default,elastic_checkpoint]"`
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1, help="最初のデバイス（プロセス）の数")
+    parser.add_argument(
+        "--min-devices", type=int, default=None, help="障害のたびに減らすデバイス数の下限（デフォルトは減らさない）"
+    )
+    parser.add_argument("--max-restarts", type=int, default=3, help="再起動の最大回数")
+    parser.add_argument("--restart-delay", type=float, default=1.0, help="再起動までの待ち時間（秒）")
+    parser.add_argument("--run-dir", type=Path, default=None, help="すべての試行で共有する出力先ディレクトリ")
+    parser.add_argument(
+        "--checkpoint-dir", type=Path, default=None, help="再開するチェックポイントを探すディレクトリ"
+    )
+    parser.add_argument("overrides", nargs="*", help="src/train.pyに渡すHydraオーバーライド")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s][%(name)s][%(levelname)s] - %(message)s")
+
+    run_dir = (
+        args.run_dir
+        or root / "logs" / "train" / "elastic" / datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    ).resolve()
+    checkpoint_dir = args.checkpoint_dir or run_dir / "checkpoints"
+    min_devices = args.devices if args.min_devices is None else args.min_devices
+    devices = args.devices
+
+    ckpt_path = next(
+        (Path(o.split("=", 1)[1].strip("'\"")) for o in args.overrides if o.startswith("ckpt_path=")),
+        None,
+    )
+    restarts = 0
+    while True:
+        command = build_command(run_dir, devices, ckpt_path, args.overrides)
+        log.info(f"トレーニングを開始します <restarts={restarts}, devices={devices}, ckpt_path={ckpt_path}>")
+        process = subprocess.Popen(command)
+        try:
+            returncode = process.wait()
+        except KeyboardInterrupt:
+            # 子プロセスも同じプロセスグループでSIGINTを受け取るため、終了を待ってから再起動せずに終了します
+            process.wait()
+            log.info("中断されました！")
+            sys.exit(130)
+
+        if returncode == 0:
+            log.info(f"トレーニングが完了しました！ <restarts={restarts}, 出力ディレクトリ: {run_dir}>")
+            return
+        if restarts >= args.max_restarts:
+            log.error(f"再起動の最大回数に達しました！ <returncode={returncode}, restarts={restarts}>")
+            sys.exit(returncode if returncode > 0 else 1)
+
+        restarts += 1
+        devices = next_devices(devices, min_devices)
+        ckpt_path = find_resume_checkpoint(checkpoint_dir) or ckpt_path
+        log.warning(
+            f"ワーカーが異常終了しました！再起動します... "
+            f"<returncode={returncode}, devices={devices}, ckpt_path={ckpt_path}>"
+        )
+        time.sleep(args.restart_delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from src.loggers.async_logger import AsyncLogger, close_async_loggers
+
+# Hydraは`_target_`のモジュールを直接インポートするため、使用しないロガーの依存関係を
+# 読み込まないよう、ここでの再エクスポートは遅延インポートにします
+_LAZY_ATTRS = {
+    "AsyncLogger": "src.loggers.async_logger",
+    "close_async_loggers": "src.loggers.async_logger",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name: str) -> Any:
+    """ロガーを遅延インポートします（PEP 562）。
+
+    :param name: 属性の名前。
+    :return: 対応するモジュールからインポートされた属性。
+    """
+    if name in _LAZY_ATTRS:
+        value = getattr(import_module(_LAZY_ATTRS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
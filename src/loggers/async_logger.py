@@ -0,0 +1,243 @@
+import copy
+import queue
+import threading
+import weakref
+from argparse import Namespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from lightning.pytorch.loggers import Logger
+from lightning_utilities.core.rank_zero import rank_zero_only
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+# `task_wrapper`の`finally`で閉じるため、作成されたロガーを記録します
+_LIVE_LOGGERS: "weakref.WeakSet[AsyncLogger]" = weakref.WeakSet()
+
+_STOP = ("stop", None)
+
+
+class AsyncLogger(Logger):
+    """複数のロガーへの書き込みをバックグラウンドのスレッドで行うロガー。
+
+    メトリクスとハイパーパラメータのイベントを上限付きのキューに追加してすぐに戻り、バックグラウンドの
+    スレッドがキューに溜まったイベントを最大`batch_size`件ずつまとめて各ロガーに書き込みます。
+    同じステップの連続したメトリクスは1回の`log_metrics`にまとめ、Lightningが記録のたびに呼び出す
+    `save()`はまとめた書き込みの後に1回だけ実行します。そのため、同期的に書き込むロガー（CSV、
+    TensorBoardなど）が複数あっても、トレーニングのスレッドが書き込みを待つことはありません。
+
+    キューが満杯の場合は、`drop_when_full=False`ではトレーニングのスレッドが空きを待ち（背圧）、
+    `drop_when_full=True`ではメトリクスを破棄して`num_dropped`に数えます（ハイパーパラメータは破棄しません）。
+
+    `finalize()`、`log_graph()`、`after_save_checkpoint()`は、キューを書き込み終えてから各ロガーを
+    同期的に呼び出します。プロセスの終了前には`close()`（`task_wrapper`が`close_async_loggers()`で
+    自動的に呼び出します）で、残りのイベントを書き込んでスレッドを停止します。
+
+    Hydraの設定では`_partial_: True`として指定し、`instantiate_loggers`が他のロガーを`loggers`に渡します。
+    """
+
+    def __init__(
+        self,
+        loggers: Sequence[Logger],
+        max_queue_size: int = 1000,
+        batch_size: int = 64,
+        drop_when_full: bool = False,
+    ) -> None:
+        """`AsyncLogger`を初期化します。
+
+        :param loggers: 書き込み先のロガー。
+        :param max_queue_size: キューに保持するイベントの最大数。デフォルトは`1000`。
+        :param batch_size: 1回にまとめて書き込むイベントの最大数。デフォルトは`64`。
+        :param drop_when_full: キューが満杯の場合にメトリクスを破棄するかどうか。`False`の場合は空きを待ちます。
+            デフォルトは`False`。
+        """
+        super().__init__()
+        self._loggers = list(loggers)
+        self.batch_size = batch_size
+        self.drop_when_full = drop_when_full
+        self.num_dropped = 0
+
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=max_queue_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="async-logger", daemon=True)
+        self._thread.start()
+        _LIVE_LOGGERS.add(self)
+
+    @property
+    def loggers(self) -> List[Logger]:
+        """書き込み先のロガーを返します。
+
+        :return: 書き込み先のロガーのリスト。
+        """
+        return self._loggers
+
+    @property
+    def name(self) -> Optional[str]:
+        """最初のロガーの名前を返します。"""
+        return self._loggers[0].name if self._loggers else None
+
+    @property
+    def version(self) -> Optional[Union[int, str]]:
+        """最初のロガーのバージョンを返します。"""
+        return self._loggers[0].version if self._loggers else None
+
+    @property
+    def save_dir(self) -> Optional[str]:
+        """最初のロガーの保存先のディレクトリを返します。"""
+        return self._loggers[0].save_dir if self._loggers else None
+
+    @property
+    def log_dir(self) -> Optional[str]:
+        """最初のロガーのログのディレクトリを返します。"""
+        if not self._loggers:
+            return None
+        return getattr(self._loggers[0], "log_dir", self._loggers[0].save_dir)
+
+    @property
+    def experiment(self) -> Any:
+        """最初のロガーの実験オブジェクト（wandbのランなど）を返します。"""
+        return self._loggers[0].experiment if self._loggers else None
+
+    @rank_zero_only
+    def log_metrics(self, metrics: Dict[str, float], step: Optional[int] = None) -> None:
+        """メトリクスをキューに追加します。
+
+        :param metrics: メトリクス名と値の辞書。
+        :param step: ステップ。
+        """
+        self._put(("metrics", (dict(metrics), step)), droppable=True)
+
+    @rank_zero_only
+    def log_hyperparams(
+        self, params: Union[Dict[str, Any], Namespace], *args: Any, **kwargs: Any
+    ) -> None:
+        """ハイパーパラメータをキューに追加します。
+
+        :param params: ハイパーパラメータ。
+        """
+        self._put(("hparams", (copy.copy(params), args, kwargs)))
+
+    @rank_zero_only
+    def log_graph(self, model: Any, input_array: Optional[Any] = None) -> None:
+        """キューを書き込み終えてから、各ロガーにモデルのグラフを記録します。"""
+        self.flush()
+        self._call_loggers("log_graph", model, input_array)
+
+    @rank_zero_only
+    def save(self) -> None:
+        """各ロガーの保存を、キューに溜まったイベントを書き込んだ後に実行するよう要求します。"""
+        self._put(("save", None), droppable=True)
+
+    @rank_zero_only
+    def finalize(self, status: str) -> None:
+        """キューを書き込み終えてから、各ロガーの`finalize`を呼び出します。
+
+        :param status: 実行の終了状態（`"success"`、`"failed"`など）。
+        """
+        self.flush()
+        self._call_loggers("finalize", status)
+
+    def after_save_checkpoint(self, checkpoint_callback: Any) -> None:
+        """キューを書き込み終えてから、各ロガーの`after_save_checkpoint`を呼び出します。"""
+        self.flush()
+        self._call_loggers("after_save_checkpoint", checkpoint_callback)
+
+    def flush(self) -> None:
+        """キューに溜まったすべてのイベントが書き込まれるまで待ちます。"""
+        if not self._closed:
+            self._queue.join()
+
+    def close(self) -> None:
+        """残りのイベントを書き込んでスレッドを停止します。以降のイベントは同期的に書き込まれます。"""
+        if self._closed:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._closed = True
+        _LIVE_LOGGERS.discard(self)
+        if self.num_dropped:
+            log.warning(f"キューが満杯のため破棄されたメトリクスがあります！ <num_dropped={self.num_dropped}>")
+
+    def _put(self, event: Tuple[str, Any], droppable: bool = False) -> None:
+        """イベントをキューに追加します。
+
+        :param event: イベントの種類と内容のタプル。
+        :param droppable: キューが満杯で`drop_when_full=True`の場合に破棄してよいかどうか。
+        """
+        if self._closed:
+            self._write([event])
+            return
+        if droppable and self.drop_when_full:
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                self.num_dropped += 1
+            return
+        self._queue.put(event)
+
+    def _run(self) -> None:
+        """キューからイベントをまとめて取り出し、各ロガーに書き込みます。"""
+        while True:
+            events = [self._queue.get()]
+            while len(events) < self.batch_size:
+                try:
+                    events.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(events)
+            finally:
+                for _ in events:
+                    self._queue.task_done()
+            if _STOP in events:
+                return
+
+    def _write(self, events: List[Tuple[str, Any]]) -> None:
+        """イベントを順番に各ロガーに書き込みます。
+
+        同じステップの連続したメトリクスは1つにまとめ、保存の要求は最後に1回だけ実行します。
+
+        :param events: イベントの種類と内容のタプルのリスト。
+        """
+        pending: Optional[Tuple[Dict[str, float], Optional[int]]] = None
+        save = False
+        for kind, payload in events:
+            if kind == "metrics":
+                metrics, step = payload
+                if pending is not None and pending[1] == step:
+                    pending[0].update(metrics)
+                    continue
+                if pending is not None:
+                    self._call_loggers("log_metrics", *pending)
+                pending = (metrics, step)
+            elif kind == "save":
+                save = True
+            elif kind == "hparams":
+                if pending is not None:
+                    self._call_loggers("log_metrics", *pending)
+                    pending = None
+                params, args, kwargs = payload
+                self._call_loggers("log_hyperparams", params, *args, **kwargs)
+
+        if pending is not None:
+            self._call_loggers("log_metrics", *pending)
+        if save:
+            self._call_loggers("save")
+
+    def _call_loggers(self, method: str, *args: Any, **kwargs: Any) -> None:
+        """各ロガーのメソッドを呼び出します。1つのロガーの失敗は他のロガーに影響しません。
+
+        :param method: メソッドの名前。
+        """
+        for logger in self._loggers:
+            try:
+                getattr(logger, method)(*args, **kwargs)
+            except Exception:
+                log.exception(f"ロガーへの書き込みに失敗しました！ <{type(logger).__name__}.{method}>")
+
+
+def close_async_loggers() -> None:
+    """作成されたすべての`AsyncLogger`の残りのイベントを書き込んで閉じます。"""
+    for logger in list(_LIVE_LOGGERS):
+        logger.close()
@@ -0,0 +1,146 @@
+from typing import List, Sequence
+
+import torch
+from torch import nn
+from torch.nn import functional as F
+
+from src.models.components.simple_dense_net import SimpleDenseNet
+
+
+class PopulationDenseNet(nn.Module):
+    """A population of `SimpleDenseNet` members with the same shape, evaluated together as batched ops.
+
+    Every member keeps its own `SimpleDenseNet` parameters (so each member can have its own optimizer
+    param group and its state dict can be loaded into a regular `SimpleDenseNet`), but the forward pass
+    stacks them: the first layer is a single matmul against the concatenated weights, the following
+    layers are batched matmuls over the member dimension and batch norm runs over the concatenated
+    channels of all members.
+    """
+
+    def __init__(
+        self,
+        seeds: Sequence[int] = (0, 1, 2, 3),
+        input_size: int = 784,
+        lin1_size: int = 256,
+        lin2_size: int = 256,
+        lin3_size: int = 256,
+        output_size: int = 10,
+    ) -> None:
+        """Initialize a `PopulationDenseNet` module.
+
+        :param seeds: One random seed per member, used to initialize its weights. The population size is
+            `len(seeds)`.
+        :param input_size: The number of input features.
+        :param lin1_size: The number of output features of the first linear layer.
+        :param lin2_size: The number of output features of the second linear layer.
+        :param lin3_size: The number of output features of the third linear layer.
+        :param output_size: The number of output features of the final linear layer.
+        """
+        super().__init__()
+
+        self.seeds = list(seeds)
+        members = []
+        for seed in seeds:
+            with torch.random.fork_rng():
+                torch.manual_seed(seed)
+                members.append(
+                    SimpleDenseNet(
+                        input_size=input_size,
+                        lin1_size=lin1_size,
+                        lin2_size=lin2_size,
+                        lin3_size=lin3_size,
+                        output_size=output_size,
+                    )
+                )
+        self.members = nn.ModuleList(members)
+
+    @property
+    def population_size(self) -> int:
+        """Get the number of members.
+
+        :return: The number of members in the population.
+        """
+        return len(self.members)
+
+    def _layers(self, index: int) -> List[nn.Module]:
+        """Get the layer at `index` of the `nn.Sequential` of every member.
+
+        :param index: The index of the layer.
+        :return: A list with the layer of each member.
+        """
+        return [member.model[index] for member in self.members]
+
+    def _batch_norm(self, x: torch.Tensor, layers: List[nn.BatchNorm1d]) -> torch.Tensor:
+        """Apply each member's batch norm to its channels of the concatenated input.
+
+        :param x: The input tensor of shape `(batch, members * features)`.
+        :param layers: The batch norm layer of each member.
+        :return: The normalized tensor of the same shape.
+        """
+        running_mean = torch.cat([layer.running_mean for layer in layers])
+        running_var = torch.cat([layer.running_var for layer in layers])
+        x = F.batch_norm(
+            x,
+            running_mean,
+            running_var,
+            weight=torch.cat([layer.weight for layer in layers]),
+            bias=torch.cat([layer.bias for layer in layers]),
+            training=self.training,
+            momentum=layers[0].momentum,
+            eps=layers[0].eps,
+        )
+
+        if self.training:
+            # `F.batch_norm` updated the concatenated copies in-place, write them back to the members
+            with torch.no_grad():
+                for layer, mean, var in zip(
+                    layers,
+                    running_mean.chunk(len(layers)),
+                    running_var.chunk(len(layers)),
+                ):
+                    layer.running_mean.copy_(mean)
+                    layer.running_var.copy_(var)
+                    layer.num_batches_tracked.add_(1)
+        return x
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """Perform a single forward pass of all members on the same input.
+
+        :param x: The input tensor.
+        :return: A tensor of predictions of shape `(members, batch, output_size)`.
+        """
+        batch_size = x.size(0)
+        num_members = self.population_size
+
+        # (batch, 1, width, height) -> (batch, 1*width*height)
+        x = x.view(batch_size, -1)
+
+        layer_types = [type(layer) for layer in self.members[0].model]
+        h = None
+        for index, layer_type in enumerate(layer_types):
+            if layer_type is nn.Linear:
+                layers = self._layers(index)
+                if h is None:
+                    # every member sees the same input: one matmul against the concatenated weights
+                    weight = torch.cat([layer.weight for layer in layers])
+                    bias = torch.cat([layer.bias for layer in layers])
+                    h = F.linear(x, weight, bias)  # (batch, members * features)
+                else:
+                    # (batch, members * in) -> (members, batch, in)
+                    h = h.view(batch_size, num_members, -1).transpose(0, 1)
+                    weight = torch.stack([layer.weight for layer in layers]).transpose(1, 2)
+                    bias = torch.stack([layer.bias for layer in layers]).unsqueeze(1)
+                    h = torch.baddbmm(bias, h, weight)  # (members, batch, out)
+                    # (members, batch, out) -> (batch, members * out)
+                    h = h.transpose(0, 1).reshape(batch_size, -1)
+            elif layer_type is nn.BatchNorm1d:
+                h = self._batch_norm(h, self._layers(index))
+            else:
+                h = self.members[0].model[index](h)
+
+        # (batch, members * output_size) -> (members, batch, output_size)
+        return h.view(batch_size, num_members, -1).transpose(0, 1)
+
+
+if __name__ == "__main__":
+    _ = PopulationDenseNet()
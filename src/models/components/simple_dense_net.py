@@ -1,3 +1,5 @@
+from typing import Tuple
+
 import torch
 from torch import nn
 
@@ -48,6 +50,19 @@ class SimpleDenseNet(nn.Module):
 
         return self.model(x)
 
+    def split(self, num_frozen: int) -> Tuple[nn.Module, nn.Module]:
+        """Split the network into a prefix of the first `num_frozen` layers and the remaining suffix.
+
+        Both parts share their parameters with this network, so `suffix(prefix(x))` equals `self(x)`.
+
+        :param num_frozen: The number of leading layers of `self.model` in the prefix.
+        :return: A tuple of the prefix (which also flattens the input) and the suffix.
+        """
+        if not 0 < num_frozen < len(self.model):
+            raise ValueError(f"num_frozen must be between 1 and {len(self.model) - 1}, got {num_frozen}")
+        prefix = nn.Sequential(nn.Flatten(), *self.model[:num_frozen])
+        return prefix, self.model[num_frozen:]
+
 
 if __name__ == "__main__":
     _ = SimpleDenseNet()
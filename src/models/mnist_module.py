@@ -1,4 +1,4 @@
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 import torch
 from lightning import LightningModule
@@ -45,12 +45,19 @@ class MNISTLitModule(LightningModule):
         optimizer: torch.optim.Optimizer,
         scheduler: torch.optim.lr_scheduler,
         compile: bool,
+        shard_optimizer_state: bool = False,
+        frozen_layers: int = 0,
     ) -> None:
         """MNISTLitModuleを初期化します。
 
         :param net: トレーニングするモデル。
         :param optimizer: トレーニングに使用するオプティマイザ。
         :param scheduler: トレーニングに使用する学習率スケジューラ。
+        :param shard_optimizer_state: DDPでオプティマイザの状態をランク間で分割するかどうか（ZeROのステージ1）。
+            デフォルトは`False`。
+        :param frozen_layers: 固定する`net`の先頭の層の数（`net.split(frozen_layers)`の前半）。固定した層は
+            トレーニングせず、BatchNormも推論モードのまま使用します。`0`の場合はすべての層をトレーニングします。
+            デフォルトは`0`。
         """
         super().__init__()
 
@@ -60,6 +67,14 @@ class MNISTLitModule(LightningModule):
 
         self.net = net
 
+        # 固定する前半と、トレーニングする後半（`net`とパラメータを共有するため、サブモジュールとして登録しません）
+        self._split: Optional[Tuple[torch.nn.Module, torch.nn.Module]] = None
+        if frozen_layers > 0:
+            self._split = net.split(frozen_layers)
+            self._split[0].requires_grad_(False)
+        # `True`の場合、バッチの入力は固定した層の出力（`FrozenFeatureCache`のキャッシュ）です
+        self.cached_features = False
+
         # 損失関数
         self.criterion = torch.nn.CrossEntropyLoss()
 
@@ -84,6 +99,25 @@ class MNISTLitModule(LightningModule):
         """
         return self.net(x)
 
+    @property
+    def frozen_prefix(self) -> Optional[torch.nn.Module]:
+        """固定した前半の層を返します。
+
+        :return: 固定した前半の層。`frozen_layers=0`の場合は`None`。
+        """
+        return self._split[0] if self._split is not None else None
+
+    def train(self, mode: bool = True) -> "MNISTLitModule":
+        """トレーニングモードを設定します。固定した層は常に推論モード（BatchNormの移動平均を使用）のままにします。
+
+        :param mode: トレーニングモードにするかどうか。デフォルトは`True`。
+        :return: このモジュール。
+        """
+        super().train(mode)
+        if self._split is not None:
+            self._split[0].eval()
+        return self
+
     def on_train_start(self) -> None:
         """トレーニングが開始されるときに呼び出されるLightningフック。"""
         # デフォルトではlightningはトレーニング開始前に検証ステップの健全性チェックを実行するため、
@@ -105,7 +139,8 @@ class MNISTLitModule(LightningModule):
             - ターゲットラベルのテンソル。
         """
         x, y = batch
-        logits = self.forward(x)
+        # キャッシュされた特徴量の場合は、トレーニングする後半の層だけを実行します
+        logits = self._split[1](x) if self.cached_features else self.forward(x)
         loss = self.criterion(logits, y)
         preds = torch.argmax(logits, dim=1)
         return loss, preds, y
@@ -174,6 +209,18 @@ class MNISTLitModule(LightningModule):
         """テストエポックが終了するときに呼び出されるLightningフック。"""
         pass
 
+    def predict_step(self, batch: Any, batch_idx: int) -> Dict[str, torch.Tensor]:
+        """予測用データのバッチに対して単一の予測ステップを実行します。
+
+        :param batch: データのバッチ。画像のテンソル、または画像とターゲットラベルを含むタプル。
+        :param batch_idx: 現在のバッチのインデックス。
+        :return: ロジット（`"logits"`）と予測ラベル（`"preds"`）を含む辞書。
+        """
+        x = batch[0] if isinstance(batch, (tuple, list)) else batch
+        logits = self.forward(x)
+        preds = torch.argmax(logits, dim=1)
+        return {"logits": logits, "preds": preds}
+
     def setup(self, stage: str) -> None:
         """fit（トレーニング＋検証）、validate、test、またはpredictの開始時に呼び出されるLightningフック。
 
@@ -194,7 +241,13 @@ class MNISTLitModule(LightningModule):
 
         :return: トレーニングに使用するように設定されたオプティマイザと学習率スケジューラを含む辞書。
         """
-        optimizer = self.hparams.optimizer(params=self.trainer.model.parameters())
+        params = [p for p in self.trainer.model.parameters() if p.requires_grad]
+        if self.hparams.get("shard_optimizer_state"):
+            from src.utils.ddp_utils import shard_optimizer
+
+            optimizer = shard_optimizer(self.hparams.optimizer, params)
+        else:
+            optimizer = self.hparams.optimizer(params=params)
         if self.hparams.scheduler is not None:
             scheduler = self.hparams.scheduler(optimizer=optimizer)
             return {
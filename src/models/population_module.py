@@ -0,0 +1,309 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+from lightning import LightningModule
+from torchmetrics import MaxMetric, Metric
+
+from src.models.components.population_dense_net import PopulationDenseNet
+
+
+class MemberAccuracy(Metric):
+    """集団の各メンバーの精度をまとめて計算するメトリック。"""
+
+    def __init__(self, num_members: int) -> None:
+        """`MemberAccuracy`を初期化します。
+
+        :param num_members: 集団のメンバー数。
+        """
+        super().__init__()
+        self.add_state("correct", default=torch.zeros(num_members), dist_reduce_fx="sum")
+        self.add_state("total", default=torch.tensor(0.0), dist_reduce_fx="sum")
+
+    def update(self, preds: torch.Tensor, targets: torch.Tensor) -> None:
+        """メトリックの状態を更新します。
+
+        :param preds: 形状`(members, batch)`の予測のテンソル。
+        :param targets: 形状`(batch,)`のターゲットラベルのテンソル。
+        """
+        self.correct += (preds == targets.unsqueeze(0)).sum(dim=1).float()
+        self.total += targets.numel()
+
+    def compute(self) -> torch.Tensor:
+        """各メンバーの精度を計算します。
+
+        :return: 形状`(members,)`の精度のテンソル。
+        """
+        return self.correct / self.total
+
+
+class MemberMean(Metric):
+    """集団の各メンバーの値（損失など）の平均をまとめて計算するメトリック。"""
+
+    def __init__(self, num_members: int) -> None:
+        """`MemberMean`を初期化します。
+
+        :param num_members: 集団のメンバー数。
+        """
+        super().__init__()
+        self.add_state("value", default=torch.zeros(num_members), dist_reduce_fx="sum")
+        self.add_state("weight", default=torch.tensor(0.0), dist_reduce_fx="sum")
+
+    def update(self, value: torch.Tensor, weight: int) -> None:
+        """メトリックの状態を更新します。
+
+        :param value: 形状`(members,)`の値のテンソル。
+        :param weight: 値の重み（バッチサイズ）。
+        """
+        self.value += value.detach() * weight
+        self.weight += weight
+
+    def compute(self) -> torch.Tensor:
+        """各メンバーの平均を計算します。
+
+        :return: 形状`(members,)`の平均のテンソル。
+        """
+        return self.value / self.weight
+
+
+class PopulationLitModule(LightningModule):
+    """同じ形状で学習率・重み減衰・シードの異なるK個の`SimpleDenseNet`を1つのプロセスでまとめて学習する
+    `LightningModule`。
+
+    すべてのメンバーは同じバッチで順伝播・逆伝播を行い（`PopulationDenseNet`を参照）、各メンバーは
+    オプティマイザの独自のパラメータグループを持ちます。メトリクスはメンバーごとに`{stage}/acc/member_{k}`として
+    記録され、`val/acc`と`val/acc_best`には最も良いメンバーの値が記録されます。
+
+    1回の`train.py`の実行でK個のハイパーパラメータ設定を評価できるため、小さなモデルの探索の
+    スループットが大きく向上します。
+    """
+
+    def __init__(
+        self,
+        net: PopulationDenseNet,
+        optimizer: torch.optim.Optimizer,
+        lrs: Optional[Sequence[float]] = None,
+        weight_decays: Optional[Sequence[float]] = None,
+        compile: bool = False,
+    ) -> None:
+        """PopulationLitModuleを初期化します。
+
+        :param net: トレーニングするメンバーの集団。
+        :param optimizer: トレーニングに使用するオプティマイザ（部分的にインスタンス化されたもの）。
+        :param lrs: メンバーごとの学習率。`None`の場合はオプティマイザのデフォルト値を使用します。
+        :param weight_decays: メンバーごとの重み減衰。`None`の場合はオプティマイザのデフォルト値を使用します。
+        :param compile: モデルをコンパイルするかどうか。デフォルトは`False`。
+        """
+        super().__init__()
+
+        # この行により、'self.hparams'属性で初期化パラメータにアクセスできます
+        # また、初期化パラメータがckptに保存されることを保証します
+        self.save_hyperparameters(logger=False)
+
+        self.net = net
+        num_members = net.population_size
+        for name, values in (("lrs", lrs), ("weight_decays", weight_decays)):
+            if values is not None and len(values) != num_members:
+                raise ValueError(
+                    f"`{name}`の長さ（{len(values)}）が集団のメンバー数（{num_members}）と一致しません！"
+                )
+
+        # 損失関数（メンバーごとの損失を計算するため、平均は後で取ります）
+        self.criterion = torch.nn.CrossEntropyLoss(reduction="none")
+
+        # メンバーごとの精度と損失
+        self.train_acc = MemberAccuracy(num_members)
+        self.val_acc = MemberAccuracy(num_members)
+        self.test_acc = MemberAccuracy(num_members)
+        self.train_loss = MemberMean(num_members)
+        self.val_loss = MemberMean(num_members)
+        self.test_loss = MemberMean(num_members)
+
+        # 最も良いメンバーのこれまでの最高検証精度を追跡するため
+        self.val_acc_best = MaxMetric()
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """すべてのメンバーで順伝播を実行します。
+
+        :param x: 画像のテンソル。
+        :return: 形状`(members, batch, classes)`のロジットのテンソル。
+        """
+        return self.net(x)
+
+    def on_train_start(self) -> None:
+        """トレーニングが開始されるときに呼び出されるLightningフック。"""
+        # 健全性チェックの結果が検証メトリクスに残らないようにします
+        self.val_loss.reset()
+        self.val_acc.reset()
+        self.val_acc_best.reset()
+
+    def model_step(
+        self, batch: Tuple[torch.Tensor, torch.Tensor]
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """データのバッチに対してすべてのメンバーで単一のモデルステップを実行します。
+
+        :param batch: データのバッチ（タプル）で、画像の入力テンソルとターゲットラベルを含みます。
+
+        :return: 以下を含むタプル（順番に）：
+            - 形状`(members,)`のメンバーごとの損失のテンソル。
+            - 形状`(members, batch)`の予測のテンソル。
+            - ターゲットラベルのテンソル。
+        """
+        x, y = batch
+        logits = self.forward(x)
+        num_members, batch_size, num_classes = logits.shape
+        losses = self.criterion(logits.reshape(-1, num_classes), y.repeat(num_members))
+        losses = losses.view(num_members, batch_size).mean(dim=1)
+        preds = torch.argmax(logits, dim=2)
+        return losses, preds, y
+
+    def _log_members(self, stage: str, losses: torch.Tensor, accs: torch.Tensor) -> None:
+        """メンバーごとの損失と精度をログに記録します。
+
+        :param stage: `"train"`、`"val"`、または`"test"`のいずれか。
+        :param losses: 形状`(members,)`の損失のテンソル。
+        :param accs: 形状`(members,)`の精度のテンソル。
+        """
+        for k in range(self.net.population_size):
+            self.log(f"{stage}/loss/member_{k}", losses[k])
+            self.log(f"{stage}/acc/member_{k}", accs[k])
+        best = int(torch.argmax(accs))
+        self.log(f"{stage}/loss", losses[best], prog_bar=True)
+        self.log(f"{stage}/acc", accs[best], prog_bar=True)
+
+    def training_step(
+        self, batch: Tuple[torch.Tensor, torch.Tensor], batch_idx: int
+    ) -> torch.Tensor:
+        """トレーニングセットからのデータのバッチに対して単一のトレーニングステップを実行します。
+
+        :param batch: データのバッチ（タプル）で、画像の入力テンソルとターゲットラベルを含みます。
+        :param batch_idx: 現在のバッチのインデックス。
+        :return: 全メンバーの損失の合計のテンソル（メンバーのパラメータは独立しているため、各メンバーの勾配は
+            それぞれの損失の勾配と等しくなります）。
+        """
+        losses, preds, targets = self.model_step(batch)
+
+        self.train_loss.update(losses, targets.numel())
+        self.train_acc.update(preds, targets)
+
+        return losses.sum()
+
+    def on_train_epoch_end(self) -> None:
+        """トレーニングエポックが終了するときに呼び出されるLightningフック。"""
+        self._log_members("train", self.train_loss.compute(), self.train_acc.compute())
+        self.train_loss.reset()
+        self.train_acc.reset()
+
+    def validation_step(self, batch: Tuple[torch.Tensor, torch.Tensor], batch_idx: int) -> None:
+        """検証セットからのデータのバッチに対して単一の検証ステップを実行します。
+
+        :param batch: データのバッチ（タプル）で、画像の入力テンソルとターゲットラベルを含みます。
+        :param batch_idx: 現在のバッチのインデックス。
+        """
+        losses, preds, targets = self.model_step(batch)
+
+        self.val_loss.update(losses, targets.numel())
+        self.val_acc.update(preds, targets)
+
+    def on_validation_epoch_end(self) -> None:
+        """検証エポックが終了するときに呼び出されるLightningフック。"""
+        accs = self.val_acc.compute()
+        self._log_members("val", self.val_loss.compute(), accs)
+        self.val_loss.reset()
+        self.val_acc.reset()
+
+        self.val_acc_best(accs.max())
+        self.log("val/acc_best", self.val_acc_best.compute(), sync_dist=True, prog_bar=True)
+
+    def test_step(self, batch: Tuple[torch.Tensor, torch.Tensor], batch_idx: int) -> None:
+        """テストセットからのデータのバッチに対して単一のテストステップを実行します。
+
+        :param batch: データのバッチ（タプル）で、画像の入力テンソルとターゲットラベルを含みます。
+        :param batch_idx: 現在のバッチのインデックス。
+        """
+        losses, preds, targets = self.model_step(batch)
+
+        self.test_loss.update(losses, targets.numel())
+        self.test_acc.update(preds, targets)
+
+    def on_test_epoch_end(self) -> None:
+        """テストエポックが終了するときに呼び出されるLightningフック。"""
+        self._log_members("test", self.test_loss.compute(), self.test_acc.compute())
+        self.test_loss.reset()
+        self.test_acc.reset()
+
+    def member_state_dict(self, k: int) -> Dict[str, torch.Tensor]:
+        """メンバー`k`の重みを`MNISTLitModule`の`state_dict`の形式で返します。
+
+        返された辞書は、同じ形状の`SimpleDenseNet`を持つ`MNISTLitModule`に`load_state_dict`で読み込めます。
+
+        :param k: メンバーのインデックス。
+        :return: メンバー`k`の`state_dict`。
+        """
+        return {f"net.{name}": value for name, value in self.net.members[k].state_dict().items()}
+
+    def member_hparams(self, k: int) -> Dict[str, Any]:
+        """メンバー`k`のハイパーパラメータを返します。
+
+        :param k: メンバーのインデックス。
+        :return: 学習率、重み減衰、シードを含む辞書。
+        """
+        optimizer_kwargs = getattr(self.hparams.optimizer, "keywords", {})
+        lrs, weight_decays = self.hparams.lrs, self.hparams.weight_decays
+        return {
+            "lr": lrs[k] if lrs is not None else optimizer_kwargs.get("lr"),
+            "weight_decay": (
+                weight_decays[k] if weight_decays is not None else optimizer_kwargs.get("weight_decay")
+            ),
+            "seed": self.net.seeds[k],
+        }
+
+    def setup(self, stage: str) -> None:
+        """fit（トレーニング＋検証）、validate、test、またはpredictの開始時に呼び出されるLightningフック。
+
+        :param stage: `"fit"`、`"validate"`、`"test"`、または`"predict"`のいずれか。
+        """
+        if self.hparams.compile and stage == "fit":
+            self.net = torch.compile(self.net)
+
+    def configure_gradient_clipping(
+        self,
+        optimizer: torch.optim.Optimizer,
+        gradient_clip_val: Optional[float] = None,
+        gradient_clip_algorithm: Optional[str] = None,
+    ) -> None:
+        """メンバーごとに勾配をクリッピングします。
+
+        Lightningのデフォルトは全パラメータの勾配のノルムでクリッピングするため、1つのメンバーの大きな勾配が
+        他のすべてのメンバーの更新を縮小してしまいます。各メンバーはオプティマイザの独自のパラメータグループを
+        持つため、グループごとにクリッピングしてメンバーを独立に保ちます。
+
+        :param optimizer: 現在のオプティマイザ。
+        :param gradient_clip_val: クリッピングする値（`trainer.gradient_clip_val`）。
+        :param gradient_clip_algorithm: `"norm"`または`"value"`（`trainer.gradient_clip_algorithm`）。
+        """
+        if not gradient_clip_val:
+            return
+        for group in optimizer.param_groups:
+            if gradient_clip_algorithm == "value":
+                torch.nn.utils.clip_grad_value_(group["params"], gradient_clip_val)
+            else:
+                torch.nn.utils.clip_grad_norm_(group["params"], gradient_clip_val)
+
+    def configure_optimizers(self) -> Dict[str, Any]:
+        """メンバーごとのパラメータグループを持つオプティマイザを作成します。
+
+        :return: トレーニングに使用するように設定されたオプティマイザを含む辞書。
+        """
+        param_groups: List[Dict[str, Any]] = []
+        for k, member in enumerate(self.net.members):
+            group: Dict[str, Any] = {"params": member.parameters()}
+            if self.hparams.lrs is not None:
+                group["lr"] = self.hparams.lrs[k]
+            if self.hparams.weight_decays is not None:
+                group["weight_decay"] = self.hparams.weight_decays[k]
+            param_groups.append(group)
+        return {"optimizer": self.hparams.optimizer(params=param_groups)}
+
+
+if __name__ == "__main__":
+    _ = PopulationLitModule(PopulationDenseNet(), None)
@@ -0,0 +1,187 @@
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import rootutils
+
+root = rootutils.setup_root(__file__, indicator=".project-root", pythonpath=True)
+
+# このプロジェクトからのインポートは、必ずrootutils.setup_rootの実行後に行う必要がある
+from src.utils import RankedLogger, available_cores, partition_cores
+
+log = RankedLogger(__name__, rank_zero_only=True)
+
+
+def split_trials(n_trials: int, num_workers: int) -> List[int]:
+    """試行の合計数をワーカーごとの試行数にできるだけ均等に分割します。
+
+    :param n_trials: 試行の合計数。
+    :param num_workers: ワーカーの数。
+    :return: 各ワーカーが実行する試行数のリスト。
+    """
+    size, remainder = divmod(n_trials, num_workers)
+    return [size + (1 if i < remainder else 0) for i in range(num_workers)]
+
+
+def build_worker_commands(
+    num_workers: int,
+    n_trials: int,
+    storage: str,
+    study_name: str,
+    sweep_dir: Path,
+    cores: List[int],
+    hparams_search: str = "mnist_optuna",
+    loader_workers: Optional[int] = None,
+    seed: int = 1234,
+    overrides: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """各ワーカーの`src/train.py -m`のコマンドと割り当てるCPUコアを作成します。
+
+    :param num_workers: 並列に実行するワーカープロセスの数。
+    :param n_trials: すべてのワーカーで実行する試行の合計数。
+    :param storage: ワーカー間で共有するOptunaのストレージURL。
+    :param study_name: ワーカー間で共有するOptunaの研究名。
+    :param sweep_dir: ワーカーごとのマルチランの出力先の親ディレクトリ。
+    :param cores: ワーカーに分配するCPUコアIDのリスト。
+    :param hparams_search: 使用する`hparams_search`設定の名前。デフォルトは`"mnist_optuna"`。
+    :param loader_workers: ワーカーごとのデータローダーのワーカー数。`None`の場合は割り当てられたコア数の1/4。
+    :param seed: サンプラーのシードの基準値。ワーカー`i`は`seed + i`を使用します。デフォルトは`1234`。
+    :param overrides: すべてのワーカーに渡す追加のHydraオーバーライドのリスト。
+    :return: 各ワーカーの`"command"`（引数のリスト）と`"cores"`（CPUコアIDのリスト）を含む辞書のリスト。
+    """
+    workers = []
+    for i, (worker_cores, worker_trials) in enumerate(
+        zip(partition_cores(cores, num_workers), split_trials(n_trials, num_workers))
+    ):
+        if worker_trials == 0:
+            continue
+        num_loader_workers = (
+            len(worker_cores) // 4 if loader_workers is None else loader_workers
+        )
+        command = [
+            sys.executable,
+            str(root / "src" / "train.py"),
+            "-m",
+            f"hparams_search={hparams_search}",
+            f"hydra.sweeper.storage='{storage}'",
+            f"hydra.sweeper.study_name={study_name}",
+            f"hydra.sweeper.n_trials={worker_trials}",
+            # 同じシードでは全ワーカーが同じ初期ランダム試行を提案してしまうため、ワーカーごとに変えます
+            f"++hydra.sweeper.sampler.seed={seed + i}",
+            f"hydra.sweep.dir={sweep_dir / f'worker_{i}'}",
+            f"cpu.cores=[{','.join(map(str, worker_cores))}]",
+            f"cpu.intra_op_threads={max(1, len(worker_cores) - num_loader_workers)}",
+            "cpu.inter_op_threads=1",
+            f"data.num_workers={num_loader_workers}",
+        ] + list(overrides or [])
+        workers.append({"command": command, "cores": worker_cores})
+    return workers
+
+
+def main() -> None:
+    """1台のマルチコアマシン上で、CPUコアを分割した複数のプロセスでOptunaの試行を並列に実行します。
+
+    各ワーカーは互いに素なCPUコアの集合に固定された`src/train.py -m`のプロセスで、
+    SQLiteストレージ上の同じOptunaの研究を共有して試行を分担します。
+
+    例：`python src/parallel_sweep.py --workers 8 --n-trials 64 trainer=cpu`
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, required=True, help="並列に実行するプロセスの数")
+    parser.add_argument("--n-trials", type=int, default=20, help="全ワーカーでの試行の合計数")
+    parser.add_argument("--hparams-search", default="mnist_optuna", help="hparams_search設定の名前")
+    parser.add_argument("--study-name", default="parallel_sweep", help="Optunaの研究名")
+    parser.add_argument(
+        "--storage", default=None, help="OptunaのストレージURL（デフォルトは出力先のSQLiteファイル）"
+    )
+    parser.add_argument("--sweep-dir", type=Path, default=None, help="出力先ディレクトリ")
+    parser.add_argument(
+        "--loader-workers", type=int, default=None, help="ワーカーごとのデータローダーのワーカー数"
+    )
+    parser.add_argument("--seed", type=int, default=1234, help="サンプラーのシードの基準値")
+    parser.add_argument("overrides", nargs="*", help="各ワーカーに渡すHydraオーバーライド")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s][%(name)s][%(levelname)s] - %(message)s")
+
+    sweep_dir = args.sweep_dir or (
+        root / "logs" / "train" / "parallel_sweeps" / datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    )
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    storage = args.storage or f"sqlite:///{(sweep_dir / 'optuna.db').resolve()}"
+
+    import optuna
+
+    # 複数のワーカーが同時にテーブルを作成しないように、先にストレージのスキーマを作成しておきます
+    optuna.storages.RDBStorage(storage)
+
+    workers = build_worker_commands(
+        num_workers=args.workers,
+        n_trials=args.n_trials,
+        storage=storage,
+        study_name=args.study_name,
+        sweep_dir=sweep_dir,
+        cores=available_cores(),
+        hparams_search=args.hparams_search,
+        loader_workers=args.loader_workers,
+        seed=args.seed,
+        overrides=args.overrides,
+    )
+
+    start_time = time.perf_counter()
+    processes = []
+    for i, worker in enumerate(workers):
+        cores = worker["cores"]
+        env = dict(os.environ)
+        env.update({name: str(len(cores)) for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS")})
+        log.info(f"ワーカー{i}を開始します <cores={cores}>")
+        stdout = open(sweep_dir / f"worker_{i}.out", "w")
+        preexec_fn = (
+            (lambda cores=cores: os.sched_setaffinity(0, cores))
+            if hasattr(os, "sched_setaffinity")
+            else None
+        )
+        processes.append(
+            (
+                subprocess.Popen(
+                    worker["command"],
+                    env=env,
+                    stdout=stdout,
+                    stderr=subprocess.STDOUT,
+                    preexec_fn=preexec_fn,
+                ),
+                stdout,
+            )
+        )
+
+    failed = []
+    for i, (process, stdout) in enumerate(processes):
+        if process.wait() != 0:
+            failed.append(i)
+        stdout.close()
+    elapsed = time.perf_counter() - start_time
+
+    study = optuna.load_study(study_name=args.study_name, storage=storage)
+    completed = [t for t in study.trials if t.state == optuna.trial.TrialState.COMPLETE]
+    log.info(
+        f"完了した試行: {len(completed)}/{len(study.trials)} "
+        f"<{len(completed) / elapsed * 3600:.1f} trials/hour>"
+    )
+    if completed:
+        log.info(f"最良のパラメータ: {study.best_params}")
+        log.info(f"最良の値: {study.best_value}")
+    log.info(f"出力ディレクトリ: {sweep_dir}")
+
+    if failed:
+        log.error(f"失敗したワーカー: {failed} <ログ: {sweep_dir}/worker_*.out>")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
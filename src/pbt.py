@@ -0,0 +1,258 @@
+import copy
+import math
+import os
+import random
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import hydra
+import rootutils
+from omegaconf import DictConfig, OmegaConf, open_dict
+
+rootutils.setup_root(__file__, indicator=".project-root", pythonpath=True)
+
+# このプロジェクトからのインポートは、必ずrootutils.setup_rootの実行後に行う必要がある
+from src.train import train
+from src.utils import RankedLogger, extras, get_metric_value, task_wrapper
+
+log = RankedLogger(__name__, rank_zero_only=True)
+
+
+def sample_hyperparams(hparams_cfg: DictConfig, rng: random.Random) -> Dict[str, float]:
+    """各ハイパーパラメータの初期値を[low, high]の対数一様分布から抽出します。
+
+    :param hparams_cfg: `pbt.hyperparams`の設定。
+    :param rng: 乱数ジェネレータ。
+    :return: ハイパーパラメータ名と値の辞書。
+    """
+    return {
+        name: math.exp(rng.uniform(math.log(spec.low), math.log(spec.high)))
+        for name, spec in hparams_cfg.items()
+    }
+
+
+def perturb_hyperparams(
+    hparams: Dict[str, float], hparams_cfg: DictConfig, rng: random.Random
+) -> Dict[str, float]:
+    """各ハイパーパラメータに`perturb_factors`のいずれかを掛け、[low, high]の範囲に収めます。
+
+    :param hparams: 摂動させるハイパーパラメータ。
+    :param hparams_cfg: `pbt.hyperparams`の設定。
+    :param rng: 乱数ジェネレータ。
+    :return: 摂動後のハイパーパラメータ。
+    """
+    perturbed = {}
+    for name, value in hparams.items():
+        spec = hparams_cfg[name]
+        value = value * rng.choice(list(spec.perturb_factors))
+        perturbed[name] = min(max(value, spec.low), spec.high)
+    return perturbed
+
+
+def exploit_checkpoint(src: Path, dst: Path, hparams: Dict[str, float]) -> None:
+    """`src`のチェックポイント（重みとオプティマイザの状態）を`dst`にコピーし、オプティマイザの
+    パラメータグループのハイパーパラメータを書き換えます。
+
+    :param src: コピー元（成績の良いメンバー）のチェックポイントのパス。
+    :param dst: コピー先（成績の悪いメンバー）のチェックポイントのパス。
+    :param hparams: パラメータグループに設定するハイパーパラメータ。
+    """
+    import torch
+
+    checkpoint = torch.load(src, map_location="cpu", weights_only=False)
+
+    # 再開時にはオプティマイザの状態がモデルの設定より優先されるため、パラメータグループを直接書き換えます
+    for optimizer_state in checkpoint.get("optimizer_states", []):
+        for group in optimizer_state["param_groups"]:
+            group.update(hparams)
+
+    # コピー元の`ModelCheckpoint`の状態はコピー元のディレクトリを指すため、コピー先のディレクトリに
+    # 置き換え、最良のチェックポイントはコピー先で改めて追跡させます
+    # (`last_model_path`を合わせないと、再開時に`last-v1.ckpt`のような別名で保存されてしまいます)
+    dirpath = os.path.realpath(dst.parent)
+    for key, state in checkpoint.get("callbacks", {}).items():
+        if str(key).startswith("ModelCheckpoint"):
+            state.update(
+                {
+                    "dirpath": dirpath,
+                    "last_model_path": os.path.join(dirpath, dst.name),
+                    "best_model_score": None,
+                    "best_model_path": "",
+                    "best_k_models": {},
+                    "kth_best_model_path": "",
+                }
+            )
+
+    # コピー先の古いチェックポイントは置き換えられたメンバーのものなので削除します
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    for stale in dst.parent.glob("*.ckpt"):
+        stale.unlink()
+    tmp_path = dst.with_suffix(".tmp")
+    torch.save(checkpoint, tmp_path)
+    shutil.move(str(tmp_path), str(dst))
+
+
+def member_config(
+    cfg: DictConfig,
+    member: int,
+    round_idx: int,
+    hparams: Dict[str, float],
+    ckpt_path: Optional[Path],
+) -> DictConfig:
+    """1つのメンバーの1ラウンド分の`train`の設定を作成します。
+
+    :param cfg: PBT全体の設定。
+    :param member: メンバーのインデックス。
+    :param round_idx: ラウンドのインデックス。
+    :param hparams: このラウンドでメンバーが使用するハイパーパラメータ。
+    :param ckpt_path: 再開するチェックポイントのパス。`None`の場合は最初から学習します。
+    :return: `train`に渡す設定。
+    """
+    member_cfg = copy.deepcopy(cfg)
+    with open_dict(member_cfg):
+        member_cfg.paths.output_dir = str(Path(cfg.paths.output_dir) / "members" / f"member_{member}")
+        member_cfg.trainer.max_epochs = (round_idx + 1) * cfg.pbt.epochs_per_round
+        member_cfg.ckpt_path = str(ckpt_path) if ckpt_path is not None else None
+        member_cfg.train = True
+        member_cfg.test = False
+        if member_cfg.get("memoize"):
+            # メンバーのチェックポイントはラウンドごとに更新されるため、結果を再利用しません
+            member_cfg.memoize.enabled = False
+        if cfg.get("seed"):
+            # ラウンドごとにシードを変えて、再開後に同じデータの順序が繰り返されないようにします
+            member_cfg.seed = cfg.seed + round_idx * cfg.pbt.population_size + member
+        for name, value in hparams.items():
+            member_cfg.model.optimizer[name] = value
+    return member_cfg
+
+
+def rank_members(scores: List[float], mode: str) -> List[int]:
+    """メンバーを成績の良い順に並べます。
+
+    :param scores: メンバーごとのメトリック値。
+    :param mode: `"max"`または`"min"`。
+    :return: 成績の良い順に並べたメンバーのインデックスのリスト。
+    """
+    if mode not in ("max", "min"):
+        raise ValueError(f"`mode`は'max'または'min'である必要があります！ <mode={mode}>")
+    return sorted(range(len(scores)), key=lambda k: scores[k], reverse=mode == "max")
+
+
+@task_wrapper
+def pbt(cfg: DictConfig) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Population Based Trainingでモデルの集団をトレーニングします。
+
+    各ラウンドで全メンバーを`train`でチェックポイントから再開して学習し、下位のメンバーに上位のメンバーの
+    チェックポイントをコピーして（exploit）、ハイパーパラメータを摂動させます（explore）。
+    最後に勝者をテストし、勝者のハイパーパラメータのスケジュールを保存します。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: 勝者のメトリクスとPBTの結果を含む辞書のタプル。
+    """
+    pbt_cfg = cfg.pbt
+    population_size = pbt_cfg.population_size
+    if population_size < 2:
+        raise ValueError(f"集団のメンバー数は2以上である必要があります！ <population_size={population_size}>")
+    num_exploit = min(max(1, int(population_size * pbt_cfg.exploit_fraction)), population_size // 2)
+
+    rng = random.Random(pbt_cfg.seed)
+    output_dir = Path(cfg.paths.output_dir)
+    ckpt_paths = [
+        output_dir / "members" / f"member_{k}" / "checkpoints" / "last.ckpt"
+        for k in range(population_size)
+    ]
+    hparams = [sample_hyperparams(pbt_cfg.hyperparams, rng) for _ in range(population_size)]
+    # メンバーごとのスケジュール（exploit時にはコピー元のスケジュールを引き継ぎます）
+    schedules: List[List[Dict[str, Any]]] = [[] for _ in range(population_size)]
+
+    scores: List[float] = []
+    for round_idx in range(pbt_cfg.num_rounds):
+        scores = []
+        for k in range(population_size):
+            log.info(f"ラウンド{round_idx}: メンバー{k}を学習します <{hparams[k]}>")
+            member_cfg = member_config(
+                cfg,
+                member=k,
+                round_idx=round_idx,
+                hparams=hparams[k],
+                ckpt_path=ckpt_paths[k] if round_idx > 0 else None,
+            )
+            metric_dict, _ = train(member_cfg)
+            scores.append(get_metric_value(metric_dict, pbt_cfg.metric))
+            schedules[k].append(
+                {
+                    "round": round_idx,
+                    "max_epochs": member_cfg.trainer.max_epochs,
+                    "member": k,
+                    **hparams[k],
+                    pbt_cfg.metric: scores[k],
+                }
+            )
+
+        ranking = rank_members(scores, pbt_cfg.mode)
+        log.info(f"ラウンド{round_idx}の順位: {[(k, scores[k]) for k in ranking]}")
+        if round_idx == pbt_cfg.num_rounds - 1:
+            break
+
+        for loser in ranking[-num_exploit:]:
+            winner = rng.choice(ranking[:num_exploit])
+            hparams[loser] = perturb_hyperparams(hparams[winner], pbt_cfg.hyperparams, rng)
+            log.info(f"メンバー{winner}をメンバー{loser}にコピーします <{hparams[loser]}>")
+            exploit_checkpoint(ckpt_paths[winner], ckpt_paths[loser], hparams[loser])
+            schedules[loser] = copy.deepcopy(schedules[winner])
+
+    best = rank_members(scores, pbt_cfg.mode)[0]
+    log.info(f"勝者: メンバー{best} <{pbt_cfg.metric}={scores[best]}>")
+
+    result = {
+        "metric": pbt_cfg.metric,
+        "best_member": best,
+        "best_value": scores[best],
+        "best_checkpoint": str(ckpt_paths[best]),
+        "best_schedule": schedules[best],
+        "final_hyperparams": hparams,
+    }
+    schedule_file = Path(pbt_cfg.schedule_file)
+    schedule_file.parent.mkdir(parents=True, exist_ok=True)
+    OmegaConf.save(OmegaConf.create(result), schedule_file)
+    log.info(f"勝者のスケジュールを保存しました: {schedule_file}")
+
+    metric_dict: Dict[str, Any] = {}
+    if cfg.get("test"):
+        # 学習済みのエポック数から再開するため、学習は行われずにテストのみが実行されます
+        test_cfg = member_config(
+            cfg,
+            member=best,
+            round_idx=pbt_cfg.num_rounds - 1,
+            hparams=hparams[best],
+            ckpt_path=ckpt_paths[best],
+        )
+        with open_dict(test_cfg):
+            test_cfg.test = True
+        metric_dict, _ = train(test_cfg)
+
+    return metric_dict, {"cfg": cfg, "result": result}
+
+
+@hydra.main(version_base="1.3", config_path="../configs", config_name="pbt.yaml")
+def main(cfg: DictConfig) -> Optional[float]:
+    """Population Based Trainingのメインエントリーポイント。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: 勝者の最適化されたメトリック値を持つOptional[float]。
+    """
+    # 追加ユーティリティを適用します
+    extras(cfg)
+
+    metric_dict, object_dict = pbt(cfg)
+
+    # テストを行わない場合は、勝者の検証メトリックを返します
+    if not metric_dict:
+        return object_dict["result"]["best_value"]
+
+    return get_metric_value(metric_dict=metric_dict, metric_name=cfg.get("optimized_metric"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import math
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+import hydra
+import rootutils
+from omegaconf import DictConfig
+
+if TYPE_CHECKING:
+    # lightningは型注釈にのみ使用し、実際のインポートはインスタンス化するまで遅らせます
+    from lightning import LightningDataModule, LightningModule, Trainer
+    from lightning.pytorch.loggers import Logger
+
+rootutils.setup_root(__file__, indicator=".project-root", pythonpath=True)
+# ------------------------------------------------------------------------------------ #
+# setup_rootの上記は以下と同等です:
+# - プロジェクトのルートディレクトリをPYTHONPATHに追加する
+#       (ユーザーにプロジェクトをパッケージとしてインストールさせる必要がない)
+#       (ローカルモジュールをインポートする前に必要 例: `from src import utils`)
+# - PROJECT_ROOT環境変数を設定する
+#       ("configs/paths/default.yaml"内のパスのベースとして使用される)
+#       (これによりコードを実行する場所に関係なく、すべてのファイルパスが同じになる)
+# - ルートディレクトリの".env"から環境変数を読み込む
+#
+# 以下の場合は削除できます:
+# 1. プロジェクトをパッケージとしてインストールするか、エントリーファイルをプロジェクトのルートディレクトリに移動する
+# 2. "configs/paths/default.yaml"内の`root_dir`を"."に設定する
+#
+# 詳細情報: https://github.com/ashleve/rootutils
+# ------------------------------------------------------------------------------------ #
+
+# このプロジェクトからのインポートは、必ずrootutils.setup_rootの実行後に行う必要がある
+from src.utils import (
+    RankedLogger,
+    extras,
+    instantiate_loggers,
+    task_wrapper,
+)
+
+log = RankedLogger(__name__, rank_zero_only=True)
+
+
+@task_wrapper
+def predict(cfg: DictConfig) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """与えられたチェックポイントでデータモジュールの予測セット全体を推論し、結果をシャードに書き込みます。
+
+    入力は`cfg.shard_size`行ごとのシャードに分割され、残りのシャードは全ランクに均等に分配されます。
+    書き込み済みのシャードはスキップされるため、同じ`cfg.predictions_dir`を指定して再実行すると
+    中断した位置から再開します。`cfg.shards_per_wave`個のシャードごとに`trainer.predict`を呼び出すことで、
+    Lightningが保持するバッチインデックスのメモリも上限付きに保ちます。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: メトリクスとすべてのインスタンス化されたオブジェクトを含む辞書のタプル。
+    """
+    assert cfg.ckpt_path
+
+    from torch.utils.data import DataLoader
+
+    from src.callbacks.sharded_prediction_writer import (
+        ShardedPredictionWriter,
+        completed_shards,
+    )
+    from src.data.components.shard_sampler import ShardedBatchSampler
+
+    log.info(f"データモジュールをインスタンス化しています <{cfg.data._target_}>")
+    datamodule: LightningDataModule = hydra.utils.instantiate(cfg.data)
+    datamodule.prepare_data()
+    datamodule.setup(stage="predict")
+    dataset = datamodule.data_predict
+
+    log.info(f"モデルをインスタンス化しています <{cfg.model._target_}>")
+    model: LightningModule = hydra.utils.instantiate(cfg.model)
+
+    num_rows = len(dataset)
+    num_shards = math.ceil(num_rows / cfg.shard_size)
+    done = set(completed_shards(cfg.predictions_dir, num_shards, cfg.prediction_keys))
+    pending = [k for k in range(num_shards) if k not in done]
+    log.info(
+        f"予測シャード: 合計{num_shards}、書き込み済み{len(done)}、残り{len(pending)} "
+        f"<{cfg.predictions_dir}>"
+    )
+
+    writer = ShardedPredictionWriter(
+        output_dir=cfg.predictions_dir,
+        num_rows=num_rows,
+        shard_size=cfg.shard_size,
+        keys=cfg.prediction_keys,
+    )
+
+    log.info("ロガーをインスタンス化しています...")
+    logger: List[Logger] = instantiate_loggers(cfg.get("logger"))
+
+    log.info(f"トレーナーをインスタンス化しています <{cfg.trainer._target_}>")
+    trainer: Trainer = hydra.utils.instantiate(
+        cfg.trainer, callbacks=[writer], logger=logger, use_distributed_sampler=False
+    )
+
+    object_dict = {
+        "cfg": cfg,
+        "datamodule": datamodule,
+        "model": model,
+        "logger": logger,
+        "trainer": trainer,
+    }
+
+    log.info("予測を開始します！")
+    start_time = time.perf_counter()
+    for wave_start in range(0, len(pending), cfg.shards_per_wave):
+        shard_ids = pending[wave_start : wave_start + cfg.shards_per_wave]
+        dataloader = DataLoader(
+            dataset=dataset,
+            batch_sampler=ShardedBatchSampler(
+                num_rows=num_rows,
+                shard_size=cfg.shard_size,
+                rows_per_batch=cfg.data.batch_size,
+                shard_ids=shard_ids,
+            ),
+            num_workers=cfg.data.get("num_workers", 0),
+            pin_memory=cfg.data.get("pin_memory", False),
+        )
+        trainer.predict(
+            model=model,
+            dataloaders=dataloader,
+            ckpt_path=cfg.ckpt_path,
+            return_predictions=False,
+            weights_only=False,
+        )
+    # 全ランクがシャードを書き終えてから数えます
+    trainer.strategy.barrier("predict")
+    elapsed = time.perf_counter() - start_time
+
+    # ランクに依存しないよう、書き込み済みのシャードから処理した行数を数えます
+    written = set(completed_shards(cfg.predictions_dir, num_shards, cfg.prediction_keys)) - done
+    rows = sum(min(cfg.shard_size, num_rows - k * cfg.shard_size) for k in written)
+    metric_dict = {
+        "predict/rows": rows,
+        "predict/rows_per_sec": rows / elapsed if elapsed > 0 else 0.0,
+        "predict/shards_pending": num_shards - len(done) - len(written),
+    }
+    log.info(f"予測が完了しました！ <{metric_dict}>")
+
+    return metric_dict, object_dict
+
+
+@hydra.main(version_base="1.3", config_path="../configs", config_name="predict.yaml")
+def main(cfg: DictConfig) -> None:
+    """予測のメインエントリーポイント。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    """
+    # 追加ユーティリティを適用します
+    # (例：cfgにタグが提供されていない場合はタグを要求する、cfg構造を表示するなど)
+    extras(cfg)
+
+    predict(cfg)
+
+
+if __name__ == "__main__":
+    main()
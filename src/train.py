@@ -1,12 +1,17 @@
-from typing import Any, Dict, List, Optional, Tuple
+import copy
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union
 
 import hydra
-import lightning as L
 import rootutils
-from lightning import Callback, LightningDataModule, LightningModule, Trainer
-from lightning.pytorch.loggers import Logger
 from omegaconf import DictConfig
 
+if TYPE_CHECKING:
+    # lightningは型注釈にのみ使用し、実際のインポートはインスタンス化するまで遅らせます
+    from lightning import Callback, LightningDataModule, LightningModule, Trainer
+    from lightning.pytorch.loggers import Logger
+
 rootutils.setup_root(__file__, indicator=".project-root", pythonpath=True)
 # ------------------------------------------------------------------------------------ #
 # setup_rootの上記は以下と同等です:
@@ -28,12 +33,22 @@ rootutils.setup_root(__file__, indicator=".project-root", pythonpath=True)
 # このプロジェクトからのインポートは、必ずrootutils.setup_rootの実行後に行う必要がある
 from src.utils import (
     RankedLogger,
+    aggregate_fold_metrics,
+    apply_cpu_config,
     extras,
     get_metric_value,
     instantiate_callbacks,
+    instantiate_datamodule,
     instantiate_loggers,
+    load_memoized_result,
     log_hyperparameters,
+    measure_inference,
+    reuse_memoized_result,
+    run_fingerprint,
+    run_folds,
+    save_memoized_result,
     task_wrapper,
+    tune_hyperparameters,
 )
 
 log = RankedLogger(__name__, rank_zero_only=True)
@@ -47,12 +62,41 @@ def train(cfg: DictConfig) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     :param cfg: Hydraによって構成されたDictConfig設定。
     :return: メトリクスとすべてのインスタンス化されたオブジェクトを含む辞書のタプル。
     """
+    # 設定・データ・ソースコードが同じ完了済みの実行があれば、再学習せずにその結果を返します
+    memoize_cfg = cfg.get("memoize")
+    fingerprint = None
+    if memoize_cfg and memoize_cfg.get("enabled"):
+        # 探索などで変更される前の設定を、実行後のフィンガープリントの計算に使用します
+        memo_cfg = copy.deepcopy(cfg)
+        fingerprint = run_fingerprint(memo_cfg)
+        if not memoize_cfg.get("force"):
+            result = load_memoized_result(memoize_cfg.dir, fingerprint)
+            if result is not None:
+                return reuse_memoized_result(result, cfg.paths.output_dir), {"cfg": cfg}
+
+    # CPUコアの割り当てとスレッド数を設定します
+    apply_cpu_config(cfg.get("cpu"))
+
+    # バッチサイズと学習率を探索し、データモジュールとモデルの設定に反映します
+    # (探索が乱数を消費しても結果が変わらないように、シードの設定より前に行います)
+    if cfg.get("tune") and cfg.tune.get("enabled"):
+        tune_hyperparameters(cfg)
+
     # pytorch、numpy、python.randomの乱数ジェネレータのシードを設定します。
     if cfg.get("seed"):
+        import lightning as L
+
         L.seed_everything(cfg.seed, workers=True)
 
-    log.info(f"データモジュールをインスタンス化しています <{cfg.data._target_}>")
-    datamodule: LightningDataModule = hydra.utils.instantiate(cfg.data)
+    datamodule: LightningDataModule = instantiate_datamodule(
+        cfg.data, reuse=cfg.get("reuse_datamodule", False)
+    )
+
+    # k分割交差検証の1つの分割を実行する場合は、トレーニングと検証のデータセットをその分割に置き換えます
+    cv_cfg = cfg.get("cv")
+    if cv_cfg and cv_cfg.get("fold") is not None:
+        log.info(f"交差検証の分割を選択します <fold={cv_cfg.fold}/{cv_cfg.num_folds}>")
+        datamodule.select_fold(cv_cfg.fold, cv_cfg.num_folds, seed=cv_cfg.seed)
 
     log.info(f"モデルをインスタンス化しています <{cfg.model._target_}>")
     model: LightningModule = hydra.utils.instantiate(cfg.model)
@@ -99,21 +143,90 @@ def train(cfg: DictConfig) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     # トレーニングとテストのメトリクスをマージします
     metric_dict = {**train_metrics, **test_metrics}
 
+    # 推論レイテンシ・パラメータ数・モデルサイズを計測し、メトリクスに追加します
+    if cfg.get("measure"):
+        import torch
+
+        log.info("推論性能を計測しています...")
+        model_metrics = measure_inference(model, **cfg.measure)
+        for lg in logger:
+            lg.log_metrics(model_metrics, step=trainer.global_step)
+            lg.save()
+        metric_dict.update({name: torch.tensor(value) for name, value in model_metrics.items()})
+
+    if fingerprint is not None:
+        # データは`prepare_data`で初めて作成される場合があるため（新しい環境でのダウンロードなど）、
+        # 次回以降の実行と同じフィンガープリントになるように実行後のデータで計算し直します
+        fingerprint = run_fingerprint(memo_cfg)
+        save_memoized_result(memoize_cfg.dir, fingerprint, metric_dict, cfg.paths.output_dir)
+
     return metric_dict, object_dict
 
+
+def _train_fold(cfg: DictConfig) -> Dict[str, float]:
+    """交差検証の1つの分割をトレーニングし、メトリクスを数値で返します。
+
+    :param cfg: `fold_config`で作成された分割の設定。
+    :return: メトリクスの名前と値の辞書。
+    """
+    metric_dict, _ = train(cfg)
+    return {name: float(value) for name, value in metric_dict.items()}
+
+
+@task_wrapper
+def cross_validate(cfg: DictConfig) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """k分割交差検証でモデルをトレーニングし、分割ごとのメトリクスの平均と標準偏差を返します。
+
+    データモジュールは最初に1回だけ読み込まれ、すべての分割で共有されます（`cv.num_workers > 1`の場合は
+    CPUコアを分割した子プロセスで分割を並列に実行します）。各分割の出力は`fold_{i}`に保存されます。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: メトリクスの平均（元の名前）と標準偏差（`_std`）の辞書と、分割ごとの結果を含む辞書のタプル。
+    """
+    import torch
+
+    cv_cfg = cfg.cv
+    num_folds = cv_cfg.num_folds
+    log.info(f"{num_folds}分割交差検証を開始します！ <num_workers={cv_cfg.num_workers}>")
+
+    # データを1回だけ読み込み、プロセス内にキャッシュして各分割の`train`で再利用します
+    datamodule: LightningDataModule = instantiate_datamodule(cfg.data, reuse=True)
+    datamodule.prepare_data()
+    datamodule.setup(stage="fit")
+
+    fold_metrics = run_folds(_train_fold, cfg, num_folds, num_workers=cv_cfg.num_workers)
+    results = aggregate_fold_metrics(fold_metrics)
+
+    optimized_metric = cfg.get("optimized_metric")
+    names = [optimized_metric] if isinstance(optimized_metric, str) else list(optimized_metric or [])
+    for name in names:
+        if name in results:
+            log.info(f"交差検証の結果: {name}={results[name]:.4f} ± {results[f'{name}_std']:.4f}")
+
+    os.makedirs(cfg.paths.output_dir, exist_ok=True)
+    with open(os.path.join(cfg.paths.output_dir, "cv_results.json"), "w") as file:
+        json.dump({"num_folds": num_folds, "folds": fold_metrics, "aggregate": results}, file, indent=2)
+
+    metric_dict = {name: torch.tensor(value) for name, value in results.items()}
+    return metric_dict, {"cfg": cfg, "datamodule": datamodule, "fold_metrics": fold_metrics}
+
+
 @hydra.main(version_base="1.3", config_path="../configs", config_name="train.yaml")
-def main(cfg: DictConfig) -> Optional[float]:
+def main(cfg: DictConfig) -> Union[float, List[float], None]:
     """トレーニングのメインエントリーポイント。
 
     :param cfg: Hydraによって構成されたDictConfig設定。
-    :return: 最適化されたメトリック値を持つOptional[float]。
+    :return: 最適化されたメトリック値。`optimized_metric`がリストの場合は、多目的最適化のための値のリスト。
     """
     # 追加ユーティリティを適用します
     # (例：cfgにタグが提供されていない場合はタグを要求する、cfg構造を表示するなど)
     extras(cfg)
 
-    # モデルをトレーニングします
-    metric_dict, _ = train(cfg)
+    # モデルをトレーニングします（交差検証の場合は分割ごとのメトリクスの平均を返します）
+    if cfg.get("cv") and cfg.cv.get("enabled"):
+        metric_dict, _ = cross_validate(cfg)
+    else:
+        metric_dict, _ = train(cfg)
 
     # hydraベースのハイパーパラメータ最適化のためにメトリック値を安全に取得します
     metric_value = get_metric_value(
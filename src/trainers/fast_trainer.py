@@ -0,0 +1,837 @@
+import contextlib
+import functools
+import math
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import lightning
+import torch
+from lightning import LightningDataModule, LightningModule
+from lightning.fabric.utilities import move_data_to_device
+from lightning.pytorch.callbacks import Callback, ModelCheckpoint
+from lightning.pytorch.loggers import Logger
+from torchmetrics import Metric
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+# `precision`の設定値とautocastのデータ型の名前の対応（`None`はautocastを使用しない）
+_AUTOCAST_DTYPES = {
+    "32": None,
+    "32-true": None,
+    "16": "float16",
+    "16-mixed": "float16",
+    "bf16": "bfloat16",
+    "bf16-mixed": "bfloat16",
+}
+
+# `self.log`のデフォルトが`on_step=True, on_epoch=False`になるフック（それ以外は`on_step=False, on_epoch=True`）
+_STEP_HOOKS = ("training_step",)
+# `self.log`の値をバッチ間で集計するフック
+_BATCH_HOOKS = ("training_step", "validation_step", "test_step")
+
+
+class _LogCollector:
+    """`LightningModule.log`の代わりに記録された値を集め、Lightningと同じ名前のメトリクスを計算します。
+
+    エポックの値はデバイス上に保持し、エポックの終了時（またはロガーへの書き込み時）にだけ
+    ホストに転送するため、ステップごとの同期は発生しません。
+    """
+
+    def __init__(self) -> None:
+        """`_LogCollector`を初期化します。"""
+        self.hook: Optional[str] = None
+        self.batch_size = 1
+        self.step_values: Dict[str, torch.Tensor] = {}
+        self._epoch_metrics: Dict[str, Metric] = {}
+        self._epoch_sums: Dict[str, List[Any]] = {}
+        self._epoch_values: Dict[str, torch.Tensor] = {}
+
+    def log(
+        self,
+        name: str,
+        value: Any,
+        prog_bar: bool = False,
+        logger: bool = True,
+        on_step: Optional[bool] = None,
+        on_epoch: Optional[bool] = None,
+        reduce_fx: str = "mean",
+        batch_size: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        """`LightningModule.log`と同じ引数で値を記録します（`prog_bar`、`sync_dist`などは無視します）。
+
+        :param name: メトリクスの名前。
+        :param value: 値（テンソル、数値、または`torchmetrics.Metric`）。
+        :param on_step: ステップごとに記録するかどうか。`None`の場合はフックに応じたLightningのデフォルト。
+        :param on_epoch: エポックで集計して記録するかどうか。`None`の場合はフックに応じたLightningのデフォルト。
+        :param reduce_fx: エポックで集計する方法（`"mean"`または`"sum"`）。デフォルトは`"mean"`。
+        :param batch_size: 平均の重みに使用するバッチサイズ。`None`の場合は現在のバッチのサイズ。
+        """
+        if on_step is None:
+            on_step = self.hook in _STEP_HOOKS
+        if on_epoch is None:
+            on_epoch = self.hook not in _STEP_HOOKS
+        if self.hook not in _BATCH_HOOKS:
+            # エポックの終了時などのフックで記録された値はそのまま使用します
+            self._epoch_values[name] = _to_tensor(value.compute() if isinstance(value, Metric) else value)
+            return
+
+        step_name, epoch_name = (f"{name}_step", f"{name}_epoch") if on_step and on_epoch else (name, name)
+        if isinstance(value, Metric):
+            if on_step:
+                forward_cache = getattr(value, "_forward_cache", None)
+                self.step_values[step_name] = _to_tensor(
+                    value.compute() if forward_cache is None else forward_cache
+                )
+            if on_epoch:
+                self._epoch_metrics[epoch_name] = value
+            return
+
+        value = _to_tensor(value)
+        if on_step:
+            self.step_values[step_name] = value
+        if on_epoch:
+            if reduce_fx not in ("mean", "sum"):
+                raise ValueError(f"サポートされていない集計方法です！ <name={name}, reduce_fx={reduce_fx}>")
+            weight = 1 if reduce_fx == "sum" else (batch_size or self.batch_size)
+            total = self._epoch_sums.setdefault(epoch_name, [0.0, 0, reduce_fx])
+            total[0] = total[0] + value * weight
+            total[1] += weight
+
+    def compute_epoch(self) -> Dict[str, torch.Tensor]:
+        """エポックで集計した値を計算し、集計をリセットします。
+
+        :return: メトリクスの名前とCPU上のテンソルの辞書。
+        """
+        metrics: Dict[str, torch.Tensor] = {}
+        for name, metric in self._epoch_metrics.items():
+            metrics[name] = _to_tensor(metric.compute())
+            metric.reset()
+        for name, (total, count, reduce_fx) in self._epoch_sums.items():
+            metrics[name] = total if reduce_fx == "sum" else total / count
+        metrics.update(self._epoch_values)
+        self._epoch_metrics.clear()
+        self._epoch_sums.clear()
+        self._epoch_values.clear()
+        return {name: value.detach().float().cpu() for name, value in metrics.items()}
+
+
+def _to_tensor(value: Any) -> torch.Tensor:
+    """記録された値をテンソルに変換します。
+
+    :param value: テンソルまたは数値。
+    :return: 勾配から切り離したテンソル。
+    """
+    if isinstance(value, torch.Tensor):
+        return value.detach()
+    return torch.tensor(float(value))
+
+
+def _batch_size(batch: Any) -> int:
+    """バッチのサンプル数を返します。
+
+    :param batch: テンソル、またはテンソルのタプル・リスト。
+    :return: 最初のテンソルの長さ。判定できない場合は`1`。
+    """
+    x = batch[0] if isinstance(batch, (tuple, list)) else batch
+    return len(x) if isinstance(x, torch.Tensor) and x.dim() > 0 else 1
+
+
+class FastTrainer:
+    """小さなモデル向けの、Lightningの`Trainer`のオーバーヘッドを省いた最小限のトレーニングループ。
+
+    `SimpleDenseNet`のような小さなモデルでは、Lightningのステップごとのフックの呼び出し、ログの
+    記録、プログレスバーが実行時間の大部分を占めます。`FastTrainer`は同じ`LightningModule`
+    （`training_step`、`validation_step`、`test_step`、`configure_optimizers`）と`LightningDataModule`
+    （データローダー）をそのまま使用し、次のように動作します：
+
+        - バッチごとのフックは呼び出さず、モジュールのエポック単位のフック（`on_train_start`、
+          `on_validation_epoch_end`など）だけを呼び出します
+        - `self.log`の値はデバイス上で集計し、Lightningと同じ名前（`train/loss`、`val/acc`、
+          `on_step`と`on_epoch`の両方の場合は`_step`/`_epoch`の接尾辞）で`callback_metrics`とロガーに記録します
+        - コールバックは`ModelCheckpoint`の設定（`dirpath`、`filename`、`monitor`、`mode`、`save_top_k`、
+          `save_last`）だけを使用し、検証の後にLightningと同じ形式・同じファイル名のチェックポイントを保存します。
+          それ以外のコールバックは呼び出しません
+        - `fused_optimizer=True`の場合、オプティマイザの部分関数（`hparams.optimizer`）に`fused=True`を渡し、
+          パラメータの更新を1つのカーネルにまとめます
+
+    チェックポイントはエポックの終了時に保存されるため、`ckpt_path`から再開すると次のエポックから始まります。
+    1つのデバイスのみをサポートします（分散学習にはLightningの`Trainer`を使用します）。
+    """
+
+    def __init__(
+        self,
+        default_root_dir: Optional[str] = None,
+        max_epochs: int = 10,
+        min_epochs: Optional[int] = None,
+        accelerator: str = "cpu",
+        devices: Union[int, str, List[int]] = 1,
+        precision: Union[int, str] = "32",
+        check_val_every_n_epoch: int = 1,
+        limit_train_batches: Union[int, float] = 1.0,
+        limit_val_batches: Union[int, float] = 1.0,
+        limit_test_batches: Union[int, float] = 1.0,
+        fast_dev_run: Union[bool, int] = False,
+        log_every_n_steps: int = 50,
+        gradient_clip_val: Optional[float] = None,
+        fused_optimizer: bool = False,
+        enable_checkpointing: bool = True,
+        deterministic: bool = False,
+        callbacks: Optional[List[Callback]] = None,
+        logger: Optional[Union[Logger, List[Logger], bool]] = None,
+        **kwargs: Any,
+    ) -> None:
+        """`FastTrainer`を初期化します。引数はLightningの`Trainer`の同名の引数と同じ意味です。
+
+        :param default_root_dir: チェックポイントのデフォルトの保存先。`None`の場合は現在のディレクトリ。
+        :param max_epochs: トレーニングするエポック数。デフォルトは`10`。
+        :param min_epochs: 互換性のために受け付けます（早期停止がないため使用しません）。
+        :param accelerator: `"cpu"`、`"gpu"`、`"cuda"`、`"mps"`、`"auto"`のいずれか。デフォルトは`"cpu"`。
+        :param devices: デバイスの数（`1`のみ）またはデバイスのインデックスのリスト（1つのみ）。デフォルトは`1`。
+        :param precision: `"32"`、`"16-mixed"`、`"bf16-mixed"`のいずれか。デフォルトは`"32"`。
+        :param check_val_every_n_epoch: 検証を実行するエポックの間隔。デフォルトは`1`。
+        :param limit_train_batches: 1エポックのトレーニングバッチの数または割合。デフォルトは`1.0`。
+        :param limit_val_batches: 検証バッチの数または割合。デフォルトは`1.0`。
+        :param limit_test_batches: テストバッチの数または割合。デフォルトは`1.0`。
+        :param fast_dev_run: `True`（または`n`）の場合、各ループを1（または`n`）バッチだけ1エポック実行し、
+            チェックポイントとロガーを使用しません。デフォルトは`False`。
+        :param log_every_n_steps: `on_step`の値をロガーに書き込むステップの間隔。デフォルトは`50`。
+        :param gradient_clip_val: 勾配のノルムの上限。`None`の場合はクリップしません。
+        :param fused_optimizer: オプティマイザに`fused=True`を渡すかどうか。デフォルトは`False`。
+        :param enable_checkpointing: チェックポイントを保存するかどうか。デフォルトは`True`。
+        :param deterministic: 決定的なアルゴリズムのみを使用するかどうか。デフォルトは`False`。
+        :param callbacks: コールバックのリスト（`ModelCheckpoint`のみ使用します）。
+        :param logger: ロガー、ロガーのリスト、または`False`。
+        :param kwargs: サポートしていないLightningの`Trainer`の引数（警告して無視します）。
+        """
+        if kwargs:
+            log.warning(f"FastTrainerがサポートしていない引数を無視します！ <{sorted(kwargs)}>")
+        if str(precision) not in _AUTOCAST_DTYPES:
+            raise ValueError(f"サポートされていない精度です！ <precision={precision}>")
+
+        self.device = self._resolve_device(accelerator, devices)
+        self.default_root_dir = os.fspath(default_root_dir or os.getcwd())
+        self.max_epochs = max_epochs
+        self.min_epochs = min_epochs
+        self.precision = str(precision)
+        self.check_val_every_n_epoch = check_val_every_n_epoch
+        self.limit_train_batches = limit_train_batches
+        self.limit_val_batches = limit_val_batches
+        self.limit_test_batches = limit_test_batches
+        self.fast_dev_run = fast_dev_run
+        self.log_every_n_steps = log_every_n_steps
+        self.gradient_clip_val = gradient_clip_val
+        self.fused_optimizer = fused_optimizer
+        if fast_dev_run:
+            num_batches = 1 if fast_dev_run is True else int(fast_dev_run)
+            self.max_epochs = 1
+            self.limit_train_batches = self.limit_val_batches = self.limit_test_batches = num_batches
+            logger = False
+        # Lightningと同じく、`fast_dev_run`では`ModelCheckpoint`を残したまま保存だけを行いません
+        self.enable_checkpointing = enable_checkpointing and not fast_dev_run
+        if deterministic:
+            torch.use_deterministic_algorithms(True)
+
+        callbacks = list(callbacks or [])
+        self.checkpoint_callbacks: List[ModelCheckpoint] = [
+            c for c in callbacks if isinstance(c, ModelCheckpoint)
+        ]
+        ignored = [type(c).__name__ for c in callbacks if not isinstance(c, ModelCheckpoint)]
+        if ignored:
+            log.info(f"FastTrainerはModelCheckpoint以外のコールバックを呼び出しません <{ignored}>")
+        self.callbacks = callbacks
+        if logger is None or logger is False or logger is True:
+            self.loggers: List[Logger] = []
+        elif isinstance(logger, Logger):
+            self.loggers = [logger]
+        else:
+            self.loggers = list(logger)
+
+        self.current_epoch = 0
+        self.global_step = 0
+        self.training = False
+        self.sanity_checking = False
+        self.callback_metrics: Dict[str, torch.Tensor] = {}
+        self.logged_metrics: Dict[str, float] = {}
+
+        self._model: Optional[LightningModule] = None
+        self._datamodule: Optional[LightningDataModule] = None
+        self._optimizer: Optional[torch.optim.Optimizer] = None
+        self._scheduler_config: Optional[Dict[str, Any]] = None
+        self._collector = _LogCollector()
+
+    @staticmethod
+    def _resolve_device(accelerator: str, devices: Union[int, str, List[int]]) -> torch.device:
+        """アクセラレータとデバイスの設定から、使用するデバイスを決定します。
+
+        :param accelerator: `"cpu"`、`"gpu"`、`"cuda"`、`"mps"`、`"auto"`のいずれか。
+        :param devices: デバイスの数またはインデックスのリスト。
+        :return: 使用するデバイス。
+        """
+        if isinstance(devices, (list, tuple)):
+            if len(devices) != 1:
+                raise ValueError(f"FastTrainerは1つのデバイスのみをサポートします！ <devices={devices}>")
+            index = int(devices[0])
+        elif devices in (1, "1", "auto"):
+            index = 0
+        else:
+            raise ValueError(f"FastTrainerは1つのデバイスのみをサポートします！ <devices={devices}>")
+
+        if accelerator == "auto":
+            accelerator = "cuda" if torch.cuda.is_available() else "cpu"
+        if accelerator in ("gpu", "cuda"):
+            return torch.device("cuda", index)
+        if accelerator in ("cpu", "mps"):
+            return torch.device(accelerator)
+        raise ValueError(f"サポートされていないアクセラレータです！ <accelerator={accelerator}>")
+
+    @property
+    def model(self) -> Optional[LightningModule]:
+        """トレーニングしているモデル（`configure_optimizers`の`self.trainer.model`）を返します。"""
+        return self._model
+
+    @property
+    def datamodule(self) -> Optional[LightningDataModule]:
+        """使用しているデータモジュールを返します。"""
+        return self._datamodule
+
+    @property
+    def logger(self) -> Optional[Logger]:
+        """最初のロガーを返します。"""
+        return self.loggers[0] if self.loggers else None
+
+    @property
+    def checkpoint_callback(self) -> Optional[ModelCheckpoint]:
+        """最初の`ModelCheckpoint`を返します。"""
+        return self.checkpoint_callbacks[0] if self.checkpoint_callbacks else None
+
+    @property
+    def world_size(self) -> int:
+        """プロセスの数（常に`1`）を返します。"""
+        return 1
+
+    @property
+    def num_devices(self) -> int:
+        """デバイスの数（常に`1`）を返します。"""
+        return 1
+
+    @property
+    def global_rank(self) -> int:
+        """グローバルランク（常に`0`）を返します。"""
+        return 0
+
+    @property
+    def local_rank(self) -> int:
+        """ローカルランク（常に`0`）を返します。"""
+        return 0
+
+    @property
+    def is_global_zero(self) -> bool:
+        """ランク0かどうか（常に`True`）を返します。"""
+        return True
+
+    def fit(
+        self,
+        model: LightningModule,
+        train_dataloaders: Optional[Iterable] = None,
+        val_dataloaders: Optional[Iterable] = None,
+        datamodule: Optional[LightningDataModule] = None,
+        ckpt_path: Optional[str] = None,
+        weights_only: Optional[bool] = None,
+    ) -> None:
+        """モデルをトレーニングします。
+
+        :param model: トレーニングする`LightningModule`。
+        :param train_dataloaders: トレーニングデータローダー（`datamodule`を指定しない場合）。
+        :param val_dataloaders: 検証データローダー（`datamodule`を指定しない場合）。
+        :param datamodule: データモジュール。
+        :param ckpt_path: トレーニングを再開するチェックポイントのパス。
+        :param weights_only: チェックポイントを`torch.load(weights_only=...)`で読み込むかどうか。
+        """
+        self._attach(model, datamodule)
+        if datamodule is not None:
+            datamodule.prepare_data()
+            datamodule.setup("fit")
+        model.setup("fit")
+        model.to(self.device)
+        train_loader = datamodule.train_dataloader() if datamodule is not None else train_dataloaders
+        val_loader = datamodule.val_dataloader() if datamodule is not None else val_dataloaders
+        self._optimizer, self._scheduler_config = self._configure_optimizers(model)
+
+        self.current_epoch, self.global_step = 0, 0
+        if ckpt_path is not None:
+            self._restore(ckpt_path, weights_only)
+
+        self.callback_metrics = {}
+        scaler = (
+            torch.amp.GradScaler(self.device.type)
+            if _AUTOCAST_DTYPES[self.precision] == "float16" and self.device.type == "cuda"
+            else None
+        )
+        start_time = time.perf_counter()
+        with self._capture_logs(model):
+            model.on_fit_start()
+            model.on_train_start()
+            while self.current_epoch < self.max_epochs:
+                self._train_epoch(model, train_loader, scaler)
+                if val_loader is not None and (self.current_epoch + 1) % self.check_val_every_n_epoch == 0:
+                    self._eval_epoch(model, val_loader, "validation", self.limit_val_batches)
+                self._end_train_epoch(model)
+                self.current_epoch += 1
+            # Lightningと同じく、終了後の`current_epoch`は完了したエポックの数になります
+            model.on_train_end()
+            model.on_fit_end()
+        log.info(f"トレーニングが完了しました！ <{time.perf_counter() - start_time:.2f}秒>")
+        self._finalize_loggers()
+
+    def validate(
+        self,
+        model: Optional[LightningModule] = None,
+        dataloaders: Optional[Iterable] = None,
+        ckpt_path: Optional[str] = None,
+        verbose: bool = True,
+        datamodule: Optional[LightningDataModule] = None,
+        weights_only: Optional[bool] = None,
+    ) -> List[Dict[str, float]]:
+        """検証ループを実行します。
+
+        :param model: 評価する`LightningModule`。`None`の場合は`fit`したモデル。
+        :param dataloaders: 検証データローダー（`datamodule`を指定しない場合）。
+        :param ckpt_path: 重みを読み込むチェックポイントのパス（`"best"`の場合は最良のチェックポイント）。
+        :param verbose: 結果をログに出力するかどうか。デフォルトは`True`。
+        :param datamodule: データモジュール。
+        :param weights_only: チェックポイントを`torch.load(weights_only=...)`で読み込むかどうか。
+        :return: メトリクスの辞書を1つ含むリスト。
+        """
+        return self._evaluate("validation", model, dataloaders, ckpt_path, verbose, datamodule, weights_only)
+
+    def test(
+        self,
+        model: Optional[LightningModule] = None,
+        dataloaders: Optional[Iterable] = None,
+        ckpt_path: Optional[str] = None,
+        verbose: bool = True,
+        datamodule: Optional[LightningDataModule] = None,
+        weights_only: Optional[bool] = None,
+    ) -> List[Dict[str, float]]:
+        """テストループを実行します。
+
+        :param model: 評価する`LightningModule`。`None`の場合は`fit`したモデル。
+        :param dataloaders: テストデータローダー（`datamodule`を指定しない場合）。
+        :param ckpt_path: 重みを読み込むチェックポイントのパス（`"best"`の場合は最良のチェックポイント）。
+        :param verbose: 結果をログに出力するかどうか。デフォルトは`True`。
+        :param datamodule: データモジュール。
+        :param weights_only: チェックポイントを`torch.load(weights_only=...)`で読み込むかどうか。
+        :return: メトリクスの辞書を1つ含むリスト。
+        """
+        return self._evaluate("test", model, dataloaders, ckpt_path, verbose, datamodule, weights_only)
+
+    def save_checkpoint(self, filepath: str, weights_only: bool = False) -> None:
+        """Lightningと同じ形式のチェックポイントを保存します。
+
+        途中まで書き込まれたファイルが残らないように、一時ファイルに書き込んでから置き換えます。
+
+        :param filepath: 保存先のパス。
+        :param weights_only: モデルの重みとハイパーパラメータだけを保存するかどうか。デフォルトは`False`。
+        """
+        model = self._model
+        checkpoint: Dict[str, Any] = {
+            "epoch": self.current_epoch,
+            "global_step": self.global_step,
+            "pytorch-lightning_version": lightning.__version__,
+            "state_dict": model.state_dict(),
+        }
+        if not weights_only:
+            checkpoint["optimizer_states"] = [self._optimizer.state_dict()] if self._optimizer else []
+            scheduler = self._scheduler_config["scheduler"] if self._scheduler_config else None
+            checkpoint["lr_schedulers"] = [scheduler.state_dict()] if scheduler is not None else []
+            if self._datamodule is not None:
+                state = self._datamodule.state_dict()
+                if state:
+                    checkpoint[type(self._datamodule).__qualname__] = state
+        if model.hparams:
+            checkpoint[LightningModule.CHECKPOINT_HYPER_PARAMS_NAME] = "kwargs"
+            checkpoint[LightningModule.CHECKPOINT_HYPER_PARAMS_KEY] = dict(model.hparams)
+        model.on_save_checkpoint(checkpoint)
+
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        tmp_path = f"{filepath}.tmp"
+        torch.save(checkpoint, tmp_path)
+        os.replace(tmp_path, filepath)
+
+    def _attach(self, model: LightningModule, datamodule: Optional[LightningDataModule]) -> None:
+        """モデルとデータモジュールから`self.trainer`としてこのトレーナーを参照できるようにします。
+
+        :param model: `LightningModule`。
+        :param datamodule: データモジュール。
+        """
+        self._model = model
+        model.trainer = self
+        if datamodule is not None:
+            self._datamodule = datamodule
+            datamodule.trainer = self
+
+    @contextlib.contextmanager
+    def _capture_logs(self, model: LightningModule) -> Any:
+        """モデルの`self.log`を`_LogCollector`に置き換えます（`log_dict`も`self.log`を経由します）。
+
+        :param model: `LightningModule`。
+        """
+        model.log = self._collector.log
+        try:
+            yield
+        finally:
+            # インスタンスに設定した関数を削除し、クラスのメソッドに戻します
+            if "log" in vars(model):
+                delattr(model, "log")
+
+    def _configure_optimizers(
+        self, model: LightningModule
+    ) -> Tuple[torch.optim.Optimizer, Optional[Dict[str, Any]]]:
+        """モデルの`configure_optimizers`からオプティマイザと学習率スケジューラの設定を取得します。
+
+        :param model: `LightningModule`。
+        :return: オプティマイザと、`scheduler`、`interval`、`frequency`、`monitor`を含むスケジューラの設定。
+        """
+        optimizer_fn = model.hparams.get("optimizer") if self.fused_optimizer else None
+        if self.fused_optimizer and not isinstance(optimizer_fn, functools.partial):
+            log.warning("オプティマイザが部分関数ではないため、fused_optimizerを適用できません！")
+            optimizer_fn = None
+        if optimizer_fn is not None:
+            model.hparams.optimizer = functools.partial(optimizer_fn, fused=True)
+        try:
+            config = model.configure_optimizers()
+        finally:
+            if optimizer_fn is not None:
+                model.hparams.optimizer = optimizer_fn
+
+        if isinstance(config, torch.optim.Optimizer):
+            return config, None
+        if not isinstance(config, dict) or "optimizer" not in config:
+            raise TypeError(
+                "FastTrainerは`configure_optimizers`がオプティマイザ、または`optimizer`を含む辞書を返す場合のみサポートします！"
+            )
+        scheduler = config.get("lr_scheduler")
+        if scheduler is None:
+            return config["optimizer"], None
+        if not isinstance(scheduler, dict):
+            scheduler = {"scheduler": scheduler}
+        return config["optimizer"], {"interval": "epoch", "frequency": 1, "monitor": None, **scheduler}
+
+    def _restore(self, ckpt_path: str, weights_only: Optional[bool]) -> None:
+        """チェックポイントからモデル、オプティマイザ、スケジューラ、データモジュール、エポックを復元します。
+
+        :param ckpt_path: チェックポイントのパス。
+        :param weights_only: チェックポイントを`torch.load(weights_only=...)`で読み込むかどうか。
+        """
+        log.info(f"チェックポイントから再開します！ <{ckpt_path}>")
+        checkpoint = torch.load(ckpt_path, map_location=self.device, weights_only=bool(weights_only))
+        model = self._model
+        model.on_load_checkpoint(checkpoint)
+        model.load_state_dict(checkpoint["state_dict"])
+        if checkpoint.get("optimizer_states"):
+            self._optimizer.load_state_dict(checkpoint["optimizer_states"][0])
+        if self._scheduler_config is not None and checkpoint.get("lr_schedulers"):
+            self._scheduler_config["scheduler"].load_state_dict(checkpoint["lr_schedulers"][0])
+        if self._datamodule is not None:
+            state = checkpoint.get(type(self._datamodule).__qualname__)
+            if state:
+                self._datamodule.load_state_dict(state)
+        # チェックポイントはエポックの終了時に保存されるため、次のエポックから再開します
+        self.current_epoch = checkpoint["epoch"] + 1
+        self.global_step = checkpoint["global_step"]
+
+    @staticmethod
+    def _num_batches(loader: Iterable, limit: Union[int, float]) -> Union[int, float]:
+        """`limit_*_batches`から、1エポックで使用するバッチの数を決定します。
+
+        :param loader: データローダー。
+        :param limit: バッチの数（`int`）または割合（`float`）。
+        :return: バッチの数。データローダーの長さがわからない場合は`math.inf`。
+        """
+        if isinstance(limit, int):
+            return limit
+        try:
+            num_batches = len(loader)
+        except TypeError:
+            return math.inf
+        # Lightningと同じく、割合が正であれば少なくとも1バッチを使用します
+        return max(int(num_batches * limit), 1) if limit > 0 else 0
+
+    def _autocast(self) -> Any:
+        """精度の設定に従ったautocastのコンテキストを返します。
+
+        :return: autocastのコンテキスト（32ビットの場合は何もしないコンテキスト）。
+        """
+        dtype_name = _AUTOCAST_DTYPES[self.precision]
+        if dtype_name is None:
+            return contextlib.nullcontext()
+        return torch.autocast(self.device.type, dtype=getattr(torch, dtype_name))
+
+    def _to_device(self, batch: Any) -> Any:
+        """バッチをデバイスに転送します（CPUの場合は何もしません）。
+
+        :param batch: データのバッチ。
+        :return: デバイス上のバッチ。
+        """
+        if self.device.type == "cpu":
+            return batch
+        return move_data_to_device(batch, self.device)
+
+    def _train_epoch(
+        self,
+        model: LightningModule,
+        loader: Iterable,
+        scaler: Optional["torch.amp.GradScaler"],
+    ) -> None:
+        """1エポックのトレーニングループを実行します。
+
+        :param model: `LightningModule`。
+        :param loader: トレーニングデータローダー。
+        :param scaler: 16ビットの混合精度の勾配スケーラー。
+        """
+        optimizer = self._optimizer
+        collector = self._collector
+        scheduler_config = self._scheduler_config
+        step_scheduler = scheduler_config is not None and scheduler_config["interval"] == "step"
+        num_batches = self._num_batches(loader, self.limit_train_batches)
+        # Lightningと同じく、分散サンプラーでなくてもエポックごとのシャッフルのためにエポックを設定します
+        sampler = getattr(loader, "sampler", None)
+        if hasattr(sampler, "set_epoch"):
+            sampler.set_epoch(self.current_epoch)
+
+        model.train()
+        self.training = True
+        collector.hook = "on_train_epoch_start"
+        model.on_train_epoch_start()
+        for batch_idx, batch in enumerate(loader):
+            if batch_idx >= num_batches:
+                break
+            batch = self._to_device(batch)
+            collector.hook = "training_step"
+            collector.batch_size = _batch_size(batch)
+            with self._autocast():
+                output = model.training_step(batch, batch_idx)
+            loss = output["loss"] if isinstance(output, dict) else output
+
+            optimizer.zero_grad(set_to_none=True)
+            if scaler is not None:
+                scaler.scale(loss).backward()
+                if self.gradient_clip_val is not None:
+                    scaler.unscale_(optimizer)
+                    torch.nn.utils.clip_grad_norm_(model.parameters(), self.gradient_clip_val)
+                scaler.step(optimizer)
+                scaler.update()
+            else:
+                loss.backward()
+                if self.gradient_clip_val is not None:
+                    torch.nn.utils.clip_grad_norm_(model.parameters(), self.gradient_clip_val)
+                optimizer.step()
+            self.global_step += 1
+            if step_scheduler and self.global_step % scheduler_config["frequency"] == 0:
+                scheduler_config["scheduler"].step()
+            if collector.step_values and self.global_step % self.log_every_n_steps == 0:
+                self._log_metrics({name: value.item() for name, value in collector.step_values.items()})
+        collector.hook = None
+        self.training = False
+
+    @torch.inference_mode()
+    def _eval_epoch(
+        self, model: LightningModule, loader: Iterable, stage: str, limit: Union[int, float]
+    ) -> None:
+        """1エポックの検証またはテストのループを実行します。
+
+        :param model: `LightningModule`。
+        :param loader: データローダー。
+        :param stage: `"validation"`または`"test"`。
+        :param limit: バッチの数または割合。
+        """
+        collector = self._collector
+        num_batches = self._num_batches(loader, limit)
+        step = model.validation_step if stage == "validation" else model.test_step
+
+        model.eval()
+        collector.hook = f"on_{stage}_epoch_start"
+        getattr(model, f"on_{stage}_epoch_start")()
+        for batch_idx, batch in enumerate(loader):
+            if batch_idx >= num_batches:
+                break
+            batch = self._to_device(batch)
+            collector.hook = f"{stage}_step"
+            collector.batch_size = _batch_size(batch)
+            with self._autocast():
+                step(batch, batch_idx)
+        collector.hook = f"on_{stage}_epoch_end"
+        getattr(model, f"on_{stage}_epoch_end")()
+        collector.hook = None
+        model.train()
+
+    def _end_train_epoch(self, model: LightningModule) -> None:
+        """エポックのメトリクスを計算し、スケジューラの更新、チェックポイントの保存、ロガーへの書き込みを行います。
+
+        :param model: `LightningModule`。
+        """
+        self._collector.hook = "on_train_epoch_end"
+        model.on_train_epoch_end()
+        self._collector.hook = None
+        metrics = self._collector.compute_epoch()
+        self.callback_metrics.update(metrics)
+
+        config = self._scheduler_config
+        if config is not None and config["interval"] == "epoch":
+            if (self.current_epoch + 1) % config["frequency"] == 0:
+                monitor = config.get("monitor")
+                if monitor is None:
+                    config["scheduler"].step()
+                elif monitor in self.callback_metrics:
+                    config["scheduler"].step(self.callback_metrics[monitor])
+                else:
+                    log.warning(f"スケジューラが監視するメトリクスがありません！スキップします... <{monitor}>")
+
+        if self.enable_checkpointing:
+            self._save_model_checkpoints()
+        self._log_metrics({**{n: v.item() for n, v in metrics.items()}, "epoch": self.current_epoch})
+        log.info(
+            f"エポック{self.current_epoch}: "
+            + ", ".join(f"{name}={value.item():.4f}" for name, value in sorted(metrics.items()))
+        )
+
+    def _evaluate(
+        self,
+        stage: str,
+        model: Optional[LightningModule],
+        dataloaders: Optional[Iterable],
+        ckpt_path: Optional[str],
+        verbose: bool,
+        datamodule: Optional[LightningDataModule],
+        weights_only: Optional[bool],
+    ) -> List[Dict[str, float]]:
+        """検証またはテストのループを、チェックポイントの重みを読み込んで実行します。
+
+        :param stage: `"validation"`または`"test"`。
+        :return: メトリクスの辞書を1つ含むリスト。
+        """
+        model = model or self._model
+        datamodule = datamodule or self._datamodule
+        if model is None:
+            raise ValueError("評価するモデルがありません！")
+        self._attach(model, datamodule)
+        stage_name = "validate" if stage == "validation" else "test"
+        if datamodule is not None:
+            datamodule.prepare_data()
+            datamodule.setup(stage_name)
+            loader = datamodule.val_dataloader() if stage == "validation" else datamodule.test_dataloader()
+        else:
+            loader = dataloaders
+        model.setup(stage_name)
+
+        if ckpt_path == "best":
+            ckpt_path = self.checkpoint_callback.best_model_path if self.checkpoint_callback else None
+        if ckpt_path:
+            checkpoint = torch.load(ckpt_path, map_location="cpu", weights_only=bool(weights_only))
+            model.load_state_dict(checkpoint["state_dict"])
+        model.to(self.device)
+
+        self.callback_metrics = {}
+        limit = self.limit_val_batches if stage == "validation" else self.limit_test_batches
+        with self._capture_logs(model):
+            self._eval_epoch(model, loader, stage, limit)
+        metrics = self._collector.compute_epoch()
+        self.callback_metrics.update(metrics)
+        results = {name: value.item() for name, value in metrics.items()}
+        self._log_metrics(results)
+        self._finalize_loggers()
+        if verbose:
+            log.info(f"{stage}の結果: {results}")
+        return [results]
+
+    def _save_model_checkpoints(self) -> None:
+        """各`ModelCheckpoint`の設定に従ってチェックポイントを保存し、最良のチェックポイントを更新します。"""
+        candidates = {
+            **self.callback_metrics,
+            "epoch": torch.tensor(self.current_epoch),
+            "step": torch.tensor(self.global_step),
+        }
+        for callback in self.checkpoint_callbacks:
+            if callback.dirpath is None:
+                callback.dirpath = os.path.join(self.default_root_dir, "checkpoints")
+            filepath = None
+            if callback.save_top_k != 0:
+                filepath = callback.format_checkpoint_name(candidates)
+                if callback.monitor is None:
+                    self._save_latest(callback, filepath)
+                elif callback.monitor in candidates:
+                    filepath = self._save_top_k(callback, filepath, candidates[callback.monitor])
+                else:
+                    log.warning(f"監視するメトリクスがありません！スキップします... <{callback.monitor}>")
+                    filepath = None
+            if callback.save_last:
+                last_path = os.path.join(
+                    callback.dirpath, callback.CHECKPOINT_NAME_LAST + callback.FILE_EXTENSION
+                )
+                if filepath is not None:
+                    shutil.copyfile(filepath, last_path)
+                else:
+                    self.save_checkpoint(last_path)
+                callback.last_model_path = last_path
+
+    def _save_latest(self, callback: ModelCheckpoint, filepath: str) -> None:
+        """監視するメトリクスがない場合に、最新のチェックポイントを保存します。
+
+        :param callback: `ModelCheckpoint`。
+        :param filepath: 保存先のパス。
+        """
+        self.save_checkpoint(filepath, callback.save_weights_only)
+        previous = callback.best_model_path
+        callback.best_model_path = filepath
+        if callback.save_top_k == 1 and previous and previous != filepath and os.path.exists(previous):
+            os.remove(previous)
+
+    def _save_top_k(
+        self, callback: ModelCheckpoint, filepath: str, score: torch.Tensor
+    ) -> Optional[str]:
+        """監視するメトリクスが上位`save_top_k`に入る場合にチェックポイントを保存します。
+
+        :param callback: `ModelCheckpoint`。
+        :param filepath: 保存先のパス。
+        :param score: 監視するメトリクスの値。
+        :return: 保存した場合はそのパス、保存しなかった場合は`None`。
+        """
+        models = callback.best_k_models
+        better = max if callback.mode == "max" else min
+        worse = min if callback.mode == "max" else max
+        if callback.save_top_k != -1 and len(models) >= callback.save_top_k:
+            worst_path = worse(models, key=lambda path: models[path].item())
+            if better(models[worst_path].item(), score.item()) == models[worst_path].item():
+                return None
+            del models[worst_path]
+            if worst_path != filepath and os.path.exists(worst_path):
+                os.remove(worst_path)
+
+        models[filepath] = score
+        self.save_checkpoint(filepath, callback.save_weights_only)
+        best_path = better(models, key=lambda path: models[path].item())
+        callback.best_model_path = best_path
+        callback.best_model_score = models[best_path]
+        callback.kth_best_model_path = worse(models, key=lambda path: models[path].item())
+        callback.kth_value = models[callback.kth_best_model_path]
+        return filepath
+
+    def _log_metrics(self, metrics: Dict[str, float]) -> None:
+        """メトリクスを各ロガーに書き込みます。
+
+        :param metrics: メトリクスの名前と値の辞書。
+        """
+        self.logged_metrics.update(metrics)
+        for logger in self.loggers:
+            logger.log_metrics(metrics, step=self.global_step)
+            logger.save()
+
+    def _finalize_loggers(self) -> None:
+        """各ロガーの書き込みを完了します。"""
+        for logger in self.loggers:
+            logger.finalize("success")
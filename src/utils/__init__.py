@@ -1,5 +1,123 @@
-from src.utils.instantiators import instantiate_callbacks, instantiate_loggers
-from src.utils.logging_utils import log_hyperparameters
-from src.utils.pylogger import RankedLogger
-from src.utils.rich_utils import enforce_tags, print_config_tree
-from src.utils.utils import extras, get_metric_value, task_wrapper
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from src.utils.benchmark_utils import (
+        compare_to_baseline,
+        hardware_info,
+        higher_is_better,
+        load_results,
+        save_results,
+        time_repeated,
+    )
+    from src.utils.cpu_utils import (
+        apply_cpu_config,
+        apply_cpu_placement,
+        available_cores,
+        cpu_topology,
+        loader_worker_init_fn,
+        partition_cores,
+        plan_cpu_placement,
+        restore_cpu_placement,
+    )
+    from src.utils.cv_utils import aggregate_fold_metrics, fold_config, run_folds
+    from src.utils.ddp_utils import (
+        comm_hook_and_state,
+        count_allreduce_bytes,
+        ddp_strategy,
+        optimizer_state_mb,
+        shard_optimizer,
+    )
+    from src.utils.instantiators import (
+        clear_datamodule_cache,
+        config_hash,
+        instantiate_callbacks,
+        instantiate_datamodule,
+        instantiate_loggers,
+    )
+    from src.utils.inference_utils import count_parameters, measure_inference, model_size_mb
+    from src.utils.logging_utils import log_hyperparameters
+    from src.utils.memo_utils import (
+        load_memoized_result,
+        reuse_memoized_result,
+        run_fingerprint,
+        save_memoized_result,
+    )
+    from src.utils.memory_utils import child_pids, children_rss_mb, process_rss_mb
+    from src.utils.pylogger import RankedLogger
+    from src.utils.rich_utils import enforce_tags, print_config_tree
+    from src.utils.tune_utils import (
+        lr_range_test,
+        search_batch_size,
+        tune_fingerprint,
+        tune_hyperparameters,
+    )
+    from src.utils.utils import extras, get_metric_value, task_wrapper
+
+# 起動時間を短縮するため、各ユーティリティは最初にアクセスされたときにインポートされます
+# (`lightning`や`rich`などの重い依存関係は、実際に使用されるまで読み込まれません)
+_LAZY_ATTRS = {
+    "compare_to_baseline": "src.utils.benchmark_utils",
+    "hardware_info": "src.utils.benchmark_utils",
+    "higher_is_better": "src.utils.benchmark_utils",
+    "load_results": "src.utils.benchmark_utils",
+    "save_results": "src.utils.benchmark_utils",
+    "time_repeated": "src.utils.benchmark_utils",
+    "apply_cpu_config": "src.utils.cpu_utils",
+    "apply_cpu_placement": "src.utils.cpu_utils",
+    "available_cores": "src.utils.cpu_utils",
+    "cpu_topology": "src.utils.cpu_utils",
+    "loader_worker_init_fn": "src.utils.cpu_utils",
+    "partition_cores": "src.utils.cpu_utils",
+    "plan_cpu_placement": "src.utils.cpu_utils",
+    "restore_cpu_placement": "src.utils.cpu_utils",
+    "aggregate_fold_metrics": "src.utils.cv_utils",
+    "fold_config": "src.utils.cv_utils",
+    "run_folds": "src.utils.cv_utils",
+    "comm_hook_and_state": "src.utils.ddp_utils",
+    "count_allreduce_bytes": "src.utils.ddp_utils",
+    "ddp_strategy": "src.utils.ddp_utils",
+    "optimizer_state_mb": "src.utils.ddp_utils",
+    "shard_optimizer": "src.utils.ddp_utils",
+    "clear_datamodule_cache": "src.utils.instantiators",
+    "config_hash": "src.utils.instantiators",
+    "instantiate_callbacks": "src.utils.instantiators",
+    "instantiate_datamodule": "src.utils.instantiators",
+    "instantiate_loggers": "src.utils.instantiators",
+    "count_parameters": "src.utils.inference_utils",
+    "measure_inference": "src.utils.inference_utils",
+    "model_size_mb": "src.utils.inference_utils",
+    "log_hyperparameters": "src.utils.logging_utils",
+    "load_memoized_result": "src.utils.memo_utils",
+    "reuse_memoized_result": "src.utils.memo_utils",
+    "run_fingerprint": "src.utils.memo_utils",
+    "save_memoized_result": "src.utils.memo_utils",
+    "child_pids": "src.utils.memory_utils",
+    "children_rss_mb": "src.utils.memory_utils",
+    "process_rss_mb": "src.utils.memory_utils",
+    "RankedLogger": "src.utils.pylogger",
+    "enforce_tags": "src.utils.rich_utils",
+    "print_config_tree": "src.utils.rich_utils",
+    "lr_range_test": "src.utils.tune_utils",
+    "search_batch_size": "src.utils.tune_utils",
+    "tune_fingerprint": "src.utils.tune_utils",
+    "tune_hyperparameters": "src.utils.tune_utils",
+    "extras": "src.utils.utils",
+    "get_metric_value": "src.utils.utils",
+    "task_wrapper": "src.utils.utils",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name: str) -> Any:
+    """ユーティリティを遅延インポートします（PEP 562）。
+
+    :param name: 属性の名前。
+    :return: 対応するモジュールからインポートされた属性。
+    """
+    if name in _LAZY_ATTRS:
+        value = getattr(import_module(_LAZY_ATTRS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
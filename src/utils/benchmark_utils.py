@@ -0,0 +1,138 @@
+import json
+import os
+import platform
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from src.utils import pylogger
+from src.utils.cpu_utils import available_cores, cpu_topology
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+def hardware_info(accelerator: Optional[str] = None) -> Dict[str, Any]:
+    """計測結果に影響するハードウェアとライブラリの情報を返します。
+
+    :param accelerator: 使用するアクセラレータ（`"cpu"`、`"gpu"`、`"cuda"`、`"auto"`など）。
+    :return: アクセラレータ、デバイス名、CPUコア数、NUMAノード数、Python・PyTorchのバージョンなどを含む辞書。
+    """
+    import torch
+
+    device_name = platform.processor() or platform.machine()
+    if accelerator in ("gpu", "cuda", "auto") and torch.cuda.is_available():
+        device_name = torch.cuda.get_device_name()
+    return {
+        "accelerator": str(accelerator),
+        "device_name": device_name,
+        "num_cores": len(available_cores()),
+        "num_numa_nodes": len({c["node"] for c in cpu_topology()}),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+    }
+
+
+def time_repeated(
+    fn: Callable[[], Any],
+    num_warmup: int = 3,
+    num_repeats: int = 20,
+    synchronize: Optional[Callable[[], None]] = None,
+) -> Dict[str, float]:
+    """関数をウォームアップした後に繰り返し実行し、実行時間の統計を返します。
+
+    :param fn: 計測する引数なしの関数。
+    :param num_warmup: 計測前のウォームアップ回数。デフォルトは`3`。
+    :param num_repeats: 計測回数。デフォルトは`20`。
+    :param synchronize: 各実行の後に呼び出す同期関数（GPUの場合は`torch.cuda.synchronize`など）。
+    :return: `median_ms`（中央値）、`min_ms`（最小値）、`stdev_ms`（標準偏差）を含む辞書。
+    """
+    for _ in range(num_warmup):
+        fn()
+    if synchronize is not None:
+        synchronize()
+
+    times = []
+    for _ in range(num_repeats):
+        start = time.perf_counter()
+        fn()
+        if synchronize is not None:
+            synchronize()
+        times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "stdev_ms": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def higher_is_better(name: str) -> bool:
+    """メトリクス名から、値が大きいほど良いメトリクスかどうかを判定します。
+
+    スループット（`*_per_sec`）は大きいほど良く、それ以外（時間やメモリ）は小さいほど良いとみなします。
+
+    :param name: メトリクス名。
+    :return: 値が大きいほど良い場合は`True`。
+    """
+    return name.endswith("per_sec")
+
+
+def compare_to_baseline(
+    results: Mapping[str, float],
+    baseline: Mapping[str, float],
+    tolerance: float = 0.2,
+    tolerances: Optional[Mapping[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """計測結果をベースラインと比較し、許容範囲を超えて悪化したメトリクスを返します。
+
+    :param results: メトリクス名と計測値の辞書。
+    :param baseline: メトリクス名とベースラインの値の辞書。
+    :param tolerance: 許容する相対的な悪化の割合。デフォルトは`0.2`（20%）。
+    :param tolerances: メトリクスごとの許容範囲。指定されたメトリクスは`tolerance`の代わりに使用します。
+    :return: 悪化したメトリクスごとの`name`、`value`、`baseline`、`change`（相対的な変化）、
+        `tolerance`を含む辞書のリスト。
+    """
+    tolerances = tolerances or {}
+    regressions = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None or base == 0:
+            continue
+        change = (value - base) / abs(base)
+        worse = -change if higher_is_better(name) else change
+        limit = tolerances.get(name, tolerance)
+        if worse > limit:
+            regressions.append(
+                {"name": name, "value": value, "baseline": base, "change": change, "tolerance": limit}
+            )
+    return regressions
+
+
+def load_results(path: str) -> Optional[Dict[str, Any]]:
+    """JSONに保存された計測結果を読み込みます。
+
+    :param path: 計測結果のJSONファイルのパス。
+    :return: `metadata`と`results`を含む辞書。ファイルが存在しない場合は`None`。
+    """
+    file = Path(path)
+    if not file.exists():
+        return None
+    return json.loads(file.read_text())
+
+
+def save_results(path: str, results: Mapping[str, float], metadata: Mapping[str, Any]) -> None:
+    """計測結果をメタデータとともにJSONに保存します。
+
+    :param path: 保存先のJSONファイルのパス。
+    :param results: メトリクス名と計測値の辞書。
+    :param metadata: ハードウェアの情報などのメタデータ。
+    """
+    file = Path(path)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+    tmp_file.write_text(
+        json.dumps({"metadata": dict(metadata), "results": dict(sorted(results.items()))}, indent=2)
+    )
+    os.replace(tmp_file, file)
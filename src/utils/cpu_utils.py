@@ -0,0 +1,270 @@
+import functools
+import glob
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from omegaconf import DictConfig
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+def available_cores() -> List[int]:
+    """現在のプロセスが使用できるCPUコアIDのリストを返します。
+
+    :return: 使用可能なCPUコアIDの昇順リスト。
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(cores: Sequence[int], num_partitions: int) -> List[List[int]]:
+    """CPUコアを互いに素な連続したグループに、できるだけ均等に分割します。
+
+    隣接するコアIDは同じ物理コアやソケットを共有していることが多いため、連続したグループに分割します。
+
+    :param cores: 分割するCPUコアIDのシーケンス。
+    :param num_partitions: グループの数。
+    :return: 各グループのCPUコアIDのリスト。
+    """
+    if num_partitions < 1:
+        raise ValueError(f"グループの数は1以上でなければなりません！ <num_partitions={num_partitions}>")
+    if num_partitions > len(cores):
+        raise ValueError(
+            f"グループの数（{num_partitions}）がCPUコアの数（{len(cores)}）を超えています！"
+        )
+
+    size, remainder = divmod(len(cores), num_partitions)
+    partitions = []
+    start = 0
+    for i in range(num_partitions):
+        end = start + size + (1 if i < remainder else 0)
+        partitions.append(list(cores[start:end]))
+        start = end
+    return partitions
+
+
+def apply_cpu_config(cpu_cfg: Optional[DictConfig]) -> None:
+    """CPUコアの割り当てとtorchのスレッド数を設定に従って適用します。
+
+    :param cpu_cfg: `cores`、`intra_op_threads`、`inter_op_threads`を含むDictConfigオブジェクト。
+    """
+    if not cpu_cfg:
+        return
+
+    import torch
+
+    cores = cpu_cfg.get("cores")
+    if cores:
+        if hasattr(os, "sched_setaffinity"):
+            log.info(f"CPUコアを割り当てます！ <cpu.cores={list(cores)}>")
+            os.sched_setaffinity(0, cores)
+        else:
+            log.warning("このプラットフォームではCPUアフィニティを設定できません！スキップします...")
+
+    intra_op_threads = cpu_cfg.get("intra_op_threads") or (len(cores) if cores else None)
+    if intra_op_threads:
+        log.info(f"演算子内のスレッド数を設定します！ <intra_op_threads={intra_op_threads}>")
+        torch.set_num_threads(intra_op_threads)
+
+    inter_op_threads = cpu_cfg.get("inter_op_threads")
+    if inter_op_threads and torch.get_num_interop_threads() != inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+            log.info(f"演算子間のスレッド数を設定します！ <inter_op_threads={inter_op_threads}>")
+        except RuntimeError:
+            # 演算子間のスレッドプールは一度開始されると変更できません（同一プロセス内のマルチランなど）
+            log.warning(
+                "演算子間のスレッド数は既に確定しているため変更できません！ "
+                f"<inter_op_threads={torch.get_num_interop_threads()}>"
+            )
+
+
+def _read_cpulist(path: str) -> List[int]:
+    """`/sys`のCPUリストの形式（例：`0-3,8-11`）のファイルを読み込みます。
+
+    :param path: ファイルのパス。
+    :return: CPUコアIDのリスト。読み込めない場合は空のリスト。
+    """
+    try:
+        with open(path) as file:
+            text = file.read().strip()
+    except OSError:
+        return []
+    cpus: List[int] = []
+    for part in filter(None, text.split(",")):
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def _read_int(path: str, default: int) -> int:
+    """整数を1つ含むファイルを読み込みます。
+
+    :param path: ファイルのパス。
+    :param default: 読み込めない場合の値。
+    :return: 読み込んだ整数。
+    """
+    try:
+        with open(path) as file:
+            return int(file.read().strip())
+    except (OSError, ValueError):
+        return default
+
+
+def cpu_topology(cores: Optional[Sequence[int]] = None) -> List[Dict[str, int]]:
+    """CPUコアごとのNUMAノード、ソケット、物理コアを返します。
+
+    Linuxの`/sys/devices/system`から読み込みます。読み込めない場合（Linux以外など）は、すべてのコアを
+    NUMAノード0、ソケット0の別々の物理コアとみなします。
+
+    :param cores: 対象のCPUコアIDのシーケンス。`None`の場合は`available_cores()`。
+    :return: `cpu`、`node`、`socket`、`core`（ソケット内の物理コアID）を含む辞書の、
+        NUMAノード、ソケット、物理コアの順に並べたリスト（同じ物理コアのハイパースレッドは隣接します）。
+    """
+    cores = available_cores() if cores is None else list(cores)
+    node_of: Dict[int, int] = {}
+    for node_dir in glob.glob("/sys/devices/system/node/node[0-9]*"):
+        node = int(os.path.basename(node_dir)[len("node") :])
+        for cpu in _read_cpulist(os.path.join(node_dir, "cpulist")):
+            node_of[cpu] = node
+
+    topology = []
+    for cpu in cores:
+        base = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+        topology.append(
+            {
+                "cpu": cpu,
+                "node": node_of.get(cpu, 0),
+                "socket": _read_int(f"{base}/physical_package_id", 0),
+                "core": _read_int(f"{base}/core_id", cpu),
+            }
+        )
+    topology.sort(key=lambda c: (c["node"], c["socket"], c["core"], c["cpu"]))
+    return topology
+
+
+def plan_cpu_placement(
+    world_size: int,
+    num_workers: int,
+    loader_cores: Optional[int] = None,
+    topology: Optional[List[Dict[str, int]]] = None,
+    use_smt: bool = False,
+) -> List[Dict[str, Any]]:
+    """各ランクの計算スレッドとデータローダーのワーカーに、互いに素なCPUコアの集合を割り当てます。
+
+    コアをNUMAノード、ソケット、物理コアの順に並べてランクごとに連続したグループに分割するため、
+    ランク数がNUMAノード数の倍数であれば、各ランクは1つのNUMAノードに収まります。各グループの末尾の
+    `loader_cores`個のコアをデータローダーのワーカーに、残りを計算スレッドに割り当てます。
+
+    :param world_size: このノードのランク（プロセス）の数。
+    :param num_workers: ランクごとのデータローダーのワーカー数。
+    :param loader_cores: ランクごとにワーカーに割り当てるコアの数。`None`の場合は`num_workers`
+        （ランクのコアの半分まで）。
+    :param topology: `cpu_topology()`の結果。`None`の場合は現在のプロセスが使用できるコアから作成します。
+    :param use_smt: ハイパースレッド（同じ物理コアの論理コア）ごとに計算スレッドを使用するかどうか。
+        `False`の場合、計算スレッドの数は物理コアの数になります。デフォルトは`False`。
+    :return: ランクごとの`compute`（計算スレッドのコア）、`loader`（ワーカーのコア）、
+        `num_threads`（演算子内のスレッド数）、`nodes`（NUMAノード）を含む辞書のリスト。
+    """
+    topology = cpu_topology() if topology is None else topology
+    by_cpu = {c["cpu"]: c for c in topology}
+    placements = []
+    for group in partition_cores([c["cpu"] for c in topology], world_size):
+        if num_workers <= 0:
+            num_loader = 0
+        elif loader_cores is None:
+            num_loader = min(num_workers, len(group) // 2)
+        else:
+            num_loader = loader_cores
+        if num_loader >= len(group):
+            raise ValueError(
+                f"ワーカーに割り当てるコアの数（{num_loader}）がランクのコアの数（{len(group)}）以上です！"
+            )
+        compute, loader = group[: len(group) - num_loader], group[len(group) - num_loader :]
+        physical = {(by_cpu[cpu]["socket"], by_cpu[cpu]["core"]) for cpu in compute}
+        placements.append(
+            {
+                "compute": compute,
+                "loader": loader,
+                "num_threads": len(compute) if use_smt else len(physical),
+                "nodes": sorted({by_cpu[cpu]["node"] for cpu in group}),
+            }
+        )
+    return placements
+
+
+# このプロセスのデータローダーのワーカーに割り当てるコア（`apply_cpu_placement`で設定されます）
+_LOADER_CORES: Optional[List[int]] = None
+
+
+def apply_cpu_placement(placement: Dict[str, Any]) -> Dict[str, Any]:
+    """`plan_cpu_placement`の1つのランクの割り当てを現在のプロセスに適用します。
+
+    メインプロセスを計算スレッドのコアに固定して演算子内のスレッド数を設定し、以降に作成される
+    データローダーの`worker_init_fn`（`loader_worker_init_fn()`）がワーカーのコアを使用するようにします。
+
+    :param placement: 1つのランクの割り当て。
+    :return: `restore_cpu_placement`で元に戻すための、適用前のコアとスレッド数を含む辞書。
+    """
+    global _LOADER_CORES
+    import torch
+
+    previous = {"cores": available_cores(), "num_threads": torch.get_num_threads(), "loader": _LOADER_CORES}
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, placement["compute"])
+    else:
+        log.warning("このプラットフォームではCPUアフィニティを設定できません！スレッド数のみ設定します...")
+    torch.set_num_threads(placement["num_threads"])
+    _LOADER_CORES = list(placement["loader"]) or None
+    return previous
+
+
+def restore_cpu_placement(previous: Dict[str, Any]) -> None:
+    """`apply_cpu_placement`を適用する前の状態に戻します。
+
+    :param previous: `apply_cpu_placement`が返した辞書。
+    """
+    global _LOADER_CORES
+    import torch
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, previous["cores"])
+    torch.set_num_threads(previous["num_threads"])
+    _LOADER_CORES = previous["loader"]
+
+
+def _pin_loader_worker(cores: List[int], worker_id: int) -> None:
+    """データローダーのワーカーをコアに固定し、ワーカー内の演算子のスレッドを1つにします。
+
+    コアがワーカー数以上ある場合は、コアをワーカーごとに分割して割り当てます。
+
+    :param cores: ワーカーに割り当てるコア。
+    :param worker_id: ワーカーのID。
+    """
+    import torch
+
+    num_workers = torch.utils.data.get_worker_info().num_workers
+    if len(cores) >= num_workers:
+        cores = partition_cores(cores, num_workers)[worker_id]
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(1)
+
+    # Lightningの`seed_everything(workers=True)`は`worker_init_fn`が未設定の場合にのみ設定されるため、ここで呼び出します
+    if int(os.environ.get("PL_SEED_WORKERS", 0)):
+        from lightning.fabric.utilities.seed import pl_worker_init_function
+
+        pl_worker_init_function(worker_id)
+
+
+def loader_worker_init_fn() -> Optional[Callable[[int], None]]:
+    """このプロセスの割り当てに従ってワーカーをコアに固定する、データローダーの`worker_init_fn`を返します。
+
+    :return: `worker_init_fn`。`apply_cpu_placement`でワーカーのコアが割り当てられていない場合は`None`。
+    """
+    if _LOADER_CORES is None:
+        return None
+    return functools.partial(_pin_loader_worker, list(_LOADER_CORES))
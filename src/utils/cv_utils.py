@@ -0,0 +1,134 @@
+import copy
+import multiprocessing
+import os
+import queue
+import statistics
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from omegaconf import DictConfig, open_dict
+
+from src.utils import pylogger
+from src.utils.cpu_utils import available_cores, partition_cores
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+def fold_config(cfg: DictConfig, fold: int, cores: Optional[Sequence[int]] = None) -> DictConfig:
+    """k分割交差検証の1つの分割を`train`で実行するための設定を作成します。
+
+    :param cfg: 交差検証全体の設定。
+    :param fold: 検証に使用する分割のインデックス。
+    :param cores: この分割を実行するプロセスに割り当てるCPUコアIDのリスト。`None`の場合は変更しません。
+    :return: `train`に渡す設定。
+    """
+    fold_cfg = copy.deepcopy(cfg)
+    with open_dict(fold_cfg):
+        fold_cfg.paths.output_dir = os.path.join(cfg.paths.output_dir, f"fold_{fold}")
+        fold_cfg.cv.fold = fold
+        # 全分割で同じ読み込み済みのデータモジュール（`instantiate_datamodule`のキャッシュ）を使用します
+        fold_cfg.reuse_datamodule = True
+        if cores:
+            num_loader_workers = cfg.data.get("num_workers") or 0
+            fold_cfg.cpu.cores = list(cores)
+            fold_cfg.cpu.intra_op_threads = max(1, len(cores) - num_loader_workers)
+    return fold_cfg
+
+
+def aggregate_fold_metrics(fold_metrics: Sequence[Dict[str, float]]) -> Dict[str, float]:
+    """分割ごとのメトリクスを、すべての分割に共通するメトリクスの平均と標準偏差に集計します。
+
+    :param fold_metrics: 分割ごとのメトリクスの名前と値の辞書のリスト。
+    :return: 平均（元の名前）と標準偏差（名前に`_std`を付加）の辞書。分割が1つの場合の標準偏差は`0.0`。
+    """
+    if not fold_metrics:
+        return {}
+    names = [name for name in fold_metrics[0] if all(name in metrics for metrics in fold_metrics)]
+    results: Dict[str, float] = {}
+    for name in names:
+        values = [float(metrics[name]) for metrics in fold_metrics]
+        results[name] = statistics.fmean(values)
+        results[f"{name}_std"] = statistics.stdev(values) if len(values) > 1 else 0.0
+    return results
+
+
+def _fold_worker(
+    run_fold: Callable[[DictConfig], Dict[str, float]],
+    jobs: List[Tuple[int, DictConfig]],
+    results: "multiprocessing.Queue",
+) -> None:
+    """子プロセスで割り当てられた分割を順に実行し、結果をキューに送ります。
+
+    :param run_fold: 1つの分割を実行してメトリクスを返す関数。
+    :param jobs: 分割のインデックスと設定のタプルのリスト。
+    :param results: `(分割のインデックス, メトリクス, エラー)`を送るキュー。
+    """
+    for fold, fold_cfg in jobs:
+        try:
+            results.put((fold, run_fold(fold_cfg), None))
+        except Exception as e:
+            results.put((fold, None, repr(e)))
+
+
+def run_folds(
+    run_fold: Callable[[DictConfig], Dict[str, float]],
+    cfg: DictConfig,
+    num_folds: int,
+    num_workers: int = 1,
+) -> List[Dict[str, float]]:
+    """k分割交差検証のすべての分割を実行し、分割ごとのメトリクスを返します。
+
+    `num_workers > 1`の場合、分割を`num_workers`個の子プロセスに分配し、CPUコアを互いに素なグループに
+    分割して各プロセスに割り当てます。子プロセスは`fork`で起動するため、親プロセスで読み込んだ
+    データセット（テンソルやメモリマップ）はコピーされずにそのまま共有され、子プロセスでの
+    モジュールの再インポートやデータの再読み込みも発生しません。
+
+    :param run_fold: 1つの分割の設定を受け取り、メトリクスの名前と値の辞書を返す関数。
+    :param cfg: 交差検証全体の設定。
+    :param num_folds: 分割の数。
+    :param num_workers: 並列に実行するプロセスの数。`1`の場合は現在のプロセスで順に実行します。デフォルトは`1`。
+    :return: 分割の順のメトリクスの辞書のリスト。
+    """
+    num_workers = min(num_workers, num_folds)
+    if num_workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+        log.warning("このプラットフォームではforkを使用できないため、分割を順に実行します！")
+        num_workers = 1
+    if num_workers <= 1:
+        return [run_fold(fold_config(cfg, fold)) for fold in range(num_folds)]
+
+    cores = cfg.cpu.get("cores") if cfg.get("cpu") else None
+    core_groups = partition_cores(list(cores) if cores else available_cores(), num_workers)
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = []
+    for worker, worker_cores in enumerate(core_groups):
+        jobs = [(fold, fold_config(cfg, fold, worker_cores)) for fold in range(worker, num_folds, num_workers)]
+        log.info(f"ワーカー{worker}を開始します <folds={[fold for fold, _ in jobs]}, cores={worker_cores}>")
+        # ワーカーの中でデータローダーのワーカーを起動できるように、デーモンプロセスにはしません
+        process = context.Process(target=_fold_worker, args=(run_fold, jobs, results))
+        process.start()
+        processes.append(process)
+
+    fold_metrics: Dict[int, Dict[str, float]] = {}
+    errors: Dict[int, str] = {}
+    while len(fold_metrics) + len(errors) < num_folds:
+        try:
+            fold, metrics, error = results.get(timeout=1.0)
+        except queue.Empty:
+            # 結果を送らずに異常終了したワーカーがいる場合に待ち続けないようにします
+            if any(process.is_alive() for process in processes):
+                continue
+            try:
+                fold, metrics, error = results.get(timeout=1.0)
+            except queue.Empty:
+                break
+        if error is None:
+            fold_metrics[fold] = metrics
+        else:
+            errors[fold] = error
+    for process in processes:
+        process.join()
+
+    missing = [fold for fold in range(num_folds) if fold not in fold_metrics]
+    if missing:
+        raise RuntimeError(f"分割の実行に失敗しました！ <folds={missing}, errors={errors}>")
+    return [fold_metrics[fold] for fold in range(num_folds)]
@@ -0,0 +1,177 @@
+import functools
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import torch
+import torch.distributed as dist
+from lightning.pytorch.strategies import DDPStrategy
+from torch.distributed.algorithms.ddp_comm_hooks import default_hooks
+from torch.distributed.algorithms.ddp_comm_hooks import powerSGD_hook as powersgd_hooks
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+COMM_HOOKS = ("none", "allreduce", "fp16", "bf16", "powersgd", "batched_powersgd")
+
+
+def comm_hook_and_state(
+    comm_hook: str = "none",
+    compress_wrapper: Optional[str] = None,
+    powersgd: Optional[Dict[str, Any]] = None,
+) -> Tuple[Optional[Callable], Optional[Any], Optional[Callable]]:
+    """DDPの勾配の通信フック、その状態、ラッパーを返します。
+
+    フック：
+        - `"none"`: フックを登録しません（DDPの組み込みのfp32のall-reduce）
+        - `"allreduce"`: Pythonのフックによるfp32のall-reduce（`"none"`と同等。通信量の計測の基準）
+        - `"fp16"`/`"bf16"`: 勾配をfp16/bf16に変換して通信し、通信量を半分にします
+        - `"powersgd"`/`"batched_powersgd"`: 勾配を低ランクの行列で近似して通信します（PowerSGD）
+
+    :param comm_hook: フックの名前（`COMM_HOOKS`のいずれか）。デフォルトは`"none"`。
+    :param compress_wrapper: PowerSGDの通信をさらにfp16/bf16に変換するラッパー（`"fp16"`または`"bf16"`）。
+        デフォルトは`None`。
+    :param powersgd: `PowerSGDState`の引数（`matrix_approximation_rank`、`start_powerSGD_iter`、
+        `warm_start`、`use_error_feedback`、`min_compression_rate`など）。デフォルトは`None`。
+    :return: フック、状態、ラッパーのタプル（使用しないものは`None`）。
+    """
+    if comm_hook not in COMM_HOOKS:
+        raise ValueError(f"サポートされていない通信フックです！ <comm_hook={comm_hook}> <choices={COMM_HOOKS}>")
+    if compress_wrapper not in (None, "fp16", "bf16"):
+        raise ValueError(f"サポートされていないラッパーです！ <compress_wrapper={compress_wrapper}>")
+    if compress_wrapper is not None and not comm_hook.endswith("powersgd"):
+        raise ValueError("`compress_wrapper`はPowerSGDのフックとのみ組み合わせられます！")
+
+    hook: Optional[Callable] = None
+    state: Optional[Any] = None
+    if comm_hook == "allreduce":
+        hook = default_hooks.allreduce_hook
+    elif comm_hook == "fp16":
+        hook = default_hooks.fp16_compress_hook
+    elif comm_hook == "bf16":
+        hook = default_hooks.bf16_compress_hook
+    elif comm_hook.endswith("powersgd"):
+        hook = (
+            powersgd_hooks.powerSGD_hook
+            if comm_hook == "powersgd"
+            else powersgd_hooks.batched_powerSGD_hook
+        )
+        state = powersgd_hooks.PowerSGDState(process_group=None, **dict(powersgd or {}))
+
+    wrapper: Optional[Callable] = None
+    if compress_wrapper == "fp16":
+        wrapper = default_hooks.fp16_compress_wrapper
+    elif compress_wrapper == "bf16":
+        wrapper = default_hooks.bf16_compress_wrapper
+    return hook, state, wrapper
+
+
+class CommHookDDPStrategy(DDPStrategy):
+    """CPU（glooバックエンド）でも通信フックを登録する`DDPStrategy`。
+
+    Lightningの`DDPStrategy`はGPUの場合にのみ通信フックを登録しますが、PyTorchのフックはglooでも
+    動作するため、`trainer=ddp_sim`で圧縮やPowerSGDの動作と通信量をCPUで検証できるようにします。
+    """
+
+    def _register_ddp_hooks(self) -> None:
+        """DDPでラップしたモデルに通信フックを登録します。"""
+        if self.root_device.type == "cuda":
+            super()._register_ddp_hooks()
+            return
+        if self._ddp_comm_hook is None:
+            return
+        hook = self._ddp_comm_hook
+        if self._ddp_comm_wrapper is not None:
+            hook = self._ddp_comm_wrapper(hook)
+        self.model.register_comm_hook(state=self._ddp_comm_state, hook=hook)
+
+
+def ddp_strategy(
+    comm_hook: str = "none",
+    compress_wrapper: Optional[str] = None,
+    powersgd: Optional[Dict[str, Any]] = None,
+    **kwargs: Any,
+) -> DDPStrategy:
+    """通信フックを設定した`CommHookDDPStrategy`を作成します。
+
+    トレーナーの設定の`strategy`に`_target_: src.utils.ddp_utils.ddp_strategy`として指定します。
+    `ddp_spawn`と同じ動作にするには`start_method: spawn`を渡します。
+
+    :param comm_hook: フックの名前（`COMM_HOOKS`のいずれか）。デフォルトは`"none"`。
+    :param compress_wrapper: PowerSGDの通信をさらにfp16/bf16に変換するラッパー。デフォルトは`None`。
+    :param powersgd: `PowerSGDState`の引数。デフォルトは`None`。
+    :param kwargs: `DDPStrategy`に渡す追加の引数（`start_method`、`find_unused_parameters`など）。
+    :return: 通信フックを設定した`CommHookDDPStrategy`。
+    """
+    hook, state, wrapper = comm_hook_and_state(comm_hook, compress_wrapper, powersgd)
+    if hook is not None:
+        log.info(f"DDPの通信フックを設定します！ <comm_hook={comm_hook}, compress_wrapper={compress_wrapper}>")
+    return CommHookDDPStrategy(
+        ddp_comm_hook=hook, ddp_comm_state=state, ddp_comm_wrapper=wrapper, **kwargs
+    )
+
+
+@contextmanager
+def count_allreduce_bytes() -> Iterator[Dict[str, int]]:
+    """`torch.distributed.all_reduce`に渡されたテンソルのバイト数と呼び出し回数を数えます。
+
+    Pythonの通信フック（`"none"`以外）の通信量の計測に使用します。数えるのは各ランクが送る
+    ペイロードのバイト数で、リングall-reduceなどのアルゴリズムによる実際の転送量はこの定数倍になります。
+
+    :yield: `"bytes"`と`"calls"`を含む辞書（コンテキストの終了まで更新されます）。
+    """
+    counter = {"bytes": 0, "calls": 0}
+    all_reduce = dist.all_reduce
+
+    @functools.wraps(all_reduce)
+    def counting_all_reduce(tensor: Any, *args: Any, **kwargs: Any) -> Any:
+        counter["bytes"] += tensor.numel() * tensor.element_size()
+        counter["calls"] += 1
+        return all_reduce(tensor, *args, **kwargs)
+
+    dist.all_reduce = counting_all_reduce
+    try:
+        yield counter
+    finally:
+        dist.all_reduce = all_reduce
+
+
+def shard_optimizer(
+    optimizer: Callable[..., torch.optim.Optimizer], params: Iterable[torch.nn.Parameter]
+) -> torch.optim.Optimizer:
+    """オプティマイザの状態をランク間で分割する`ZeroRedundancyOptimizer`（ZeROのステージ1）を作成します。
+
+    各ランクはパラメータの一部の状態（Adamのモーメントなど）だけを保持して更新し、更新したパラメータを
+    他のランクにブロードキャストするため、状態のメモリはランクあたりおよそ`1 / world_size`になります。
+    チェックポイントの保存時には、Lightningが`consolidate_state_dict()`でランク0に状態を集めるため、
+    通常のオプティマイザと同じ形式で保存され、分割の有無やランク数を変えて再開できます。
+
+    :param optimizer: オプティマイザの部分関数（Hydraの`_partial_: true`で作成した`functools.partial`）。
+    :param params: 最適化するパラメータ。
+    :return: `ZeroRedundancyOptimizer`。分散環境が初期化されていない場合は通常のオプティマイザ。
+    """
+    if not (dist.is_available() and dist.is_initialized()):
+        log.warning("分散環境が初期化されていません！オプティマイザの状態を分割せずに作成します...")
+        return optimizer(params=params)
+    if not isinstance(optimizer, functools.partial):
+        raise TypeError("オプティマイザはfunctools.partial（`_partial_: true`）でなければなりません！")
+
+    from torch.distributed.optim import ZeroRedundancyOptimizer
+
+    return ZeroRedundancyOptimizer(list(params), optimizer_class=optimizer.func, **optimizer.keywords)
+
+
+def optimizer_state_mb(optimizer: torch.optim.Optimizer) -> float:
+    """このランクが保持しているオプティマイザの状態のサイズを返します。
+
+    :param optimizer: オプティマイザ（`ZeroRedundancyOptimizer`の場合はこのランクの分割）。
+    :return: 状態のテンソルのバイト数の合計（MB）。
+    """
+    optimizer = getattr(optimizer, "optimizer", optimizer)  # LightningOptimizer
+    optimizer = getattr(optimizer, "optim", optimizer)  # ZeroRedundancyOptimizer
+    num_bytes = 0
+    for state in optimizer.state.values():
+        for value in state.values():
+            if isinstance(value, torch.Tensor):
+                num_bytes += value.numel() * value.element_size()
+    return num_bytes / 2**20
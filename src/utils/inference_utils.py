@@ -0,0 +1,90 @@
+import statistics
+import time
+from typing import TYPE_CHECKING, Dict, Sequence
+
+from src.utils import pylogger
+
+if TYPE_CHECKING:
+    import torch
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+def count_parameters(model: "torch.nn.Module") -> int:
+    """モデルのパラメータ数を返します。
+
+    :param model: パラメータを数えるモデル。
+    :return: パラメータの要素数の合計。
+    """
+    return sum(p.numel() for p in model.parameters())
+
+
+def model_size_mb(model: "torch.nn.Module") -> float:
+    """モデルのパラメータとバッファが占めるメモリのサイズを返します。
+
+    :param model: サイズを計算するモデル。
+    :return: パラメータとバッファのバイト数の合計（MB）。
+    """
+    num_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    num_bytes += sum(b.numel() * b.element_size() for b in model.buffers())
+    return num_bytes / 2**20
+
+
+def measure_inference(
+    model: "torch.nn.Module",
+    input_shape: Sequence[int],
+    batch_size: int = 1,
+    num_warmup: int = 10,
+    num_iters: int = 100,
+) -> Dict[str, float]:
+    """標準化された方法でモデルの推論性能を計測します。
+
+    評価モードの`torch.inference_mode()`で、同じ形状のランダムな入力に対する順伝播を`num_warmup`回
+    実行した後に`num_iters`回計測し、レイテンシの中央値を返します。計測後はモデルのモードを元に戻します。
+
+    :param model: 計測するモデル。
+    :param input_shape: 1サンプルの入力の形状（バッチ次元を除く）。
+    :param batch_size: 推論のバッチサイズ。デフォルトは`1`。
+    :param num_warmup: 計測前のウォームアップ回数。デフォルトは`10`。
+    :param num_iters: 計測回数。デフォルトは`100`。
+    :return: `model/latency_ms`（レイテンシの中央値）、`model/params`（パラメータ数）、
+        `model/size_mb`（パラメータとバッファのサイズ）、GPUの場合は`model/peak_memory_mb`
+        （推論中の最大メモリ使用量）を含む辞書。
+    """
+    import torch
+
+    parameter = next(model.parameters(), None)
+    device = parameter.device if parameter is not None else torch.device("cpu")
+    x = torch.randn(batch_size, *input_shape, device=device)
+    is_cuda = device.type == "cuda"
+
+    was_training = model.training
+    model.eval()
+    try:
+        with torch.inference_mode():
+            for _ in range(num_warmup):
+                model(x)
+            if is_cuda:
+                torch.cuda.synchronize(device)
+                torch.cuda.reset_peak_memory_stats(device)
+
+            latencies = []
+            for _ in range(num_iters):
+                start = time.perf_counter()
+                model(x)
+                if is_cuda:
+                    torch.cuda.synchronize(device)
+                latencies.append(time.perf_counter() - start)
+    finally:
+        model.train(was_training)
+
+    metrics = {
+        "model/latency_ms": statistics.median(latencies) * 1000,
+        "model/params": float(count_parameters(model)),
+        "model/size_mb": model_size_mb(model),
+    }
+    if is_cuda:
+        metrics["model/peak_memory_mb"] = torch.cuda.max_memory_allocated(device) / 2**20
+
+    log.info(f"推論性能を計測しました！ <{', '.join(f'{k}={v:.4g}' for k, v in metrics.items())}>")
+    return metrics
@@ -1,16 +1,25 @@
-from typing import List
+import hashlib
+import json
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List
 
 import hydra
-from lightning import Callback
-from lightning.pytorch.loggers import Logger
-from omegaconf import DictConfig
+from omegaconf import DictConfig, OmegaConf
 
 from src.utils import pylogger
 
+if TYPE_CHECKING:
+    from lightning import Callback, LightningDataModule
+    from lightning.pytorch.loggers import Logger
+
 log = pylogger.RankedLogger(__name__, rank_zero_only=True)
 
+# 同一プロセス内のマルチランで再利用するデータモジュール（データ設定のハッシュ -> インスタンス）
+_DATAMODULE_CACHE: "OrderedDict[str, LightningDataModule]" = OrderedDict()
+_DATAMODULE_CACHE_SIZE = 4
+
 
-def instantiate_callbacks(callbacks_cfg: DictConfig) -> List[Callback]:
+def instantiate_callbacks(callbacks_cfg: DictConfig) -> List["Callback"]:
     """設定からコールバックをインスタンス化します。
 
     :param callbacks_cfg: コールバック設定を含むDictConfigオブジェクト。
@@ -33,13 +42,17 @@ def instantiate_callbacks(callbacks_cfg: DictConfig) -> List[Callback]:
     return callbacks
 
 
-def instantiate_loggers(logger_cfg: DictConfig) -> List[Logger]:
+def instantiate_loggers(logger_cfg: DictConfig) -> List["Logger"]:
     """設定からロガーをインスタンス化します。
 
+    `_partial_: True`で指定されたロガー（`AsyncLogger`など）は他のロガーをラップするものとして扱い、
+    他のすべてのロガーを`loggers`に渡してインスタンス化します。
+
     :param logger_cfg: ロガー設定を含むDictConfigオブジェクト。
     :return: インスタンス化されたロガーのリスト。
     """
     logger: List[Logger] = []
+    wrappers = []
 
     if not logger_cfg:
         log.warning("ロガー設定が見つかりません！スキップします...")
@@ -51,6 +64,60 @@ def instantiate_loggers(logger_cfg: DictConfig) -> List[Logger]:
     for _, lg_conf in logger_cfg.items():
         if isinstance(lg_conf, DictConfig) and "_target_" in lg_conf:
             log.info(f"ロガーをインスタンス化しています <{lg_conf._target_}>")
-            logger.append(hydra.utils.instantiate(lg_conf))
+            if lg_conf.get("_partial_"):
+                wrappers.append(hydra.utils.instantiate(lg_conf))
+            else:
+                logger.append(hydra.utils.instantiate(lg_conf))
+
+    for wrapper in wrappers:
+        logger = [wrapper(loggers=logger)]
+
+    return logger
+
+
+def config_hash(cfg: DictConfig) -> str:
+    """解決済みの設定の内容から決定的なハッシュを計算します。
 
-    return logger
\ No newline at end of file
+    :param cfg: ハッシュを計算するDictConfigオブジェクト。
+    :return: 設定のSHA-1ハッシュの16進数文字列。
+    """
+    container = OmegaConf.to_container(cfg, resolve=True)
+    payload = json.dumps(container, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def instantiate_datamodule(data_cfg: DictConfig, reuse: bool = False) -> "LightningDataModule":
+    """設定からデータモジュールをインスタンス化します。
+
+    `reuse=True`の場合、インスタンスはデータ設定のハッシュをキーとしてプロセス内にキャッシュされ、
+    同じデータ設定を持つ後続のジョブ（Hydraのマルチランなど）では、準備・読み込み済みのデータセットと
+    データローダー（永続ワーカーを含む）がそのまま再利用されます。
+
+    :param data_cfg: データモジュール設定を含むDictConfigオブジェクト。
+    :param reuse: 同一プロセス内でデータモジュールを再利用するかどうか。デフォルトは`False`。
+    :return: インスタンス化された（またはキャッシュされた）データモジュール。
+    """
+    if not reuse:
+        log.info(f"データモジュールをインスタンス化しています <{data_cfg._target_}>")
+        return hydra.utils.instantiate(data_cfg)
+
+    key = config_hash(data_cfg)
+    if key in _DATAMODULE_CACHE:
+        log.info(f"キャッシュされたデータモジュールを再利用します <{data_cfg._target_}> <hash={key[:8]}>")
+        _DATAMODULE_CACHE.move_to_end(key)
+        datamodule = _DATAMODULE_CACHE[key]
+        # 前のジョブのトレーナー（とそれが参照するモデル）を保持し続けないように切り離します
+        datamodule.trainer = None
+        return datamodule
+
+    log.info(f"データモジュールをインスタンス化しています <{data_cfg._target_}> <hash={key[:8]}>")
+    datamodule = hydra.utils.instantiate(data_cfg)
+    _DATAMODULE_CACHE[key] = datamodule
+    while len(_DATAMODULE_CACHE) > _DATAMODULE_CACHE_SIZE:
+        _DATAMODULE_CACHE.popitem(last=False)
+    return datamodule
+
+
+def clear_datamodule_cache() -> None:
+    """`instantiate_datamodule`によってキャッシュされたデータモジュールをすべて破棄します。"""
+    _DATAMODULE_CACHE.clear()
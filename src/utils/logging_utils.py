@@ -4,6 +4,7 @@ from lightning_utilities.core.rank_zero import rank_zero_only
 from omegaconf import OmegaConf
 
 from src.utils import pylogger
+from src.utils.inference_utils import model_size_mb
 
 log = pylogger.RankedLogger(__name__, rank_zero_only=True)
 
@@ -14,6 +15,7 @@ def log_hyperparameters(object_dict: Dict[str, Any]) -> None:
 
     さらに以下を保存します：
         - モデルのパラメータ数
+        - モデルのパラメータとバッファのサイズ（MB）
 
     :param object_dict: 以下のオブジェクトを含む辞書：
         - `"cfg"`: メイン設定を含むDictConfigオブジェクト。
@@ -41,6 +43,9 @@ def log_hyperparameters(object_dict: Dict[str, Any]) -> None:
         p.numel() for p in model.parameters() if not p.requires_grad
     )
 
+    # モデルのメモリサイズを保存（トレーニング中のメモリは`MemoryMonitor`コールバックで計測します）
+    hparams["model/size_mb"] = model_size_mb(model)
+
     hparams["data"] = cfg["data"]
     hparams["trainer"] = cfg["trainer"]
 
@@ -0,0 +1,228 @@
+import copy
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from omegaconf import DictConfig, OmegaConf, open_dict
+
+from src.utils import pylogger
+from src.utils.instantiators import config_hash
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+# ファイルのチェックサムのキャッシュ（パス -> (サイズ, 更新時刻, チェックサム)）
+_CHECKSUM_CACHE: Dict[str, Any] = {}
+_CHECKSUM_CACHE_FILE = "checksums.json"
+
+
+def _load_checksum_cache(memo_dir: Path) -> None:
+    """ディスク上のファイルのチェックサムのキャッシュを読み込みます。
+
+    :param memo_dir: メモ化の結果を保存するディレクトリ。
+    """
+    path = memo_dir / _CHECKSUM_CACHE_FILE
+    if not _CHECKSUM_CACHE and path.exists():
+        try:
+            _CHECKSUM_CACHE.update(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            log.warning(f"チェックサムのキャッシュを読み込めませんでした！ <{path}>")
+
+
+def _save_checksum_cache(memo_dir: Path) -> None:
+    """ファイルのチェックサムのキャッシュをディスクに保存します。
+
+    :param memo_dir: メモ化の結果を保存するディレクトリ。
+    """
+    memo_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = memo_dir / f"{_CHECKSUM_CACHE_FILE}.{os.getpid()}.tmp"
+    tmp_path.write_text(json.dumps(_CHECKSUM_CACHE))
+    os.replace(tmp_path, memo_dir / _CHECKSUM_CACHE_FILE)
+
+
+def file_checksum(path: Path) -> str:
+    """ファイルの内容のSHA-1チェックサムを計算します。
+
+    サイズと更新時刻が変わっていないファイルは、キャッシュされたチェックサムを返します。
+
+    :param path: チェックサムを計算するファイルのパス。
+    :return: ファイルの内容のSHA-1ハッシュの16進数文字列。
+    """
+    stat = path.stat()
+    key = str(path.resolve())
+    cached = _CHECKSUM_CACHE.get(key)
+    if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+        return cached[2]
+
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    checksum = sha1.hexdigest()
+    _CHECKSUM_CACHE[key] = [stat.st_size, stat.st_mtime_ns, checksum]
+    return checksum
+
+
+def tree_checksum(root: Path, patterns: Iterable[str] = ("**/*",)) -> str:
+    """ディレクトリ以下のファイルの相対パスと内容から、まとめたチェックサムを計算します。
+
+    :param root: チェックサムを計算するディレクトリ。存在しない場合は空のディレクトリとして扱います。
+    :param patterns: 対象のファイルを選ぶglobパターン。デフォルトはすべてのファイル。
+    :return: SHA-1ハッシュの16進数文字列。
+    """
+    files = set()
+    if root.is_dir():
+        for pattern in patterns:
+            files.update(path for path in root.glob(pattern) if path.is_file())
+
+    sha1 = hashlib.sha1()
+    for path in sorted(files):
+        if "__pycache__" in path.parts:
+            continue
+        sha1.update(f"{path.relative_to(root).as_posix()}:{file_checksum(path)}\n".encode())
+    return sha1.hexdigest()
+
+
+def data_checksum(data_cfg: DictConfig) -> Optional[str]:
+    """データモジュールがディスクから読み込むデータのファイルから、まとめたチェックサムを計算します。
+
+    データモジュールの`data_artifacts()`が返すパス（MNISTのダウンロードしたファイルなど）だけを対象とするため、
+    同じデータディレクトリに書き込まれる派生キャッシュ（他の実験の合成データのメモリマップや
+    `FrozenFeatureCache`の特徴量など）はチェックサムに影響しません。`data_artifacts()`を持たない
+    データモジュールの場合は、データディレクトリ全体を対象とします。
+
+    :param data_cfg: データモジュールの設定。
+    :return: SHA-1ハッシュの16進数文字列。データモジュールがディスクからデータを読み込まない場合は`None`。
+    """
+    import hydra
+
+    datamodule = hydra.utils.instantiate(data_cfg) if "_target_" in data_cfg else None
+    if hasattr(datamodule, "data_artifacts"):
+        artifacts = [Path(path) for path in datamodule.data_artifacts()]
+    else:
+        data_dir = data_cfg.get("data_dir")
+        artifacts = [Path(data_dir)] if data_dir else []
+    if not artifacts:
+        return None
+
+    # パスはマシンごとに異なるため、データモジュールが返す順序と内容だけを使用します
+    sha1 = hashlib.sha1()
+    for i, path in enumerate(artifacts):
+        if path.is_dir():
+            checksum = tree_checksum(path)
+        elif path.is_file():
+            checksum = file_checksum(path)
+        else:
+            checksum = "missing"
+        sha1.update(f"{i}:{checksum}\n".encode())
+    return sha1.hexdigest()
+
+
+def run_fingerprint(cfg: DictConfig) -> str:
+    """実行結果を一意に決める要素から、実行のフィンガープリントを計算します。
+
+    フィンガープリントは以下から計算されます：
+        - `memoize.exclude`のキー（パスやロガーなど結果に影響しないもの）を除いた解決済みの設定
+          （パスはプレースホルダーに置き換えてから解決するため、出力ディレクトリの違いは無視されます）
+        - データモジュールが読み込むデータのファイルのチェックサム（`data_checksum`を参照）
+        - ソースツリー（`src/`以下の`.py`ファイル）のチェックサム
+        - 再開するチェックポイント（`ckpt_path`）のチェックサム
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: フィンガープリントのSHA-1ハッシュの16進数文字列。
+    """
+    memo_dir = Path(cfg.memoize.dir)
+    _load_checksum_cache(memo_dir)
+
+    root_dir = Path(cfg.paths.root_dir)
+    ckpt_path = cfg.get("ckpt_path")
+
+    stable_cfg = copy.deepcopy(cfg)
+    with open_dict(stable_cfg):
+        # 出力先などのパスは実行ごとに異なるため、参照元の値をプレースホルダーに置き換えます
+        for key in list(stable_cfg.get("paths") or {}):
+            stable_cfg.paths[key] = f"<{key}>"
+        for key in cfg.memoize.get("exclude") or []:
+            if OmegaConf.select(stable_cfg, key, default=None) is not None:
+                parent, _, leaf = key.rpartition(".")
+                node = OmegaConf.select(stable_cfg, parent) if parent else stable_cfg
+                del node[leaf]
+
+    components = {
+        "config": config_hash(stable_cfg),
+        "data": data_checksum(cfg.data),
+        "source": tree_checksum(root_dir / "src", patterns=("**/*.py",)),
+        "ckpt": file_checksum(Path(ckpt_path)) if ckpt_path else None,
+    }
+    _save_checksum_cache(memo_dir)
+
+    payload = json.dumps(components, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def load_memoized_result(memo_dir: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """同じフィンガープリントの完了済みの実行の結果を読み込みます。
+
+    :param memo_dir: メモ化の結果を保存するディレクトリ。
+    :param fingerprint: 実行のフィンガープリント。
+    :return: `metric_dict`（メトリクス名と値）と`output_dir`（元の実行の出力ディレクトリ）を含む辞書。
+        完了済みの実行がない場合は`None`。
+    """
+    path = Path(memo_dir) / f"{fingerprint}.json"
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        log.warning(f"メモ化された結果を読み込めませんでした！再計算します... <{path}>")
+        return None
+
+
+def save_memoized_result(
+    memo_dir: str, fingerprint: str, metric_dict: Dict[str, Any], output_dir: str
+) -> None:
+    """完了した実行の結果をフィンガープリントをキーとして保存します。
+
+    :param memo_dir: メモ化の結果を保存するディレクトリ。
+    :param fingerprint: 実行のフィンガープリント。
+    :param metric_dict: 実行のメトリクス。値はテンソルまたは数値です。
+    :param output_dir: 実行の出力ディレクトリ。
+    """
+    memo_dir_path = Path(memo_dir)
+    memo_dir_path.mkdir(parents=True, exist_ok=True)
+    result = {
+        "fingerprint": fingerprint,
+        "metric_dict": {name: float(value) for name, value in metric_dict.items()},
+        "output_dir": str(output_dir),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    tmp_path = memo_dir_path / f"{fingerprint}.json.{os.getpid()}.tmp"
+    tmp_path.write_text(json.dumps(result, indent=2))
+    os.replace(tmp_path, memo_dir_path / f"{fingerprint}.json")
+
+
+def reuse_memoized_result(result: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+    """メモ化された結果を現在の実行の結果として使用できるようにします。
+
+    元の実行のチェックポイントを現在の出力ディレクトリから参照できるようにシンボリックリンクを作成し
+    （逐次半減法の次の段階などがチェックポイントを見つけられるように）、メトリクスをテンソルに戻します。
+
+    :param result: `load_memoized_result`で読み込んだ結果。
+    :param output_dir: 現在の実行の出力ディレクトリ。
+    :return: メトリクス名とテンソルの値の`metric_dict`。
+    """
+    import torch
+
+    log.info(
+        "設定・データ・ソースコードが同じ完了済みの実行の結果を使用します！"
+        f"（再計算するには`memoize.force=True`を指定します） <output_dir={result['output_dir']}>"
+    )
+    src_ckpt_dir = Path(result["output_dir"]) / "checkpoints"
+    dst_ckpt_dir = Path(output_dir) / "checkpoints"
+    if src_ckpt_dir.is_dir() and not dst_ckpt_dir.exists() and src_ckpt_dir != dst_ckpt_dir:
+        dst_ckpt_dir.parent.mkdir(parents=True, exist_ok=True)
+        dst_ckpt_dir.symlink_to(src_ckpt_dir.resolve(), target_is_directory=True)
+
+    return {name: torch.tensor(value) for name, value in result["metric_dict"].items()}
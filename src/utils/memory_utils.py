@@ -0,0 +1,80 @@
+import os
+from typing import List, Optional
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def process_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """プロセスの常駐メモリサイズ（RSS）を返します。
+
+    `psutil`がインストールされている場合はそれを使用し、そうでない場合はLinuxの`/proc`から求めます。
+
+    :param pid: プロセスID。`None`の場合は現在のプロセス。
+    :return: RSS（MB）。取得できない場合は`None`。
+    """
+    pid = os.getpid() if pid is None else pid
+    try:
+        import psutil
+
+        return psutil.Process(pid).memory_info().rss / 2**20
+    except ImportError:
+        pass
+    except Exception:
+        # プロセスが終了した場合など
+        return None
+
+    try:
+        with open(f"/proc/{pid}/statm") as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE / 2**20
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def child_pids(pid: Optional[int] = None) -> List[int]:
+    """プロセスの子孫プロセス（データローダーのワーカーなど）のIDを返します。
+
+    :param pid: プロセスID。`None`の場合は現在のプロセス。
+    :return: 子孫プロセスのIDのリスト。取得できない場合は空のリスト。
+    """
+    pid = os.getpid() if pid is None else pid
+    try:
+        import psutil
+
+        return [child.pid for child in psutil.Process(pid).children(recursive=True)]
+    except ImportError:
+        pass
+    except Exception:
+        return []
+
+    # `/proc/*/stat`の親プロセスIDから子孫をたどります
+    parents = {}
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return []
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                # コマンド名に空白が含まれる可能性があるため、最後の')'以降をフィールドとして扱います
+                fields = file.read().rsplit(")", 1)[1].split()
+            parents[int(entry)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+    children, frontier = [], [pid]
+    while frontier:
+        parent = frontier.pop()
+        for child, child_parent in parents.items():
+            if child_parent == parent:
+                children.append(child)
+                frontier.append(child)
+    return children
+
+
+def children_rss_mb(pid: Optional[int] = None) -> float:
+    """プロセスの子孫プロセスのRSSの合計を返します。
+
+    :param pid: プロセスID。`None`の場合は現在のプロセス。
+    :return: 子孫プロセスのRSSの合計（MB）。
+    """
+    return sum(rss or 0.0 for rss in map(process_rss_mb, child_pids(pid)))
@@ -0,0 +1,47 @@
+from typing import TYPE_CHECKING, Dict, Optional
+
+from src.utils import pylogger
+
+if TYPE_CHECKING:
+    from optuna.trial import Trial
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+# 同一プロセス内で実行中のジョブ番号（`hydra.job.num`）とOptunaの試行の対応
+_TRIALS: Dict[int, "Trial"] = {}
+
+
+def register_trial(job_num: int, trial: "Trial") -> None:
+    """ジョブ番号に対応するOptunaの試行を登録します。スイーパーがジョブを起動する前に呼び出します。
+
+    :param job_num: ジョブ番号（`hydra.job.num`）。
+    :param trial: ジョブが評価するOptunaの試行。
+    """
+    _TRIALS[job_num] = trial
+
+
+def unregister_trial(job_num: int) -> None:
+    """ジョブ番号に対応するOptunaの試行の登録を解除します。
+
+    :param job_num: ジョブ番号（`hydra.job.num`）。
+    """
+    _TRIALS.pop(job_num, None)
+
+
+def get_current_trial() -> Optional["Trial"]:
+    """現在のHydraジョブが評価しているOptunaの試行を返します。
+
+    試行はスイーパーと同じプロセスで実行されるジョブ（Hydraの基本ランチャーなど）でのみ取得できます。
+
+    :return: 現在のジョブのOptunaの試行。スイープ中でない場合や、別のプロセスで実行されている場合は`None`。
+    """
+    if not _TRIALS:
+        return None
+
+    from hydra.core.hydra_config import HydraConfig
+    from omegaconf import OmegaConf
+
+    if not HydraConfig.initialized():
+        return None
+    # `hydra.job.num`はマルチランでのみ設定されます
+    return _TRIALS.get(OmegaConf.select(HydraConfig.get(), "job.num", default=None))
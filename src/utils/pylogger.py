@@ -1,9 +1,27 @@
 import logging
+import os
 from typing import Mapping, Optional
 
 from lightning_utilities.core.rank_zero import rank_prefixed_message, rank_zero_only
 
 
+def _rank_from_env() -> int:
+    """環境変数からプロセスのランクを求めます（`lightning`のインポート時と同じ規則）。
+
+    :return: プロセスのランク。ランクを示す環境変数がない場合は`0`。
+    """
+    for key in ("RANK", "LOCAL_RANK", "SLURM_PROCID", "JSM_NAMESPACE_RANK"):
+        rank = os.environ.get(key)
+        if rank is not None:
+            return int(rank)
+    return 0
+
+
+# `rank_zero_only.rank`は通常`lightning`のインポート時に設定されますが、
+# `lightning`は必要になるまでインポートされないため、ここで同じ値を設定しておきます
+rank_zero_only.rank = getattr(rank_zero_only, "rank", _rank_from_env())
+
+
 class RankedLogger(logging.LoggerAdapter):
     """マルチGPU対応のPythonコマンドラインロガー。"""
 
@@ -1,13 +1,9 @@
 from pathlib import Path
 from typing import Sequence
 
-import rich
-import rich.syntax
-import rich.tree
 from hydra.core.hydra_config import HydraConfig
 from lightning_utilities.core.rank_zero import rank_zero_only
 from omegaconf import DictConfig, OmegaConf, open_dict
-from rich.prompt import Prompt
 
 from src.utils import pylogger
 
@@ -37,6 +33,11 @@ def print_config_tree(
     :param resolve: DictConfigの参照フィールドを解決するかどうか。デフォルトは``False``です。
     :param save_to_file: 設定をHydra出力フォルダにエクスポートするかどうか。デフォルトは``False``です。
     """
+    # richはインポートに時間がかかるため、表示するときにのみインポートします
+    import rich
+    import rich.syntax
+    import rich.tree
+
     style = "dim"
     tree = rich.tree.Tree("CONFIG", style=style, guide_style=style)
 
@@ -81,6 +82,9 @@ def enforce_tags(cfg: DictConfig, save_to_file: bool = False) -> None:
     :param cfg: Hydraによって構成されたDictConfig。
     :param save_to_file: タグをHydra出力フォルダにエクスポートするかどうか。デフォルトは``False``です。
     """
+    import rich
+    from rich.prompt import Prompt
+
     if not cfg.get("tags"):
         if "id" in HydraConfig().cfg.hydra.job:
             raise ValueError("マルチランを開始する前にタグを指定してください！")
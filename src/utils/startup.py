@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from src.utils import pylogger
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+def process_uptime() -> Optional[float]:
+    """現在のプロセスが開始されてからの経過秒数を返します。
+
+    `psutil`がインストールされている場合はそれを使用し、そうでない場合はLinuxの`/proc`から求めます。
+
+    :return: プロセス開始からの経過秒数。取得できない場合は`None`。
+    """
+    try:
+        import psutil
+
+        return time.time() - psutil.Process().create_time()
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/stat") as file:
+            # コマンド名に空白が含まれる可能性があるため、最後の')'以降をフィールドとして扱います
+            fields = file.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as file:
+            system_uptime = float(file.read().split()[0])
+        start_ticks = int(fields[19])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def import_time_breakdown(module: str, top_k: int = 15) -> Dict[str, Any]:
+    """`python -X importtime`を新しいプロセスで実行し、モジュールのインポート時間の内訳を返します。
+
+    :param module: インポートするモジュール名（例：`"src.train"`）。
+    :param top_k: 内訳に含める、インポート時間の大きいトップレベルパッケージの数。デフォルトは`15`。
+    :return: 以下を含む辞書：
+        - `"total_sec"`: サブプロセスの実行時間（インタプリタの起動を含む）。
+        - `"import_sec"`: `module`のインポートにかかった累積時間。
+        - `"packages"`: トップレベルパッケージごとのインポート時間（自己時間の合計、秒）の降順リスト。
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_sec = time.perf_counter() - start
+
+    # 各行の形式: "import time: self [us] | cumulative | imported package"
+    # 自己時間をトップレベルパッケージごとに合計することで、二重計上せずに内訳を求めます
+    self_us_by_package: Dict[str, int] = {}
+    import_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (
+            part.strip() for part in line[len("import time:") :].split("|")
+        )
+        if not self_us.isdigit():
+            continue
+        if name == module:
+            import_us = int(cumulative_us)
+        package = name.split(".")[0]
+        self_us_by_package[package] = self_us_by_package.get(package, 0) + int(self_us)
+
+    packages: List[Dict[str, Any]] = [
+        {"package": name, "self_sec": us / 1e6}
+        for name, us in sorted(self_us_by_package.items(), key=lambda item: item[1], reverse=True)
+    ]
+    return {
+        "module": module,
+        "total_sec": total_sec,
+        "import_sec": import_us / 1e6,
+        "packages": packages[:top_k],
+    }
+
+
+if __name__ == "__main__":
+    breakdown = import_time_breakdown(sys.argv[1] if len(sys.argv) > 1 else "src.train")
+    print(f"{breakdown['module']}: total={breakdown['total_sec']:.3f}s import={breakdown['import_sec']:.3f}s")
+    for item in breakdown["packages"]:
+        print(f"  {item['package']:<30} {item['self_sec']:.3f}s")
@@ -0,0 +1,281 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import hydra
+from omegaconf import DictConfig, OmegaConf
+
+from src.utils import pylogger
+from src.utils.benchmark_utils import hardware_info
+from src.utils.instantiators import config_hash, instantiate_datamodule
+
+if TYPE_CHECKING:
+    from lightning import Callback, LightningDataModule, LightningModule, Trainer
+
+log = pylogger.RankedLogger(__name__, rank_zero_only=True)
+
+
+def tune_fingerprint(cfg: DictConfig) -> str:
+    """チューニング結果を一意に決める要素から、キャッシュのキーを計算します。
+
+    チューニングの対象の値（バッチサイズと学習率）を除いたモデル・データの設定、チューニングの設定、
+    ハードウェアの情報から計算されるため、同じ環境で同じモデルとデータを使用する後続の実行では
+    探索をスキップできます。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: キャッシュのキーのSHA-1ハッシュの16進数文字列。
+    """
+    tune_cfg = cfg.tune
+    stable_cfg = OmegaConf.create(
+        {
+            "model": OmegaConf.to_container(cfg.model, resolve=True),
+            "data": OmegaConf.to_container(cfg.data, resolve=True),
+        }
+    )
+    for key in (tune_cfg.batch_size_key, tune_cfg.lr_key):
+        parent, _, leaf = key.rpartition(".")
+        node = OmegaConf.select(stable_cfg, parent) if parent else stable_cfg
+        if node is not None and leaf in node:
+            del node[leaf]
+
+    stable_cfg.tune = {
+        "batch_size": OmegaConf.to_container(tune_cfg.batch_size, resolve=True),
+        "lr": OmegaConf.to_container(tune_cfg.lr, resolve=True),
+    }
+    stable_cfg.hardware = {
+        **hardware_info(cfg.trainer.get("accelerator")),
+        "devices": str(cfg.trainer.get("devices")),
+        "precision": str(cfg.trainer.get("precision")),
+    }
+    return config_hash(stable_cfg)
+
+
+def _instantiate_model(cfg: DictConfig) -> "LightningModule":
+    """チューニング用のモデルをインスタンス化します。
+
+    探索中は検証を行わないため、検証メトリクスを監視する学習率スケジューラは無効にします。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: インスタンス化されたモデル。
+    """
+    if "scheduler" in cfg.model:
+        return hydra.utils.instantiate(cfg.model, scheduler=None)
+    return hydra.utils.instantiate(cfg.model)
+
+
+def _instantiate_trainer(
+    cfg: DictConfig, max_steps: int, callbacks: Optional[List["Callback"]] = None
+) -> "Trainer":
+    """チューニング用に、ロガー・チェックポイント・検証を無効にしたトレーナーをインスタンス化します。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param max_steps: トレーニングステップの最大数。
+    :param callbacks: トレーナーに渡すコールバックのリスト。
+    :return: インスタンス化されたトレーナー。
+    """
+    return hydra.utils.instantiate(
+        cfg.trainer,
+        callbacks=callbacks or [],
+        logger=False,
+        default_root_dir=cfg.tune.dir,
+        min_epochs=None,
+        max_epochs=-1,
+        max_steps=max_steps,
+        limit_val_batches=0,
+        num_sanity_val_steps=0,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+    )
+
+
+def search_batch_size(
+    cfg: DictConfig,
+    datamodule: "LightningDataModule",
+    candidates: Sequence[int],
+    memory_budget_mb: Optional[float] = None,
+    throughput_tolerance: float = 0.05,
+    num_warmup: int = 3,
+    num_steps: int = 10,
+) -> Tuple[Optional[int], Dict[int, float]]:
+    """メモリの予算内で、スループット（サンプル/秒）が最も高いバッチサイズを探索します。
+
+    候補を小さい順に数ステップずつトレーニングしてスループットを計測し、メモリ不足になるか、
+    GPUの最大メモリ使用量が`memory_budget_mb`を超えた時点で探索を打ち切ります。
+    最も高いスループットとの差が`throughput_tolerance`以内の候補のうち、最大のバッチサイズを選びます。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param datamodule: トレーニングに使用するデータモジュール。`hparams.batch_size`は探索後に元に戻します。
+    :param candidates: バッチサイズの候補。
+    :param memory_budget_mb: GPUの最大メモリ使用量の上限（MB）。`None`の場合はメモリ不足になるまで探索します。
+        CPUではメモリ使用量を計測しないため無視されます。
+    :param throughput_tolerance: 最も高いスループットに対して許容する相対的な差。デフォルトは`0.05`。
+    :param num_warmup: 計測から除外する最初のステップの数。デフォルトは`3`。
+    :param num_steps: 候補ごとに計測するステップの数。デフォルトは`10`。
+    :return: 選ばれたバッチサイズ（メモリに収まる候補がない場合は`None`）と、バッチサイズごとのスループットの辞書。
+    """
+    from lightning.pytorch.utilities.memory import garbage_collection_cuda, is_oom_error
+
+    from src.callbacks.throughput_meter import ThroughputMeter
+
+    original_batch_size = datamodule.hparams.batch_size
+    throughputs: Dict[int, float] = {}
+    try:
+        for batch_size in sorted(candidates):
+            datamodule.hparams.batch_size = batch_size
+            meter = ThroughputMeter(num_warmup=num_warmup)
+            trainer = _instantiate_trainer(cfg, max_steps=num_warmup + num_steps, callbacks=[meter])
+            try:
+                trainer.fit(model=_instantiate_model(cfg), datamodule=datamodule)
+            except RuntimeError as exception:
+                if not is_oom_error(exception):
+                    raise
+                garbage_collection_cuda()
+                log.info(f"メモリ不足になりました！探索を終了します... <batch_size={batch_size}>")
+                break
+
+            if (
+                memory_budget_mb is not None
+                and meter.peak_memory_mb is not None
+                and meter.peak_memory_mb > memory_budget_mb
+            ):
+                log.info(
+                    f"メモリの予算を超えました！探索を終了します... <batch_size={batch_size}, "
+                    f"peak_memory_mb={meter.peak_memory_mb:.1f}, memory_budget_mb={memory_budget_mb}>"
+                )
+                break
+            if meter.samples_per_sec is None:
+                continue
+
+            throughputs[batch_size] = meter.samples_per_sec
+            log.info(
+                f"バッチサイズのスループットを計測しました <batch_size={batch_size}, "
+                f"samples_per_sec={meter.samples_per_sec:.1f}>"
+            )
+    finally:
+        datamodule.hparams.batch_size = original_batch_size
+
+    if not throughputs:
+        return None, throughputs
+    best = max(throughputs.values())
+    batch_size = max(bs for bs, value in throughputs.items() if value >= best * (1 - throughput_tolerance))
+    return batch_size, throughputs
+
+
+def lr_range_test(
+    cfg: DictConfig,
+    datamodule: "LightningDataModule",
+    batch_size: int,
+    min_lr: float = 1e-6,
+    max_lr: float = 1.0,
+    num_steps: int = 100,
+) -> Optional[float]:
+    """学習率を指数的に増やしながらトレーニングするLR range testで、学習率を推定します。
+
+    Lightningの`Tuner.lr_find`を使用し、損失の減少が最も急な学習率を返します。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :param datamodule: トレーニングに使用するデータモジュール。`hparams.batch_size`はテスト後に元に戻します。
+    :param batch_size: テストに使用するバッチサイズ。
+    :param min_lr: 最小の学習率。デフォルトは`1e-6`。
+    :param max_lr: 最大の学習率。デフォルトは`1.0`。
+    :param num_steps: テストするステップ（学習率）の数。デフォルトは`100`。
+    :return: 推定された学習率。推定できなかった場合は`None`。
+    """
+    from lightning.pytorch.tuner import Tuner
+
+    original_batch_size = datamodule.hparams.batch_size
+    datamodule.hparams.batch_size = batch_size
+    try:
+        trainer = _instantiate_trainer(cfg, max_steps=num_steps)
+        lr_finder = Tuner(trainer).lr_find(
+            _instantiate_model(cfg),
+            datamodule=datamodule,
+            min_lr=min_lr,
+            max_lr=max_lr,
+            num_training=num_steps,
+            update_attr=False,
+        )
+    finally:
+        datamodule.hparams.batch_size = original_batch_size
+
+    return lr_finder.suggestion() if lr_finder is not None else None
+
+
+def tune_hyperparameters(cfg: DictConfig) -> Dict[str, Any]:
+    """トレーニングの前にバッチサイズと学習率を探索し、結果を設定に反映します。
+
+    結果は`tune_fingerprint`をキーとして`tune.dir`に保存され、同じモデル・データ・ハードウェアの
+    後続の実行では探索せずに再利用されます（`tune.force=True`で再探索します）。
+    見つかった値は`tune.batch_size_key`と`tune.lr_key`で指定された設定のキーに書き込まれるため、
+    その後にインスタンス化されるデータモジュールとモデルに反映されます。
+
+    :param cfg: Hydraによって構成されたDictConfig設定。
+    :return: `batch_size`と`lr`（探索しなかった、または見つからなかった場合は`None`）を含む辞書。
+    """
+    tune_cfg = cfg.tune
+    tune_dir = Path(tune_cfg.dir)
+    fingerprint = tune_fingerprint(cfg)
+    path = tune_dir / f"{fingerprint}.json"
+
+    result = None
+    if path.exists() and not tune_cfg.get("force"):
+        try:
+            result = json.loads(path.read_text())
+            log.info(f"キャッシュされたチューニング結果を使用します！ <{path}>")
+        except (OSError, ValueError):
+            log.warning(f"チューニング結果を読み込めませんでした！再探索します... <{path}>")
+
+    if result is None:
+        datamodule = instantiate_datamodule(cfg.data, reuse=cfg.get("reuse_datamodule", False))
+        batch_size = OmegaConf.select(cfg, tune_cfg.batch_size_key)
+        throughputs: Dict[int, float] = {}
+        if tune_cfg.batch_size.get("enabled"):
+            log.info("バッチサイズを探索しています...")
+            found, throughputs = search_batch_size(
+                cfg,
+                datamodule,
+                candidates=tune_cfg.batch_size.candidates,
+                memory_budget_mb=tune_cfg.batch_size.get("memory_budget_mb"),
+                throughput_tolerance=tune_cfg.batch_size.throughput_tolerance,
+                num_warmup=tune_cfg.batch_size.num_warmup,
+                num_steps=tune_cfg.batch_size.num_steps,
+            )
+            if found is None:
+                log.warning("メモリに収まるバッチサイズが見つかりませんでした！設定の値を使用します...")
+            batch_size = found or batch_size
+
+        lr = None
+        if tune_cfg.lr.get("enabled"):
+            log.info(f"LR range testで学習率を探索しています... <batch_size={batch_size}>")
+            lr = lr_range_test(
+                cfg,
+                datamodule,
+                batch_size=batch_size,
+                min_lr=tune_cfg.lr.min_lr,
+                max_lr=tune_cfg.lr.max_lr,
+                num_steps=tune_cfg.lr.num_steps,
+            )
+            if lr is None:
+                log.warning("学習率を推定できませんでした！設定の値を使用します...")
+
+        result = {
+            "fingerprint": fingerprint,
+            "batch_size": batch_size if tune_cfg.batch_size.get("enabled") else None,
+            "lr": lr,
+            "throughputs": {str(bs): value for bs, value in throughputs.items()},
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        tune_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = tune_dir / f"{fingerprint}.json.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps(result, indent=2))
+        os.replace(tmp_path, path)
+
+    if result.get("batch_size") is not None:
+        OmegaConf.update(cfg, tune_cfg.batch_size_key, result["batch_size"], force_add=True)
+    if result.get("lr") is not None:
+        OmegaConf.update(cfg, tune_cfg.lr_key, result["lr"], force_add=True)
+    log.info(f"チューニング結果 <batch_size={result.get('batch_size')}, lr={result.get('lr')}>")
+    return {"batch_size": result.get("batch_size"), "lr": result.get("lr")}
@@ -1,6 +1,6 @@
+import sys
 import warnings
-from importlib.util import find_spec
-from typing import Any, Callable, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
 
 from omegaconf import DictConfig
 
@@ -45,6 +45,7 @@ def task_wrapper(task_func: Callable) -> Callable:
 
     このラッパーは以下のために使用できます：
         - タスク関数が例外を発生させても、ロガーが確実に閉じられるようにする（マルチラン失敗を防ぐ）
+        - タスク関数が例外を発生させても、非同期ロガーのキューに残ったイベントを書き込む
         - 例外を`.log`ファイルに保存する
         - 専用のファイルを`logs/`フォルダに作成して実行を失敗としてマークする（後で見つけて再実行できるように）
         - その他（必要に応じて調整）
@@ -69,6 +70,13 @@ def task_wrapper(task_func: Callable) -> Callable:
 
         # 例外が発生した場合の処理
         except Exception as ex:
+            # Optunaによって枝刈りされた試行は失敗ではないため、スタックトレースを出さずに再送出します
+            # (スイーパーが枝刈り済みとして記録します)
+            optuna = sys.modules.get("optuna")
+            if optuna is not None and isinstance(ex, optuna.TrialPruned):
+                log.info(f"試行が枝刈りされました！ <{ex}>")
+                raise ex
+
             # 例外を`.log`ファイルに保存
             log.exception("")
 
@@ -82,10 +90,16 @@ def task_wrapper(task_func: Callable) -> Callable:
             # 出力ディレクトリのパスをターミナルに表示
             log.info(f"出力ディレクトリ: {cfg.paths.output_dir}")
 
-            # wandbがインストールされているか確認
-            if find_spec("wandb"):
-                import wandb
+            # 例外が発生しても非同期ロガーのキューに残ったイベントを書き込む
+            # (使用されていなければモジュールもインポートされていないため、ここでは新たにインポートしません)
+            async_logger = sys.modules.get("src.loggers.async_logger")
+            if async_logger is not None:
+                async_logger.close_async_loggers()
 
+            # wandbがインポート済みか確認（インポートされていなければランも存在しないため、
+            # 起動時間を増やさないようにここでは新たにインポートしません）
+            wandb = sys.modules.get("wandb")
+            if wandb is not None:
                 # 例外が発生してもwandbのランを常に閉じる（マルチランが失敗しないように）
                 if wandb.run:
                     log.info("wandbを閉じています！")
@@ -96,17 +110,23 @@ def task_wrapper(task_func: Callable) -> Callable:
     return wrap
 
 
-def get_metric_value(metric_dict: Dict[str, Any], metric_name: Optional[str]) -> Optional[float]:
+def get_metric_value(
+    metric_dict: Dict[str, Any], metric_name: Union[str, Sequence[str], None]
+) -> Union[float, List[float], None]:
     """LightningModuleでログに記録されたメトリックの値を安全に取得します。
 
     :param metric_dict: メトリック値を含む辞書。
-    :param metric_name: 提供された場合、取得するメトリックの名前。
-    :return: メトリック名が提供された場合、そのメトリックの値。
+    :param metric_name: 提供された場合、取得するメトリックの名前。名前のリストの場合は、
+        多目的最適化のためにそれぞれの値のリストを返します。
+    :return: メトリック名が提供された場合、そのメトリックの値（またはその値のリスト）。
     """
     if not metric_name:
         log.info("メトリック名がNoneです！メトリック値の取得をスキップします...")
         return None
 
+    if not isinstance(metric_name, str):
+        return [get_metric_value(metric_dict, name) for name in metric_name]
+
     if metric_name not in metric_dict:
         raise Exception(
             f"メトリック値が見つかりません！ <metric_name={metric_name}>\n"
@@ -1,6 +1,7 @@
 """このファイルは他のテスト用の設定フィクスチャを準備します。"""
 
 from pathlib import Path
+from typing import List
 
 import pytest
 import rootutils
@@ -8,6 +9,99 @@ from hydra import compose, initialize
 from hydra.core.global_hydra import GlobalHydra
 from omegaconf import DictConfig, open_dict
 
+from tests.helpers.perf_baseline import PerfBaseline
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """性能テストのコマンドラインオプションを追加します。
+
+    :param parser: pytestのコマンドラインパーサー。
+    """
+    parser.addoption(
+        "--run-perf",
+        action="store_true",
+        default=False,
+        help="性能テスト（`perf`マーカー）を実行します（`-m perf`でも実行されます）。",
+    )
+    parser.addoption(
+        "--update-perf-baselines",
+        action="store_true",
+        default=False,
+        help="性能テストを実行し、計測値で`tests/perf_baselines/`のベースラインを更新します。",
+    )
+    parser.addoption(
+        "--perf-tolerance",
+        type=float,
+        default=0.5,
+        help="性能テストで許容する、このマシンのベースラインからの相対的な悪化の割合（デフォルトは0.5）。",
+    )
+    parser.addoption(
+        "--perf-reference-tolerance",
+        type=float,
+        default=1.0,
+        help="このマシンのベースラインがない場合に、リファレンスのベースラインから許容する相対的な悪化の割合"
+        "（デフォルトは1.0）。",
+    )
+    parser.addoption(
+        "--perf-baseline-name",
+        default=None,
+        help="`--update-perf-baselines`で書き込むベースラインの名前（デフォルトはこのマシンのキー、"
+        "CIでは`reference`）。",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """テストのマーカーを登録します。
+
+    :param config: pytestの設定。
+    """
+    config.addinivalue_line("markers", "slow: 実行に時間がかかるテスト")
+    config.addinivalue_line("markers", "perf: 計測値をベースラインと比較する性能テスト")
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: List[pytest.Item]) -> None:
+    """明示的に指定されない限り、性能テストをスキップします。
+
+    計測値はマシンの負荷に左右されるため、`-m perf`、`--run-perf`、`--update-perf-baselines`の
+    いずれかを指定した場合にだけ実行します。
+
+    :param config: pytestの設定。
+    :param items: 収集されたテストのリスト。
+    """
+    if (
+        "perf" in (config.getoption("-m") or "")
+        or config.getoption("--run-perf")
+        or config.getoption("--update-perf-baselines")
+    ):
+        return
+    skip_perf = pytest.mark.skip(
+        reason="性能テストは`-m perf`または`--run-perf`を指定した場合にだけ実行します"
+    )
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip_perf)
+
+
+@pytest.fixture(scope="session")
+def perf_baseline(request: pytest.FixtureRequest) -> PerfBaseline:
+    """性能テストの計測値をハードウェアごとのベースライン（なければリファレンスのベースライン）と
+    比較するためのpytestフィクスチャ。
+
+    `--update-perf-baselines`を指定した場合は、セッションの終了時に計測値をベースラインのファイルに書き込みます。
+
+    :param request: pytestのリクエスト。
+    :return: `PerfBaseline`オブジェクト。
+    """
+    baseline = PerfBaseline(
+        Path(__file__).parent / "perf_baselines",
+        update=request.config.getoption("--update-perf-baselines"),
+        tolerance=request.config.getoption("--perf-tolerance"),
+        reference_tolerance=request.config.getoption("--perf-reference-tolerance"),
+        name=request.config.getoption("--perf-baseline-name"),
+    )
+    yield baseline
+    baseline.save()
+
 
 @pytest.fixture(scope="package")
 def cfg_train_global() -> DictConfig:
@@ -16,7 +110,8 @@ def cfg_train_global() -> DictConfig:
     :return: トレーニング用のデフォルトHydra設定を含むDictConfigオブジェクト。
     """
     with initialize(version_base="1.3", config_path="../configs"):
-        cfg = compose(config_name="train.yaml", return_hydra_config=True, overrides=[])
+        # ダウンロードなしでオフラインに実行できるよう、合成データを使用します
+        cfg = compose(config_name="train.yaml", return_hydra_config=True, overrides=["data=synthetic"])
 
         # すべてのテスト用のデフォルト設定
         with open_dict(cfg):
@@ -43,7 +138,11 @@ def cfg_eval_global() -> DictConfig:
     :return: 評価用のデフォルトHydra設定を含むDictConfig。
     """
     with initialize(version_base="1.3", config_path="../configs"):
-        cfg = compose(config_name="eval.yaml", return_hydra_config=True, overrides=["ckpt_path=."])
+        cfg = compose(
+            config_name="eval.yaml",
+            return_hydra_config=True,
+            overrides=["ckpt_path=.", "data=synthetic"],
+        )
 
         # すべてのテスト用のデフォルト設定
         with open_dict(cfg):
@@ -61,6 +160,60 @@ def cfg_eval_global() -> DictConfig:
     return cfg
 
 
+@pytest.fixture(scope="package")
+def cfg_predict_global() -> DictConfig:
+    """予測用のデフォルトHydra DictConfigを設定するためのpytestフィクスチャ。
+
+    :return: 予測用のデフォルトHydra設定を含むDictConfig。
+    """
+    with initialize(version_base="1.3", config_path="../configs"):
+        cfg = compose(
+            config_name="predict.yaml",
+            return_hydra_config=True,
+            overrides=["ckpt_path=.", "data=synthetic"],
+        )
+
+        # すべてのテスト用のデフォルト設定
+        with open_dict(cfg):
+            cfg.paths.root_dir = str(rootutils.find_root(indicator=".project-root"))
+            cfg.trainer.accelerator = "cpu"
+            cfg.trainer.devices = 1
+            cfg.data.num_workers = 0
+            cfg.data.pin_memory = False
+            cfg.extras.print_config = False
+            cfg.extras.enforce_tags = False
+            cfg.logger = None
+
+    return cfg
+
+
+@pytest.fixture(scope="package")
+def cfg_benchmark_global() -> DictConfig:
+    """ベンチマーク用のデフォルトHydra DictConfigを設定するためのpytestフィクスチャ。
+
+    :return: ベンチマーク用のデフォルトHydra設定を含むDictConfig。
+    """
+    with initialize(version_base="1.3", config_path="../configs"):
+        cfg = compose(
+            config_name="benchmark.yaml",
+            return_hydra_config=True,
+            overrides=["benchmark=quick", "data=synthetic"],
+        )
+
+        # すべてのテスト用のデフォルト設定
+        with open_dict(cfg):
+            cfg.paths.root_dir = str(rootutils.find_root(indicator=".project-root"))
+            cfg.trainer.accelerator = "cpu"
+            cfg.trainer.devices = 1
+            cfg.benchmark.device = "cpu"
+            cfg.data.num_workers = 0
+            cfg.data.pin_memory = False
+            cfg.extras.print_config = False
+            cfg.extras.enforce_tags = False
+
+    return cfg
+
+
 @pytest.fixture(scope="function")
 def cfg_train(cfg_train_global: DictConfig, tmp_path: Path) -> DictConfig:
     """`cfg_train_global()`フィクスチャの上に構築されたpytestフィクスチャで、一時的なログパスを生成するための
@@ -104,4 +257,47 @@ def cfg_eval(cfg_eval_global: DictConfig, tmp_path: Path) -> DictConfig:
 
     yield cfg
 
-    GlobalHydra.instance().clear()
\ No newline at end of file
+    GlobalHydra.instance().clear()
+
+
+@pytest.fixture(scope="function")
+def cfg_predict(cfg_predict_global: DictConfig, tmp_path: Path) -> DictConfig:
+    """`cfg_predict_global()`フィクスチャの上に構築されたpytestフィクスチャで、一時的なログパスを生成するための
+    一時的なログパス`tmp_path`を受け付けます。
+
+    :param cfg_predict_global: 変更される入力DictConfigオブジェクト。
+    :param tmp_path: 一時的なログパス。
+
+    :return: `tmp_path`に対応する更新された出力およびログディレクトリを持つDictConfig。
+    """
+    cfg = cfg_predict_global.copy()
+
+    with open_dict(cfg):
+        cfg.paths.output_dir = str(tmp_path)
+        cfg.paths.log_dir = str(tmp_path)
+
+    yield cfg
+
+    GlobalHydra.instance().clear()
+
+
+@pytest.fixture(scope="function")
+def cfg_benchmark(cfg_benchmark_global: DictConfig, tmp_path: Path) -> DictConfig:
+    """`cfg_benchmark_global()`フィクスチャの上に構築されたpytestフィクスチャで、一時的なログパスを生成するための
+    一時的なログパス`tmp_path`を受け付けます。
+
+    :param cfg_benchmark_global: 変更される入力DictConfigオブジェクト。
+    :param tmp_path: 一時的なログパス。
+
+    :return: `tmp_path`に対応する更新された出力およびログディレクトリを持つDictConfig。
+    """
+    cfg = cfg_benchmark_global.copy()
+
+    with open_dict(cfg):
+        cfg.paths.output_dir = str(tmp_path)
+        cfg.paths.log_dir = str(tmp_path)
+        cfg.benchmark.baseline_path = str(tmp_path / "baseline.json")
+
+    yield cfg
+
+    GlobalHydra.instance().clear()
@@ -0,0 +1,33 @@
+import os
+import signal
+from pathlib import Path
+from typing import Any
+
+from lightning.pytorch import Callback, LightningModule, Trainer
+
+
+class KillRank(Callback):
+    """指定したランクのプロセスを、指定したステップで一度だけ強制終了するコールバック。
+
+    ワーカーの障害を再現してエラスティックな起動（`src/elastic.py`）をテストするために使用します。
+    マーカーファイルが存在する場合は何もしないため、再開した後のトレーニングは終了されません。
+    """
+
+    def __init__(self, marker: str, rank: int = 1, step: int = 5) -> None:
+        """`KillRank`を初期化します。
+
+        :param marker: 強制終了したことを記録するファイルのパス。
+        :param rank: 強制終了するランク。デフォルトは`1`。
+        :param step: 強制終了するグローバルステップ。デフォルトは`5`。
+        """
+        self.marker = Path(marker)
+        self.rank = rank
+        self.step = step
+
+    def on_train_batch_end(
+        self, trainer: Trainer, pl_module: LightningModule, outputs: Any, batch: Any, batch_idx: int
+    ) -> None:
+        if trainer.global_rank != self.rank or trainer.global_step < self.step or self.marker.exists():
+            return
+        self.marker.touch()
+        os.kill(os.getpid(), signal.SIGKILL)
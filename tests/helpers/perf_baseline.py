@@ -0,0 +1,101 @@
+import json
+import re
+import warnings
+from pathlib import Path
+from typing import Dict, Optional
+
+import pytest
+
+from src.utils import compare_to_baseline, hardware_info
+
+
+def machine_key() -> str:
+    """ベースラインのファイル名に使用する、ハードウェアを識別するキーを返します。
+
+    :return: CPUの名前、コア数、PyTorchのバージョンから作成したキー（例：`"x86_64-8cores-torch2.9"`）。
+    """
+    info = hardware_info("cpu")
+    torch_version = ".".join(info["torch"].split("+")[0].split(".")[:2])
+    key = f"{info['device_name']}-{info['num_cores']}cores-torch{torch_version}"
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", key)
+
+
+# CI（リファレンス環境）で記録した、マシンごとのベースラインがない場合に使用するベースラインの名前
+REFERENCE_BASELINE = "reference"
+
+
+class PerfBaseline:
+    """性能テストの計測値を、コミットされたベースラインと許容範囲で比較するヘルパー。
+
+    ベースラインは`{directory}/{名前}.json`に保存されます。このマシンのベースライン（`{machine_key()}.json`）が
+    あればそれと`tolerance`で比較し、なければリファレンス環境のベースライン（`reference.json`）と、
+    マシンの違いを見込んだより広い`reference_tolerance`で比較します。適用できるベースラインにない
+    メトリクスのテストは失敗します。
+
+    `update=True`（`pytest --update-perf-baselines`）の場合だけ、比較せずに計測値を記録し、`save()`で
+    `{name}.json`（デフォルトはこのマシンのベースライン）に書き込みます。リファレンスのベースラインは
+    CIで`pytest -m perf --update-perf-baselines --perf-baseline-name reference`を実行して更新します。
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        update: bool = False,
+        tolerance: float = 0.5,
+        reference_tolerance: float = 1.0,
+        name: Optional[str] = None,
+    ) -> None:
+        """`PerfBaseline`を初期化します。
+
+        :param directory: ベースラインのファイルを保存するディレクトリ。
+        :param update: 比較せずにすべての計測値でベースラインを更新するかどうか。デフォルトは`False`。
+        :param tolerance: このマシンのベースラインに対して許容する相対的な悪化の割合。デフォルトは`0.5`（50%）。
+        :param reference_tolerance: リファレンスのベースラインに対して許容する相対的な悪化の割合。
+            デフォルトは`1.0`（100%）。
+        :param name: 更新するベースラインの名前。`None`の場合は`machine_key()`。
+        """
+        self.path = directory / f"{name or machine_key()}.json"
+        self.update = update
+        self.tolerance = tolerance
+        self.values: Dict[str, float] = {}
+        if self.path.exists():
+            self.values = json.loads(self.path.read_text())
+        elif not update and (directory / f"{REFERENCE_BASELINE}.json").exists():
+            self.path = directory / f"{REFERENCE_BASELINE}.json"
+            self.tolerance = reference_tolerance
+            self.values = json.loads(self.path.read_text())
+            warnings.warn(
+                f"このマシンのベースラインがないため、リファレンスのベースラインと比較します "
+                f"<path={self.path}, tolerance={self.tolerance:.0%}>"
+            )
+        self._dirty = False
+
+    def check(self, name: str, value: float) -> None:
+        """計測値をベースラインと比較し、許容範囲を超えて悪化していればテストを失敗させます。
+
+        :param name: メトリクス名（`*_per_sec`は大きいほど良く、それ以外は小さいほど良いとみなします）。
+        :param value: 計測値。
+        """
+        if self.update:
+            self.values[name] = value
+            self._dirty = True
+            return
+        if name not in self.values:
+            pytest.fail(
+                f"{name}のベースラインがありません！ <path={self.path}> "
+                "`pytest -m perf --update-perf-baselines`で記録してコミットしてください。"
+            )
+
+        regressions = compare_to_baseline({name: value}, self.values, tolerance=self.tolerance)
+        assert not regressions, (
+            f"{name}が悪化しました！ {self.values[name]:.4g} -> {value:.4g} "
+            f"({regressions[0]['change']:+.1%}, tolerance={self.tolerance:.0%}, baseline={self.path.name}) "
+            "意図した変更の場合は`pytest -m perf --update-perf-baselines`でベースラインを更新してください。"
+        )
+
+    def save(self) -> None:
+        """記録した計測値をベースラインのファイルに書き込みます。"""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(dict(sorted(self.values.items())), indent=2) + "\n")
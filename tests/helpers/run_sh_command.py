@@ -19,4 +19,4 @@ def run_sh_command(command: List[str]) -> None:
    except sh.ErrorReturnCode as e:
        msg = e.stderr.decode()
    if msg:
-       pytest.fail(msg=msg)
\ No newline at end of file
+       pytest.fail(reason=msg)
\ No newline at end of file
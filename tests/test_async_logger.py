@@ -0,0 +1,153 @@
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+from hydra.core.hydra_config import HydraConfig
+from lightning.pytorch.loggers import Logger
+from omegaconf import DictConfig, OmegaConf, open_dict
+
+from src.loggers.async_logger import AsyncLogger
+from src.train import train
+from src.utils import instantiate_loggers, task_wrapper
+
+
+class _RecordingLogger(Logger):
+    """呼び出しと、呼び出したスレッドを記録するテスト用のロガー。"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: List[Tuple[str, Any]] = []
+        self.threads = set()
+
+    @property
+    def name(self) -> str:
+        return "recording"
+
+    @property
+    def version(self) -> int:
+        return 0
+
+    def log_metrics(self, metrics: Dict[str, float], step: Optional[int] = None) -> None:
+        self.threads.add(threading.current_thread().name)
+        self.calls.append(("metrics", (metrics, step)))
+
+    def log_hyperparams(self, params: Any, *args: Any, **kwargs: Any) -> None:
+        self.calls.append(("hparams", params))
+
+    def save(self) -> None:
+        self.calls.append(("save", None))
+
+    def finalize(self, status: str) -> None:
+        self.calls.append(("finalize", status))
+
+
+def test_async_logger_batches_events() -> None:
+    """イベントがバックグラウンドのスレッドで順番に書き込まれ、同じステップのメトリクスと保存の要求が
+    まとめられることを検証するテスト。"""
+    inner = _RecordingLogger()
+    logger = AsyncLogger([inner], batch_size=64)
+
+    logger.log_hyperparams({"lr": 0.1})
+    for step in range(3):
+        logger.log_metrics({"a": step}, step=step)
+        logger.log_metrics({"b": step}, step=step)
+        logger.save()
+    logger.finalize("success")
+
+    # 書き込みのまとまり方はスレッドのタイミングに依存するため、ステップごとに集計して比較します
+    merged: Dict[int, Dict[str, float]] = {}
+    for kind, payload in inner.calls:
+        if kind == "metrics":
+            merged.setdefault(payload[1], {}).update(payload[0])
+    assert merged == {step: {"a": step, "b": step} for step in range(3)}
+    assert inner.calls[0] == ("hparams", {"lr": 0.1})
+    assert inner.calls[-1] == ("finalize", "success")
+    assert 1 <= sum(kind == "save" for kind, _ in inner.calls) <= 3
+    assert inner.threads == {"async-logger"}
+
+    # 1回の書き込みでは、同じステップの連続したメトリクスが1つにまとめられ、保存は最後に1回だけ実行されます
+    inner.calls.clear()
+    logger._write(
+        [
+            ("metrics", ({"a": 0}, 0)),
+            ("save", None),
+            ("metrics", ({"b": 0}, 0)),
+            ("metrics", ({"a": 1}, 1)),
+            ("save", None),
+        ]
+    )
+    assert inner.calls == [
+        ("metrics", ({"a": 0, "b": 0}, 0)),
+        ("metrics", ({"a": 1}, 1)),
+        ("save", None),
+    ]
+
+    logger.close()
+    assert not logger._thread.is_alive()
+
+    # 閉じた後のイベントは同期的に書き込まれます
+    logger.log_metrics({"a": 3}, step=3)
+    assert inner.calls[-1] == ("metrics", ({"a": 3}, 3))
+
+
+def test_task_wrapper_closes_async_logger_on_exception() -> None:
+    """タスクが例外を発生させても、`task_wrapper`がキューに残ったイベントを書き込むことを検証するテスト。"""
+    inner = _RecordingLogger()
+
+    @task_wrapper
+    def failing_task(cfg: DictConfig) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        logger = AsyncLogger([inner])
+        for step in range(100):
+            logger.log_metrics({"loss": float(step)}, step=step)
+        raise RuntimeError("failure")
+
+    with pytest.raises(RuntimeError):
+        failing_task(cfg=OmegaConf.create({"paths": {"output_dir": "."}}))
+
+    assert len([kind for kind, _ in inner.calls if kind == "metrics"]) == 100
+
+
+def test_instantiate_async_logger(tmp_path: Path) -> None:
+    """`_partial_: True`のロガーが他のロガーをラップしてインスタンス化されることを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    """
+    logger_cfg = OmegaConf.create(
+        {
+            "csv": {
+                "_target_": "lightning.pytorch.loggers.csv_logs.CSVLogger",
+                "save_dir": str(tmp_path),
+            },
+            "async": {"_target_": "src.loggers.async_logger.AsyncLogger", "_partial_": True},
+        }
+    )
+    loggers = instantiate_loggers(logger_cfg)
+    assert len(loggers) == 1 and isinstance(loggers[0], AsyncLogger)
+    assert type(loggers[0].loggers[0]).__name__ == "CSVLogger"
+    loggers[0].close()
+
+
+def test_train_async_logger(cfg_train: DictConfig, tmp_path: Path) -> None:
+    """非同期ロガーを使用したトレーニングで、CSVロガーにメトリクスが書き込まれることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    """
+    with open_dict(cfg_train):
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.trainer.log_every_n_steps = 1
+        cfg_train.logger = {
+            "csv": {
+                "_target_": "lightning.pytorch.loggers.csv_logs.CSVLogger",
+                "save_dir": str(tmp_path),
+                "name": "csv/",
+            },
+            "async": {"_target_": "src.loggers.async_logger.AsyncLogger", "_partial_": True},
+        }
+    HydraConfig().set_config(cfg_train)
+    train(cfg_train)
+
+    metrics_csv = next(tmp_path.glob("csv/**/metrics.csv")).read_text()
+    assert "train/loss" in metrics_csv
+    assert "test/acc" in metrics_csv
@@ -0,0 +1,56 @@
+import json
+from pathlib import Path
+
+import pytest
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.benchmark import benchmark
+from src.utils import compare_to_baseline
+
+
+def test_compare_to_baseline() -> None:
+    """スループットの低下と時間の増加が、許容範囲を超えた場合にのみ悪化として報告されることを検証するテスト。"""
+    baseline = {"a/samples_per_sec": 100.0, "a/step_ms": 10.0, "a/epoch_sec": 5.0, "b/step_ms": 1.0}
+    results = {"a/samples_per_sec": 70.0, "a/step_ms": 11.0, "a/epoch_sec": 7.0, "c/step_ms": 3.0}
+
+    regressions = compare_to_baseline(results, baseline, tolerance=0.2, tolerances={"a/epoch_sec": 0.5})
+
+    assert [r["name"] for r in regressions] == ["a/samples_per_sec"]
+    assert regressions[0]["change"] == pytest.approx(-0.3)
+
+
+@pytest.mark.slow
+def test_benchmark(cfg_benchmark: DictConfig, tmp_path: Path) -> None:
+    """ベンチマークの結果がJSONに保存され、ベースラインとの比較で悪化が検出されることを検証するテスト。
+
+    :param cfg_benchmark: 有効なベンチマーク設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    """
+    with open_dict(cfg_benchmark):
+        cfg_benchmark.benchmark.startup.enabled = False
+        cfg_benchmark.benchmark.update_baseline = True
+
+    HydraConfig().set_config(cfg_benchmark)
+    metric_dict, _ = benchmark(cfg_benchmark)
+
+    assert metric_dict["dataloader/samples_per_sec"] > 0
+    assert metric_dict["step/bs32/32/step_ms"] > 0
+    assert metric_dict["epoch/epoch_sec"] > 0
+    assert metric_dict["eval/samples_per_sec"] > 0
+    baseline = json.loads((tmp_path / "baseline.json").read_text())
+    assert baseline["results"] == pytest.approx(metric_dict)
+    assert baseline["metadata"]["hardware"]["num_cores"] > 0
+
+    # 1つのメトリクスのベースラインを100倍速くして、悪化として検出されることを確認します
+    # （他のメトリクスは計測のばらつきで検出される場合があるため、検証しません）
+    injected = "dataloader/samples_per_sec"
+    baseline["results"][injected] *= 100
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    with open_dict(cfg_benchmark):
+        cfg_benchmark.benchmark.update_baseline = False
+    _, object_dict = benchmark(cfg_benchmark)
+
+    assert injected in {r["name"] for r in object_dict["regressions"]}
+    output = json.loads((tmp_path / "benchmark.json").read_text())
+    assert injected in {r["name"] for r in output["metadata"]["regressions"]}
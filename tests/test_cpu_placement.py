@@ -0,0 +1,90 @@
+import os
+
+import pytest
+import torch
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.train import train
+from src.utils import (
+    apply_cpu_placement,
+    available_cores,
+    cpu_topology,
+    loader_worker_init_fn,
+    plan_cpu_placement,
+    restore_cpu_placement,
+)
+
+
+def test_plan_cpu_placement() -> None:
+    """ランクがNUMAノードごとに、計算スレッドとワーカーが互いに素なコアに割り当てられ、
+    計算スレッドの数がハイパースレッドを除いた物理コアの数になることを検証するテスト。"""
+    # 2つのNUMAノード（ソケット）にそれぞれ4つの物理コア、各物理コアに2つのハイパースレッド（cpuとcpu+8）
+    topology = sorted(
+        (
+            {"cpu": cpu + smt * 8, "node": cpu // 4, "socket": cpu // 4, "core": cpu % 4}
+            for cpu in range(8)
+            for smt in range(2)
+        ),
+        key=lambda c: (c["node"], c["socket"], c["core"], c["cpu"]),
+    )
+    placements = plan_cpu_placement(world_size=2, num_workers=2, topology=topology)
+
+    assert [p["nodes"] for p in placements] == [[0], [1]]
+    assert placements[0]["compute"] == [0, 8, 1, 9, 2, 10]
+    assert placements[0]["loader"] == [3, 11]
+    assert placements[0]["num_threads"] == 3
+    assert placements[1]["loader"] == [7, 15]
+    cores = [c for p in placements for c in p["compute"] + p["loader"]]
+    assert sorted(cores) == list(range(16))
+
+    smt = plan_cpu_placement(world_size=1, num_workers=0, topology=topology, use_smt=True)[0]
+    assert smt["loader"] == [] and smt["num_threads"] == 16
+
+    with pytest.raises(ValueError):
+        plan_cpu_placement(world_size=2, num_workers=2, loader_cores=8, topology=topology)
+
+
+def test_apply_cpu_placement() -> None:
+    """割り当ての適用でスレッド数とワーカーの`worker_init_fn`が設定され、元の状態に戻せることを検証するテスト。"""
+    topology = cpu_topology()
+    assert sorted(c["cpu"] for c in topology) == available_cores()
+    assert loader_worker_init_fn() is None
+
+    num_threads = torch.get_num_threads()
+    placement = {"compute": available_cores(), "loader": available_cores()[-1:], "num_threads": 1}
+    previous = apply_cpu_placement(placement)
+    try:
+        assert torch.get_num_threads() == 1
+        assert loader_worker_init_fn().args == (available_cores()[-1:],)
+    finally:
+        restore_cpu_placement(previous)
+    assert torch.get_num_threads() == num_threads
+    assert loader_worker_init_fn() is None
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "sched_setaffinity") or len(available_cores()) < 3, reason="3コア以上のLinuxが必要です"
+)
+def test_train_cpu_placement(cfg_train: DictConfig) -> None:
+    """`CpuPlacement`を使用してワーカーありでトレーニングでき、終了後にCPUアフィニティが元に戻ることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    """
+    cores = available_cores()
+    with open_dict(cfg_train):
+        cfg_train.test = False
+        cfg_train.trainer.accelerator = "cpu"
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.trainer.limit_train_batches = 4
+        cfg_train.trainer.limit_val_batches = 1
+        cfg_train.data.num_workers = 1
+        cfg_train.callbacks.cpu_placement = {"_target_": "src.callbacks.cpu_placement.CpuPlacement"}
+    HydraConfig().set_config(cfg_train)
+
+    _, object_dict = train(cfg_train)
+
+    callback = next(c for c in object_dict["callbacks"] if type(c).__name__ == "CpuPlacement")
+    assert len(callback.placement["loader"]) == 1
+    assert callback.placement["loader"][0] not in callback.placement["compute"]
+    assert available_cores() == cores
@@ -0,0 +1,88 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.data.components.kfold import kfold_indices
+from src.data.synthetic_datamodule import SyntheticDataModule
+from src.train import cross_validate
+from src.utils import aggregate_fold_metrics
+
+
+@pytest.mark.parametrize("num_samples,num_folds", [(10, 2), (103, 5)])
+def test_kfold_indices(num_samples: int, num_folds: int) -> None:
+    """各分割の検証のインデックスが互いに素で、合わせるとすべてのサンプルになることを確認します。
+
+    :param num_samples: サンプル数。
+    :param num_folds: 分割の数。
+    """
+    val_indices = []
+    for fold in range(num_folds):
+        train, val = kfold_indices(num_samples, num_folds, fold)
+        assert not set(train) & set(val)
+        assert len(train) + len(val) == num_samples
+        assert len(val) in (num_samples // num_folds, num_samples // num_folds + 1)
+        val_indices.extend(val)
+    assert sorted(val_indices) == list(range(num_samples))
+
+    with pytest.raises(ValueError):
+        kfold_indices(num_samples, num_folds, num_folds)
+
+
+def test_select_fold() -> None:
+    """分割を切り替えても、トレーニングと検証のデータセットの合計とテストセットが変わらないことを確認します。"""
+    dm = SyntheticDataModule(train_val_test_split=(80, 20, 10), batch_size=8)
+    dm.setup()
+    test_set = dm.data_test
+
+    for fold in range(4):
+        dm.select_fold(fold, num_folds=4)
+        assert len(dm.data_train) == 75
+        assert len(dm.data_val) == 25
+        assert dm.data_test is test_set
+        x, y = next(iter(dm.train_dataloader()))
+        assert x.shape[0] == 8
+
+
+def test_aggregate_fold_metrics() -> None:
+    """平均と標準偏差が、すべての分割に共通するメトリクスについて計算されることを確認します。"""
+    results = aggregate_fold_metrics([{"val/acc": 0.5, "test/acc": 0.4}, {"val/acc": 0.7}])
+
+    assert results["val/acc"] == pytest.approx(0.6)
+    assert results["val/acc_std"] == pytest.approx(0.1414, abs=1e-4)
+    assert "test/acc" not in results
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_cross_validate(tmp_path: Path, cfg_train: DictConfig, num_workers: int) -> None:
+    """2分割交差検証を順に、または2つのプロセスで並列に実行します。
+
+    :param tmp_path: 一時的なログパス。
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param num_workers: 分割を並列に実行するプロセスの数。
+    """
+    if num_workers > 1 and len(os.sched_getaffinity(0)) < num_workers:
+        pytest.skip("CPUコアが足りません")
+
+    HydraConfig().set_config(cfg_train)
+    with open_dict(cfg_train):
+        cfg_train.cv.enabled = True
+        cfg_train.cv.num_folds = 2
+        cfg_train.cv.num_workers = num_workers
+        cfg_train.test = False
+
+    metric_dict, object_dict = cross_validate(cfg_train)
+
+    assert "val/acc" in metric_dict
+    assert "val/acc_std" in metric_dict
+    assert len(object_dict["fold_metrics"]) == 2
+    for fold in range(2):
+        assert "last.ckpt" in os.listdir(tmp_path / f"fold_{fold}" / "checkpoints")
+
+    with open(tmp_path / "cv_results.json") as file:
+        results = json.load(file)
+    assert results["aggregate"]["val/acc"] == pytest.approx(metric_dict["val/acc"].item())
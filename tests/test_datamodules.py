@@ -34,4 +34,80 @@ def test_mnist_datamodule(batch_size: int) -> None:
     assert len(x) == batch_size
     assert len(y) == batch_size
     assert x.dtype == torch.float32
-    assert y.dtype == torch.int64
\ No newline at end of file
+    assert y.dtype == torch.int64
+
+
+def test_instantiate_datamodule_reuse() -> None:
+    """`instantiate_datamodule`が同じデータ設定に対してキャッシュされたデータモジュールを返し、
+    永続ワーカーが有効な場合にデータローダーを再利用することを検証するテスト。"""
+    from omegaconf import OmegaConf
+
+    from src.utils import clear_datamodule_cache, instantiate_datamodule
+
+    cfg = OmegaConf.create(
+        {
+            "_target_": "src.data.mnist_datamodule.MNISTDataModule",
+            "data_dir": "data/",
+            "batch_size": 32,
+            "num_workers": 1,
+            "persistent_workers": True,
+        }
+    )
+    clear_datamodule_cache()
+
+    dm = instantiate_datamodule(cfg, reuse=True)
+    assert instantiate_datamodule(cfg, reuse=True) is dm
+    assert instantiate_datamodule(cfg, reuse=False) is not dm
+
+    other_cfg = cfg.copy()
+    other_cfg.batch_size = 64
+    assert instantiate_datamodule(other_cfg, reuse=True) is not dm
+
+    dm.prepare_data()
+    dm.setup()
+    assert dm.train_dataloader() is dm.train_dataloader()
+    assert dm.val_dataloader() is not dm.train_dataloader()
+
+    clear_datamodule_cache()
+
+
+def test_synthetic_datamodule(tmp_path: Path) -> None:
+    """`SyntheticDataModule`がオフラインで決定的なサンプルを生成し、`scale`に従った分割を作成すること、
+    およびメモリマップから読み込んだサンプルがオンザフライで生成したものと一致することを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    """
+    from src.data.synthetic_datamodule import SyntheticDataModule
+
+    dm = SyntheticDataModule(
+        data_dir=str(tmp_path), train_val_test_split=(50, 20, 30), scale=2, batch_size=16
+    )
+    dm.prepare_data()
+    dm.setup()
+    assert (len(dm.data_train), len(dm.data_val), len(dm.data_test)) == (100, 40, 60)
+    assert dm.data_predict is dm.data_test
+    assert not (tmp_path / "synthetic").exists()
+
+    x, y = next(iter(dm.train_dataloader()))
+    assert x.shape == (16, 1, 28, 28)
+    assert x.dtype == torch.float32
+    assert y.dtype == torch.int64
+    assert int(y.max()) < dm.num_classes
+
+    # 同じ設定では同じサンプルが得られ、分割間でサンプルは重複しません
+    x0, _ = dm.data_val[0]
+    other = SyntheticDataModule(train_val_test_split=(50, 20, 30), scale=2)
+    assert torch.equal(x0, other._dataset(num_samples=1, offset=100)[0][0])
+    assert not torch.equal(x0, dm.data_train[0][0])
+
+    mm = SyntheticDataModule(
+        data_dir=str(tmp_path), train_val_test_split=(50, 20, 30), scale=2, memmap=True
+    )
+    mm.prepare_data()
+    mm.setup()
+    assert len(list((tmp_path / "synthetic").glob("*.npy"))) == 2
+    for i in (0, 39):
+        x_mm, y_mm = mm.data_val[i]
+        x_gen, y_gen = dm.data_val[i]
+        assert torch.equal(x_mm, x_gen)
+        assert y_mm == y_gen
@@ -0,0 +1,77 @@
+import pytest
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.benchmark import bench_ddp_comm
+from src.train import train
+from src.utils import comm_hook_and_state, ddp_strategy
+
+
+def test_comm_hook_and_state() -> None:
+    """フックの名前から通信フック、PowerSGDの状態、ラッパーが作成され、無効な組み合わせが拒否されることを
+    検証するテスト。"""
+    assert comm_hook_and_state("none") == (None, None, None)
+
+    hook, state, wrapper = comm_hook_and_state("fp16")
+    assert hook.__name__ == "fp16_compress_hook" and state is None and wrapper is None
+
+    hook, state, wrapper = comm_hook_and_state(
+        "powersgd", compress_wrapper="bf16", powersgd={"matrix_approximation_rank": 2}
+    )
+    assert hook.__name__ == "powerSGD_hook"
+    assert state.matrix_approximation_rank == 2
+    assert wrapper.__name__ == "bf16_compress_wrapper"
+
+    with pytest.raises(ValueError):
+        comm_hook_and_state("int8")
+    with pytest.raises(ValueError):
+        comm_hook_and_state("fp16", compress_wrapper="bf16")
+
+    strategy = ddp_strategy("bf16", start_method="spawn")
+    assert strategy._ddp_comm_hook.__name__ == "bf16_compress_hook"
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("comm_hook", ["fp16", "powersgd"])
+def test_train_ddp_sim_comm_hook(cfg_train: DictConfig, comm_hook: str) -> None:
+    """2つのCPUプロセス（glooバックエンド）で、通信フックを登録したDDPでトレーニングできることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param comm_hook: 通信フックの名前。
+    """
+    HydraConfig().set_config(cfg_train)
+    with open_dict(cfg_train):
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.trainer.limit_train_batches = 10
+        cfg_train.trainer.accelerator = "cpu"
+        cfg_train.trainer.devices = 2
+        cfg_train.trainer.strategy = {
+            "_target_": "src.utils.ddp_utils.ddp_strategy",
+            "comm_hook": comm_hook,
+            "start_method": "spawn",
+            "powersgd": {"start_powerSGD_iter": 2},
+        }
+    train(cfg_train)
+
+
+@pytest.mark.slow
+def test_bench_ddp_comm(cfg_train: DictConfig) -> None:
+    """fp16の圧縮で通信量が半分になり、PowerSGDでさらに少なくなることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    """
+    results = bench_ddp_comm(
+        cfg_train,
+        hooks=["none", "allreduce", "fp16", "powersgd"],
+        world_size=2,
+        batch_size=16,
+        powersgd={"start_powerSGD_iter": 2},
+        num_warmup=1,
+        num_repeats=3,
+    )
+
+    full_mb = results["ddp/allreduce/comm_mb_per_step"]
+    assert results["ddp/none/comm_mb_per_step"] == pytest.approx(full_mb)
+    assert results["ddp/fp16/comm_mb_per_step"] == pytest.approx(full_mb / 2, rel=0.01)
+    assert results["ddp/powersgd/comm_mb_per_step"] < full_mb / 2
+    assert all(results[f"ddp/{hook}/step_ms"] > 0 for hook in ["none", "fp16", "powersgd"])
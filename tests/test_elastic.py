@@ -0,0 +1,175 @@
+import functools
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+from src.data.components.resumable_sampler import ResumableDistributedSampler
+from src.data.synthetic_datamodule import SyntheticDataModule
+from src.elastic import build_command, find_resume_checkpoint, next_devices
+from src.models.components.simple_dense_net import SimpleDenseNet
+from src.models.mnist_module import MNISTLitModule
+
+
+def test_resumable_sampler() -> None:
+    """`ResumableDistributedSampler`が再開したエポックで消費済みのサンプルだけを飛ばし、
+    ランク数を変えて再開しても残りのサンプルを重複も欠落もなく分担することを検証するテスト。"""
+    dataset = list(range(100))
+    full = list(ResumableDistributedSampler(dataset, seed=3))
+    assert sorted(full) == dataset
+
+    # 2ランクで各10サンプル（合計40サンプル）消費した後、1ランクで再開します
+    sampler = ResumableDistributedSampler(dataset, seed=3)
+    sampler.set_epoch(0)
+    sampler.resume(epoch=0, samples_seen=40)
+    assert len(sampler) == 100
+    assert list(sampler) == full[40:]
+    # 飛ばすのは最初の反復だけです
+    assert list(sampler) == full
+
+    # 別のエポックの位置は無視します
+    sampler.resume(epoch=1, samples_seen=40)
+    assert list(sampler) == full
+
+
+def test_synthetic_datamodule_resume(tmp_path: Path) -> None:
+    """データモジュールが消費したサンプル数を保存し、読み込んだ後のデータローダーが続きから読み込むことを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    """
+    kwargs = dict(data_dir=str(tmp_path), train_val_test_split=(64, 8, 8), batch_size=8, num_workers=0)
+    dm = SyntheticDataModule(**kwargs)
+    dm.setup()
+    expected = [y for _, y in dm.train_dataloader()]
+
+    resumed = SyntheticDataModule(**kwargs)
+    resumed.load_state_dict({"epoch": 0, "samples_seen": 24})
+    assert resumed.state_dict() == {"epoch": 0, "samples_seen": 24}
+    resumed.setup()
+    batches = [y for _, y in resumed.train_dataloader()]
+    assert len(batches) == len(expected) - 3
+    for y, y_expected in zip(batches, expected[3:]):
+        assert torch.equal(y, y_expected)
+
+
+def test_reused_datamodule_resets_position(tmp_path: Path) -> None:
+    """同じデータモジュールで2回`fit`しても、2回目の消費サンプル数が前の`fit`の続きから数えられないことを
+    検証するテスト（`reuse_datamodule=True`の試行間など）。
+
+    :param tmp_path: 一時的なパス。
+    """
+    from lightning import Trainer
+
+    dm = SyntheticDataModule(
+        data_dir=str(tmp_path), train_val_test_split=(64, 8, 8), batch_size=8, num_workers=0
+    )
+    for _ in range(2):
+        model = MNISTLitModule(
+            net=SimpleDenseNet(lin1_size=16, lin2_size=16, lin3_size=16),
+            optimizer=functools.partial(torch.optim.SGD, lr=0.1),
+            scheduler=None,
+            compile=False,
+        )
+        trainer = Trainer(
+            default_root_dir=str(tmp_path),
+            accelerator="cpu",
+            max_epochs=1,
+            limit_train_batches=3,
+            limit_val_batches=0,
+            logger=False,
+            enable_checkpointing=False,
+            enable_progress_bar=False,
+            enable_model_summary=False,
+        )
+        trainer.fit(model=model, datamodule=dm)
+        assert dm.state_dict() == {"epoch": 0, "samples_seen": 24}
+
+
+def test_reused_dataloader_follows_seed(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """永続ワーカーで再利用されるトレーニングデータローダーが、最初の試行ではなく現在の実行のシードで
+    シャッフルすることを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    :param monkeypatch: 環境変数を変更するpytestのフィクスチャ。
+    """
+    dm = SyntheticDataModule(
+        data_dir=str(tmp_path),
+        train_val_test_split=(64, 8, 8),
+        batch_size=8,
+        num_workers=1,
+        persistent_workers=True,
+    )
+    dm.setup()
+    monkeypatch.setenv("PL_GLOBAL_SEED", "1")
+    dataloader = dm.train_dataloader()
+    assert dataloader.sampler.seed == 1
+
+    monkeypatch.setenv("PL_GLOBAL_SEED", "2")
+    assert dm.train_dataloader() is dataloader
+    assert dataloader.sampler.seed == 2
+    assert list(dataloader.sampler) == list(ResumableDistributedSampler(dm.data_train, seed=2))
+
+
+def test_find_resume_checkpoint(tmp_path: Path) -> None:
+    """途中までしか書き込まれていないチェックポイントを飛ばして、最新の有効なチェックポイントを選ぶことを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    """
+    assert find_resume_checkpoint(tmp_path / "missing") is None
+
+    valid = tmp_path / "elastic" / "step_000010.ckpt"
+    valid.parent.mkdir()
+    torch.save({"state_dict": {}, "loops": {}, "global_step": 10}, valid)
+    torch.save({"state_dict": {}}, tmp_path / "weights.ckpt")
+    (tmp_path / "last.ckpt").write_bytes(b"truncated")
+    assert find_resume_checkpoint(tmp_path) == valid
+
+    assert next_devices(4, 2) == 3
+    assert next_devices(2, 2) == 2
+
+    command = build_command(tmp_path, 2, valid, ["trainer=ddp_sim", "ckpt_path=old.ckpt"])
+    assert "ckpt_path=old.ckpt" not in command
+    assert command[-2:] == ["trainer.devices=2", f"ckpt_path='{valid}'"]
+
+
+@pytest.mark.slow
+def test_elastic_restart_after_killed_rank(tmp_path: Path) -> None:
+    """`trainer=ddp_sim`でランク1を強制終了した後、最新のチェックポイントから自動的に再開して完了することを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    """
+    marker = tmp_path / "killed"
+    command = [
+        sys.executable,
+        "src/elastic.py",
+        "--devices=2",
+        "--max-restarts=1",
+        "--restart-delay=0",
+        f"--run-dir={tmp_path / 'run'}",
+        "trainer=ddp_sim",
+        "data=synthetic",
+        "data.train_val_test_split=[1024,128,128]",
+        "data.batch_size=64",
+        "data.num_workers=0",
+        "logger=[]",
+        "test=False",
+        "trainer.max_epochs=1",
+        "callbacks=[default,elastic_checkpoint]",
+        "callbacks.elastic_checkpoint.every_n_train_steps=4",
+        "~callbacks.rich_progress_bar",
+        "+callbacks.kill_rank._target_=tests.helpers.fault_injection.KillRank",
+        f"+callbacks.kill_rank.marker={marker}",
+        "+callbacks.kill_rank.step=10",
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert marker.exists()
+    assert "restarts=1" in result.stderr
+
+    checkpoint = torch.load(
+        tmp_path / "run" / "checkpoints" / "last.ckpt", map_location="cpu", weights_only=False
+    )
+    # 1024サンプル / (2ランク x 32) = 16ステップ。再開しても合計のステップ数は変わりません
+    assert checkpoint["global_step"] == 16
@@ -0,0 +1,98 @@
+import os
+from pathlib import Path
+
+import hydra
+import pytest
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.benchmark import bench_trainer_overhead
+from src.models.mnist_module import MNISTLitModule
+from src.train import train
+
+FAST_TRAINER = "src.trainers.fast_trainer.FastTrainer"
+
+
+def test_fast_trainer_fast_dev_run(cfg_train: DictConfig) -> None:
+    """`FastTrainer`で1回のトレーニング、検証、テストステップを実行します。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    """
+    HydraConfig().set_config(cfg_train)
+    with open_dict(cfg_train):
+        cfg_train.trainer._target_ = FAST_TRAINER
+        cfg_train.trainer.fast_dev_run = True
+    train(cfg_train)
+
+
+@pytest.mark.slow
+def test_fast_trainer_matches_lightning(tmp_path: Path, cfg_train: DictConfig) -> None:
+    """`FastTrainer`がLightningのトレーナーと同じ名前のメトリクスと、読み込めるチェックポイントを出力することを確認します。
+
+    :param tmp_path: 一時的なログパス。
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    """
+    HydraConfig().set_config(cfg_train)
+    lightning_metrics, _ = train(cfg_train)
+    os.rename(tmp_path / "checkpoints", tmp_path / "checkpoints_lightning")
+
+    with open_dict(cfg_train):
+        cfg_train.trainer._target_ = FAST_TRAINER
+    fast_metrics, _ = train(cfg_train)
+
+    assert set(fast_metrics) == set(lightning_metrics)
+    files = os.listdir(tmp_path / "checkpoints")
+    assert "last.ckpt" in files
+    assert "epoch_000.ckpt" in files
+
+    model = MNISTLitModule.load_from_checkpoint(tmp_path / "checkpoints" / "epoch_000.ckpt")
+    assert isinstance(model, MNISTLitModule)
+
+
+@pytest.mark.slow
+def test_fast_trainer_resume(tmp_path: Path, cfg_train: DictConfig) -> None:
+    """`FastTrainer`で1エポック実行し、終了してから、もう1エポック再開します。
+
+    :param tmp_path: 一時的なログパス。
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    """
+    with open_dict(cfg_train):
+        cfg_train.trainer._target_ = FAST_TRAINER
+        cfg_train.trainer.max_epochs = 1
+
+    HydraConfig().set_config(cfg_train)
+    metric_dict_1, _ = train(cfg_train)
+
+    with open_dict(cfg_train):
+        cfg_train.ckpt_path = str(tmp_path / "checkpoints" / "last.ckpt")
+        cfg_train.trainer.max_epochs = 2
+
+    metric_dict_2, _ = train(cfg_train)
+
+    files = os.listdir(tmp_path / "checkpoints")
+    assert "epoch_001.ckpt" in files
+    assert "epoch_002.ckpt" not in files
+    assert metric_dict_1["train/acc"] < metric_dict_2["train/acc"]
+
+
+@pytest.mark.slow
+def test_bench_trainer_overhead(cfg_benchmark: DictConfig) -> None:
+    """両方のトレーナーが同じステップ数をトレーニングし、オーバーヘッドが計測されることを確認します。
+
+    :param cfg_benchmark: 有効なベンチマーク設定を含むDictConfig。
+    """
+    datamodule = hydra.utils.instantiate(cfg_benchmark.data)
+    datamodule.prepare_data()
+    datamodule.setup(stage="fit")
+
+    results = bench_trainer_overhead(cfg_benchmark, datamodule, limit_train_batches=5, num_repeats=1)
+
+    assert results["trainer_overhead/lightning/epoch_sec"] > 0
+    assert results["trainer_overhead/fast/samples_per_sec"] > 0
+    assert "trainer_overhead/lightning/overhead_ms_per_step" in results
+    for engine in ("lightning", "fast"):
+        num_samples = (
+            results[f"trainer_overhead/{engine}/samples_per_sec"]
+            * results[f"trainer_overhead/{engine}/epoch_sec"]
+        )
+        assert num_samples == pytest.approx(5 * datamodule.batch_size_per_device)
@@ -0,0 +1,104 @@
+import os
+from pathlib import Path
+
+import pytest
+import torch
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.callbacks.frozen_feature_cache import FrozenFeatureCache
+from src.data.components.feature_cache import CachedFeatureDataset, module_hash, write_features
+from src.data.components.synthetic_dataset import SyntheticDataset
+from src.models.components.simple_dense_net import SimpleDenseNet
+from src.models.mnist_module import MNISTLitModule
+from src.train import train
+
+
+def test_split_matches_forward() -> None:
+    """前半と後半の層を続けて適用した結果が、ネットワーク全体の出力と一致することを確認します。"""
+    net = SimpleDenseNet(lin1_size=16, lin2_size=16, lin3_size=16).eval()
+    prefix, suffix = net.split(6)
+    x = torch.randn(4, 1, 28, 28)
+
+    assert torch.allclose(suffix(prefix(x)), net(x))
+    with pytest.raises(ValueError):
+        net.split(len(net.model))
+
+
+def test_frozen_layers() -> None:
+    """固定した層がトレーニングされず、トレーニングモードでもBatchNormが推論モードのままであることを確認します。"""
+    module = MNISTLitModule(
+        net=SimpleDenseNet(lin1_size=16, lin2_size=16, lin3_size=16),
+        optimizer=None,
+        scheduler=None,
+        compile=False,
+        frozen_layers=3,
+    )
+    module.train()
+
+    assert all(not p.requires_grad for p in module.frozen_prefix.parameters())
+    assert not module.frozen_prefix.training
+    assert module.net.model[3].training
+    assert module.net.model[3].weight.requires_grad
+
+
+def test_write_features(tmp_path: Path) -> None:
+    """書き込んだ特徴量が前半の層の出力と一致し、重みが変わるとハッシュが変わることを確認します。
+
+    :param tmp_path: 一時的なディレクトリ。
+    """
+    net = SimpleDenseNet(lin1_size=16, lin2_size=16, lin3_size=16)
+    prefix, _ = net.split(3)
+    dataset = SyntheticDataset(num_samples=10)
+    path = str(tmp_path / "train")
+
+    write_features(prefix, dataset, path, batch_size=4)
+    cached = CachedFeatureDataset(path)
+
+    assert len(cached) == 10
+    x, y = cached[7]
+    with torch.no_grad():
+        expected = prefix.eval()(dataset[7][0].unsqueeze(0))[0]
+    assert torch.allclose(x, expected, atol=1e-6)
+    assert y == dataset[7][1]
+
+    key = module_hash(prefix)
+    with torch.no_grad():
+        net.model[0].weight.add_(1.0)
+    assert module_hash(prefix) != key
+
+
+@pytest.mark.slow
+def test_train_frozen_feature_cache(tmp_path: Path, cfg_train: DictConfig) -> None:
+    """固定した層の特徴量をキャッシュしてトレーニングし、キャッシュが再利用されることを確認します。
+
+    :param tmp_path: 一時的なログパス。
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    """
+    HydraConfig().set_config(cfg_train)
+    with open_dict(cfg_train):
+        cfg_train.seed = 12345
+        cfg_train.model.frozen_layers = 9
+        cfg_train.callbacks.frozen_feature_cache = {
+            "_target_": "src.callbacks.frozen_feature_cache.FrozenFeatureCache",
+            "cache_dir": str(tmp_path / "feature_cache"),
+        }
+
+    metric_dict, object_dict = train(cfg_train)
+
+    assert "val/acc" in metric_dict
+    assert "test/acc" in metric_dict
+    callback = next(c for c in object_dict["callbacks"] if isinstance(c, FrozenFeatureCache))
+    model = object_dict["model"]
+    # トレーニング後も固定した層の重みはキャッシュのキーと一致します
+    weights_key = module_hash(model.frozen_prefix)[:16]
+    assert os.path.basename(os.path.dirname(callback.cache_paths["train"])) == weights_key
+    assert CachedFeatureDataset.exists(callback.cache_paths["train"])
+    assert not model.cached_features
+
+    # 同じシードでは前半の層の重みが同じになるため、キャッシュが再利用されます
+    mtime = os.path.getmtime(f"{callback.cache_paths['train']}_x.npy")
+    _, object_dict = train(cfg_train)
+    callback_2 = next(c for c in object_dict["callbacks"] if isinstance(c, FrozenFeatureCache))
+    assert callback_2.cache_paths["train"] == callback.cache_paths["train"]
+    assert os.path.getmtime(f"{callback.cache_paths['train']}_x.npy") == mtime
@@ -0,0 +1,29 @@
+import torch
+
+from src.models.components.simple_dense_net import SimpleDenseNet
+from src.utils import get_metric_value, measure_inference
+
+
+def test_measure_inference() -> None:
+    """推論性能の計測結果と、計測後にモデルのモードが元に戻ることを検証するテスト。"""
+    net = SimpleDenseNet(lin1_size=16, lin2_size=8, lin3_size=16)
+    net.train()
+
+    metrics = measure_inference(net, input_shape=[1, 28, 28], batch_size=2, num_warmup=1, num_iters=3)
+
+    num_params = sum(p.numel() for p in net.parameters())
+    assert metrics["model/params"] == num_params
+    # パラメータに加えてバッチ正規化の統計（バッファ）も含まれます
+    assert metrics["model/size_mb"] > num_params * 4 / 2**20
+    assert metrics["model/latency_ms"] > 0
+    assert net.training
+
+
+def test_get_metric_value_multi_objective() -> None:
+    """メトリック名のリストに対して、多目的最適化のための値のリストが返されることを検証するテスト。"""
+    metric_dict = {"val/acc_best": torch.tensor(0.9), "model/params": torch.tensor(100.0)}
+    assert get_metric_value(metric_dict, "model/params") == 100.0
+    assert get_metric_value(metric_dict, ["val/acc_best", "model/params"]) == [
+        torch.tensor(0.9).item(),
+        100.0,
+    ]
@@ -0,0 +1,110 @@
+from pathlib import Path
+
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, OmegaConf, open_dict
+
+from src.train import train
+from src.utils import run_fingerprint
+
+
+def test_run_fingerprint(tmp_path: Path) -> None:
+    """フィンガープリントが出力先や除外したキーには依存せず、設定・データ・ソースコードの変更で
+    変わることを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    """
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "module.py").write_text("x = 1\n")
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "train.bin").write_bytes(b"\x00" * 8)
+    cfg = OmegaConf.create(
+        {
+            "paths": {"root_dir": str(tmp_path), "output_dir": str(tmp_path / "run_0")},
+            "data": {"data_dir": "${paths.root_dir}/data"},
+            "model": {"lr": 0.1, "dirpath": "${paths.output_dir}/checkpoints"},
+            "tags": ["a"],
+            "memoize": {"dir": str(tmp_path / "memo"), "exclude": ["tags"]},
+        }
+    )
+    fingerprint = run_fingerprint(cfg)
+
+    # 出力先と除外したキーは無視されます
+    cfg.paths.output_dir = str(tmp_path / "run_1")
+    cfg.tags = ["b"]
+    assert run_fingerprint(cfg) == fingerprint
+
+    # 設定、データ、ソースコードの変更はフィンガープリントを変えます
+    cfg.model.lr = 0.01
+    assert run_fingerprint(cfg) != fingerprint
+    cfg.model.lr = 0.1
+    (tmp_path / "data" / "train.bin").write_bytes(b"\x01" * 9)
+    data_fingerprint = run_fingerprint(cfg)
+    assert data_fingerprint != fingerprint
+    (tmp_path / "src" / "module.py").write_text("x = 2\n# changed\n")
+    assert run_fingerprint(cfg) != data_fingerprint
+
+
+def test_train_memoized(cfg_train: DictConfig, tmp_path: Path) -> None:
+    """同じ設定の2回目のトレーニングが再学習せずにメモ化された結果を返し、`memoize.force`で
+    再計算されることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    """
+    with open_dict(cfg_train):
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.test = False
+        cfg_train.trainer.accelerator = "cpu"
+        cfg_train.paths.output_dir = str(tmp_path / "run_0")
+        cfg_train.memoize.enabled = True
+
+    HydraConfig().set_config(cfg_train)
+    metric_dict_0, object_dict_0 = train(cfg_train)
+    assert "trainer" in object_dict_0
+
+    with open_dict(cfg_train):
+        cfg_train.paths.output_dir = str(tmp_path / "run_1")
+    metric_dict_1, object_dict_1 = train(cfg_train)
+    assert "trainer" not in object_dict_1
+    assert float(metric_dict_1["val/acc"]) == float(metric_dict_0["val/acc"])
+    # 元の実行のチェックポイントを参照できます
+    assert (tmp_path / "run_1" / "checkpoints" / "last.ckpt").exists()
+
+    with open_dict(cfg_train):
+        cfg_train.paths.output_dir = str(tmp_path / "run_2")
+        cfg_train.memoize.force = True
+    _, object_dict_2 = train(cfg_train)
+    assert "trainer" in object_dict_2
+
+
+def test_train_memoized_fresh_data_dir(cfg_train: DictConfig, tmp_path: Path) -> None:
+    """新しいデータディレクトリで最初の実行がデータを作成しても、2回目の実行がメモ化された結果を使用し、
+    データディレクトリに書き込まれた派生キャッシュがフィンガープリントに影響しないことを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    """
+    data_dir = tmp_path / "data"
+    with open_dict(cfg_train):
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.test = False
+        cfg_train.data.data_dir = str(data_dir)
+        cfg_train.data.memmap = True
+        cfg_train.data.train_val_test_split = [1_000, 200, 200]
+        cfg_train.paths.output_dir = str(tmp_path / "run_0")
+        cfg_train.memoize.enabled = True
+
+    HydraConfig().set_config(cfg_train)
+    assert not data_dir.exists()
+    _, object_dict_0 = train(cfg_train)
+    assert "trainer" in object_dict_0
+    assert list((data_dir / "synthetic").glob("*_x.npy"))
+
+    # 他の実験の特徴量のキャッシュなど、データモジュールが読み込まないファイルは無視されます
+    (data_dir / "feature_cache").mkdir()
+    (data_dir / "feature_cache" / "train_x.npy").write_bytes(b"\x00" * 8)
+
+    with open_dict(cfg_train):
+        cfg_train.paths.output_dir = str(tmp_path / "run_1")
+    _, object_dict_1 = train(cfg_train)
+    assert "trainer" not in object_dict_1
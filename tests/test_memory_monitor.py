@@ -0,0 +1,54 @@
+import json
+import os
+from pathlib import Path
+
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.train import train
+from src.utils import children_rss_mb, process_rss_mb
+
+
+def test_process_rss() -> None:
+    """現在のプロセスのRSSが取得でき、存在しないプロセスでは`None`になることを検証するテスト。"""
+    assert process_rss_mb() > 0
+    assert process_rss_mb(2**22 + os.getpid()) is None
+    assert children_rss_mb() >= 0
+
+
+def test_train_memory_monitor(cfg_train: DictConfig, tmp_path: Path) -> None:
+    """`MemoryMonitor`がステージごとの最大値とモジュールごとのアクティベーションをレポートに出力し、
+    トレーニング後にフックとトレーナーのメソッドが元に戻ることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    """
+    with open_dict(cfg_train):
+        cfg_train.test = False
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.trainer.limit_train_batches = 4
+        cfg_train.trainer.limit_val_batches = 2
+        cfg_train.callbacks.memory_monitor = {
+            "_target_": "src.callbacks.memory_monitor.MemoryMonitor",
+            "dirpath": str(tmp_path / "memory"),
+            "interval_sec": 0.01,
+        }
+    HydraConfig().set_config(cfg_train)
+
+    metric_dict, object_dict = train(cfg_train)
+
+    report = json.loads((tmp_path / "memory" / "memory_rank0.json").read_text())
+    for stage in ("setup", "forward", "backward", "optimizer", "dataloader", "validation", "checkpoint"):
+        assert report["stages"][stage]["rss_peak_mb"] > 0
+    assert report["lifetime_peak_rss_mb"] >= report["stages"]["forward"]["rss_peak_mb"]
+
+    # SimpleDenseNetの末端のモジュール（Linear、BatchNorm1d、ReLU）のアクティベーション
+    names = [row["module"] for row in report["activations"]]
+    assert "model.0 (Linear)" in names
+    assert report["activations_total_mb"] > 0
+    assert (tmp_path / "memory" / "memory_rank0.txt").exists()
+    assert "memory/forward/rss_peak_mb" in metric_dict
+
+    model = object_dict["model"]
+    assert not any(module._forward_hooks for module in model.net.modules())
+    assert "save_checkpoint" not in vars(object_dict["trainer"])
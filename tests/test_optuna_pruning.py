@@ -0,0 +1,58 @@
+import optuna
+import pytest
+from hydra.core.hydra_config import HydraConfig
+from hydra_plugins.pruning_optuna_sweeper._impl import PruningOptunaSweeperImpl
+from omegaconf import DictConfig, open_dict
+
+from src.train import train
+from src.utils.optuna_utils import get_current_trial, register_trial, unregister_trial
+
+
+def test_train_pruned(cfg_train: DictConfig) -> None:
+    """`OptunaPruning`コールバックが検証メトリクスを現在の試行に報告し、枝刈りの判断に従って
+    `optuna.TrialPruned`でトレーニングを停止することを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    """
+    with open_dict(cfg_train):
+        cfg_train.hydra.job.num = 0
+        cfg_train.test = False
+        cfg_train.callbacks.optuna_pruning = {
+            "_target_": "src.callbacks.optuna_pruning.OptunaPruning",
+            "monitor": "val/acc",
+        }
+    HydraConfig().set_config(cfg_train)
+
+    # 精度は2.0を超えないため、最初の報告で必ず枝刈りされます
+    study = optuna.create_study(direction="maximize", pruner=optuna.pruners.ThresholdPruner(lower=2.0))
+    trial = study.ask()
+    register_trial(0, trial)
+    try:
+        assert get_current_trial() is trial
+        with pytest.raises(optuna.TrialPruned):
+            train(cfg_train)
+    finally:
+        unregister_trial(0)
+
+    assert get_current_trial() is None
+    assert list(study.trials[0].intermediate_values) == [0]
+
+
+def test_sweeper_without_pruner() -> None:
+    """`pruner`が`None`の場合に、スイーパーが枝刈りしないスタディを作成することを検証するテスト。"""
+    sweeper = PruningOptunaSweeperImpl(
+        optuna.samplers.RandomSampler(seed=0),
+        "maximize",
+        None,
+        None,
+        1,
+        1,
+        0.0,
+        None,
+        None,
+        None,
+        pruner=None,
+    )
+    study, *_ = sweeper._create_study([])
+
+    assert type(study.pruner) is optuna.pruners.NopPruner
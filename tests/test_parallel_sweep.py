@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import pytest
+
+from src.parallel_sweep import build_worker_commands, split_trials
+from src.utils import partition_cores
+
+
+def test_partition_cores() -> None:
+    """`partition_cores`がCPUコアを互いに素で連続したグループにできるだけ均等に分割することを検証するテスト。"""
+    partitions = partition_cores(list(range(10)), 4)
+    assert partitions == [[0, 1, 2], [3, 4, 5], [6, 7], [8, 9]]
+    assert sorted(core for part in partitions for core in part) == list(range(10))
+
+    with pytest.raises(ValueError):
+        partition_cores([0, 1], 3)
+
+
+def test_build_worker_commands(tmp_path: Path) -> None:
+    """各ワーカーのコマンドが試行数、CPUコア、サンプラーのシードを正しく分担することを検証するテスト。
+
+    :param tmp_path: 一時的なログパス。
+    """
+    assert split_trials(10, 4) == [3, 3, 2, 2]
+
+    workers = build_worker_commands(
+        num_workers=2,
+        n_trials=5,
+        storage="sqlite:///optuna.db",
+        study_name="study",
+        sweep_dir=tmp_path,
+        cores=list(range(8)),
+        overrides=["trainer=cpu"],
+    )
+    assert [worker["cores"] for worker in workers] == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+    command = workers[1]["command"]
+    assert "hydra.sweeper.n_trials=2" in command
+    assert "++hydra.sweeper.sampler.seed=1235" in command
+    assert "cpu.cores=[4,5,6,7]" in command
+    assert "cpu.intra_op_threads=3" in command
+    assert "data.num_workers=1" in command
+    assert command[-1] == "trainer=cpu"
@@ -0,0 +1,97 @@
+import os
+from pathlib import Path
+
+import pytest
+import rootutils
+import torch
+from hydra import compose, initialize
+from hydra.core.global_hydra import GlobalHydra
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import OmegaConf, open_dict
+
+from src.pbt import exploit_checkpoint, pbt
+
+
+def test_exploit_checkpoint(tmp_path: Path) -> None:
+    """コピー先のチェックポイントで、オプティマイザのパラメータグループが書き換えられ、
+    `ModelCheckpoint`の状態がコピー先のディレクトリを指すことを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    """
+    src = tmp_path / "a" / "last.ckpt"
+    src.parent.mkdir()
+    weight = torch.randn(3)
+    torch.save(
+        {
+            "state_dict": {"net.weight": weight},
+            "optimizer_states": [{"state": {}, "param_groups": [{"lr": 0.1, "params": [0]}]}],
+            "callbacks": {
+                "ModelCheckpoint{'monitor': 'val/acc'}": {
+                    "dirpath": str(src.parent),
+                    "best_model_path": str(src.parent / "epoch_000.ckpt"),
+                    "last_model_path": str(src),
+                }
+            },
+        },
+        src,
+    )
+
+    dst = tmp_path / "b" / "last.ckpt"
+    dst.parent.mkdir()
+    (dst.parent / "epoch_000.ckpt").touch()
+    exploit_checkpoint(src, dst, {"lr": 0.05})
+
+    checkpoint = torch.load(dst, weights_only=False)
+    assert torch.equal(checkpoint["state_dict"]["net.weight"], weight)
+    assert checkpoint["optimizer_states"][0]["param_groups"][0]["lr"] == 0.05
+    state = checkpoint["callbacks"]["ModelCheckpoint{'monitor': 'val/acc'}"]
+    assert state["dirpath"] == os.path.realpath(dst.parent)
+    assert state["last_model_path"] == os.path.join(os.path.realpath(dst.parent), "last.ckpt")
+    assert state["best_model_path"] == ""
+    assert sorted(path.name for path in dst.parent.iterdir()) == ["last.ckpt"]
+    # コピー元は変更されません
+    assert torch.load(src, weights_only=False)["optimizer_states"][0]["param_groups"][0]["lr"] == 0.1
+
+
+@pytest.mark.slow
+def test_pbt(tmp_path: Path) -> None:
+    """小さな集団でPBTを実行し、勝者のスケジュールが保存されることを検証するテスト。
+
+    :param tmp_path: 一時的なパス。
+    """
+    with initialize(version_base="1.3", config_path="../configs"):
+        cfg = compose(
+            config_name="pbt.yaml",
+            return_hydra_config=True,
+            overrides=[
+                "trainer=cpu",
+                "pbt.population_size=2",
+                "pbt.num_rounds=2",
+                "pbt.epochs_per_round=1",
+                "logger=[]",
+                "data=synthetic",
+            ],
+        )
+    with open_dict(cfg):
+        cfg.paths.root_dir = str(rootutils.find_root(indicator=".project-root"))
+        cfg.paths.output_dir = str(tmp_path)
+        cfg.paths.log_dir = str(tmp_path)
+        cfg.trainer.limit_train_batches = 0.01
+        cfg.trainer.limit_val_batches = 0.1
+        cfg.trainer.limit_test_batches = 0.1
+        cfg.data.num_workers = 0
+        cfg.data.pin_memory = False
+        cfg.extras.print_config = False
+        cfg.extras.enforce_tags = False
+    HydraConfig().set_config(cfg)
+
+    metric_dict, object_dict = pbt(cfg)
+    GlobalHydra.instance().clear()
+
+    assert "test/acc" in metric_dict
+    schedule = OmegaConf.load(tmp_path / "pbt_schedule.yaml")
+    assert schedule.best_member == object_dict["result"]["best_member"]
+    assert [entry["round"] for entry in schedule.best_schedule] == [0, 1]
+    assert "lr" in schedule.best_schedule[0]
+    for k in range(2):
+        assert (tmp_path / "members" / f"member_{k}" / "checkpoints" / "last.ckpt").exists()
@@ -0,0 +1,129 @@
+import statistics
+import time
+from pathlib import Path
+
+import hydra
+import pytest
+import torch
+from omegaconf import DictConfig
+from torch.utils.data import default_collate
+
+from src.data.components.synthetic_dataset import SyntheticDataset
+from src.utils import time_repeated
+from src.utils.startup import import_time_breakdown
+from tests.helpers.perf_baseline import PerfBaseline
+
+BATCH_SIZE = 128
+NUM_TRAIN_STEPS = 20
+
+
+def _fit_steps(cfg_train: DictConfig, tmp_path: Path, max_steps: int):
+    """合成データで`max_steps`ステップだけトレーニングし、トレーナーを返します。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    :param max_steps: トレーニングステップの数。
+    :return: トレーニング後のトレーナー。
+    """
+    datamodule = hydra.utils.instantiate(cfg_train.data, batch_size=BATCH_SIZE)
+    model = hydra.utils.instantiate(cfg_train.model, scheduler=None)
+    trainer = hydra.utils.instantiate(
+        cfg_train.trainer,
+        default_root_dir=str(tmp_path),
+        logger=False,
+        min_epochs=None,
+        max_epochs=-1,
+        max_steps=max_steps,
+        limit_train_batches=1.0,
+        limit_val_batches=0,
+        num_sanity_val_steps=0,
+        enable_checkpointing=False,
+        enable_progress_bar=False,
+        enable_model_summary=False,
+    )
+    trainer.fit(model=model, datamodule=datamodule)
+    return trainer
+
+
+@pytest.mark.perf
+def test_perf_collate(perf_baseline: PerfBaseline) -> None:
+    """データセットからのサンプルの取得とバッチへのまとめ（コレート）の時間を計測します。
+
+    :param perf_baseline: 計測値をベースラインと比較するフィクスチャ。
+    """
+    dataset = SyntheticDataset(num_samples=BATCH_SIZE)
+
+    stats = time_repeated(lambda: default_collate([dataset[i] for i in range(BATCH_SIZE)]))
+    perf_baseline.check(f"collate/bs{BATCH_SIZE}_ms", stats["median_ms"])
+
+
+@pytest.mark.perf
+def test_perf_model_step(cfg_train: DictConfig, perf_baseline: PerfBaseline) -> None:
+    """`model_step`（順伝播と損失の計算）と逆伝播の時間を計測します。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param perf_baseline: 計測値をベースラインと比較するフィクスチャ。
+    """
+    torch.manual_seed(0)
+    model = hydra.utils.instantiate(cfg_train.model)
+    batch = (torch.randn(BATCH_SIZE, 1, 28, 28), torch.randint(0, 10, (BATCH_SIZE,)))
+
+    def step() -> None:
+        loss, _, _ = model.model_step(batch)
+        loss.backward()
+
+    with torch.no_grad():
+        forward_stats = time_repeated(lambda: model.model_step(batch))
+    step_stats = time_repeated(step)
+    perf_baseline.check(f"model_step/bs{BATCH_SIZE}_forward_ms", forward_stats["median_ms"])
+    perf_baseline.check(f"model_step/bs{BATCH_SIZE}_backward_ms", step_stats["median_ms"])
+
+
+@pytest.mark.perf
+def test_perf_train_steps(
+    cfg_train: DictConfig, tmp_path: Path, perf_baseline: PerfBaseline
+) -> None:
+    """データの読み込みを含め、固定ステップ数のトレーニングの時間を計測します。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    :param perf_baseline: 計測値をベースラインと比較するフィクスチャ。
+    """
+    # ウォームアップ（初回のインポートや初期化のコストを除きます）
+    _fit_steps(cfg_train, tmp_path, max_steps=2)
+
+    times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        _fit_steps(cfg_train, tmp_path, max_steps=NUM_TRAIN_STEPS)
+        times.append(time.perf_counter() - start)
+    perf_baseline.check(f"train/{NUM_TRAIN_STEPS}_steps_sec", statistics.median(times))
+
+
+@pytest.mark.perf
+def test_perf_checkpoint(
+    cfg_train: DictConfig, tmp_path: Path, perf_baseline: PerfBaseline
+) -> None:
+    """チェックポイントの保存と読み込みの時間を計測します。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    :param perf_baseline: 計測値をベースラインと比較するフィクスチャ。
+    """
+    trainer = _fit_steps(cfg_train, tmp_path, max_steps=1)
+    path = tmp_path / "perf.ckpt"
+
+    save_stats = time_repeated(lambda: trainer.save_checkpoint(path), num_repeats=10)
+    load_stats = time_repeated(lambda: torch.load(path, weights_only=False), num_repeats=10)
+    perf_baseline.check("checkpoint/save_ms", save_stats["median_ms"])
+    perf_baseline.check("checkpoint/load_ms", load_stats["median_ms"])
+
+
+@pytest.mark.perf
+def test_perf_startup(perf_baseline: PerfBaseline) -> None:
+    """新しいプロセスで`src.train`をインポートするまでの起動時間を計測します。
+
+    :param perf_baseline: 計測値をベースラインと比較するフィクスチャ。
+    """
+    times = [import_time_breakdown("src.train")["total_sec"] for _ in range(3)]
+    perf_baseline.check("startup/total_sec", statistics.median(times))
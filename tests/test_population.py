@@ -0,0 +1,84 @@
+import copy
+
+import pytest
+import torch
+
+from src.models.components.population_dense_net import PopulationDenseNet
+from src.models.components.simple_dense_net import SimpleDenseNet
+from src.models.mnist_module import MNISTLitModule
+from src.models.population_module import PopulationLitModule
+
+
+@pytest.mark.parametrize("training", [True, False])
+def test_population_dense_net_matches_members(training: bool) -> None:
+    """`PopulationDenseNet`のまとめた順伝播が、各メンバーを個別に実行した結果（バッチ正規化の統計を含む）と
+    一致することを検証するテスト。
+
+    :param training: トレーニングモードで実行するかどうか。
+    """
+    net = PopulationDenseNet(seeds=[0, 1, 2], lin1_size=16, lin2_size=8, lin3_size=16)
+    members = [copy.deepcopy(member) for member in net.members]
+    net.train(training)
+    for member in members:
+        member.train(training)
+
+    x = torch.randn(8, 1, 28, 28)
+    out = net(x)
+    assert out.shape == (3, 8, 10)
+    for k, member in enumerate(members):
+        assert torch.allclose(out[k], member(x), atol=1e-5)
+        assert torch.allclose(
+            net.members[k].model[1].running_mean, member.model[1].running_mean, atol=1e-6
+        )
+
+
+def test_population_member_state_dict() -> None:
+    """各メンバーが独自の学習率を持つパラメータグループで最適化され、その重みが`MNISTLitModule`に
+    読み込めることを検証するテスト。"""
+    net = PopulationDenseNet(seeds=[0, 1], lin1_size=16, lin2_size=8, lin3_size=16)
+    model = PopulationLitModule(
+        net=net,
+        optimizer=torch.optim.SGD,
+        lrs=[0.1, 0.01],
+        weight_decays=None,
+    )
+    optimizer = model.configure_optimizers()["optimizer"]
+    assert [group["lr"] for group in optimizer.param_groups] == [0.1, 0.01]
+
+    single = MNISTLitModule(
+        net=SimpleDenseNet(lin1_size=16, lin2_size=8, lin3_size=16),
+        optimizer=None,
+        scheduler=None,
+        compile=False,
+    )
+    single.load_state_dict(model.member_state_dict(1))
+    single.eval()
+    model.eval()
+    x = torch.randn(4, 1, 28, 28)
+    assert torch.allclose(single(x), model(x)[1], atol=1e-5)
+    assert model.member_hparams(1) == {"lr": 0.01, "weight_decay": None, "seed": 1}
+
+    with pytest.raises(ValueError):
+        PopulationLitModule(net=net, optimizer=torch.optim.SGD, lrs=[0.1])
+
+
+def test_population_gradient_clipping_per_member() -> None:
+    """勾配のクリッピングがメンバーごとに行われ、あるメンバーの大きな勾配が他のメンバーの勾配を
+    縮小しないことを検証するテスト。"""
+    net = PopulationDenseNet(seeds=[0, 1], lin1_size=16, lin2_size=8, lin3_size=16)
+    model = PopulationLitModule(net=net, optimizer=torch.optim.SGD, lrs=[0.1, 0.1])
+    optimizer = model.configure_optimizers()["optimizer"]
+
+    x, y = torch.randn(8, 1, 28, 28), torch.randint(0, 10, (8,))
+    losses, _, _ = model.model_step((x, y))
+    (losses[0] * 1e4 + losses[1]).backward()
+    member_1_grads = [p.grad.clone() for p in net.members[1].parameters()]
+
+    model.configure_gradient_clipping(optimizer, gradient_clip_val=1e3, gradient_clip_algorithm="norm")
+
+    norm_0 = torch.linalg.vector_norm(
+        torch.stack([torch.linalg.vector_norm(p.grad) for p in net.members[0].parameters()])
+    )
+    assert norm_0 <= 1e3 * (1 + 1e-4)
+    for p, grad in zip(net.members[1].parameters(), member_1_grads):
+        assert torch.equal(p.grad, grad)
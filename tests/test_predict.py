@@ -0,0 +1,77 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.data.components.shard_sampler import ShardedBatchSampler
+from src.predict import predict
+from src.train import train
+
+
+def test_sharded_batch_sampler() -> None:
+    """`ShardedBatchSampler`がシャードの境界をまたがずに、指定されたシャードの全行を生成することを検証します。"""
+    sampler = ShardedBatchSampler(num_rows=25, shard_size=10, rows_per_batch=4, shard_ids=[0, 2])
+    batches = list(sampler)
+
+    assert len(batches) == len(sampler) == 5
+    assert [i for batch in batches for i in batch] == list(range(10)) + list(range(20, 25))
+    assert all(batch[0] // 10 == batch[-1] // 10 for batch in batches)
+
+
+def test_sharded_batch_sampler_balances_pending(monkeypatch: pytest.MonkeyPatch) -> None:
+    """残りのシャードがすべて奇数のインデックスでも、各ランクに均等に割り当てられることを検証します。
+
+    :param monkeypatch: ランクとワールドサイズを差し替えるpytestのフィクスチャ。
+    """
+    sampler = ShardedBatchSampler(num_rows=100, shard_size=10, rows_per_batch=10, shard_ids=[1, 3, 5, 7])
+    assigned = []
+    for rank in range(2):
+        monkeypatch.setattr(
+            ShardedBatchSampler, "_rank_and_world_size", staticmethod(lambda rank=rank: (rank, 2))
+        )
+        assigned.append(sampler.local_shard_ids())
+
+    assert assigned == [[1, 5], [3, 7]]
+
+
+@pytest.mark.slow
+def test_train_predict(
+    tmp_path: Path, cfg_train: DictConfig, cfg_predict: DictConfig
+) -> None:
+    """1エポックトレーニングした後、`predict.py`でシャードに予測を書き込み、再実行で再開されることをテストします。
+
+    :param tmp_path: 一時的なログパス。
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param cfg_predict: 有効な予測設定を含むDictConfig。
+    """
+    with open_dict(cfg_train):
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.test = False
+
+    HydraConfig().set_config(cfg_train)
+    train(cfg_train)
+
+    with open_dict(cfg_predict):
+        cfg_predict.ckpt_path = str(tmp_path / "checkpoints" / "last.ckpt")
+        cfg_predict.shard_size = 4_000
+        cfg_predict.shards_per_wave = 2
+
+    HydraConfig().set_config(cfg_predict)
+    metric_dict, _ = predict(cfg_predict)
+
+    files = sorted(os.listdir(cfg_predict.predictions_dir))
+    assert len(files) == 3 * len(cfg_predict.prediction_keys)
+    assert metric_dict["predict/rows"] == 10_000
+    assert metric_dict["predict/shards_pending"] == 0
+
+    logits = np.load(Path(cfg_predict.predictions_dir, "shard_000002.logits.npy"))
+    preds = np.load(Path(cfg_predict.predictions_dir, "shard_000002.preds.npy"))
+    assert logits.shape == (2_000, 10)
+    assert (logits.argmax(axis=1) == preds).all()
+
+    # 書き込み済みのシャードはスキップされます
+    metric_dict, _ = predict(cfg_predict)
+    assert metric_dict["predict/rows"] == 0
@@ -0,0 +1,104 @@
+import functools
+import os
+import socket
+from pathlib import Path
+
+import pytest
+import torch
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.train import train
+from src.utils import optimizer_state_mb, shard_optimizer
+
+
+def _sharded_state_worker(rank: int, world_size: int, port: int, results: dict) -> None:
+    """各ランクで1ステップ更新し、このランクが保持するオプティマイザの状態のサイズを記録します。
+
+    :param rank: ランク。
+    :param world_size: プロセスの数。
+    :param port: プロセスグループの通信に使用するポート。
+    :param results: ランクと状態のサイズを記録する共有の辞書。
+    """
+    import torch.distributed as dist
+
+    os.environ["MASTER_ADDR"] = "127.0.0.1"
+    os.environ["MASTER_PORT"] = str(port)
+    dist.init_process_group("gloo", rank=rank, world_size=world_size)
+    try:
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(*[torch.nn.Linear(256, 256) for _ in range(8)])
+        optimizer = shard_optimizer(functools.partial(torch.optim.Adam, lr=0.001), model.parameters())
+        model(torch.randn(4, 256)).sum().backward()
+        optimizer.step()
+        results[rank] = optimizer_state_mb(optimizer)
+    finally:
+        dist.destroy_process_group()
+
+
+def test_shard_optimizer_without_distributed() -> None:
+    """分散環境が初期化されていない場合は通常のオプティマイザが作成され、状態のサイズが正しく求められることを
+    検証するテスト。"""
+    model = torch.nn.Linear(100, 10)
+    optimizer = shard_optimizer(functools.partial(torch.optim.Adam, lr=0.01), model.parameters())
+    assert type(optimizer) is torch.optim.Adam
+    assert optimizer_state_mb(optimizer) == 0
+
+    model(torch.randn(2, 100)).sum().backward()
+    optimizer.step()
+    # exp_avgとexp_avg_sqはパラメータと同じサイズ
+    num_params = sum(p.numel() for p in model.parameters())
+    assert optimizer_state_mb(optimizer) >= 2 * num_params * 4 / 2**20
+
+
+@pytest.mark.slow
+def test_sharded_optimizer_state_per_rank() -> None:
+    """2つのランクで分割すると、各ランクのオプティマイザの状態が全体のおよそ半分になることを検証するテスト。"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    ctx = torch.multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        results = manager.dict()
+        torch.multiprocessing.spawn(_sharded_state_worker, args=(2, port, results), nprocs=2)
+        per_rank = dict(results)
+
+    full_mb = 2 * 8 * (256 * 256 + 256) * 4 / 2**20
+    assert sum(per_rank.values()) == pytest.approx(full_mb, rel=0.01)
+    assert max(per_rank.values()) < 0.6 * full_mb
+
+
+@pytest.mark.slow
+def test_train_ddp_sim_sharded_optimizer(cfg_train: DictConfig, tmp_path: Path) -> None:
+    """オプティマイザの状態を分割してDDPでトレーニングし、チェックポイントには統合された状態が保存され、
+    そこから再開できることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    """
+    with open_dict(cfg_train):
+        cfg_train.test = False
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.trainer.limit_train_batches = 10
+        cfg_train.trainer.accelerator = "cpu"
+        cfg_train.trainer.devices = 2
+        cfg_train.trainer.strategy = "ddp_spawn"
+        cfg_train.model.shard_optimizer_state = True
+    HydraConfig().set_config(cfg_train)
+    train(cfg_train)
+
+    ckpt_path = Path(cfg_train.paths.output_dir) / "checkpoints" / "last.ckpt"
+    checkpoint = torch.load(ckpt_path, weights_only=False)
+    optimizer_state = checkpoint["optimizer_states"][0]
+    # 各ランクの分割ではなく、すべてのパラメータの状態がランク0に統合されて保存されます
+    num_params = sum(len(group["params"]) for group in optimizer_state["param_groups"])
+    assert num_params == len(checkpoint["state_dict"]) - len(
+        [name for name in checkpoint["state_dict"] if "running_" in name or "num_batches" in name]
+    )
+    assert len(optimizer_state["state"]) == num_params
+
+    with open_dict(cfg_train):
+        cfg_train.trainer.max_epochs = 2
+        cfg_train.ckpt_path = str(ckpt_path)
+    train(cfg_train)
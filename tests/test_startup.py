@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+from src.utils.startup import import_time_breakdown, process_uptime
+
+
+def test_entry_points_import_lazily() -> None:
+    """エントリーポイントのインポート時に重い依存関係が読み込まれないことを検証します。
+
+    起動時間の回帰を防ぐため、`lightning`、`torch`、`rich`、`wandb`はインスタンス化や表示の際に
+    初めて読み込まれる必要があります。
+    """
+    heavy = ["lightning", "torch", "torchvision", "torchmetrics", "rich", "wandb"]
+    code = (
+        "import sys\n"
+        "import src.train, src.eval, src.predict\n"
+        f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_import_time_breakdown() -> None:
+    """`import_time_breakdown`がインポート時間の内訳を返すことを検証します。"""
+    breakdown = import_time_breakdown("src.utils.startup", top_k=5)
+
+    assert breakdown["total_sec"] > 0.0
+    assert breakdown["import_sec"] > 0.0
+    assert 0 < len(breakdown["packages"]) <= 5
+    assert process_uptime() > 0.0
@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.train import train
+
+
+def test_train_step_profiler(cfg_train: DictConfig, tmp_path: Path) -> None:
+    """`StepProfiler`が設定したステップの区間だけを記録し、トレースと種類ごとのレポートを出力すること、
+    およびトレーニング後にモデルのメソッドとトレーナーのプロファイラが元に戻ることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    """
+    with open_dict(cfg_train):
+        cfg_train.test = False
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.trainer.limit_train_batches = 10
+        cfg_train.callbacks.step_profiler = {
+            "_target_": "src.callbacks.step_profiler.StepProfiler",
+            "dirpath": str(tmp_path / "profiler"),
+            "skip_first": 2,
+            "wait": 1,
+            "warmup": 1,
+            "active": 2,
+            "repeat": 2,
+        }
+    HydraConfig().set_config(cfg_train)
+
+    _, object_dict = train(cfg_train)
+
+    traces = sorted(path.name for path in (tmp_path / "profiler").glob("trace_*.json"))
+    assert traces == ["trace_rank0_cycle0.json", "trace_rank0_cycle1.json"]
+
+    summary = json.loads((tmp_path / "profiler" / "summary_rank0.json").read_text())
+    assert summary["cycles"] == 2
+    assert any("training_step" in row["name"] for row in summary["hooks"])
+    assert "[Method]MNISTLitModule.model_step" in [row["name"] for row in summary["methods"]]
+    assert summary["operators"]
+    assert (tmp_path / "profiler" / "summary_rank0.txt").exists()
+
+    assert "model_step" not in vars(object_dict["model"])
+    assert type(object_dict["trainer"].profiler).__name__ == "PassThroughProfiler"
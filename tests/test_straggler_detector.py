@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from hydra.core.hydra_config import HydraConfig
+from omegaconf import DictConfig, open_dict
+
+from src.callbacks.straggler_detector import StragglerDetector, straggler_ratios
+from src.train import train
+
+
+def test_straggler_ratios() -> None:
+    """中央値に対する比が計算され、中央値が`0`の場合にすべて`1.0`になることを検証するテスト。"""
+    assert straggler_ratios([10.0, 10.0, 30.0]) == [1.0, 1.0, 3.0]
+    assert straggler_ratios([0.0, 0.0, 5.0]) == [1.0, 1.0, 1.0]
+
+    table = StragglerDetector._format_table(
+        [{"rank": 0, "data_ms": 1.0, "forward_ms": 2.0, "step_ms": 5.0, "host_load": 0.5, "ratio": 1.5}],
+        slow=[0],
+    )
+    assert table.splitlines()[1].endswith("<- slow")
+
+
+def test_train_straggler_detector(cfg_train: DictConfig, tmp_path: Path) -> None:
+    """`StragglerDetector`が区間ごとにランクの時間を集めてレポートに出力し、`patience`回続けて
+    閾値を超えたランクを遅いランクとして記録することを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    """
+    with open_dict(cfg_train):
+        cfg_train.test = False
+        cfg_train.trainer.max_epochs = 1
+        cfg_train.trainer.limit_train_batches = 8
+        cfg_train.trainer.limit_val_batches = 1
+        # 1ランクでは比が常に1.0になるため、閾値を1.0未満にして遅いランクの判定を確認します
+        cfg_train.callbacks.straggler_detector = {
+            "_target_": "src.callbacks.straggler_detector.StragglerDetector",
+            "dirpath": str(tmp_path / "stragglers"),
+            "interval": 2,
+            "threshold": 0.5,
+            "patience": 2,
+            "dump_stack": True,
+        }
+    HydraConfig().set_config(cfg_train)
+
+    metric_dict, _ = train(cfg_train)
+
+    report = json.loads((tmp_path / "stragglers" / "stragglers.json").read_text())
+    assert len(report["windows"]) == 4
+    assert [window["slow"] for window in report["windows"]] == [[], [0], [0], [0]]
+    assert report["slow_ranks"] == [0]
+    row = report["windows"][-1]["ranks"][0]
+    assert row["step_ms"] >= row["forward_ms"] > 0
+    assert (tmp_path / "stragglers" / "stacks_rank0.txt").exists()
+    assert metric_dict["straggler/num_slow"] == 1.0
@@ -6,7 +6,7 @@ from tests.helpers.run_if import RunIf
 from tests.helpers.run_sh_command import run_sh_command
 
 startfile = "src/train.py"
-overrides = ["logger=[]"]
+overrides = ["logger=[]", "data=synthetic"]
 
 
 @RunIf(sh=True)
@@ -77,6 +77,7 @@ def test_optuna_sweep(tmp_path: Path) -> None:
         "-m",
         "hparams_search=mnist_optuna",
         "hydra.sweep.dir=" + str(tmp_path),
+        "memoize.dir=" + str(tmp_path / "memo"),
         "hydra.sweeper.n_trials=10",
         "hydra.sweeper.sampler.n_startup_trials=5",
         "++trainer.fast_dev_run=true",
@@ -84,6 +85,61 @@ def test_optuna_sweep(tmp_path: Path) -> None:
     run_sh_command(command)
 
 
+@RunIf(sh=True)
+@pytest.mark.slow
+def test_optuna_sweep_successive_halving(tmp_path: Path) -> None:
+    """逐次半減法によるOptunaスイープで、昇格した試行が前の段階のチェックポイントから再開されることをテスト。
+
+    :param tmp_path: 一時的なログパス。
+    """
+    command = [
+        startfile,
+        "-m",
+        "hparams_search=mnist_optuna_sh",
+        "hydra.sweep.dir=" + str(tmp_path),
+        "memoize.dir=" + str(tmp_path / "memo"),
+        "hydra.sweeper.n_trials=4",
+        "hydra.sweeper.successive_halving.reduction_factor=2",
+        "hydra.sweeper.successive_halving.rungs="
+        "[['trainer.max_epochs=1','++trainer.limit_train_batches=0.01'],"
+        "['trainer.max_epochs=2','++trainer.limit_train_batches=0.02']]",
+        "+trainer.limit_val_batches=0.1",
+        "test=False",
+    ] + overrides
+    run_sh_command(command)
+
+    # 4試行が最初の段階を、上位2試行が前の段階のチェックポイントから次の段階を実行します
+    assert (tmp_path / "optimization_results.yaml").exists()
+    assert (tmp_path / "5").exists() and not (tmp_path / "6").exists()
+    assert "Restored all states" in (tmp_path / "5" / "train.log").read_text()
+
+
+@RunIf(sh=True)
+@pytest.mark.slow
+def test_optuna_sweep_pareto(tmp_path: Path) -> None:
+    """精度と推論コストの多目的Optunaスイープで、パレート解の表が保存されることをテスト。
+
+    :param tmp_path: 一時的なログパス。
+    """
+    command = [
+        startfile,
+        "-m",
+        "hparams_search=mnist_optuna_pareto",
+        "hydra.sweep.dir=" + str(tmp_path),
+        "memoize.dir=" + str(tmp_path / "memo"),
+        "hydra.sweeper.n_trials=3",
+        "trainer.max_epochs=1",
+        "+trainer.limit_train_batches=0.01",
+        "+trainer.limit_val_batches=0.1",
+        "measure.num_iters=5",
+        "test=False",
+    ] + overrides
+    run_sh_command(command)
+
+    header = (tmp_path / "pareto_front.csv").read_text().splitlines()[0]
+    assert header.startswith("trial,val/acc_best (maximize),model/latency_ms (minimize)")
+
+
 @RunIf(wandb=True, sh=True)
 @pytest.mark.slow
 def test_optuna_sweep_ddp_sim_wandb(tmp_path: Path) -> None:
@@ -96,6 +152,7 @@ def test_optuna_sweep_ddp_sim_wandb(tmp_path: Path) -> None:
         "-m",
         "hparams_search=mnist_optuna",
         "hydra.sweep.dir=" + str(tmp_path),
+        "memoize.dir=" + str(tmp_path / "memo"),
         "hydra.sweeper.n_trials=5",
         "trainer=ddp_sim",
         "trainer.max_epochs=3",
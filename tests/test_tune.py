@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import pytest
+from omegaconf import DictConfig, open_dict
+
+from src.utils import tune_utils
+
+
+def test_tune_hyperparameters(
+    cfg_train: DictConfig, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """バッチサイズと学習率の探索結果が設定に反映され、2回目はキャッシュから再利用されることを検証するテスト。
+
+    :param cfg_train: 有効なトレーニング設定を含むDictConfig。
+    :param tmp_path: 一時的なパス。
+    :param monkeypatch: pytestのmonkeypatchフィクスチャ。
+    """
+    with open_dict(cfg_train):
+        cfg_train.trainer.accelerator = "cpu"
+        cfg_train.tune.enabled = True
+        cfg_train.tune.dir = str(tmp_path / "tune")
+        cfg_train.tune.batch_size.candidates = [16, 32]
+        cfg_train.tune.batch_size.num_warmup = 1
+        cfg_train.tune.batch_size.num_steps = 2
+        cfg_train.tune.lr.num_steps = 30
+
+    result = tune_utils.tune_hyperparameters(cfg_train)
+    assert result["batch_size"] in (16, 32)
+    assert cfg_train.data.batch_size == result["batch_size"]
+    if result["lr"] is not None:
+        assert cfg_train.model.optimizer.lr == result["lr"]
+    assert len(list((tmp_path / "tune").glob("*.json"))) == 1
+
+    # 2回目は探索せずにキャッシュされた結果を使用します
+    def fail(*args, **kwargs):
+        raise AssertionError("キャッシュされた結果があるのに探索しました")
+
+    monkeypatch.setattr(tune_utils, "search_batch_size", fail)
+    monkeypatch.setattr(tune_utils, "lr_range_test", fail)
+    with open_dict(cfg_train):
+        cfg_train.data.batch_size = 128
+    assert tune_utils.tune_hyperparameters(cfg_train) == result
+    assert cfg_train.data.batch_size == result["batch_size"]